@@ -1,4 +1,10 @@
+import time
+
+# Imports are timed for the startup report
+_IMPORT_START = time.perf_counter()
+
 import signal
+from typing import Dict
 
 from flask import (
     Flask,
@@ -14,11 +20,22 @@ from werkzeug.http import HTTP_STATUS_CODES
 
 from cah.bot_base import CAHBot
 from cah.db_eng import WizzyPSQLClient
+from cah.etl.migrations import (
+    apply_migrations,
+    find_missing_indexes,
+)
 from cah.flask_base import db
+from cah.metrics import instrument_engine
 from cah.routes.actions import bp_actions
+from cah.routes.bolt import create_bolt_handler
 from cah.routes.crons import bp_crons
 from cah.routes.events import bp_events
 from cah.routes.helpers import (
+    begin_request_metrics,
+    begin_unit_of_work,
+    commit_unit_of_work,
+    end_request_metrics,
+    end_unit_of_work,
     get_app_logger,
     log_after,
     log_before,
@@ -27,6 +44,8 @@ from cah.routes.main import bp_main
 from cah.routes.slash import bp_slash
 from cah.settings import Production
 
+IMPORT_TIME_S = time.perf_counter() - _IMPORT_START
+
 # TODO:
 #  - add menu to control other users that are unresponsive (e.g., arparca)
 #  - split out the main menu into general and in-game commands
@@ -59,6 +78,8 @@ def handle_err(err):
 def create_app(*args, **kwargs) -> Flask:
     config_class = kwargs.pop('config_class', Production)
     props = kwargs.pop('props')
+    # Seconds spent in each step of starting up
+    startup_timings = {'imports': IMPORT_TIME_S}  # type: Dict[str, float]
 
     app = Flask(__name__, static_url_path='/')
     app.config.from_object(config_class)
@@ -90,17 +111,46 @@ def create_app(*args, **kwargs) -> Flask:
 
     # Set up database connection
     logg.debug('Initializing db engine...')
-    eng = WizzyPSQLClient(props=props, parent_log=logg)
+    step_start = time.perf_counter()
+    eng = WizzyPSQLClient(props=props, parent_log=logg, settings_ttl_s=config_class.SETTINGS_CACHE_TTL_S,
+                          engine_kwargs=config_class.get_engine_kwargs(),
+                          is_read_committed_reads=config_class.DB_READ_COMMITTED_READS,
+                          serialization_retries=config_class.DB_SERIALIZATION_RETRIES)
+    # Statements get counted & timed per request for /metrics
+    instrument_engine(eng.engine)
     app.extensions.setdefault('eng', eng)
+    startup_timings['db engine'] = time.perf_counter() - step_start
+
+    if config_class.DB_MIGRATE_ON_BOOT:
+        step_start = time.perf_counter()
+        apply_migrations(eng.engine, log=logg)
+        find_missing_indexes(eng.engine, log=logg)
+        startup_timings['db migrations'] = time.perf_counter() - step_start
 
     logg.debug('Instantiating bot...')
     bot = CAHBot(eng=eng, props=props, config=config_class, parent_log=logg)
+    startup_timings.update(bot.startup_timings)
     # Register the cleanup function as a signal handler
     signal.signal(signal.SIGINT, bot.cleanup)
     signal.signal(signal.SIGTERM, bot.cleanup)
     app.extensions.setdefault('bot', bot)
 
+    # One Bolt app serves all the routes, reusing the bot's Slack client
+    step_start = time.perf_counter()
+    app.extensions.setdefault('bolt_handler', create_bolt_handler(signing_secret=props['signing-secret'],
+                                                                  client=bot.bot))
+    startup_timings['bolt app'] = time.perf_counter() - step_start
+
+    # Registered first so the request's metrics are ended last (teardowns run in reverse), after its commit
+    app.before_request(begin_request_metrics)
+    app.teardown_request(end_request_metrics)
     app.before_request(log_before)
     app.after_request(log_after)
+    if config_class.DB_UNIT_OF_WORK_PER_REQUEST:
+        app.before_request(begin_unit_of_work)
+        app.after_request(commit_unit_of_work)
+        app.teardown_request(end_unit_of_work)
 
+    timings_txt = ', '.join(f'{step}: {secs:.2f}s' for step, secs in startup_timings.items())
+    logg.info(f'Startup took {sum(startup_timings.values()):.2f}s ({timings_txt})')
     return app
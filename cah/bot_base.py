@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from contextlib import contextmanager
 from datetime import (
     datetime,
     timedelta,
 )
+from random import random
 import sys
+import time
 from typing import (
     TYPE_CHECKING,
+    Callable,
     Dict,
     List,
     Optional,
@@ -15,8 +19,6 @@ from typing import (
 )
 
 from loguru import logger
-import numpy as np
-import pandas as pd
 from slacktools import SlackBotBase
 from slacktools.block_kit.base import BlocksType
 from slacktools.block_kit.blocks import (
@@ -35,14 +37,23 @@ from slacktools.block_kit.elements.formatters import (
     DateFormatType,
 )
 from slacktools.command_processing import build_commands
+from sqlalchemy import func
 
 from cah import ROOT_PATH
 from cah.core.common_methods import refresh_players_in_channel
 from cah.core.deck import Deck
+from cah.core.game_registry import GameRegistry
 from cah.core.games import (
     Game,
     GameStatus,
 )
+from cah.core.jobs import (
+    DelayedJobQueue,
+    OrderedWorkQueue,
+)
+from cah.core.render_cache import RenderKind
+from cah.core.scheduler import TaskScheduler
+from cah.core.throttle import ThrottledSlackClient
 from cah.db_eng import WizzyPSQLClient
 from cah.forms import Forms
 from cah.model import (
@@ -57,6 +68,8 @@ from cah.model import (
 from cah.queries.bot_queries import BotQueries
 
 if TYPE_CHECKING:
+    import pandas as pd
+
     from cah.core.players import Player
     from cah.settings import (
         Development,
@@ -82,18 +95,24 @@ class CAHBot(Forms):
         self.admins = config.ADMINS
         self.version = config.VERSION
         self.update_date = config.UPDATE_DATE
+        # Seconds spent in each step of starting up, for the startup report
+        self.startup_timings = {}  # type: Dict[str, float]
 
         # Begin loading and organizing commands
-        self.commands = build_commands(self, cmd_yaml_path=ROOT_PATH.parent.joinpath('commands.yaml'),
-                                       log=self.log)
+        with self._time_startup_step('command build'):
+            self.commands = build_commands(self, cmd_yaml_path=ROOT_PATH.parent.joinpath('commands.yaml'),
+                                           log=self.log)
         # Initate the bot, which comes with common tools for interacting with Slack's API
         self.is_post_exceptions = self.eng.get_setting(SettingType.IS_POST_ERR_TRACEBACK)
-        self.st = SlackBotBase(props=props, triggers=self.triggers, main_channel=self.channel_id,
-                               admins=self.admins, is_post_exceptions=self.is_post_exceptions,
-                               is_debug=config.DEBUG, is_use_session=False)
+        with self._time_startup_step('slack auth'):
+            self.st = SlackBotBase(props=props, triggers=self.triggers, main_channel=self.channel_id,
+                                   admins=self.admins, is_post_exceptions=self.is_post_exceptions,
+                                   is_debug=config.DEBUG, is_use_session=False)
         # Pass in commands to SlackBotBase, where task delegation occurs
         self.log.debug('Patching in commands to SBB...')
         self.st.update_commands(commands=self.commands)
+        # Everything that talks to Slack (incl. games & players) shares these rate limits & call stats
+        self.st = ThrottledSlackClient(st=self.st, log=self.log)
         self.bot_id = self.st.bot_id
         self.user_id = self.st.user_id
         self.bot = self.st.bot
@@ -102,31 +121,97 @@ class CAHBot(Forms):
         super().__init__(st=self.st, eng=self.eng)
 
         # More game environment-specific initialization stuff
-        self.current_game = None        # type: Optional[Game]
+        # Games in progress, one per channel
+        self.games = GameRegistry()
+        # Background work gets the same unit of work as requests, if they have one
+        job_wrapper = self.eng.run_in_unit_of_work if config.DB_UNIT_OF_WORK_PER_REQUEST else None
+        # Delayed work (e.g., round transitions) gets run here instead of in the request thread
+        self.jobs = DelayedJobQueue(log=self.log, job_wrapper=job_wrapper)
+        # Incoming Slack events & actions are processed here after being acknowledged, in order per channel
+        self.work_queue = OrderedWorkQueue(log=self.log, max_workers=config.WORK_QUEUE_WORKERS,
+                                           max_pending=config.WORK_QUEUE_MAX_PENDING,
+                                           job_wrapper=job_wrapper)
         self.bq = BotQueries(eng=eng, log=self.log)
+        # Tasks from the task table (e.g., auto-randpicks) are triggered from here, one at a time
+        self.task_jobs = DelayedJobQueue(log=self.log, max_workers=1, name='cah-tasks', job_wrapper=job_wrapper)
+        self.scheduler = TaskScheduler(eng=self.eng, log=self.log, job_queue=self.task_jobs, handlers={
+            'handle-randpick': self.handle_randpick,
+            'handle-randchoose': self.handle_randchoose,
+            'force-choose': self.force_choose,
+        })
 
         if self.eng.get_setting(SettingType.IS_ANNOUNCE_STARTUP):
             self.log.debug('IS_ANNOUNCE_STARTUP was enabled, so sending message to main channel')
             self.st.message_main_channel(blocks=self.get_bootup_msg())
 
         if self.eng.get_setting(SettingType.IS_LOOK_FOR_ONGOING_GAMES):
-            self.log.debug('Checking for an ongoing game...')
-            self.check_for_ongoing_game()
+            self.log.debug('Checking for ongoing games...')
+            with self._time_startup_step('game reinstate'):
+                self.check_for_ongoing_game()
+
+        if config.IS_TASK_SCHEDULER_ENABLED:
+            with self._time_startup_step('task schedule'):
+                self.scheduler.load_tasks()
 
         # Store for state across UI responses (thanks Slack for not supporting multi-user selects!)
+        #   Decks are kept by the channel the new game form was sent to
         self.state_store = {
-            'decks': ['cahbase']
-        }
+            'decks': {}
+        }  # type: Dict[str, Dict[str, List[str]]]
+
+    @contextmanager
+    def _time_startup_step(self, step: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[step] = time.perf_counter() - start
+
+    @property
+    def current_game(self) -> Optional[Game]:
+        """The game in the main channel"""
+        return self.games.get(self.channel_id)
+
+    @current_game.setter
+    def current_game(self, game: Optional[Game]):
+        self.games.set(self.channel_id, game)
+
+    def get_game(self, channel: str = None, user_hash: str = None) -> Optional[Game]:
+        """Finds the game for the channel (the main channel by default).
+        If there's no game there (e.g., the command came in by DM), falls back to the game the user is playing in.
+        """
+        game = self.games.get(self.channel_id if channel is None else channel)
+        if game is None and user_hash is not None:
+            player_games = self.games.find_player_games(user_hash)
+            if len(player_games) == 1:
+                game = player_games[0]
+        return game
+
+    def _reply_channel(self, channel: str = None, game: Game = None) -> str:
+        """Replies about a game go to the game's channel, otherwise to wherever the command came from"""
+        if game is not None:
+            return game.channel_id
+        return self.channel_id if channel is None else channel
 
     def check_for_ongoing_game(self):
-        """Determines if the last game in the db was ended properly.
+        """Determines if the last game in each channel was ended properly.
         If not, it assumes that game will need to be started up"""
+        # Games from before channels were recorded were all played in the main channel
+        game_channel = func.coalesce(TableGame.channel_id, self.channel_id)
         with self.eng.session_mgr() as session:
-            last_game: TableGame
-            last_game = session.query(TableGame).order_by(TableGame.created_date.desc()).limit(1).one_or_none()
-            if last_game is not None and last_game.status != GameStatus.ENDED:
-                self.log.debug(f'Game id {last_game.game_id} was not ended. Reloading...')
-                self.reinstate_game(game_id=last_game.game_id)
+            latest_game_ids = session.query(func.max(TableGame.game_id)).group_by(game_channel)
+            unended_games = session.query(TableGame.game_id, game_channel).filter(
+                TableGame.game_id.in_(latest_game_ids),
+                TableGame.status != GameStatus.ENDED
+            ).order_by(TableGame.game_id.desc()).all()
+        # Newest games first, so they keep any players who ended up in more than one
+        for game_id, game_channel in unended_games:
+            self.log.debug(f'Game id {game_id} in channel {game_channel} was not ended. Reloading...')
+            try:
+                self.reinstate_game(game_id=game_id, channel=game_channel)
+            except Exception as e:
+                # Don't let one broken game keep the others from coming back
+                self.log.error(f'Unable to reinstate game id {game_id}: {e}')
 
     def get_bootup_msg(self) -> BlocksType:
         now = datetime.now()
@@ -165,6 +250,16 @@ class CAHBot(Forms):
         notify_block = [
             MarkdownContextBlock(f'{self.bot_name} died. Pour one out `010100100100100101010000`').asdict()
         ]
+        # Stop taking on new work, then let what was already accepted finish so its changes are in what's flushed
+        self.scheduler.shutdown()
+        self.task_jobs.shutdown(wait=True)
+        self.work_queue.shutdown(wait=True)
+        for game in self.games.games:
+            self.log.debug(f'Flushing pending round state for game {game.game_id} before shutting down...')
+            game.flush_round_state(checkpoint='shutdown')
+            game.deck.flush_draw_counts()
+            game.message_updates.flush_all()
+        self.jobs.shutdown()
         if self.eng.get_setting(SettingType.IS_ANNOUNCE_SHUTDOWN):
             self.st.message_main_channel(blocks=notify_block)
         self.log.info('Bot shutting down...')
@@ -178,6 +273,48 @@ class CAHBot(Forms):
         """Hands off the event data while also refreshing the session"""
         self.st.parse_message_event(event_dict)
 
+    def _get_work_key(self, channel: Optional[str], user_hash: Optional[str]) -> Optional[str]:
+        """Work is queued under the channel of the game it's for, so e.g., a click in a DM
+        is handled in order with the rest of that game's work"""
+        game = self.get_game(channel, user_hash=user_hash)
+        return channel if game is None else game.channel_id
+
+    def queue_event(self, event_dict: Dict) -> bool:
+        """Queues a message event for processing after any others from the same channel
+
+        Returns:
+            False if the queue was full and the event was turned away
+        """
+        event = event_dict.get('event', {})
+        channel = event.get('channel')
+        user = event.get('user')
+        if self.work_queue.submit(self._get_work_key(channel, user), self.process_event, event_dict, name='event'):
+            return True
+        text = event.get('text', '').lower()
+        if user is not None and any(text.startswith(x) for x in self.triggers):
+            # Only let the user know if it looked like a command
+            self.st.private_channel_message(user_id=user, channel=channel,
+                                            message='I\'m swamped right now :sweat_smile: Try that again in a bit.')
+        return False
+
+    def queue_incoming_action(self, user: str, channel: str, action_dict: Dict, event_dict: Dict,
+                              callback: Callable[[], None] = None) -> bool:
+        """Queues an action for processing after any other events & actions from the same channel
+
+        Args:
+            callback: optional callable run once the action's been handled (e.g., to update the original message)
+
+        Returns:
+            False if the queue was full and the action was turned away
+        """
+        def _process():
+            self.process_incoming_action(user, channel, action_dict=action_dict, event_dict=event_dict)
+            if callback is not None:
+                callback()
+
+        return self.work_queue.submit(self._get_work_key(channel, user), _process,
+                                      name=f'action-{action_dict.get("action_id")}')
+
     def process_incoming_action(self, user: str, channel: str, action_dict: Dict, event_dict: Dict) -> Optional:
         """Handles an incoming action (e.g., when a button is clicked)"""
         action_id = action_dict.get('action_id')
@@ -215,11 +352,11 @@ class CAHBot(Forms):
             if 'pick' in parsed_command:
                 # Handle pick/randpick
                 self.log.debug(f'Processed "pick" command to: {parsed_command}')
-                self.process_picks(user, parsed_command)
+                self.process_picks(user, parsed_command, channel=channel)
             elif 'choose' in parsed_command:
                 # handle choose/randchoose
                 self.log.debug(f'Processed "choose" command to: {parsed_command}')
-                self.choose_card(user, parsed_command)
+                self.choose_card(user, parsed_command, channel=channel)
         elif action_id == 'help':
             self.st.send_message(channel=channel, blocks=self.generate_intro(), thread_ts=thread_ts)
         elif action_id.startswith('shelp'):
@@ -229,7 +366,8 @@ class CAHBot(Forms):
             self.st.send_message(channel=channel, blocks=blocks, thread_ts=thread_ts)
         elif action_id == 'new-game-start':
             # Kicks off the new game form process
-            if self.current_game is not None and self.current_game.status != GameStatus.ENDED:
+            game = self.games.get(channel)
+            if game is not None and game.status != GameStatus.ENDED:
                 self.st.send_message(channel=channel, message=f'Dear <@{user}>, one must end the game '
                                                               f'before one can start a game anew :meditation-fart:')
                 return None
@@ -247,49 +385,52 @@ class CAHBot(Forms):
             self.log.debug('Processing second part of new game process.')
             deck_names = [x['value'].replace('deck_', '') for x in action_dict['selected_options']]
             self.log.debug(f'Extracted these deck names: {deck_names}')
-            self.state_store['decks'] = deck_names
+            self.state_store['decks'][channel] = deck_names
             formp2 = self.build_new_game_form_p2(decks_list=deck_names)
             _ = self.st.private_channel_message(user_id=user, channel=channel, message='New game form, p2',
                                                 blocks=formp2)
         elif action_id == 'game-stats':
-            blocks = self.game_stats()
+            blocks = self.game_stats(channel=channel)
             self.st.send_message(channel=channel, blocks=blocks, thread_ts=thread_ts)
         elif action_id in ['my-stats', 'player-stats']:
-            blocks = self.player_stats(user_id=user, message='')
+            blocks = self.player_stats(user_id=user, message='', channel=channel)
             self.st.send_message(channel=channel, blocks=blocks, thread_ts=thread_ts)
         elif action_id == 'arparc-player':
             self.st.send_message(channel=channel, message='ARPARC player is currently in development! '
                                                           'Check back later.', thread_ts=thread_ts)
         elif action_id == 'my-cards':
             user_player_obj: Player
-            user_player_obj = self.current_game.players.player_dict[user.upper()]
+            user_player_obj = self.get_game(channel, user_hash=user.upper()).players.player_dict[user.upper()]
             cards_block = user_player_obj.render_hand()
             self.st.private_channel_message(user_id=user, channel=channel, message='Your cahds', blocks=cards_block)
         elif action_id == 'new-game-users':
-            self.new_game(deck_names=self.state_store['decks'], player_hashes=action_dict['selected_users'])
+            self.new_game(deck_names=self.state_store['decks'].get(channel, ['cahbase']),
+                          player_hashes=action_dict['selected_users'], channel=channel)
         elif action_id == 'status':
-            status_block = self.display_status()
+            status_block = self.display_status(channel=channel)
             if status_block is not None:
                 self.st.send_message(channel=channel, message='Game status', blocks=status_block,
                                      thread_ts=thread_ts)
         elif action_id == 'modify-question-form':
+            game = self.get_game(channel, user_hash=user)
             qmod_form = self.modify_question_form(
-                original_value=self.current_game.current_question_card.card_text,
-                question_id=self.current_game.current_question_card.question_card_id
+                original_value=game.current_question_card.card_text,
+                question_id=game.current_question_card.question_card_id
             )
             _ = self.st.private_channel_message(user_id=user, channel=channel, message='Modify question form',
                                                 blocks=qmod_form)
         elif action_id.startswith('modify-question'):
             # Response from modify question form
-            past_q = self.current_game.current_question_card.card_text
+            game = self.get_game(channel, user_hash=user)
+            past_q = game.current_question_card.card_text
             question_id = int(action_id.split('-')[-1])
-            self.modify_question_text(new_text=action_value, question_card_id=question_id)
+            self.modify_question_text(new_text=action_value, question_card_id=question_id, channel=game.channel_id)
             blocks = [
                 MarkdownContextBlock(f'<@{user}> was kind enough to update the question.'),
                 MarkdownSectionBlock(f'`Old:` _`{past_q}`_ \n'
-                                     f'*`New:`* *`{self.current_game.current_question_card.card_text}`*')
+                                     f'*`New:`* *`{game.current_question_card.card_text}`*')
             ]
-            self.st.message_main_channel(blocks=blocks)
+            self.st.send_message(channel=game.channel_id, blocks=blocks)
         elif action_id == 'my-settings':
             self.get_my_settings(user=user, channel=channel)
         elif action_id == 'add-player':
@@ -297,21 +438,27 @@ class CAHBot(Forms):
             _ = self.st.private_channel_message(user_id=user, channel=channel, message='Add player form',
                                                 blocks=add_user)
         elif action_id == 'add-player-done':
-            if self.current_game is not None:
+            game = self.get_game(channel, user_hash=user)
+            if game is not None:
                 add_user = action_dict.get('selected_user')
-                self.current_game.players.add_player_to_game(add_user, game_id=self.current_game.game_id,
-                                                             game_round_id=self.current_game.game_round_id)
+                with self.games.channel_lock(game.channel_id):
+                    # A player can only be in one game at a time
+                    if not self._notify_busy_players([add_user], channel=game.channel_id):
+                        game.players.add_player_to_game(add_user, game_id=game.game_id,
+                                                        game_round_id=game.game_round_id)
         elif action_id == 'remove-player':
             rem_user = self.build_remove_user_form()
             _ = self.st.private_channel_message(user_id=user, channel=channel, message='Remove player form',
                                                 blocks=rem_user)
         elif action_id == 'remove-player-done':
-            if self.current_game is not None:
+            game = self.get_game(channel, user_hash=user)
+            if game is not None:
                 rem_user = action_dict.get('selected_user')
-                self.current_game.players.remove_player_from_game(rem_user)
+                game.players.remove_player_from_game(rem_user)
         elif action_id == 'decknuke':
-            if self.current_game is not None:
-                self.current_game.decknuke(user)
+            game = self.get_game(channel, user_hash=user)
+            if game is not None:
+                game.decknuke(user)
         elif action_id.startswith('toggle-'):
             action_msg = action_id.replace('-', ' ')
             if action_id == 'toggle-auto-randpick':
@@ -326,14 +473,14 @@ class CAHBot(Forms):
             elif action_id == 'toggle-card-dm':
                 self.toggle_card_dm(user_hash=user, channel=channel)
         elif action_id == 'score':
-            score_block = self.display_points()
+            score_block = self.display_points(channel=channel)
             if score_block is not None:
                 self.st.send_message(channel=channel, message='Scores', blocks=score_block)
         elif action_id == 'ping':
-            ping_txt = self.ping_players_left_to_pick()
+            ping_txt = self.ping_players_left_to_pick(channel=channel)
             self.st.send_message(channel=channel, message=ping_txt)
         elif action_id == 'end-game':
-            self.end_game()
+            self.end_game(channel=channel)
         else:
             # Probably should notify the user, but I'm not sure if Slack will attempt
             #   to send requests multiple times if it doesn't get a response in time.
@@ -346,9 +493,27 @@ class CAHBot(Forms):
 
     def prebuild_main_menu(self, user_hash: str, channel: str):
         """Encapsulates required objects for building and sending the main menu form"""
-        self.build_main_menu(game_obj=self.current_game, user=user_hash, channel=channel)
-
-    def new_game(self, deck_names: List[str], player_hashes: List[str] = None, message: str = None):
+        self.build_main_menu(game_obj=self.get_game(channel, user_hash=user_hash), user=user_hash, channel=channel)
+
+    def _get_busy_players(self, player_hashes: List[str], channel: str) -> List[str]:
+        """Returns the players who are already in a game in a different channel"""
+        busy_hashes = [x for game in self.games.games if game.channel_id != channel
+                       for x in game.players.player_dict.keys()]
+        return [x for x in player_hashes if x in busy_hashes]
+
+    def _notify_busy_players(self, player_hashes: List[str], channel: str) -> bool:
+        """Lets the channel know if any of the players are already in a game elsewhere.
+        Returns True if there were any"""
+        busy_players = self._get_busy_players(player_hashes, channel=channel)
+        if len(busy_players) > 0:
+            busy_txt = ' '.join([f'<@{x}>' for x in busy_players])
+            self.st.send_message(channel, f'{busy_txt} already in a game elsewhere. '
+                                          f'They\'ll have to finish that one first.')
+            return True
+        return False
+
+    def new_game(self, deck_names: List[str], player_hashes: List[str] = None, message: str = None,
+                 channel: str = None):
         """Begins a new game
 
         Args:
@@ -356,48 +521,62 @@ class CAHBot(Forms):
             player_hashes: list of the slack hashes assigned to each player
             message: optional, the message used to spin up the game. originally used to orchestrate things,
                 but now is somewhat vestigial
+            channel: the channel to play the game in. Defaults to the main channel.
         """
         _ = message
-        if self.current_game is not None:
-            if self.current_game.status != GameStatus.ENDED:
-                self.st.message_main_channel('Looks like you haven\'t ended the current game yet. '
-                                             'Do that and then start a new game.')
+        channel = self.channel_id if channel is None else channel
+        with self.games.channel_lock(channel):
+            game = self.games.get(channel)
+            if game is not None:
+                if game.status != GameStatus.ENDED:
+                    self.st.send_message(channel, 'Looks like you haven\'t ended the current game yet. '
+                                                  'Do that and then start a new game.')
+                    return None
+                self.games.remove(channel)
+
+            # A player can only be in one game at a time
+            if self._notify_busy_players(player_hashes, channel=channel):
                 return None
 
-        response_list = [f'Using decks: `{deck_names}` deck']
+            response_list = [f'Using decks: `{deck_names}` deck']
 
-        # Read in card deck to use with this game
-        self.log.debug('Reading in deck...')
-        deck = self._read_in_cards(deck_names)
+            # Read in card deck to use with this game
+            self.log.debug('Reading in deck...')
+            deck = self._read_in_cards(deck_names)
 
-        # Load the game, add players, shuffle the players
-        self.log.debug('Instantiating game object')
-        self.current_game = Game(player_hashes=player_hashes, deck=deck, st=self.st, eng=self.eng,
-                                 parent_log=self.log, config=self.config)
+            # Load the game, add players, shuffle the players
+            self.log.debug(f'Instantiating game object for channel {channel}')
+            game = Game(player_hashes=player_hashes, deck=deck, st=self.st, eng=self.eng,
+                        parent_log=self.log, config=self.config, job_queue=self.jobs, channel_id=channel,
+                        active_player_hashes=self.games.get_player_hashes() + player_hashes)
+            self.games.set(channel, game)
         # Get order of judges
         self.log.debug('Getting judge order')
-        response_list.append(f'Judge order: {self.current_game.get_judge_order()}')
+        response_list.append(f'Judge order: {game.get_judge_order()}')
         # Kick off the new round, message details to the group
         self.log.debug('Beginning new round')
-        self.new_round(notifications=response_list)
+        self.new_round(notifications=response_list, channel=channel)
 
-    def refresh_players(self) -> str:
+    def refresh_players(self, channel: str = None) -> str:
         """Refresh all channel members' details, including the players' names.
         While doing so, make sure they're members of the channel."""
-        refresh_players_in_channel(channel=self.channel_id, eng=self.eng, st=self.st, log=self.log)
-        if self.current_game is not None:
-            self.log.debug('After refresh, syncing display names for current game\'s player objects...')
+        refresh_players_in_channel(channel=self.channel_id if channel is None else channel, eng=self.eng,
+                                   st=self.st, log=self.log)
+        games = self.games.games
+        if len(games) > 0:
+            self.log.debug('After refresh, syncing display names for the games\' player objects...')
             with self.eng.session_mgr() as session:
                 all_players = session.query(TablePlayer).all()
                 p_obj: TablePlayer
                 for p_obj in all_players:
-                    if p_obj.slack_user_hash in self.current_game.players.player_dict.keys():
-                        self.current_game.players.player_dict[p_obj.slack_user_hash].display_name = p_obj.display_name
+                    for game in games:
+                        if p_obj.slack_user_hash in game.players.player_dict.keys():
+                            game.players.player_dict[p_obj.slack_user_hash].display_name = p_obj.display_name
 
         return 'Players refreshed o7'
 
-    def game_stats(self) -> BlocksType:
-        stats = self.current_game.gq.get_game_stats()
+    def game_stats(self, channel: str = None) -> BlocksType:
+        stats = self.get_game(channel).gq.get_game_stats()
         fields = []
         for name, val in stats.items():
             if isinstance(val, timedelta):
@@ -408,12 +587,13 @@ class CAHBot(Forms):
             MarkdownSectionBlock(fields)
         ]
 
-    def player_stats(self, user_id, message: str) -> BlocksType:
+    def player_stats(self, user_id, message: str, channel: str = None) -> BlocksType:
         msg_split = message.split()
-        if self.current_game is None:
+        game = self.get_game(channel, user_hash=user_id)
+        if game is None:
             player = self.eng.get_player_from_hash(user_hash=user_id)  # type: TablePlayer
         else:
-            player = self.current_game.players.player_dict[user_id]  # type: 'Player'
+            player = game.players.player_dict[user_id]  # type: 'Player'
 
             # Set the player as the user first, but see if the user is actually picking for someone else
             if any(['<@' in x for x in msg_split]):
@@ -424,12 +604,12 @@ class CAHBot(Forms):
                     # Clean tag markup, if any
                     ptag = ptag.replace('<@', '').replace('>', '')
                     try:
-                        player = self.current_game.players.player_dict[ptag.upper()]  # type: 'Player'
+                        player = game.players.player_dict[ptag.upper()]  # type: 'Player'
                     except KeyError:
                         return [MarkdownSectionBlock('Player not found in current game :(')]
 
         stats = player.pq.get_player_stats(player_id=player.player_table_id,
-                                           game_round_id=self.current_game.game_round_id)
+                                           game_round_id=game.game_round_id)
 
         fields = []
         for name, val in stats.items():
@@ -445,13 +625,14 @@ class CAHBot(Forms):
             MarkdownSectionBlock(fields)
         ]
 
-    def decknuke(self, user: str):
+    def decknuke(self, user: str, channel: str = None):
         """Deals the user a new hand while randpicking one of the cards from their current deck.
         The card that's picked will have a negative point value
         """
-        if self.current_game is None or self.current_game.status not in [GameStatus.PLAYER_DECISION]:
+        game = self.get_game(channel, user_hash=user)
+        if game is None or game.status not in [GameStatus.PLAYER_DECISION]:
             return 'Here\'s a nuke for ya :fart:'
-        self.current_game.decknuke(player_hash=user)
+        game.decknuke(player_hash=user)
 
     def show_decks(self) -> str:
         """Returns the deck names currently available"""
@@ -477,19 +658,20 @@ class CAHBot(Forms):
         self.log.debug(f'Returned: {deck_combo}. Building card lists from this...')
         return Deck(deck_combo=deck_combo, eng=self.eng)
 
-    def _toggle_bool_setting(self, setting: SettingType):
+    def _toggle_bool_setting(self, setting: SettingType, channel: str = None):
         # Map of setting attribute names to their toggle methods
         setting_map = {
             setting.IS_PING_JUDGE: {'method': 'toggle_judge_ping', 'attr': 'is_ping_judge'},
             setting.IS_PING_WINNER: {'method': 'toggle_winner_ping', 'attr': 'is_ping_winner'},
         }
-        if self.current_game is not None:
+        game = self.get_game(channel)
+        if game is not None:
             self.log.debug('Toggling setting inside of active game.')
             if setting in setting_map.keys():
                 method = setting_map[setting]['method']
                 attr = setting_map[setting]['attr']
-                getattr(self.current_game, method)()
-                new_val = getattr(self.current_game, attr)
+                getattr(game, method)()
+                new_val = getattr(game, attr)
             else:
                 self.log.error(f'Unable to find setting ({setting}) in setting map. Returning None')
                 return None
@@ -498,27 +680,34 @@ class CAHBot(Forms):
             old_val = self.eng.get_setting(setting)
             new_val = not old_val
             self.eng.set_setting(setting, setting_val=new_val)
-        self.st.message_main_channel(f'`{setting.name}` set to: `{new_val}`')
+        self.st.send_message(self._reply_channel(channel, game=game), f'`{setting.name}` set to: `{new_val}`')
 
-    def toggle_judge_ping(self):
+    def refresh_settings(self, user: str) -> str:
+        """Drops the cached settings so they're reread from the db"""
+        if user not in self.admins:
+            return 'Only admins can refresh the settings. :shame:'
+        self.eng.invalidate_settings()
+        return 'Settings will be reread from the db on next use.'
+
+    def toggle_judge_ping(self, channel: str = None):
         """Toggles whether or not to ping the judge when all card decisions have been completed"""
-        self._toggle_bool_setting(SettingType.IS_PING_JUDGE)
+        self._toggle_bool_setting(SettingType.IS_PING_JUDGE, channel=channel)
 
-    def toggle_winner_ping(self):
+    def toggle_winner_ping(self, channel: str = None):
         """Toggles whether or not to ping the winner when they've won a round"""
-        self._toggle_bool_setting(SettingType.IS_PING_WINNER)
+        self._toggle_bool_setting(SettingType.IS_PING_WINNER, channel=channel)
 
     def toggle_auto_pick_or_choose(self, user_hash: str, channel: str, message: str, pick_or_choose: str) -> str:
         """Toggles ARP/ARC for player"""
-        _ = channel
         msg_split = message.split()
         is_randpick = pick_or_choose == 'randpick'
         is_both = pick_or_choose == 'both'
 
-        if self.current_game is None:
+        game = self.get_game(channel, user_hash=user_hash)
+        if game is None:
             player = self.eng.get_player_from_hash(user_hash=user_hash)  # type: TablePlayer
         else:
-            player = self.current_game.players.player_dict[user_hash]  # type: 'Player'
+            player = game.players.player_dict[user_hash]  # type: 'Player'
 
             # Set the player as the user first, but see if the user is actually picking for someone else
             if any(['<@' in x for x in msg_split]):
@@ -528,7 +717,7 @@ class CAHBot(Forms):
                     ptag = next((x for x in msg_split if '<@' in x))
                     # Clean tag markup, if any
                     ptag = ptag.replace('<@', '').replace('>', '')
-                    player = self.current_game.players.player_dict[ptag.upper()]  # type: 'Player'
+                    player = game.players.player_dict[ptag.upper()]  # type: 'Player'
 
         resp_msg = []
 
@@ -542,9 +731,9 @@ class CAHBot(Forms):
                 player.toggle_arp()
                 resp_msg.append(f'Auto randpick for player `{player.display_name}` set to '
                                 f'`{player.is_arp}`')
-            if self.current_game is not None:
-                if all([self.current_game.status == GameStatus.PLAYER_DECISION,
-                        player.player_hash != self.current_game.judge.player_hash,
+            if game is not None:
+                if all([game.status == GameStatus.PLAYER_DECISION,
+                        player.player_hash != game.judge.player_hash,
                         player.is_arp,
                         not player.is_picked]):
                     # randpick for the player immediately if:
@@ -555,11 +744,11 @@ class CAHBot(Forms):
                     #   - player picks are empty
                     resp_msg.append('THIS IS TO CONFIRM THAT YOUR RANDPICK HAS BEEN AUTOMATHICALLY '
                                     'HANDLED THIS ROUND, ASSHOLE!!!!')
-                    rand_roll = np.random.random()
+                    rand_roll = random()
                     if rand_roll <= 0.10:
-                        self.decknuke(player.player_hash)
+                        self.decknuke(player.player_hash, channel=game.channel_id)
                     else:
-                        self.process_picks(player.player_hash, 'randpick')
+                        self.process_picks(player.player_hash, 'randpick', channel=game.channel_id)
 
         if any([not is_randpick, is_both]):
             # Auto randchoose
@@ -571,18 +760,18 @@ class CAHBot(Forms):
                 player.toggle_arc()
                 resp_msg.append(f'Auto randchoose for player `{player.display_name}` set to '
                                 f'`{player.is_arc}`')
-            if self.current_game is not None:
-                if all([self.current_game.status == GameStatus.JUDGE_DECISION,
-                        player.player_hash == self.current_game.judge.player_hash,
+            if game is not None:
+                if all([game.status == GameStatus.JUDGE_DECISION,
+                        player.player_hash == game.judge.player_hash,
                         player.is_arc,
-                        self.current_game.judge.selected_choice_idx is None]):
+                        game.judge.selected_choice_idx is None]):
                     # randchoose for the player immediately if:
                     #   - game active
                     #   - judge's decision status
                     #   - player is judge
                     #   - autorandchoose was turned on
                     #   - judge picks are empty
-                    self.choose_card(player.player_hash, 'randchoose')
+                    self.choose_card(player.player_hash, 'randchoose', channel=game.channel_id)
         if isinstance(player, TablePlayer):
             # Apply changes to table
             self.eng.refresh_table_object(tbl_obj=player)
@@ -591,12 +780,13 @@ class CAHBot(Forms):
 
     def toggle_card_dm(self, user_hash: str, channel: str):
         """Toggles card dming"""
-        if self.current_game is not None:
-            player = self.current_game.players.player_dict[user_hash]
+        game = self.get_game(channel, user_hash=user_hash)
+        if game is not None:
+            player = game.players.player_dict[user_hash]
             player.toggle_cards_dm()
             # Send cards to user if the status shows we're currently in a game
-            if self.current_game.status == GameStatus.PLAYER_DECISION and player.is_dm_cards:
-                self.dm_cards_now(user_hash)
+            if game.status == GameStatus.PLAYER_DECISION and player.is_dm_cards:
+                self.dm_cards_now(user_hash, channel=game.channel_id)
         else:
             player = self.eng.get_player_from_hash(user_hash=user_hash)
             player.is_dm_cards = not player.is_dm_cards
@@ -605,12 +795,13 @@ class CAHBot(Forms):
         msg = f'Card DMing for player `{player.display_name}` set to `{player.is_dm_cards}`'
         self.st.send_message(channel, msg)
 
-    def dm_cards_now(self, user_hash: str) -> Optional:
+    def dm_cards_now(self, user_hash: str, channel: str = None) -> Optional:
         """DMs current card set to user"""
-        if self.current_game is None:
-            self.st.message_main_channel('Start a game first, then tell me to do that.')
+        game = self.get_game(channel, user_hash=user_hash)
+        if game is None:
+            self.st.send_message(self._reply_channel(channel), 'Start a game first, then tell me to do that.')
             return None
-        player = self.current_game.players.player_dict[user_hash]
+        player = game.players.player_dict[user_hash]
         self.log.debug(f'DMing cards to player: {player.display_name}')
 
         # Send cards to user if the status shows we're currently in a game
@@ -619,26 +810,26 @@ class CAHBot(Forms):
             msg_txt = "You have no cards to send. This likely means you've recently nuked your deck, " \
                       "or you're not a current player"
             self.st.private_message(player.player_hash, msg_txt)
-        elif self.current_game.status == GameStatus.PLAYER_DECISION:
+        elif game.status == GameStatus.PLAYER_DECISION:
             self.log.debug('Player is in player decision status, so sending their deck')
-            question_block = self.current_game.make_question_block()
+            question_block = game.make_question_block()
             cards_block = player.render_hand(
-                max_selected=self.current_game.current_question_card.responses_required)
+                max_selected=game.current_question_card.responses_required)
             self.st.private_message(player.player_hash, message='Your cards have arrived',
                                     blocks=question_block + cards_block)
-        elif (self.current_game.status == GameStatus.JUDGE_DECISION and
-              self.current_game.judge.player_hash == player.player_hash):
+        elif (game.status == GameStatus.JUDGE_DECISION and
+              game.judge.player_hash == player.player_hash):
             self.log.debug('Player is in judge decision status and is judge, so sending picks')
             # Instead of getting their own deck, send the player the choices
-            _, judge_picks = self.current_game.display_picks()
+            _, judge_picks = game.display_picks()
             self.st.private_message(player.player_hash, message='Your cards have arrived',
                                     blocks=judge_picks)
         else:
             self.log.debug('Player is not in the right status.')
-            msg_txt = f"The game's current status (`{self.current_game.status.name}`) doesn't allow for card DMing"
+            msg_txt = f"The game's current status (`{game.status.name}`) doesn't allow for card DMing"
             self.st.private_message(player.player_hash, msg_txt)
 
-    def reinstate_game(self, game_id: int):
+    def reinstate_game(self, game_id: int, channel: str = None):
         """Reinstates a game after a reboot"""
         # We're binding to a preexisting game
         with self.eng.session_mgr() as session:
@@ -654,14 +845,29 @@ class CAHBot(Forms):
                 TablePlayerRound.game_key == game_id
             ).group_by(TablePlayer.player_id).all()
             player_hashes = [x.slack_user_hash for x in players]
-        self.current_game = Game(player_hashes=player_hashes, deck=deck, st=self.st, eng=self.eng,
-                                 parent_log=self.log, config=self.config, game_id=game_id)
-        self.current_game.reinstate_round()
-
-    def new_round(self, notifications: List[str] = None) -> Optional:
+        channel = self.channel_id if channel is None else channel
+        with self.games.channel_lock(channel):
+            # A player can only be in one game at a time, so leave out anyone already reinstated elsewhere
+            busy_players = self._get_busy_players(player_hashes, channel=channel)
+            if len(busy_players) > 0:
+                self.log.warning(f'Leaving players {busy_players} out of game id {game_id}, '
+                                 f'they\'re already in a game elsewhere.')
+                player_hashes = [x for x in player_hashes if x not in busy_players]
+            game = Game(player_hashes=player_hashes, deck=deck, st=self.st, eng=self.eng, parent_log=self.log,
+                        config=self.config, game_id=game_id, job_queue=self.jobs, channel_id=channel,
+                        active_player_hashes=self.games.get_player_hashes() + player_hashes)
+            game.reinstate_round()
+            self.games.set(game.channel_id, game)
+
+    def new_round(self, channel: str = None, notifications: List[str] = None) -> Optional:
         """Starts a new round
+        :param channel: str, the channel of the game to move along. Defaults to the main channel.
         :param notifications: list of str, notifications to be bundled together and posted to the group
         """
+        game = self.get_game(channel)
+        if game is None:
+            self.st.send_message(self._reply_channel(channel), 'Start a game first, then tell me to do that.')
+            return None
 
         # Leverage Block Kit to make notifications fancier
         notification_block = []
@@ -672,80 +878,126 @@ class CAHBot(Forms):
                 MarkdownContextBlock([x for x in notifications]).asdict()
             )
 
-        if self.current_game.status == GameStatus.ENDED:
+        if game.status == GameStatus.ENDED:
             # Game ended because we ran out of questions
-            self.st.message_main_channel(blocks=notification_block)
-            self.end_game()
+            game.message_channel(blocks=notification_block)
+            self.end_game(channel=game.channel_id)
             return None
 
-        if self.current_game.game_round_number % 10 == 0:
+        if game.game_round_number % 10 == 0:
             self.log.info('Refreshing players in channel...')
-            self.st.message_main_channel(':loading-or-rolling-c:')
-            self.refresh_players()
-            self.st.message_main_channel(':fart:')
+            game.message_channel(':loading-or-rolling-c:')
+            self.refresh_players(channel=game.channel_id)
+            game.message_channel(':fart:')
 
-        self.current_game.new_round(notification_block=notification_block)
+        game.new_round(notification_block=notification_block)
 
-    def process_picks(self, user_hash: str, message: str) -> Optional:
+    def process_picks(self, user_hash: str, message: str, channel: str = None) -> Optional:
         """Processes the card selection made by the user"""
-        if self.current_game is None:
-            self.st.message_main_channel('Start a game first, then tell me to do that.')
+        game = self.get_game(channel, user_hash=user_hash)
+        if game is None:
+            self.st.send_message(self._reply_channel(channel), 'Start a game first, then tell me to do that.')
             return None
 
-        if self.current_game.status != GameStatus.PLAYER_DECISION:
+        if game.status != GameStatus.PLAYER_DECISION:
             # Prevent this method from being called outside of the player's decision stage
-            self.st.message_main_channel(f'<@{user_hash}> You cannot make selections '
-                                         f'in the current status of this game: `{self.current_game.status.name}`.')
+            game.message_channel(f'<@{user_hash}> You cannot make selections '
+                                 f'in the current status of this game: `{game.status.name}`.')
             return None
 
-        self.current_game.process_picks(player_hash=user_hash, message=message)
+        game.process_picks(player_hash=user_hash, message=message)
 
-    def choose_card(self, user_hash: str, message: str) -> Optional:
+    def choose_card(self, user_hash: str, message: str, channel: str = None) -> Optional:
         """For the judge to choose the winning card and
         for other players to vote on the card they think should win"""
-        if self.current_game is None:
-            self.st.message_main_channel('Start a game first, then tell me to do that.')
+        game = self.get_game(channel, user_hash=user_hash)
+        if game is None:
+            self.st.send_message(self._reply_channel(channel), 'Start a game first, then tell me to do that.')
             return None
 
-        if self.current_game.status != GameStatus.JUDGE_DECISION:
+        if game.status != GameStatus.JUDGE_DECISION:
             # Prevent this method from being called outside of the judge's decision stage
-            self.st.message_main_channel(f'Not the right status for this command: '
-                                         f'`{self.current_game.status.name}`')
+            game.message_channel(f'Not the right status for this command: '
+                                 f'`{game.status.name}`')
             return None
 
-        self.current_game.choose_card(player_hash=user_hash, message=message)
-        if self.current_game.judge.selected_choice_idx is not None:
-            self.current_game.round_wrap_up()
+        game.choose_card(player_hash=user_hash, message=message)
+        if game.judge.selected_choice_idx is not None:
+            game.round_wrap_up()
 
-    def end_game(self) -> Optional:
-        """Ends the current game"""
-        if self.current_game is None:
-            self.st.message_main_channel('You have to start a game before you can end it...????')
-            return None
-        if self.current_game.status != GameStatus.ENDED:
-            # Check if game was not already ended automatically
-            self.current_game.end_game()
-        # Save score history to file
-        self.display_points()
-        self.current_game = None
-        self.st.message_main_channel('The game has ended. :died:')
-
-    def get_score(self, in_game: bool = True) -> pd.DataFrame:
+    def _get_task_games(self, channel: str = None) -> List[Game]:
+        """The games a task is run for: the channel's, if the task has one, otherwise all of them"""
+        if channel is None:
+            return self.games.games
+        game = self.games.get(channel)
+        return [] if game is None else [game]
+
+    def handle_randpick(self, channel: str = None):
+        """Picks for players that have auto-randpick turned on, in all games (or only the channel's)"""
+        self.log.debug('Beginning randpick handling check...')
+        for game in self._get_task_games(channel):
+            # Queued with the game's other work so it's handled in order with the picks coming in
+            self.work_queue.submit(game.channel_id, game.handle_autorandpicks, name='randpick')
+
+    def handle_randchoose(self, is_forced: bool = False, channel: str = None):
+        """Chooses for judges awaiting a choice that have auto-randchoose turned on, in all games
+        (or only the channel's)
+
+        Args:
+            is_forced: if True, chooses for the judge even if they don't have auto-randchoose on
+            channel: the channel of the game to choose in
+        """
+        self.log.debug(f'Beginning randchoose handling check (forced={is_forced})...')
+        for game in self._get_task_games(channel):
+            self.work_queue.submit(game.channel_id, self._randchoose, game, is_forced=is_forced, name='randchoose')
+
+    def _randchoose(self, game: Game, is_forced: bool = False):
+        """Chooses for the game's judge, if they're still awaiting a choice by the time this is run"""
+        if game.status == GameStatus.JUDGE_DECISION:
+            if (is_forced or game.judge.is_arc) and game.judge.selected_choice_idx is None:
+                self.log.info(f'Game {game.game_id} is awaiting a choice from ARC\'d judge. Handling that now.')
+                self.choose_card(game.judge.player_hash, 'randchoose', channel=game.channel_id)
+
+    def force_choose(self, channel: str = None):
+        """Forces a choice on the judges of all games (or only the channel's), even if they aren't ARC"""
+        self.handle_randchoose(is_forced=True, channel=channel)
+
+    def end_game(self, channel: str = None) -> Optional:
+        """Ends the channel's game"""
+        channel = self.channel_id if channel is None else channel
+        with self.games.channel_lock(channel):
+            game = self.games.get(channel)
+            if game is None:
+                self.st.send_message(channel, 'You have to start a game before you can end it...????')
+                return None
+            if game.status != GameStatus.ENDED:
+                # Check if game was not already ended automatically
+                game.end_game()
+            # Save score history to file
+            self.display_points(channel=channel)
+            self.games.remove(channel)
+        self.st.send_message(channel, 'The game has ended. :died:')
+
+    def get_score(self, in_game: bool = True, game: Game = None) -> 'pd.DataFrame':
         """Queries db for players' scores"""
+        # Only the scoreboard needs pandas, so it's not loaded at startup
+        import pandas as pd
+
         # Get overall score
-        is_current_game = in_game and self.current_game is not None
+        is_current_game = in_game and game is not None
         score_df = self.bq.get_overall_score()
 
         if is_current_game:
-            current_df = self.bq.get_score_data_for_display_points(game_id=self.current_game.game_id,
-                                                                   game_round_id=self.current_game.game_round_id)
+            current_df = self.bq.get_score_data_for_display_points(game_id=game.game_id,
+                                                                   game_round_id=game.game_round_id)
             score_df = score_df.merge(current_df, on=['player_id', 'display_name'], how='left')
 
             # Determine rank trajectory
             self.log.debug('Determining rank and trajectory...')
             for stage in ['current', 'prev']:
-                score_df[f'{stage}_rank'] = score_df[[stage, f'overall_{stage}']].apply(tuple, axis=1).\
-                    rank(ascending=False, method='first')
+                # Rank by game score, then overall score. A stable sort keeps ties in their original order.
+                ranked_idx = score_df.sort_values([stage, f'overall_{stage}'], ascending=False, kind='stable').index
+                score_df[f'{stage}_rank'] = pd.Series(range(1, len(ranked_idx) + 1), index=ranked_idx)
             score_df['rank_chg'] = score_df['prev_rank'] - score_df['current_rank']
             score_df['rank_chg_emoji'] = score_df['rank_chg'].apply(
                 lambda x: ':green-triangle-up:' if x > 0 else ':red-triangle-down:' if x < 0 else ':blank:')
@@ -756,52 +1008,15 @@ class CAHBot(Forms):
 
         return score_df
 
-    def determine_streak(self) -> Tuple[Optional[int], int]:
-        self.log.debug('Determining if there\'s currently a streak')
-        rounds_df = self.bq.get_player_rounds_in_game(game_id=self.current_game.game_id)
-        self.log.debug(f'Pulled {rounds_df.shape[0]} rows of data for current game.')
-        # Get previous round, determine who won
-        n_streak = 0
-        streaker_id = None
-        if rounds_df.shape[0] == 0:
-            return streaker_id, n_streak
-        for r in range(self.current_game.game_round_id - 1, rounds_df.game_round_key.min() - 1, -1):
-            self.log.debug(f'Working round {r}...')
-            # Determine if round had a caught nuke
-            caught_nukes_df = rounds_df.loc[(rounds_df.game_round_key == r) & rounds_df.is_nuked_hand_caught, :]
-            if not caught_nukes_df.empty:
-                self.log.debug(f'Stopping at round {r} - detected caught decknuke')
-                break
-            winner = rounds_df.loc[(rounds_df.game_round_key == r) & (rounds_df.score > 0), 'player_id']
-            if winner.empty:
-                self.log.debug('Result: No winner was found (empty result)')
-                break
-            if streaker_id is None:
-                streaker_id = winner.item()
-            elif winner.item() == streaker_id:
-                self.log.debug('Same winner found as previously. Incrementing streak.')
-                # Same streaker
-                n_streak += 1
-            elif winner.item() != streaker_id:
-                # Check if streaker was judge for this round
-                self.log.debug('Winner was not the same. Checking if judge.')
-                res = rounds_df.loc[(rounds_df.game_round_key == r) &
-                                    (rounds_df.player_id == streaker_id), 'score']
-                if pd.isna(res.item()):
-                    # They were the judge. Continue, as they might have scored in the round
-                    # before to preserve their streak
-                    self.log.debug('Streaker was judge this round. Continuing streak count.')
-                    continue
-                else:
-                    # They weren't the judge, so this ends their streak. Break out of the loop
-                    self.log.debug('Streaker was not the judge this round. Breaking out of loop.')
-                    break
-        return streaker_id, n_streak
-
-    def display_points(self) -> BlocksType:
+    def determine_streak(self, game: Game) -> Tuple[Optional[int], int]:
+        """Retrieves the player id of the current streak holder and their streak length"""
+        return game.streak.current
+
+    def display_points(self, channel: str = None) -> BlocksType:
         """Displays points for all players"""
         self.log.debug('Generating scores...')
-        score_df = self.get_score(in_game=True)  # type: pd.DataFrame
+        game = self.get_game(channel)
+        score_df = self.get_score(in_game=True, game=game)  # type: pd.DataFrame
         self.log.debug(f'Retrieved {score_df.shape[0]} players\' scores')
         if score_df.shape[0] == 0:
             return [
@@ -815,8 +1030,8 @@ class CAHBot(Forms):
                 score_df.loc[(score_df.current_rank == r) & (~is_zero), 'rank_emoji'] = f':cah-rank-{r}:'
         # Determine if the recent winner is on a streak
         score_df['streak'] = ''
-        if self.current_game is not None:
-            player_id, n_streak = self.determine_streak()
+        if game is not None:
+            player_id, n_streak = self.determine_streak(game=game)
             if n_streak > 0:
                 # Streak!
                 score_df.loc[score_df.player_id == player_id, 'streak'] = ':steak:' * n_streak
@@ -841,21 +1056,22 @@ class CAHBot(Forms):
             MarkdownSectionBlock(scores_list)
         ]
 
-    def ping_players_left_to_pick(self) -> str:
+    def ping_players_left_to_pick(self, channel: str = None) -> str:
         """Generates a string to tag any players that have yet to pick"""
-        if self.current_game is None:
+        game = self.get_game(channel)
+        if game is None:
             return 'I can\'t really do this outside of a game WHAT DO YOU WANT FROM ME?!?!?!?!??!'
-        elif self.current_game.status == GameStatus.PLAYER_DECISION:
+        elif game.status == GameStatus.PLAYER_DECISION:
             self.log.debug('Determining players that haven\'t yet picked for pinging...')
-            remaining = self.current_game.players_left_to_pick(as_name=False)
+            remaining = game.players_left_to_pick(as_name=False)
             if len(remaining) > 0:
                 tagged = ' and '.join([f'<@{x}>' for x in remaining])
                 return f'Hey {tagged} - get out there and make pickles! :pickle-sword::pickle-sword::pickle-sword:'
-        elif self.current_game.status == GameStatus.JUDGE_DECISION:
+        elif game.status == GameStatus.JUDGE_DECISION:
             self.log.debug('Pinging judge to make a choice')
-            return f'Hey <@{self.current_game.judge.player_hash}> time to wake up and do your CAHvic doodie'
+            return f'Hey <@{game.judge.player_hash}> time to wake up and do your CAHvic doodie'
         else:
-            self.log.debug(f'Status wasn\'t right for pinging: {self.current_game.status}.')
+            self.log.debug(f'Status wasn\'t right for pinging: {game.status}.')
             return 'IDK - looks like the wrong status for a ping, bucko.'
 
     @staticmethod
@@ -871,40 +1087,46 @@ class CAHBot(Forms):
             player_list = player_list[:9]
         return sect_list + player_list
 
-    def modify_question_text(self, new_text: str, question_card_id: int):
+    def modify_question_text(self, new_text: str, question_card_id: int, channel: str = None):
         """Modifies the question text"""
+        game = self.get_game(channel)
         with self.eng.session_mgr() as session:
-            self.current_game.current_question_card.card_text = new_text
+            game.current_question_card.card_text = new_text
             session.query(TableQuestionCard).filter(
                 TableQuestionCard.question_card_id == question_card_id
             ).update({
                 TableQuestionCard.card_text: new_text
             })
+        game.render_cache.invalidate(kind=RenderKind.QUESTION)
 
     def modify_answer_text(self, answer_card_id: int, new_text: str):
-        """Modifies the question text"""
+        """Modifies the answer text"""
         with self.eng.session_mgr() as session:
             session.query(TableAnswerCard).filter(TableAnswerCard.answer_card_id == answer_card_id).update({
                 TableAnswerCard.card_text: new_text
             })
+        # The card could be in anyone's hand
+        for game in self.games.games:
+            game.render_cache.invalidate(kind=RenderKind.HAND)
 
-    def display_status(self, hide_identities: bool = True) -> Optional[BlocksType]:
+    def display_status(self, channel: str = None, hide_identities: bool = True) -> Optional[BlocksType]:
         """Displays status of the game"""
-
-        if self.current_game is None:
-            self.st.message_main_channel('I just stahted this wicked pissa game, go grab me some dunkies.')
+        game = self.get_game(channel)
+        if game is None:
+            self.st.send_message(self._reply_channel(channel),
+                                 'I just stahted this wicked pissa game, go grab me some dunkies.')
             return None
 
         status_block = [
             MarkdownSectionBlock('*Game Info*')
         ]
 
-        if self.current_game.status not in [GameStatus.ENDED, GameStatus.INITIATED]:
+        if game.status not in [GameStatus.ENDED, GameStatus.INITIATED]:
             icon = ':orange_check:'
 
-            dmers = self.current_game.players.get_players_with_dm_cards(name_only=False)
-            arpers = self.current_game.players.get_players_with_arp(name_only=False)
-            arcers = self.current_game.players.get_players_with_arc(name_only=False)
+            dmers = game.players.get_players_with_dm_cards(name_only=False)
+            arpers = game.players.get_players_with_arp(name_only=False)
+            arcers = game.players.get_players_with_arc(name_only=False)
 
             # Players that have card DMing enabled
             dm_section = self._generate_avi_context_section(dmers, f'{icon} *DM Cards*: ')
@@ -918,19 +1140,19 @@ class CAHBot(Forms):
                 # Players that have auto randchoose enabled
                 arc_section = self._generate_avi_context_section(arcers, f'{icon} *ARC*: ')
 
-            status_section = f'*Status*: *`{self.current_game.status.name.replace("_", " ").title()}`*\n' \
-                             f'*Judge Ping*: `{self.current_game.is_ping_judge}`\t\t' \
-                             f'*Weiner Ping*: `{self.current_game.is_ping_winner}`\n'
-            game_section = f':stopwatch: *Round `{self.current_game.game_round_number}`*: ' \
-                           f'{self.st.get_time_elapsed(self.current_game.game_round_tbl.start_time)}\t\t' \
-                           f'*Game*: {self.st.get_time_elapsed(self.current_game.game_start_time)}\n' \
-                           f':stack-of-cards: *Deck*: `{self.current_game.deck.deck_combo}` - ' \
-                           f'`{len(self.current_game.deck.questions_card_list)}` question & ' \
-                           f'`{len(self.current_game.deck.answers_card_list)}` answer cards remain\n' \
-                           f':conga_parrot: *Judge Order*: {self.current_game.get_judge_order()}'
+            status_section = f'*Status*: *`{game.status.name.replace("_", " ").title()}`*\n' \
+                             f'*Judge Ping*: `{game.is_ping_judge}`\t\t' \
+                             f'*Weiner Ping*: `{game.is_ping_winner}`\n'
+            game_section = f':stopwatch: *Round `{game.game_round_number}`*: ' \
+                           f'{self.st.get_time_elapsed(game.game_round_tbl.start_time)}\t\t' \
+                           f'*Game*: {self.st.get_time_elapsed(game.game_start_time)}\n' \
+                           f':stack-of-cards: *Deck*: `{game.deck.deck_combo}` - ' \
+                           f'`{game.deck.num_question_cards}` question & ' \
+                           f'`{game.deck.num_answer_cards}` answer cards remain\n' \
+                           f':conga_parrot: *Judge Order*: {game.get_judge_order()}'
 
             status_block += [
-                MarkdownContextBlock(f':gavel: *Judge*: *`{self.current_game.judge.get_full_name()}`*'),
+                MarkdownContextBlock(f':gavel: *Judge*: *`{game.judge.get_full_name()}`*'),
                 DividerBlock(),
                 MarkdownContextBlock(status_section),
                 ContextBlock(dm_section),
@@ -940,13 +1162,13 @@ class CAHBot(Forms):
                 MarkdownContextBlock(game_section)
             ]
 
-        if self.current_game.status in [GameStatus.PLAYER_DECISION, GameStatus.JUDGE_DECISION]:
-            picks_needed = ['`{}`'.format(x) for x in self.current_game.players_left_to_pick()]
+        if game.status in [GameStatus.PLAYER_DECISION, GameStatus.JUDGE_DECISION]:
+            picks_needed = ['`{}`'.format(x) for x in game.players_left_to_pick()]
             pickle_txt = '' if len(picks_needed) == 0 else f'\n:pickle-sword: ' \
                                                            f'*Pickles Needed*: {" ".join(picks_needed)}'
             status_block = status_block[:1] + [
-                MarkdownSectionBlock(f':regional_indicator_q: `{self.current_game.current_question_card.card_text}`'),
-                MarkdownContextBlock(f':gavel: *Judge*: *`{self.current_game.judge.get_full_name()}` *{pickle_txt}'),
+                MarkdownSectionBlock(f':regional_indicator_q: `{game.current_question_card.card_text}`'),
+                MarkdownContextBlock(f':gavel: *Judge*: *`{game.judge.get_full_name()}` *{pickle_txt}'),
             ] + status_block[2:]  # Skip over the previous judge block
 
         return status_block
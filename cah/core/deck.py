@@ -1,6 +1,10 @@
+from collections import Counter
 from random import shuffle
+import threading
 from typing import (
+    Dict,
     List,
+    Optional,
     Type,
     Union,
 )
@@ -22,12 +26,17 @@ from cah.model import (
 
 
 class Deck:
-    """Deck of question and answer cards for a game"""
+    """Deck of question and answer cards for a game
+
+    Only the card ids are held for dealing. Each list is shuffled once, then dealt from a cursor.
+    The question cards' details and the answer cards' text are loaded the first time they're needed.
+    Draw counts are tallied in memory and written out with `flush_draw_counts`.
+    """
     deck_combo: List[str]
     eng: WizzyPSQLClient
     deck_ids: List[int]
-    questions_card_list: List[TableQuestionCard]
-    answers_card_list: List[TableAnswerCard]
+    question_card_ids: List[int]
+    answer_card_ids: List[int]
 
     def __init__(self, deck_combo: List[str], eng: WizzyPSQLClient, game_id: int = None):
         self.deck_combo = deck_combo
@@ -45,7 +54,7 @@ class Deck:
                 q_past_rounds_subquery = session.query(TableQuestionCard.question_card_id). \
                     join(TableGameRound, TableQuestionCard.question_card_id == TableGameRound.question_card_key). \
                     filter(TableGameRound.game_key == game_id)
-                qcards = session.query(TableQuestionCard).filter(and_(
+                qcards = session.query(TableQuestionCard.question_card_id).filter(and_(
                         TableQuestionCard.deck_key.in_(self.deck_ids),
                         TableQuestionCard.question_card_id.not_in(q_past_rounds_subquery),
                         not_(TableQuestionCard.is_deleted)
@@ -55,71 +64,118 @@ class Deck:
                     join(TableGameRound, TablePlayerPick.game_round_key == TableGameRound.game_round_id). \
                     filter(TableGameRound.game_key == game_id)
                 a_current_hand_subquery = session.query(TablePlayerHand.answer_card_key)
-                acards = session.query(TableAnswerCard).filter(and_(
+                acards = session.query(TableAnswerCard.answer_card_id).filter(and_(
                         TableAnswerCard.deck_key.in_(self.deck_ids),
                         TableAnswerCard.answer_card_id.not_in(a_past_picks_subquery),
                         TableAnswerCard.answer_card_id.not_in(a_current_hand_subquery),
                         not_(TableAnswerCard.is_deleted)
                     )).all()
             else:
-                qcards = session.query(TableQuestionCard).filter(and_(
+                qcards = session.query(TableQuestionCard.question_card_id).filter(and_(
                     TableQuestionCard.deck_key.in_(self.deck_ids),
                     not_(TableQuestionCard.is_deleted)
                 )).all()
-                acards = session.query(TableAnswerCard).filter(and_(
+                acards = session.query(TableAnswerCard.answer_card_id).filter(and_(
                     TableAnswerCard.deck_key.in_(self.deck_ids),
                     not_(TableAnswerCard.is_deleted)
                 )).all()
             session.expunge_all()
 
-            self.questions_card_list = qcards   # type: List[TableQuestionCard]
-            self.answers_card_list = acards     # type: List[TableAnswerCard]
+        self.question_card_ids = [x.question_card_id for x in qcards]
+        self.answer_card_ids = [x.answer_card_id for x in acards]
+        # Position of the next card to deal in each list
+        self._question_cursor = 0
+        self._answer_cursor = 0
+        self._deal_lock = threading.Lock()
+        # Loaded on first use
+        self._question_cards = None  # type: Optional[Dict[int, TableQuestionCard]]
+        # Draws that have yet to be counted in the db
+        self._pending_question_draws = Counter()  # type: Counter
+        self._pending_answer_draws = Counter()  # type: Counter
 
     @property
     def num_answer_cards(self) -> int:
-        return len(self.answers_card_list)
+        return len(self.answer_card_ids) - self._answer_cursor
 
     @property
     def num_question_cards(self) -> int:
-        return len(self.questions_card_list)
+        return len(self.question_card_ids) - self._question_cursor
 
     def shuffle_deck(self):
-        """Shuffles the deck"""
-        shuffle(self.questions_card_list)
-        shuffle(self.answers_card_list)
+        """Shuffles the cards that have yet to be dealt"""
+        with self._deal_lock:
+            self.question_card_ids = self.question_card_ids[self._question_cursor:]
+            self.answer_card_ids = self.answer_card_ids[self._answer_cursor:]
+            self._question_cursor = self._answer_cursor = 0
+            shuffle(self.question_card_ids)
+            shuffle(self.answer_card_ids)
+
+    def deal_answer_card(self) -> int:
+        """Deals an answer card in the deck, returning its id"""
+        return self.deal_answer_cards(n_cards=1)[0]
 
-    def deal_answer_card(self) -> TableAnswerCard:
-        """Deals an answer card in the deck."""
-        card: TableAnswerCard
-        card = self._deal_card(tbl=TableAnswerCard)
-        return card
+    def deal_answer_cards(self, n_cards: int) -> List[int]:
+        """Deals up to n_cards answer cards, returning their ids. Fewer are returned if the deck runs low."""
+        with self._deal_lock:
+            if self.num_answer_cards == 0:
+                raise IndexError('No answer cards left to deal')
+            card_ids = self.answer_card_ids[self._answer_cursor:self._answer_cursor + n_cards]
+            self._answer_cursor += len(card_ids)
+            self._pending_answer_draws.update(card_ids)
+        return card_ids
 
     def deal_question_card(self) -> TableQuestionCard:
         """Deals a question card in the deck."""
-        card: TableQuestionCard
-        card = self._deal_card(tbl=TableQuestionCard)
-        return card
+        with self._deal_lock:
+            if self.num_question_cards == 0:
+                raise IndexError('No question cards left to deal')
+            card_id = self.question_card_ids[self._question_cursor]
+            self._question_cursor += 1
+            self._pending_question_draws[card_id] += 1
+        return self.get_question_card(card_id)
+
+    def get_question_card(self, card_id: int) -> TableQuestionCard:
+        """Retrieves the (detached) question card, loading all the deck's questions on the first call"""
+        if self._question_cards is None:
+            with self.eng.session_mgr() as session:
+                qcards = session.query(TableQuestionCard).filter(
+                    TableQuestionCard.question_card_id.in_(self.question_card_ids)
+                ).all()
+                session.expunge_all()
+            self._question_cards = {x.question_card_id: x for x in qcards}
+        return self._question_cards[card_id]
 
-    def _deal_card(self, tbl: Type[Union[TableAnswerCard, TableQuestionCard]]) -> \
-            Union[TableAnswerCard, TableQuestionCard]:
-        """Deals either a question or answer card and counts their times drawn"""
+    def flush_draw_counts(self):
+        """Writes the times_drawn increments for all cards dealt since the last flush"""
+        with self._deal_lock:
+            q_draws, self._pending_question_draws = self._pending_question_draws, Counter()
+            a_draws, self._pending_answer_draws = self._pending_answer_draws, Counter()
+        if len(q_draws) == 0 and len(a_draws) == 0:
+            return
+        try:
+            with self.eng.session_mgr() as session:
+                for tbl, draws in [(TableQuestionCard, q_draws), (TableAnswerCard, a_draws)]:
+                    self._increment_times_drawn(session, tbl=tbl, draws=draws)
+        except Exception:
+            # Put the increments back so they're written at the next flush, along with any dealt since
+            with self._deal_lock:
+                self._pending_question_draws.update(q_draws)
+                self._pending_answer_draws.update(a_draws)
+            raise
+
+    @staticmethod
+    def _increment_times_drawn(session, tbl: Type[Union[TableAnswerCard, TableQuestionCard]], draws: Counter):
+        """Issues one UPDATE per distinct increment (normally just one, as cards are only dealt once per game)"""
         if tbl.__tablename__ == 'answer_card':
-            card = self.answers_card_list.pop(0)
             id_attr = TableAnswerCard.answer_card_id
-            drawn_attr = TableAnswerCard.times_drawn
-            card_id = card.answer_card_id
         elif tbl.__tablename__ == 'question_card':
-            card = self.questions_card_list.pop(0)
             id_attr = TableQuestionCard.question_card_id
-            drawn_attr = TableQuestionCard.times_drawn
-            card_id = card.question_card_id
         else:
             raise ValueError(f'Unaccounted for table provided: {tbl}')
-        with self.eng.session_mgr() as session:
-            # Increment the times drawn attribute
-            session.query(tbl).filter(
-                id_attr == card_id
-            ).update({
-                drawn_attr: drawn_attr + 1
-            })
-        return card
+        ids_by_increment = {}  # type: Dict[int, List[int]]
+        for card_id, n in draws.items():
+            ids_by_increment.setdefault(n, []).append(card_id)
+        for n, card_ids in ids_by_increment.items():
+            session.query(tbl).filter(id_attr.in_(card_ids)).update({
+                tbl.times_drawn: tbl.times_drawn + n
+            }, synchronize_session=False)
@@ -0,0 +1,76 @@
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    List,
+    Optional,
+)
+
+if TYPE_CHECKING:
+    from cah.core.games import Game
+
+
+class GameRegistry:
+    """Holds the games running in this process, one per channel.
+
+    Lookups happen on every incoming command, so they're kept to dict reads under a short lock.
+    Anything that creates or ends a game in a channel should hold that channel's lock
+    (see `channel_lock`) so two requests can't start games in the same channel at once,
+    while games in other channels carry on independently.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._games_by_channel = {}  # type: Dict[str, 'Game']
+        self._channel_locks = {}  # type: Dict[str, threading.RLock]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._games_by_channel)
+
+    @property
+    def games(self) -> List['Game']:
+        """A snapshot of all the registered games"""
+        with self._lock:
+            return list(self._games_by_channel.values())
+
+    def channel_lock(self, channel_id: str) -> threading.RLock:
+        """Retrieves the lock that guards starting & ending games in the channel"""
+        with self._lock:
+            if channel_id not in self._channel_locks:
+                self._channel_locks[channel_id] = threading.RLock()
+            return self._channel_locks[channel_id]
+
+    def get(self, channel_id: str) -> Optional['Game']:
+        """Retrieves the game for the channel, if any"""
+        with self._lock:
+            return self._games_by_channel.get(channel_id)
+
+    def get_by_id(self, game_id: int) -> Optional['Game']:
+        """Retrieves a registered game by its id"""
+        with self._lock:
+            return next((x for x in self._games_by_channel.values() if x.game_id == game_id), None)
+
+    def set(self, channel_id: str, game: Optional['Game']):
+        """Registers the game for the channel, replacing any game already there. None removes it."""
+        with self._lock:
+            if game is None:
+                self._games_by_channel.pop(channel_id, None)
+            else:
+                self._games_by_channel[channel_id] = game
+
+    def remove(self, channel_id: str) -> Optional['Game']:
+        """Unregisters the channel's game, returning it"""
+        with self._lock:
+            return self._games_by_channel.pop(channel_id, None)
+
+    def find_player_games(self, player_hash: str) -> List['Game']:
+        """Collects the games that the player is in"""
+        return [x for x in self.games if player_hash in x.players.player_dict.keys()]
+
+    def get_player_hashes(self) -> List[str]:
+        """Collects the hashes of the players across all registered games"""
+        player_hashes = []
+        for game in self.games:
+            player_hashes += [x for x in game.players.player_dict.keys() if x not in player_hashes]
+        return player_hashes
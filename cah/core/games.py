@@ -3,10 +3,11 @@
 from datetime import datetime
 from random import (
     choice,
+    random,
     shuffle,
 )
 import re
-import time
+import threading
 from typing import (
     TYPE_CHECKING,
     Dict,
@@ -16,7 +17,6 @@ from typing import (
 )
 
 from loguru import logger
-import numpy as np
 from slack_sdk.errors import SlackApiError
 from slacktools import SlackBotBase
 from slacktools.block_kit.base import BlocksType
@@ -29,21 +29,30 @@ from slacktools.block_kit.blocks import (
 )
 from sqlalchemy.sql import and_
 
+from cah.core.jobs import (
+    CoalescedMessageUpdates,
+    run_later,
+)
 from cah.core.players import (
     Judge,
     Player,
     Players,
 )
+from cah.core.render_cache import (
+    RenderCache,
+    RenderKind,
+)
+from cah.core.round_state import RoundStateStore
 from cah.core.selections import (
     Choice,
     Pick,
 )
+from cah.core.streaks import StreakTracker
 from cah.db_eng import WizzyPSQLClient
 from cah.model import (
     GameStatus,
     RipType,
     SettingType,
-    TableAnswerCard,
     TableGame,
     TableGameRound,
     TablePlayer,
@@ -57,6 +66,7 @@ from cah.queries.game_queries import (
 
 if TYPE_CHECKING:
     from cah.core.deck import Deck
+    from cah.core.jobs import DelayedJobQueue
 
 
 # Define statuses where game is not active
@@ -65,6 +75,10 @@ GAME_NOT_ACTIVE = [GameStatus.INITIATED, GameStatus.ENDED]
 NEW_ROUND_READY = [GameStatus.INITIATED, GameStatus.END_ROUND]
 
 DECK_SIZE = 5
+# Seconds to wait between announcing something and moving the round along
+ROUND_TRANSITION_DELAY_S = 5
+# Seconds that updates to the round's status message are held back, so a burst of picks is sent as one update
+ROUND_MESSAGE_UPDATE_DELAY_S = 1.5
 
 
 class OutOfCardsException(Exception):
@@ -75,13 +89,30 @@ class Game:
     """Holds data for current game"""
 
     def __init__(self, player_hashes: List[str], deck: 'Deck', st: SlackBotBase, eng: WizzyPSQLClient,
-                 parent_log: logger, config, game_id: int = None):
+                 parent_log: logger, config, game_id: int = None, job_queue: 'DelayedJobQueue' = None,
+                 channel_id: str = None, active_player_hashes: List[str] = None):
+        """
+        Args:
+            channel_id: the channel the game is played in. Defaults to the main channel.
+                An existing game keeps the channel it was started in.
+            active_player_hashes: everyone playing in any game in this process, used to mark active players.
+                Defaults to this game's players.
+        """
         self.st = st
         self.eng = eng
         self.config = config
+        # Delayed round transitions are handed off here. Without one, they happen immediately.
+        self.job_queue = job_queue
+        # Guards status changes that kick off a transition, so a double click can't start two of them
+        self._transition_lock = threading.RLock()
         self.judge_order_divider = self.eng.get_setting(SettingType.JUDGE_ORDER_DIVIDER)
         self.log = parent_log.bind(child_name=self.__class__.__name__)
+        # Updates to the round's status message are coalesced on the job queue
+        self.message_updates = CoalescedMessageUpdates(log=self.log, update_func=self.st.update_message,
+                                                       job_queue=job_queue, delay_s=ROUND_MESSAGE_UPDATE_DELAY_S)
         self.gq = GameQueries(eng=eng, log=self.log)
+        # Player attribute changes are held here and written out in bulk at checkpoints
+        self.round_state = RoundStateStore(eng=eng, log=self.log)
         self.log.debug(f'Building out new game with deck as combo: {deck.deck_combo}...')
 
         # Database table links
@@ -97,17 +128,21 @@ class Game:
                 )).order_by(TableGameRound.game_round_id.desc()).limit(1).one_or_none()
                 self.game_round_id = self.game_round_tbl.game_round_id
                 session.expunge_all()
+            if self.game_tbl.channel_id is not None:
+                channel_id = self.game_tbl.channel_id
         else:
             self.log.debug('Starting a new game...')
             # Create a new game
             self._status = GameStatus.INITIATED
-            game_tbl = TableGame(deck_combo=deck.deck_combo, status=self._status)
+            game_tbl = TableGame(deck_combo=deck.deck_combo, status=self._status,
+                                 channel_id=channel_id if channel_id is not None else config.MAIN_CHANNEL)
             # Add the object to the database & refresh to get ids
             self.game_tbl = self.eng.refresh_table_object(game_tbl)  # type: TableGame
             # These ones will be set when new_round() is called
             self.game_round_tbl = None  # type: Optional[TableGameRound]
             self.game_round_id = None  # type: Optional[int]
             self.game_id = self.game_tbl.game_id
+        self.channel_id = channel_id if channel_id is not None else config.MAIN_CHANNEL
 
         # Load settings
         self._is_ping_judge = self.eng.get_setting(SettingType.IS_PING_JUDGE)
@@ -115,10 +150,14 @@ class Game:
         self._decknuke_penalty = self.eng.get_setting(SettingType.DECKNUKE_PENALTY)
         # Load players
         self.log.debug(f'Setting {len(player_hashes)} players as active for this game.')
-        self.eng.set_active_players(player_hashes)
+        self.eng.set_active_players(player_hashes if active_player_hashes is None else active_player_hashes)
+        # Blocks rendered in a round (question, hands, judge's choices) are built once and reused
+        self.render_cache = RenderCache()
+        self._round_number = (None, 0)  # type: Tuple[Optional[int], int]
         self.players = Players(
             player_hash_list=player_hashes, slack_api=self.st, eng=self.eng, parent_log=self.log,
-            config=self.config, is_existing=self.is_existing_game
+            config=self.config, is_existing=self.is_existing_game, round_state=self.round_state,
+            game_id=self.game_id, channel_id=self.channel_id, render_cache=self.render_cache
         )  # type: Players
         if self.is_existing_game:
             # Get the current round's judge
@@ -135,7 +174,8 @@ class Game:
                 _judge_hash = _judge.slack_user_hash
         else:
             _judge_hash = self.players.judge_order[0]
-        self.judge = Judge(player_hash=_judge_hash, eng=self.eng, log=self.log)      # type: Judge
+        self.judge = Judge(player_hash=_judge_hash, eng=self.eng, log=self.log,
+                           round_state=self.round_state)  # type: Judge
         self.prev_judge = None          # type: Optional[Judge]
         self.game_start_time = self.game_tbl.start_time
 
@@ -144,6 +184,15 @@ class Game:
         self.current_question_card = None  # type: Optional[TableQuestionCard]
         self.deck.shuffle_deck()
 
+        # Updated at each round's wrap-up, so it's ready for the scoreboard
+        self.streak = StreakTracker()
+        if self.is_existing_game:
+            # Replay the game's rounds, leaving out any round still in progress
+            self.streak.load_rounds(
+                self.gq.get_player_rounds_in_game(game_id=self.game_id),
+                before_round_id=None if self.status == GameStatus.END_ROUND else self.game_round_id
+            )
+
     @property
     def status(self) -> GameStatus:
         return self._status
@@ -156,6 +205,16 @@ class Game:
                 'status': self._status
             })
 
+    def _transition_status(self, from_statuses: List[GameStatus], to_status: GameStatus) -> bool:
+        """Moves to a new status only if the game is currently in one of the expected statuses.
+        Returns whether the transition happened."""
+        with self._transition_lock:
+            if self.status not in from_statuses:
+                self.log.debug(f'Skipping transition to {to_status.name} - current status is {self.status.name}')
+                return False
+            self.status = to_status
+            return True
+
     @property
     def is_ping_judge(self) -> bool:
         return self._is_ping_judge
@@ -185,12 +244,19 @@ class Game:
 
     @property
     def game_round_number(self) -> int:
-        """Retrieves the round number from the db"""
+        """Retrieves the round number from the db, once per round"""
+        round_id, round_number = self._round_number
+        if round_id is not None and round_id == self.game_round_id:
+            return round_number
         with self.eng.session_mgr() as session:
             tbl = session.query(TableGame).filter(TableGame.game_id == self.game_id).one_or_none()
-            if tbl is None:
-                return 0
-            return len(tbl.rounds)
+            round_number = 0 if tbl is None else len(tbl.rounds)
+        self._round_number = (self.game_round_id, round_number)
+        return round_number
+
+    def message_channel(self, message: str = None, blocks: BlocksType = None):
+        """Sends a message to the game's channel"""
+        self.st.send_message(channel=self.channel_id, message=message, blocks=blocks)
 
     def get_judge_order(self) -> str:
         """Determines order of judges """
@@ -217,6 +283,10 @@ class Game:
 
     def new_round(self, notification_block: List[Dict] = None) -> Optional[BlocksType]:
         """Starts a new round"""
+        with self._transition_lock:
+            return self._new_round(notification_block=notification_block)
+
+    def _new_round(self, notification_block: List[Dict] = None) -> Optional[BlocksType]:
         self.log.debug('Working on new round...')
         if self.status not in NEW_ROUND_READY:
             self.log.error(f'Status wasn\'t right for a new round: {self.status.name}')
@@ -230,7 +300,7 @@ class Game:
             self.end_round()
 
         # Determine if the game should be ended before proceeding
-        if len(self.deck.questions_card_list) == 0:
+        if self.deck.num_question_cards == 0:
             self.log.debug('No more questions available. Ending game')
             # No more questions, game hath ended
             self.end_game()
@@ -275,14 +345,16 @@ class Game:
         self.get_next_judge(n_round=round_number, game_id=self.game_id, game_round_id=self.game_round_id)
 
         self.deal_cards()
+        # Count this round's draws (and any from decknukes last round) in one go
+        self.deck.flush_draw_counts()
         self.status = GameStatus.PLAYER_DECISION
 
-        self.st.private_channel_message(self.judge.player_hash, self.config.MAIN_CHANNEL,
+        self.st.private_channel_message(self.judge.player_hash, self.channel_id,
                                         ":gavel::gavel::gavel: You're the judge this round! :gavel::gavel::gavel:")
         question_block = self.make_question_block()
         notification_block += question_block
         self.log.debug('Sending question block to channel...')
-        self.st.message_main_channel(blocks=notification_block)
+        self.message_channel(blocks=notification_block)
 
         # Next, send a message to the channel about players to pick...
         self.log.debug('Sending pick reception block to channel...')
@@ -292,7 +364,7 @@ class Game:
         remaining_txt = ' '.join([f'`{x}`' for x in remaining])
         messages = [f'*`{len(remaining)}`* players remaining to decide: {remaining_txt}']
         msg_block = [MarkdownContextBlock(messages)]
-        round_msg_ts = self.st.send_message(self.config.MAIN_CHANNEL,
+        round_msg_ts = self.st.send_message(self.channel_id,
                                             message='A new round hath begun',
                                             ret_ts=True, blocks=msg_block)
         self.game_round_tbl.message_timestamp = round_msg_ts
@@ -300,25 +372,40 @@ class Game:
 
         self.log.debug('Wiping all data for choice_order')
         with self.eng.session_mgr() as session:
-            session.query(TablePlayer).update({
+            session.query(TablePlayer).filter(TablePlayer.player_id.in_(self.get_player_ids())).update({
                 TablePlayer.choice_order: None
-            })
-
-        # Last, render hands for the players
-        self.log.debug('Waiting 5 seconds before rendering the players\' hands...')
-        time.sleep(5)
+            }, synchronize_session=False)
+
+        # Last, render hands for the players after giving the channel a moment with the question
+        self.log.debug(f'Scheduling hand rendering in {ROUND_TRANSITION_DELAY_S} seconds...')
+        run_later(self.job_queue, ROUND_TRANSITION_DELAY_S, self.deal_out_hands, game_round_id=self.game_round_id,
+                  name=f'render-hands-{self.game_round_id}')
+
+    def deal_out_hands(self, game_round_id: int):
+        """Renders & sends hands for the round, then handles autorandpicks."""
+        with self._transition_lock:
+            if game_round_id != self.game_round_id or self.status != GameStatus.PLAYER_DECISION:
+                self.log.debug(f'Round {game_round_id} is no longer accepting picks. Skipping hand rendering.')
+                return
         self.log.debug('Rendering player hands and sending them')
         self.handle_render_hands()
         self.handle_autorandpicks()
 
+    def flush_round_state(self, checkpoint: str = None):
+        """Writes any pending player & player round changes to the db"""
+        self.round_state.flush(checkpoint=checkpoint)
+
     def end_round(self):
         """Procedures for ending the round"""
         self.log.debug('Ending round.')
+        self.flush_round_state(checkpoint='round end')
         # Update the previous round with an end time
         with self.eng.session_mgr() as session:
             session.query(TableGameRound).filter(TableGameRound.game_round_id == self.game_round_id).update({
                 TableGameRound.end_time: datetime.now()
             })
+        self.gq.rollup_player_stats(game_round_id=self.game_round_id)
+        self.gq.invalidate_game_stats()
         self.status = GameStatus.END_ROUND
 
     def end_game(self):
@@ -328,6 +415,7 @@ class Game:
             # Avoid starting a new round when one has already been started
             raise ValueError(f'No active game to end - status: (`{self.status.name}`)')
         self.end_round()
+        self.deck.flush_draw_counts()
         self.log.debug('Wiping cards from players\' hands...')
         self.players.reset_player_hands()
 
@@ -343,16 +431,23 @@ class Game:
         req_ans = self.current_question_card.responses_required
         question_block = self.make_question_block()
         try:
-            self.players.render_hands(judge_hash=self.judge.player_hash, question_block=question_block,
-                                      req_ans=req_ans)
+            failures = self.players.render_hands(judge_hash=self.judge.player_hash, question_block=question_block,
+                                                 req_ans=req_ans)
         except OutOfCardsException:
             self.log.debug('Stopping game - ran out of cards!')
             blocks = [
                 MarkdownSectionBlock(f'The people have run out of answer cards! Game over! {":party-dead:" * 3}')
             ]
-            self.st.message_main_channel(blocks=blocks)
+            self.message_channel(blocks=blocks)
             self.end_game()
             return None
+        if len(failures) > 0:
+            # Let the round carry on, but let the affected players know they'll need to pull up their cards
+            failed_names = [f'`{self.players.player_dict[x].display_name}`' for x in failures.keys()]
+            self.message_channel(
+                message=f'I couldn\'t deliver cards to {", ".join(failed_names)}. '
+                        f'Use `My Cahhds` in the main menu to get them.'
+            )
 
     def handle_autorandpicks(self):
         """Handles autorandpicking for players that have had it turned on"""
@@ -363,7 +458,7 @@ class Game:
                 continue
             elif player.is_arp:
                 # Player has elected to automatically pick their cards
-                rand_roll = np.random.random()
+                rand_roll = random()
                 if rand_roll <= 0.10:
                     self.decknuke(player_hash=player_hash)
                 else:
@@ -393,7 +488,7 @@ class Game:
             else:
                 # Just select the judge at random from the list
                 _judge = choice(self.players.judge_order)
-            self.judge = Judge(player_hash=_judge, eng=self.eng, log=self.log)
+            self.judge = Judge(player_hash=_judge, eng=self.eng, log=self.log, round_state=self.round_state)
         self.players.player_dict[self.judge.player_hash].is_judge = True
         self.judge.game_id = game_id
         self.judge.game_round_id = game_round_id
@@ -401,63 +496,101 @@ class Game:
         # Regenerate the honorific for the new judge
         self.determine_honorific()
 
-    def _deal_card(self) -> Optional[TableAnswerCard]:
-        if len(self.deck.answers_card_list) == 0:
+    def _deal_cards(self, n_cards: int) -> List[int]:
+        """Deals up to n_cards answer card ids"""
+        if self.deck.num_answer_cards == 0:
             self.log.debug('No more cards left to deal!!!!!')
-            return None
-        return self.deck.deal_answer_card()
-
-    def deal_cards(self):
-        """Deals cards out to players by indicating the number of cards to give out"""
+            return []
+        return self.deck.deal_answer_cards(n_cards=n_cards)
+
+    def deal_cards(self, is_bulk: bool = True):
+        """Deals cards out to players by indicating the number of cards to give out
+
+        Args:
+            is_bulk: if True, all players' open slots are read in one query and filled in one transaction.
+                Otherwise, each player is dealt to one at a time.
+        """
+        skip_judge = self.game_round_number > 1
+        if not is_bulk:
+            self._deal_cards_per_player(skip_judge=skip_judge)
+            return
+        player_hashes = [
+            p_hash for p_hash in self.players.player_dict.keys()
+            if not (skip_judge and self.judge.player_hash == p_hash)
+        ]
+        open_slots = self.players.get_open_hand_slots(player_hashes=player_hashes, hand_size=DECK_SIZE)
+        slot_fills = {}  # type: Dict[str, List[Tuple[Optional[int], int, int]]]
+        for p_hash, slots in open_slots.items():
+            if self.deck.num_answer_cards == 0:
+                break
+            if len(slots) == 0:
+                continue
+            card_list = self._deal_cards(n_cards=len(slots))
+            self.log.debug(f'Dealing {len(card_list)} cards to {self.players.player_dict[p_hash].display_name}')
+            slot_fills[p_hash] = [(hand_id, card_pos, card_id)
+                                  for (hand_id, card_pos), card_id in zip(slots, card_list)]
+        self.players.take_dealt_hands(slot_fills=slot_fills)
+
+    def _deal_cards_per_player(self, skip_judge: bool):
+        """Deals cards to one player at a time"""
         for p_hash, p_obj in self.players.player_dict.items():
             if self.deck.num_answer_cards == 0:
                 break
-            if self.game_round_number > 1 and self.judge.player_hash == p_hash:
+            if skip_judge and self.judge.player_hash == p_hash:
                 # Skip judge if dealing after first round
                 continue
-            if p_obj.get_nonreplaceable_cards() == DECK_SIZE:
-                continue
             num_cards = DECK_SIZE - p_obj.get_nonreplaceable_cards()
             if num_cards > 0:
                 self.log.debug(f'Dealing {num_cards} cards to {p_obj.display_name}')
-                card_list = [self._deal_card() for _ in range(num_cards)]
+                card_list = self._deal_cards(n_cards=num_cards)
                 self.players.take_dealt_cards(player_hash=p_hash, card_list=card_list)
                 self.log.debug(f'Player {p_obj.display_name} now has {p_obj.get_all_cards()} cards')
-            else:
-                self.log.warning(f'Player {p_obj.display_name} now has {p_obj.get_all_cards()} cards')
 
     def decknuke(self, player_hash: str):
         player = self.players.player_dict[player_hash]
         self.log.debug(f'Player {player.display_name} has nuked their deck. Processing command.')
         if self.judge.player_hash == player_hash:
-            self.st.message_main_channel(f'Decknuke rejected. {player.player_tag} you is the judge baby. :shame:')
+            self.message_channel(f'Decknuke rejected. {player.player_tag} you is the judge baby. :shame:')
             return
         # Randpick a card for this user
         if player.get_all_cards() < self.current_question_card.responses_required:
-            self.st.message_main_channel(f'Decknuke rejected. {player.player_tag} you haz ranned '
-                                         f'out of cahds. :shame:')
+            self.message_channel(f'Decknuke rejected. {player.player_tag} you haz ranned '
+                                 f'out of cahds. :shame:')
             self.end_game()
             return
         self.process_picks(player_hash, 'randpick')
         # Remove all cards form their hand & tag player
         self.players.process_player_decknuke(player_hash=player_hash)
         addl_txt = '...also, we\'re out of cards hehe..' if self.deck.num_answer_cards == 0 else ''
-        self.st.message_main_channel(f'{player.player_tag} nuked their deck! :frogsiren: {addl_txt}')
+        self.message_channel(f'{player.player_tag} nuked their deck! :frogsiren: {addl_txt}')
         # Deal the player the unused new cards the number of cards played will be replaced after the round ends.
         n_cards = DECK_SIZE - self.current_question_card.responses_required
-        card_list = [self._deal_card() for _ in range(n_cards)]
+        card_list = self._deal_cards(n_cards=n_cards)
         self.players.take_dealt_cards(player_hash=player_hash, card_list=card_list)
 
     def round_wrap_up(self):
         """Coordinates end-of-round logic (tallying votes, picking winner, etc.)"""
         # Make sure all users have votes and judge has made decision before wrapping up the round
-        # Handle the announcement of winner and distribution of points
-        self.st.message_main_channel(blocks=self.winner_selection())
-        self.status = GameStatus.END_ROUND
-        self.log.debug('Waiting 5 seconds before rendering the next round\'s hands...')
-        time.sleep(5)
-        # Start new round
-        self.new_round()
+        with self._transition_lock:
+            if self.status != GameStatus.JUDGE_DECISION:
+                self.log.debug(f'Round already wrapped up (status: {self.status.name}). Ignoring.')
+                return
+            # Handle the announcement of winner and distribution of points
+            winner_block = self.winner_selection()
+            self.status = GameStatus.END_ROUND
+        self.message_channel(blocks=winner_block)
+        self.log.debug(f'Scheduling the next round in {ROUND_TRANSITION_DELAY_S} seconds...')
+        run_later(self.job_queue, ROUND_TRANSITION_DELAY_S, self.start_next_round,
+                  ended_game_round_id=self.game_round_id, name=f'new-round-after-{self.game_round_id}')
+
+    def start_next_round(self, ended_game_round_id: int):
+        """Starts the round following the one provided, provided nothing else has started it already"""
+        with self._transition_lock:
+            if ended_game_round_id != self.game_round_id or self.status != GameStatus.END_ROUND:
+                self.log.debug(f'Round after {ended_game_round_id} was already started or the game ended. '
+                               f'Skipping.')
+                return
+            self.new_round()
 
     def winner_selection(self) -> BlocksType:
         """Contains the logic that determines point distributions upon selection of a winner"""
@@ -472,10 +605,11 @@ class Game:
             self.log.debug('The winner selected seems to have left the game. Spinning their object up to '
                            'grant their points.')
             # Load the Player object so we can make the same changes as an existing player
-            winner = Player(player_hash=self.judge.winner_hash, eng=self.eng, log=self.log)
+            winner = Player(player_hash=self.judge.winner_hash, eng=self.eng, log=self.log,
+                            round_state=self.round_state)
             # Attach the current round to the winner
             winner.game_id = self.game_id
-            winner.round_id = self.game_round_id
+            winner.game_round_id = self.game_round_id
 
         self.log.debug(f'Winner selected as "{winner.display_name}"')
         # If decknuke occurred, distribute the points to others randomly
@@ -496,6 +630,8 @@ class Game:
         winner.mark_chosen_pick()
 
         winner.add_points(points_won)
+        self.streak.record_round(winner_id=winner.player_table_id, judge_id=self.judge.player_table_id,
+                                 is_nuke_caught=winner.is_nuked_hand)
         if not winner_was_none:
             self.players.player_dict[winner.player_hash] = winner
         winner_details = winner.player_tag if self.is_ping_winner else f'*`{winner.display_name.title()}`*'
@@ -560,13 +696,13 @@ class Game:
         for pt in range(0, penalty * -1):
             player: Player
             if len(eligible_receivers) > 1:
-                player = list(np.random.choice(eligible_receivers, 1))[0]
+                player = choice(eligible_receivers)
             elif len(eligible_receivers) == 1:
                 # In case everyone has the max score except for one person
                 player = eligible_receivers[0]
             else:
                 # Everyone has the same score lol. Just pick a random player
-                player = list(np.random.choice(nonjudge_players, 1))[0]
+                player = choice(nonjudge_players)
 
             player.add_points(1)
             # Record the points for notifying in the channel
@@ -614,6 +750,7 @@ class Game:
             # Replace the pick messages
             self.log.debug('Pick assignment successful. Updating player.')
             player.is_picked = True
+            self.flush_round_state(checkpoint='pick registered')
             self.players.player_dict[player_hash] = player
             self.replace_block_forms(player_hash)
             return f'*`{player.display_name}`*\'s pick has been registered.'
@@ -624,6 +761,10 @@ class Game:
             self.log.debug('Pick assignment unsuccessful. Other reason.')
             return 'Pick not registered.'
 
+    def get_player_ids(self) -> List[int]:
+        """Collects the player table ids of everyone in the game"""
+        return [x.player_table_id for x in self.players.player_dict.values()]
+
     def players_left_to_pick(self, as_name: bool = True) -> List[str]:
         """Returns a list of the players that have yet to pick a card"""
         self.log.debug('Determining players remaining to pick')
@@ -660,7 +801,7 @@ class Game:
         if pick.player_hash == self.judge.player_hash:
             # Make sure the player referenced isn't the judge
             self.log.debug('Ignoring pick... This player is the judge.')
-            self.st.message_main_channel(f'{self.judge.player_tag} is the judge this round. Judges can\'t pick!!!')
+            self.message_channel(f'{self.judge.player_tag} is the judge this round. Judges can\'t pick!!!')
             return None
         elif player_hash != pick.player_hash:
             # Reload player - a pick was called in for someone other than the command sender
@@ -670,19 +811,19 @@ class Game:
         if player.is_picked:
             # Player already picked
             self.log.debug('Ignoring pick... Player has already picked.')
-            self.st.message_main_channel(f'{player.player_tag} you already pickled this round????? NO DOUBLE PICKLE!!!')
+            self.message_channel(f'{player.player_tag} you already pickled this round????? NO DOUBLE PICKLE!!!')
             return None
         pick.handle_pick(total_cards=player.get_all_cards())
 
         if pick.picks is None:
             self.log.debug('Picks object was still NoneType at this point.')
             if pick.n_required != len(pick.positions):
-                self.st.message_main_channel(f'Dearest <@{player_hash}>, you picked {len(pick.positions)} things, but '
-                                             f'the question needs {pick.n_required}.')
+                self.message_channel(f'Dearest <@{player_hash}>, you picked {len(pick.positions)} things, but '
+                                     f'the question needs {pick.n_required}.')
             return None
         elif any([x > player.get_all_cards() - 1 or x < 0 for x in pick.picks]):
-            self.st.message_main_channel(f'<@{player_hash}> I think you picked outside the range of suggestions. '
-                                         f'Your picks: `{pick.picks}`.')
+            self.message_channel(f'<@{player_hash}> I think you picked outside the range of suggestions. '
+                                 f'Your picks: `{pick.picks}`.')
             return None
         messages = [self.assign_player_pick(player.player_hash, pick.picks)]
 
@@ -694,16 +835,18 @@ class Game:
         # See who else has yet to decide
         remaining = self.players_left_to_pick()
         if len(remaining) == 0:
+            # Only the first of any simultaneous last picks moves the round on to judging
+            if not self._transition_status([GameStatus.PLAYER_DECISION], GameStatus.JUDGE_DECISION):
+                return None
             messages.append('All players have made their picks.')
             if self.is_ping_judge:
                 judge_msg = f'{self.judge.player_tag} to judge.'
             else:
                 judge_msg = f'`{self.judge.display_name.title()}` to judge.'
             messages.append(judge_msg)
-            self.status = GameStatus.JUDGE_DECISION
             # Update the "remaining picks" message
-            self.st.update_message(self.config.MAIN_CHANNEL, self.game_round_tbl.message_timestamp,
-                                   message='Pickling complete!')
+            self.message_updates.update_now(self.channel_id, self.game_round_tbl.message_timestamp,
+                                            message='Pickling complete!')
             self._display_picks(notifications=messages)
             # Handle auto randchoose players
             self.log.debug(f'All players made their picks. Checking if judge is arc: {self.judge.is_arc}')
@@ -720,15 +863,15 @@ class Game:
             if self.game_round_tbl.message_timestamp is None:
                 # Announcing the picks for the first time; capture the timestamp so
                 #   we can update that same message later
-                round_msg_ts = self.st.send_message(self.config.MAIN_CHANNEL,
+                round_msg_ts = self.st.send_message(self.channel_id,
                                                     message='Message about current game!',
                                                     ret_ts=True, blocks=msg_block)
                 self.game_round_tbl.message_timestamp = round_msg_ts
                 self.game_round_tbl = self.eng.refresh_table_object(self.game_round_tbl)
             else:
                 # Update the message we've already got
-                self.st.update_message(self.config.MAIN_CHANNEL, self.game_round_tbl.message_timestamp,
-                                       blocks=msg_block)
+                self.message_updates.update(self.channel_id, self.game_round_tbl.message_timestamp,
+                                            blocks=msg_block)
 
     def _display_picks(self, notifications: List[str] = None):
         """Shows a random order of the picks"""
@@ -745,11 +888,11 @@ class Game:
         # Judge's block
         judge_response_block = question_block + private_choices
         # Show everyone's picks to the group, but only send the choice buttons to the judge
-        self.st.message_main_channel(blocks=public_response_block)
+        self.message_channel(blocks=public_response_block)
 
         # Handle sending judge messages
         # send as private in-channel message (though this sometimes goes unrendered)
-        _ = self.st.private_channel_message(self.judge.player_hash, self.config.MAIN_CHANNEL,
+        _ = self.st.private_channel_message(self.judge.player_hash, self.channel_id,
                                             message='', ret_ts=True, blocks=judge_response_block)
         if self.judge.is_dm_cards:
             # DM choices to player if they have card dming enabled
@@ -757,7 +900,14 @@ class Game:
                                            blocks=judge_response_block)
 
     def display_picks(self) -> Tuple[BlocksType, BlocksType]:
-        """Shows the player's picks in random order"""
+        """Shows the player's picks in random order
+
+        The order is set the first time this is called in a round; after that, the same blocks are
+        handed back so the judge's choice numbers keep matching the stored choice order.
+        """
+        return self.render_cache.get_or_render(self.game_round_id, RenderKind.JUDGE_CHOICES, self._render_picks)
+
+    def _render_picks(self) -> Tuple[BlocksType, BlocksType]:
         self.log.debug('Rendering picks...')
         picks: Dict[str, List[PickItemType]]
         picks = self.gq.get_player_picks(game_round_id=self.game_round_id)
@@ -783,6 +933,8 @@ class Game:
             # Make a "public" block that just shows the choices in the channel
             public_card_blocks.append(MarkdownSectionBlock(pick_txt))
             randbtn_list.append((f'{option_btn_txt}', f'randchoose-{num}'))
+        # The judge's choice is resolved against the stored choice order, so that needs to land in the db now
+        self.flush_round_state(checkpoint='picks displayed')
 
         rand_options = [(':hyper-shrug: All choices', 'randchoose-all')] + randbtn_list
 
@@ -795,6 +947,11 @@ class Game:
 
     def make_question_block(self, hide_arc: bool = False) -> BlocksType:
         """Generates the question block for the current round"""
+        return self.render_cache.get_or_render(self.game_round_id, RenderKind.QUESTION,
+                                               lambda: self._render_question_block(hide_arc=hide_arc),
+                                               variant=(hide_arc, self.judge.is_arc))
+
+    def _render_question_block(self, hide_arc: bool = False) -> BlocksType:
         bot_moji = ':math:' if self.judge.is_arc and not hide_arc else ''
 
         return [
@@ -818,7 +975,7 @@ class Game:
 
         if player_hash != self.judge.player_hash:
             self.log.debug(f'Nonjudge user tried to choose: {player_hash}')
-            self.st.message_main_channel(f'<@{player_hash}>, you\'re not the judge!')
+            self.message_channel(f'<@{player_hash}>, you\'re not the judge!')
             return None
 
         max_position = len(self.players.player_dict) - 2
@@ -830,14 +987,14 @@ class Game:
             # Pick can either be:
             #   -less than total players minus judge, minus 1 more to account for array
             #   -greater than -1
-            self.st.message_main_channel(f'I think you picked outside the range of suggestions. '
-                                         f'Your choice: {chce.choice}')
+            self.message_channel(f'I think you picked outside the range of suggestions. '
+                                 f'Your choice: {chce.choice}')
             return None
         else:
             # Record the judge's pick
             if self.judge.selected_choice_idx is None:
                 self.log.debug(f'Setting judge\'s choice as {chce.choice}:')
                 self.judge.selected_choice_idx = chce.choice
-                self.judge.get_winner_from_choice_order()
+                self.judge.get_winner_from_choice_order(player_ids=self.get_player_ids())
             else:
-                self.st.message_main_channel('Judge\'s pick voided. You\'ve already picked this round.')
+                self.message_channel('Judge\'s pick voided. You\'ve already picked this round.')
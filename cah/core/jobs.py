@@ -0,0 +1,357 @@
+"""Background execution helpers, so that slow or delayed work doesn't hold up a request thread"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+import threading
+import time
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from loguru import logger
+
+from cah.metrics import track_interaction
+
+
+class ScheduledJob:
+    """Handle for a job that's been put on the DelayedJobQueue"""
+
+    def __init__(self, name: str, run_at: float, func: Callable, args: Tuple, kwargs: dict):
+        self.name = name
+        self.run_at = run_at
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.is_cancelled = False
+
+    def cancel(self):
+        """Prevents the job from running, if it hasn't already started"""
+        self.is_cancelled = True
+
+    def __repr__(self) -> str:
+        return f'<ScheduledJob(name={self.name}, run_at={self.run_at:.2f}, cancelled={self.is_cancelled})>'
+
+
+class DelayedJobQueue:
+    """Runs callables after a delay on a bounded pool of background threads.
+
+    A single dispatcher thread sleeps until the earliest job is due, then hands it off to the worker pool.
+    """
+
+    def __init__(self, log: logger, max_workers: int = 4, name: str = 'cah-jobs',
+                 job_wrapper: Callable[[Callable], None] = None):
+        """
+        Args:
+            log: log object
+            max_workers: the max number of jobs that can run at the same time
+            name: prefix for the thread names, also the route jobs are tracked under in the metrics
+            job_wrapper: optional callable that takes a zero-arg callable and runs it
+                (e.g., to provide a db session or other context around each job)
+        """
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.name = name
+        self.job_wrapper = job_wrapper
+        self._heap = []  # type: List[Tuple[float, int, ScheduledJob]]
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._is_shutdown = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name=f'{name}-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def n_pending(self) -> int:
+        with self._cond:
+            return len([x for x in self._heap if not x[2].is_cancelled])
+
+    def schedule(self, delay_s: float, func: Callable, *args, name: str = None, **kwargs) -> ScheduledJob:
+        """Schedules func(*args, **kwargs) to run after delay_s seconds"""
+        if self._is_shutdown:
+            raise RuntimeError('Cannot schedule jobs after the queue has been shut down')
+        job = ScheduledJob(name=name or getattr(func, '__name__', 'job'), run_at=time.monotonic() + max(delay_s, 0),
+                           func=func, args=args, kwargs=kwargs)
+        with self._cond:
+            heapq.heappush(self._heap, (job.run_at, next(self._counter), job))
+            self._cond.notify()
+        self.log.debug(f'Scheduled job {job.name} to run in {delay_s}s')
+        return job
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._is_shutdown and (len(self._heap) == 0 or self._heap[0][0] > time.monotonic()):
+                    timeout = None if len(self._heap) == 0 else self._heap[0][0] - time.monotonic()
+                    self._cond.wait(timeout=timeout)
+                if self._is_shutdown:
+                    return
+                _, _, job = heapq.heappop(self._heap)
+            if not job.is_cancelled:
+                self._executor.submit(self._run, job)
+
+    def _run(self, job: ScheduledJob):
+        self.log.debug(f'Running job {job.name}')
+
+        def _call():
+            job.func(*job.args, **job.kwargs)
+
+        try:
+            with track_interaction(route=self.name, action_id=job.name):
+                if self.job_wrapper is not None:
+                    self.job_wrapper(_call)
+                else:
+                    _call()
+        except Exception as e:
+            self.log.exception(f'Job {job.name} failed: {e}')
+
+    def shutdown(self, wait: bool = False):
+        """Stops accepting jobs and drops any that haven't yet come due"""
+        with self._cond:
+            self._is_shutdown = True
+            self._heap.clear()
+            self._cond.notify_all()
+        self._executor.shutdown(wait=wait)
+
+
+class QueuedWork:
+    """An item on the OrderedWorkQueue"""
+
+    def __init__(self, name: str, func: Callable, args: Tuple, kwargs: dict):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+    def __repr__(self) -> str:
+        return f'<QueuedWork(name={self.name})>'
+
+
+class OrderedWorkQueue:
+    """Processes work on a pool of background threads, one item at a time per key (e.g., channel).
+
+    Items sharing a key run in the order they were submitted; items with different keys run in parallel.
+    A key's worker hands back its thread after each item so that one busy channel can't starve the others.
+    """
+
+    def __init__(self, log: logger, max_workers: int = 4, max_pending: int = 200, name: str = 'cah-work',
+                 job_wrapper: Callable[[Callable], None] = None, n_latency_samples: int = 500):
+        """
+        Args:
+            log: log object
+            max_workers: the max number of items that can be processed at the same time
+            max_pending: the max number of items that can be waiting or running before submissions are refused
+            name: prefix for the thread names, also the route items are tracked under in the metrics
+            job_wrapper: optional callable that takes a zero-arg callable and runs it
+                (e.g., to provide a db session or other context around each item)
+            n_latency_samples: the number of most recent items to compute latency stats from
+        """
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.name = name
+        self.job_wrapper = job_wrapper
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # Signalled whenever the last pending item finishes
+        self._idle = threading.Condition(self._lock)
+        self._queues = {}  # type: Dict[Hashable, Deque[QueuedWork]]
+        self._n_pending = 0
+        self._n_processed = 0
+        self._n_failed = 0
+        self._n_refused = 0
+        # (seconds waiting in the queue, seconds processing)
+        self._latencies = deque(maxlen=n_latency_samples)  # type: Deque[Tuple[float, float]]
+        self._is_shutdown = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    @property
+    def n_pending(self) -> int:
+        """Items that are waiting or running"""
+        with self._lock:
+            return self._n_pending
+
+    def submit(self, key: Hashable, func: Callable, *args, name: str = None, **kwargs) -> bool:
+        """Queues func(*args, **kwargs) to run after any other work already submitted under the same key
+
+        Returns:
+            False if the queue is full (or shut down) and the work wasn't accepted
+        """
+        work = QueuedWork(name=name or getattr(func, '__name__', 'work'), func=func, args=args, kwargs=kwargs)
+        with self._lock:
+            if self._is_shutdown or self._n_pending >= self.max_pending:
+                self._n_refused += 1
+                self.log.warning(f'Refused {work.name} for {key}: {self._n_pending} items pending '
+                                 f'(shutdown={self._is_shutdown})')
+                return False
+            self._n_pending += 1
+            key_queue = self._queues.get(key)
+            if key_queue is not None:
+                # A worker already owns this key and will get to it
+                key_queue.append(work)
+                return True
+            self._queues[key] = deque([work])
+        self._executor.submit(self._run_next, key)
+        return True
+
+    def _run_next(self, key: Hashable):
+        with self._lock:
+            work = self._queues[key][0]
+        started_at = time.monotonic()
+
+        def _call():
+            work.func(*work.args, **work.kwargs)
+
+        is_failed = False
+        try:
+            with track_interaction(route=self.name, action_id=work.name):
+                if self.job_wrapper is not None:
+                    self.job_wrapper(_call)
+                else:
+                    _call()
+        except Exception as e:
+            is_failed = True
+            self.log.exception(f'Work {work.name} for {key} failed: {e}')
+        finished_at = time.monotonic()
+
+        with self._lock:
+            self._n_pending -= 1
+            if self._n_pending == 0:
+                self._idle.notify_all()
+            self._n_processed += 1
+            self._n_failed += is_failed
+            self._latencies.append((started_at - work.enqueued_at, finished_at - started_at))
+            key_queue = self._queues[key]
+            key_queue.popleft()
+            if len(key_queue) == 0:
+                del self._queues[key]
+                return
+        # Go to the back of the line so other keys get a turn
+        try:
+            self._executor.submit(self._run_next, key)
+        except RuntimeError:
+            # Shut down in the meantime
+            with self._lock:
+                self._n_pending -= len(self._queues.pop(key, []))
+
+    def get_stats(self) -> Dict:
+        """Queue depth & latency (in ms) over the most recent items"""
+        with self._lock:
+            latencies = list(self._latencies)
+            stats = {
+                'n_pending': self._n_pending,
+                'n_keys': len(self._queues),
+                'max_pending': self.max_pending,
+                'n_processed': self._n_processed,
+                'n_failed': self._n_failed,
+                'n_refused': self._n_refused,
+            }
+        for i, stat in enumerate(['wait', 'run']):
+            samples = sorted(x[i] for x in latencies)
+            stats[f'{stat}_ms'] = {
+                'avg': round(1000 * sum(samples) / len(samples), 1) if len(samples) > 0 else None,
+                'p95': round(1000 * samples[int(0.95 * (len(samples) - 1))], 1) if len(samples) > 0 else None,
+                'max': round(1000 * samples[-1], 1) if len(samples) > 0 else None,
+            }
+        return stats
+
+    def shutdown(self, wait: bool = False):
+        """Stops accepting work. With wait, everything already accepted is run before this returns;
+        otherwise items already running are finished & the rest are dropped."""
+        with self._lock:
+            self._is_shutdown = True
+            if wait:
+                self._idle.wait_for(lambda: self._n_pending == 0)
+            for key, key_queue in self._queues.items():
+                # Leave the running item in place for its worker to clear
+                while len(key_queue) > 1:
+                    key_queue.pop()
+                    self._n_pending -= 1
+        self._executor.shutdown(wait=wait)
+
+
+class CoalescedMessageUpdates:
+    """Holds back updates to Slack messages for a short window, then sends only the latest one per message.
+
+    A burst of changes (e.g., several picks coming in at once) then costs one chat.update call instead of one each.
+    """
+
+    def __init__(self, log: logger, update_func: Callable[..., None], job_queue: Optional[DelayedJobQueue],
+                 delay_s: float = 1.0):
+        """
+        Args:
+            log: log object
+            update_func: called as update_func(channel, ts, **kwargs) to send an update (e.g., st.update_message)
+            job_queue: the queue the held back updates are sent from. If None, updates are sent right away.
+            delay_s: seconds to wait after the first of a burst of updates before sending
+        """
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.update_func = update_func
+        self.job_queue = job_queue
+        self.delay_s = delay_s
+        self._lock = threading.Lock()
+        # (channel, ts) -> the latest kwargs for update_func & the job that'll send them
+        self._pending = {}  # type: Dict[Tuple[str, str], dict]
+        self._jobs = {}  # type: Dict[Tuple[str, str], ScheduledJob]
+        # Keeps an older update from being sent after a newer one to the same channel
+        self._send_locks = {}  # type: Dict[str, threading.Lock]
+
+    @property
+    def n_pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def update(self, channel: str, ts: str, **kwargs):
+        """Queues an update to the message, replacing any that hasn't been sent yet"""
+        key = (channel, ts)
+        with self._lock:
+            self._pending[key] = kwargs
+            if self.job_queue is not None and key not in self._jobs:
+                self._jobs[key] = self.job_queue.schedule(self.delay_s, self.flush, channel, ts,
+                                                          name='message-update')
+        if self.job_queue is None:
+            self.flush(channel, ts)
+
+    def update_now(self, channel: str, ts: str, **kwargs):
+        """Sends an update to the message right away, dropping any that hasn't been sent yet"""
+        with self._lock:
+            self._pending[(channel, ts)] = kwargs
+        self.flush(channel, ts)
+
+    def flush(self, channel: str, ts: str):
+        """Sends the message's pending update, if it has one"""
+        key = (channel, ts)
+        with self._lock:
+            send_lock = self._send_locks.setdefault(channel, threading.Lock())
+        with send_lock:
+            with self._lock:
+                kwargs = self._pending.pop(key, None)
+                job = self._jobs.pop(key, None)
+            if job is not None:
+                job.cancel()
+            if kwargs is None:
+                return
+            try:
+                self.update_func(channel, ts, **kwargs)
+            except Exception as e:
+                self.log.exception(f'Failed to update message {ts} in {channel}: {e}')
+
+    def flush_all(self):
+        """Sends all pending updates (e.g., before shutting down)"""
+        with self._lock:
+            keys = list(self._pending.keys())
+        for channel, ts in keys:
+            self.flush(channel, ts)
+
+
+def run_later(queue: Optional[DelayedJobQueue], delay_s: float, func: Callable, *args, name: str = None,
+              **kwargs):
+    """Schedules the callable on the queue if one is available, otherwise runs it right away"""
+    if queue is None:
+        func(*args, **kwargs)
+        return None
+    return queue.schedule(delay_s, func, *args, name=name, **kwargs)
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from concurrent.futures import (
+    ThreadPoolExecutor,
+    as_completed,
+)
 from random import shuffle
 from typing import (
+    TYPE_CHECKING,
     Dict,
     List,
     Optional,
+    Tuple,
     Union,
 )
 
@@ -23,28 +29,49 @@ from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.sql import and_
 
 from cah.core.common_methods import refresh_players_in_channel
+from cah.core.render_cache import RenderKind
 from cah.db_eng import WizzyPSQLClient
 from cah.model import (
     SettingType,
-    TableAnswerCard,
+    TableGame,
     TablePlayer,
     TablePlayerRound,
 )
 from cah.queries.player_queries import (
+    HandSlotType,
     PlayerHandCardType,
     PlayerQueries,
 )
 
+if TYPE_CHECKING:
+    from cah.core.render_cache import RenderCache
+    from cah.core.round_state import RoundStateStore
+
+# Max number of players' hands that can be in flight to Slack at once
+HAND_DELIVERY_WORKERS = 6
+
 
 class Player:
     """Player-specific things"""
 
-    def __init__(self, player_hash: str, eng: WizzyPSQLClient, log: logger):
+    def __init__(self, player_hash: str, eng: WizzyPSQLClient, log: logger,
+                 round_state: 'RoundStateStore' = None, render_cache: 'RenderCache' = None):
+        """
+        Args:
+            player_hash: the player's slack user hash
+            eng: the database engine
+            log: log object
+            round_state: optional write-behind store for attribute changes. When not provided,
+                changes are written to the database as soon as they're set.
+            render_cache: optional cache the rendered hand is kept in for the round, until the hand changes
+        """
         self.player_hash = player_hash
         self.player_tag = f'<@{self.player_hash}>'
         self.log = log.bind(child_name=self.__class__.__name__)
         self.pq = PlayerQueries(eng=eng, log=self.log)
         self.eng = eng
+        self.round_state = round_state
+        self.render_cache = render_cache
 
         player_table = self._get_player_tbl()
         self.player_table_id = player_table.player_id
@@ -74,8 +101,7 @@ class Player:
     @is_arp.setter
     def is_arp(self, value: bool):
         self._is_arp = value
-        round_tbl = self.get_playerround_tbl()
-        if round_tbl is not None and not round_tbl.is_picked:
+        if self.game_round_id is not None and not self.is_picked:
             # They haven't yet picked, so they'd ARP this round too.
             #   Set that to make sure the data is logged properly
             self._set_player_round_tbl(TablePlayerRound.is_arp, self._is_arp)
@@ -89,8 +115,7 @@ class Player:
     def is_arc(self, value: bool):
         self.log.debug(f'Setting ARC to {value}')
         self._is_arc = value
-        round_tbl = self.get_playerround_tbl()
-        if round_tbl is not None:
+        if self.game_round_id is not None:
             # No check here, as once a judge picks, the round progresses immediately
             self._set_player_round_tbl(TablePlayerRound.is_arc, self._is_arc)
         self._set_player_tbl(TablePlayer.is_auto_randchoose, self._is_arc)
@@ -113,8 +138,7 @@ class Player:
     def is_picked(self, value: bool):
         self.log.debug(f'Setting is_picked to {value}')
         self._is_picked = value
-        round_tbl = self.get_playerround_tbl()
-        if round_tbl is not None:
+        if self.game_round_id is not None:
             # No check here, as once a judge picks, the round progresses immediately
             self._set_player_round_tbl(TablePlayerRound.is_picked, self._is_picked)
 
@@ -164,6 +188,9 @@ class Player:
         self._set_player_round_tbl(TablePlayerRound.is_nuked_hand_caught, self._is_nuked_hand_caught)
 
     def _set_player_tbl(self, attr: Union[InstrumentedAttribute, int, str], value: Optional[Union[int, bool, str]]):
+        if self.round_state is not None:
+            self.round_state.set_player_attr(player_hash=self.player_hash, attr=attr, value=value)
+            return
         self.pq.set_player_table_attr(player_hash=self.player_hash, attr=attr, value=value)
 
     def _get_player_tbl(self) -> Optional[TablePlayer]:
@@ -172,6 +199,10 @@ class Player:
         return self.pq.get_player_table(player_hash=self.player_hash)
 
     def _set_player_round_tbl(self, attr: Union[InstrumentedAttribute, bool, int], value: Union[int, bool, str]):
+        if self.round_state is not None:
+            self.round_state.set_player_round_attr(game_id=self.game_id, game_round_id=self.game_round_id,
+                                                   player_id=self.player_table_id, attr=attr, value=value)
+            return
         self.pq.set_player_round_table(player_id=self.player_table_id, game_round_id=self.game_round_id,
                                        game_id=self.game_id, attr=attr, value=value)
 
@@ -201,16 +232,23 @@ class Player:
         (have been picked or have been nuked)"""
         return self.pq.get_nonreplaceable_cards(player_id=self.player_table_id)
 
+    def clear_rendered_hand(self):
+        if self.render_cache is not None:
+            self.render_cache.invalidate(kind=RenderKind.HAND, player_hash=self.player_hash)
+
     def empty_hand(self):
         self.pq.empty_hand(player_id=self.player_table_id)
+        self.clear_rendered_hand()
 
     def nuke_cards(self):
         """Marks all the cards in the hand as 'nuked' for a player who had chosen to 'decknuke' their cards"""
         self.pq.set_nuke_cards(player_id=self.player_table_id)
+        self.clear_rendered_hand()
 
-    def take_cards(self, cards: List[TableAnswerCard]):
-        """Takes a card into the player's hand"""
-        self.pq.set_cards_in_hand(player_id=self.player_table_id, cards=cards)
+    def take_cards(self, card_ids: List[int]):
+        """Takes cards (by answer card id) into the player's hand"""
+        self.pq.set_cards_in_hand(player_id=self.player_table_id, card_ids=card_ids)
+        self.clear_rendered_hand()
 
     def get_hand(self) -> List:
         return self.pq.get_player_hand(player_id=self.player_table_id)
@@ -222,6 +260,13 @@ class Player:
                 if this equals 1, the multi select for definite selections will not be rendered,
                 otherwise it will take the place of the individual buttons
         """
+        if self.render_cache is None:
+            return self._render_hand(max_selected=max_selected)
+        return self.render_cache.get_or_render(self.game_round_id, RenderKind.HAND,
+                                               lambda: self._render_hand(max_selected=max_selected),
+                                               player_hash=self.player_hash, variant=max_selected)
+
+    def _render_hand(self, max_selected: int = 1) -> BlocksType:
         card_blocks = []
         btn_list = []  # Button info to be made into a button group
         randbtn_list = []  # Just like above, but bear a 'rand' prefix to differentiate. These can be subset.
@@ -281,6 +326,7 @@ class Player:
             card = cards[p]  # type: PlayerHandCardType
             self.pq.set_picked_card(player_id=self.player_table_id, game_round_id=self.game_round_id,
                                     slack_user_hash=self.player_hash, position=i, card=card)
+        self.clear_rendered_hand()
         return True
 
     def render_picks_as_list(self) -> List[str]:
@@ -310,21 +356,31 @@ class Player:
         for better tracking"""
         self.pq.mark_chosen_pick(player_id=self.player_table_id, game_round_id=self.game_round_id)
 
+    def _flush_settings(self):
+        """Settings are read straight from the db by forms, so toggles are written out immediately"""
+        if self.round_state is not None:
+            self.round_state.flush(checkpoint='settings toggled')
+
     def toggle_cards_dm(self):
         """Toggles whether or not to DM cards to player"""
         self.is_dm_cards = not self.is_dm_cards
+        self._flush_settings()
 
     def toggle_arp(self):
         """Toggles auto randpick"""
         self.is_arp = not self.is_arp
+        self._flush_settings()
 
     def toggle_arc(self):
         """Toggles auto randpick"""
         self.is_arc = not self.is_arc
+        self._flush_settings()
 
     def add_points(self, points: int):
         """Adds points to the player's score"""
-        self._set_player_round_tbl(TablePlayerRound.score, TablePlayerRound.score + points)
+        # Scores are read back from the db right away, so this bypasses the write-behind store
+        self.pq.add_points(player_id=self.player_table_id, game_round_id=self.game_round_id,
+                           game_id=self.game_id, points=points)
 
     def get_current_score(self) -> int:
         """Retrieves the players current score"""
@@ -351,28 +407,63 @@ class Players:
     player_dict = Dict[str, Player]
 
     def __init__(self, player_hash_list: List[str], slack_api: SlackTools, eng: WizzyPSQLClient,
-                 parent_log: logger, config, is_existing: bool = False):
+                 parent_log: logger, config, is_existing: bool = False, round_state: 'RoundStateStore' = None,
+                 game_id: int = None, channel_id: str = None, render_cache: 'RenderCache' = None):
         """
         Args:
             player_hash_list: list of player slack hashes
             slack_api: slack api to send messages to the channel
             parent_log: log object to record important details
+            round_state: optional write-behind store shared by all players in the game
+            game_id: the game the players belong to. The judge order is kept with this game.
+            channel_id: the channel the game is played in. Defaults to the main channel.
+            render_cache: optional cache shared by the game's players for their rendered hands
         """
         self.log = parent_log.bind(child_name=self.__class__.__name__)
         self.st = slack_api
         self.eng = eng
         self.config = config
+        self.round_state = round_state
+        self.render_cache = render_cache
+        self.game_id = game_id
+        self.channel_id = channel_id if channel_id is not None else config.MAIN_CHANNEL
+        self.pq = PlayerQueries(eng=eng, log=self.log)
         self.player_dict = {
-            k: Player(k, eng=eng, log=self.log) for k in player_hash_list
+            k: Player(k, eng=eng, log=self.log, round_state=round_state, render_cache=render_cache)
+            for k in player_hash_list
         }
 
         if not is_existing:
             self.log.debug('Shuffling players and setting judge order')
             self.judge_order = player_hash_list
             shuffle(self.judge_order)
-            self.eng.set_setting(SettingType.JUDGE_ORDER, setting_val=','.join(self.judge_order))
+            self._save_judge_order()
         else:
-            self.judge_order = self.eng.get_setting(SettingType.JUDGE_ORDER).split(',')
+            self.judge_order = self._load_judge_order()
+
+    def _save_judge_order(self):
+        """Stores the judge order with the game (or in the bot's settings, if there's no game id)"""
+        judge_order_str = ','.join(self.judge_order)
+        if self.game_id is None:
+            self.eng.set_setting(SettingType.JUDGE_ORDER, setting_val=judge_order_str)
+            return
+        with self.eng.session_mgr() as session:
+            session.query(TableGame).filter(TableGame.game_id == self.game_id).update({
+                TableGame.judge_order: judge_order_str
+            })
+
+    def _load_judge_order(self) -> List[str]:
+        """Reads the judge order stored for the game"""
+        judge_order_str = None
+        if self.game_id is not None:
+            with self.eng.session_mgr() as session:
+                judge_order_str = session.query(TableGame.judge_order).filter(
+                    TableGame.game_id == self.game_id
+                ).scalar()
+        if judge_order_str is None:
+            # Games started before the judge order was stored per game
+            judge_order_str = self.eng.get_setting(SettingType.JUDGE_ORDER)
+        return judge_order_str.split(',')
 
     def reinstate_round_players(self, game_id: int, game_round_id: int):
         """Handles the player side of reinstating the game / round"""
@@ -432,15 +523,16 @@ class Players:
         # Get the player's info
         self.log.debug('Beginning process to add player to game...')
         self.log.debug('Refreshing players in channel to scan for potential new players')
-        refresh_players_in_channel(channel=self.config.MAIN_CHANNEL, eng=self.eng, st=self.st, log=self.log)
+        refresh_players_in_channel(channel=self.channel_id, eng=self.eng, st=self.st, log=self.log)
 
         if self.player_dict.get(player_hash) is not None:
             return f'*`{self.player_dict[player_hash].display_name}`* already in game...'
-        player = Player(player_hash=player_hash, log=self.log, eng=self.eng)
+        player = Player(player_hash=player_hash, log=self.log, eng=self.eng, round_state=self.round_state,
+                        render_cache=self.render_cache)
         player.start_round(game_id=game_id, game_round_id=game_round_id)
         self.player_dict[player_hash] = player
         self.judge_order.append(player_hash)
-        self.eng.set_setting(SettingType.JUDGE_ORDER, setting_val=','.join(self.judge_order))
+        self._save_judge_order()
         self.log.debug(f'Player with name "{player.display_name}" added to game...')
         return f'*`{player.display_name}`* successfully added to game...'
 
@@ -453,7 +545,7 @@ class Players:
         player = self.player_dict.pop(player_hash)
         # Remove from judge order
         _ = self.judge_order.pop(self.judge_order.index(player_hash))
-        self.eng.set_setting(SettingType.JUDGE_ORDER, setting_val=','.join(self.judge_order))
+        self._save_judge_order()
 
         return f'*`{player.display_name}`* successfully removed from game...'
 
@@ -463,26 +555,79 @@ class Players:
         for p_hash, _ in self.player_dict.items():
             self.player_dict[p_hash].start_round(game_id=game_id, game_round_id=game_round_id)
 
-    def render_hands(self, judge_hash: str, question_block: List[Dict], req_ans: int):
-        """Renders each players' hands"""
+    def render_hands(self, judge_hash: str, question_block: List[Dict], req_ans: int) -> Dict[str, Exception]:
+        """Renders each players' hands
+
+        The hands are built one after another here (they read from the db), but the Slack calls
+        to deliver them are fanned out over a small thread pool, throttled per API method.
+        A failed delivery for one player doesn't stop the others.
+
+        Returns:
+            dict of player hash -> exception for any players whose cards couldn't be delivered
+        """
         self.log.debug('Rendering hands for players...')
+        hands = {}  # type: Dict[str, List[Dict]]
         for p_hash, p_obj in self.player_dict.items():
             if p_hash == judge_hash or p_obj.is_arp:
                 continue
-            cards_block = p_obj.render_hand(max_selected=req_ans)  # type: List[Dict]
-            if p_obj.is_dm_cards:
-                msg_block = question_block + cards_block
-                dm_chan, ts = self.st.private_message(p_hash, message='Here are your cards!', ret_ts=True,
-                                                      blocks=msg_block)
-                self.player_dict[p_hash].pick_blocks[dm_chan] = ts
-            pchan_ts = self.st.private_channel_message(p_hash, self.config.MAIN_CHANNEL, ret_ts=True,
-                                                       message='Here are your cards!', blocks=cards_block)
-            self.player_dict[p_hash].pick_blocks[self.config.MAIN_CHANNEL] = pchan_ts
-
-    def take_dealt_cards(self, player_hash: str, card_list: List[TableAnswerCard]):
-        """Deals out cards to players"""
+            hands[p_hash] = p_obj.render_hand(max_selected=req_ans)
+
+        failures = {}  # type: Dict[str, Exception]
+        if len(hands) == 0:
+            return failures
+        with ThreadPoolExecutor(max_workers=min(HAND_DELIVERY_WORKERS, len(hands)),
+                                thread_name_prefix='cah-hands') as executor:
+            futures = {
+                executor.submit(self._deliver_hand, p_hash, question_block, cards_block): p_hash
+                for p_hash, cards_block in hands.items()
+            }
+            for future in as_completed(futures):
+                p_hash = futures[future]
+                try:
+                    pick_blocks = future.result()
+                except Exception as e:
+                    self.log.error(f'Failed to deliver hand to player {p_hash}: {e}')
+                    failures[p_hash] = e
+                    continue
+                # Bookkeeping stays on this thread
+                self.player_dict[p_hash].pick_blocks.update(pick_blocks)
+        return failures
+
+    def _deliver_hand(self, player_hash: str, question_block: List[Dict], cards_block: List[Dict]) -> Dict[str, str]:
+        """Sends a rendered hand to the player, returning the channel -> ts of each message sent"""
+        pick_blocks = {}
+        if self.player_dict[player_hash].is_dm_cards:
+            dm_chan, ts = self.st.private_message(player_hash, message='Here are your cards!', ret_ts=True,
+                                                  blocks=question_block + cards_block)
+            pick_blocks[dm_chan] = ts
+        pchan_ts = self.st.private_channel_message(player_hash, self.channel_id, ret_ts=True,
+                                                   message='Here are your cards!', blocks=cards_block)
+        pick_blocks[self.channel_id] = pchan_ts
+        return pick_blocks
+
+    def take_dealt_cards(self, player_hash: str, card_list: List[int]):
+        """Deals out cards (answer card ids) to players"""
         self.player_dict[player_hash].take_cards(card_list)
 
+    def get_open_hand_slots(self, player_hashes: List[str], hand_size: int) -> Dict[str, List[HandSlotType]]:
+        """Collects the (hand_id, card_pos) slots that can take a new card for each of the players"""
+        id_to_hash = {self.player_dict[x].player_table_id: x for x in player_hashes}
+        open_slots = self.pq.get_open_hand_slots(player_ids=list(id_to_hash.keys()), hand_size=hand_size)
+        return {id_to_hash[k]: v for k, v in open_slots.items()}
+
+    def take_dealt_hands(self, slot_fills: Dict[str, List[Tuple[Optional[int], int, int]]]):
+        """Writes cards dealt to many players at once
+
+        Args:
+            slot_fills: {player_hash: [(hand_id, card_pos, answer_card_id), ...]}
+        """
+        self.pq.fill_hand_slots(slot_fills=[
+            (self.player_dict[p_hash].player_table_id, hand_id, card_pos, card_id)
+            for p_hash, fills in slot_fills.items() for hand_id, card_pos, card_id in fills
+        ])
+        for p_hash in slot_fills.keys():
+            self.player_dict[p_hash].clear_rendered_hand()
+
     def reset_player_pick_block(self, player_hash: str):
         """Resets the dictionary containing info about the messsage containing pick info.
         This is run after updating the original message in order to ensure the no longer needed info is removed.
@@ -504,21 +649,29 @@ class Players:
 
 class Judge(Player):
     """Player who chooses winning card"""
-    def __init__(self, player_hash: str, eng: WizzyPSQLClient, log: logger):
-        super().__init__(player_hash=player_hash, eng=eng, log=log)
+    def __init__(self, player_hash: str, eng: WizzyPSQLClient, log: logger, round_state: 'RoundStateStore' = None):
+        super().__init__(player_hash=player_hash, eng=eng, log=log, round_state=round_state)
         self.selected_choice_idx = None  # type: Optional[int]
         self.winner_id = None    # type: Optional[int]
         self.winner_hash = None  # type: Optional[str]
         self._choice_order = None
 
-    def get_winner_from_choice_order(self):
-        """Obtains winner's player id from the choice"""
+    def get_winner_from_choice_order(self, player_ids: List[int] = None):
+        """Obtains winner's player id from the choice
+
+        Args:
+            player_ids: the ids of the players in the judge's game. Choice orders are stored on the player
+                table, so this keeps the lookup from matching a player in a different game.
+        """
         with self.eng.session_mgr() as session:
             winner: TablePlayer
-            winner = session.query(TablePlayer).filter(and_(
+            winner_filters = [
                 TablePlayer.choice_order == self.selected_choice_idx,
                 TablePlayer.is_active
-            )).one()
+            ]
+            if player_ids is not None:
+                winner_filters.append(TablePlayer.player_id.in_(player_ids))
+            winner = session.query(TablePlayer).filter(and_(*winner_filters)).one()
             if winner is not None:
                 self.log.debug(f'Selected winner: {winner}')
                 self.winner_id = winner.player_id
@@ -0,0 +1,83 @@
+"""Memoized Block Kit renders, so the blocks shown again and again in a round are only built once"""
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+)
+
+# (block kind, player hash, variant) -> rendered blocks
+CacheKeyType = Tuple[str, Optional[str], Hashable]
+
+
+class RenderKind:
+    """The kinds of blocks kept in the render cache"""
+    QUESTION = 'question'
+    HAND = 'hand'
+    JUDGE_CHOICES = 'judge_choices'
+
+
+def _copy(value: Any) -> Any:
+    """Hands out copies of the outer lists, so callers adding to them don't change what's cached"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, tuple):
+        return tuple(_copy(x) for x in value)
+    return value
+
+
+class RenderCache:
+    """Holds the blocks rendered for the current round of a game, keyed on (game_round_id, kind, player, variant).
+
+    Everything is dropped once a render for a new round comes in. Within a round, entries are dropped
+    when what they show changes (e.g., a player's hand, or the question text).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.game_round_id = None  # type: Optional[int]
+        self._cache = {}  # type: Dict[CacheKeyType, Any]
+        # Bumped on each invalidation, so a render that was underway at the time isn't cached
+        self._generation = 0
+        self.n_hits = 0
+        self.n_misses = 0
+
+    def get_or_render(self, game_round_id: Optional[int], kind: str, render_func: Callable[[], Any],
+                      player_hash: str = None, variant: Hashable = None) -> Any:
+        """Returns the cached blocks for the key, rendering & caching them first if needed
+
+        Args:
+            game_round_id: the round the blocks belong to. Without one, blocks are rendered but not cached.
+            kind: the kind of blocks (see RenderKind)
+            render_func: zero-arg callable that renders the blocks
+            player_hash: the player the blocks are for, if they're player-specific
+            variant: anything else the render depends on (e.g., the number of picks required)
+        """
+        if game_round_id is None:
+            return render_func()
+        key = (kind, player_hash, variant)
+        with self._lock:
+            if game_round_id != self.game_round_id:
+                self._cache.clear()
+                self.game_round_id = game_round_id
+            elif key in self._cache:
+                self.n_hits += 1
+                return _copy(self._cache[key])
+            self.n_misses += 1
+            generation = self._generation
+        value = render_func()
+        with self._lock:
+            if game_round_id == self.game_round_id and generation == self._generation:
+                self._cache[key] = value
+        return _copy(value)
+
+    def invalidate(self, kind: str = None, player_hash: str = None):
+        """Drops the cached blocks of the kind and/or player (or everything, if neither is provided)"""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._cache.keys()):
+                if (kind is None or key[0] == kind) and (player_hash is None or key[1] == player_hash):
+                    del self._cache[key]
@@ -0,0 +1,91 @@
+import threading
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy.orm.attributes import InstrumentedAttribute
+
+from cah.db_eng import WizzyPSQLClient
+from cah.queries.player_queries import PlayerQueries
+
+# (game_id, game_round_id, player_id)
+PlayerRoundKeyType = Tuple[int, int, int]
+ChangesType = Dict[str, Optional[Union[int, bool, str]]]
+
+
+class RoundStateStore:
+    """Write-behind store for player and player_round attributes.
+
+    Player property setters update their in-memory values immediately and register the changed column here.
+    Nothing is sent to the database until `flush` is called at one of the game's checkpoints
+    (pick registered, picks displayed, round end, shutdown), at which point all dirty rows
+    are written in batched UPDATEs inside a single transaction.
+    """
+
+    def __init__(self, eng: WizzyPSQLClient, log: logger):
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.eng = eng
+        self.pq = PlayerQueries(eng=eng, log=self.log)
+        self._lock = threading.RLock()
+        self._player_round_changes = {}  # type: Dict[PlayerRoundKeyType, ChangesType]
+        self._player_changes = {}  # type: Dict[str, ChangesType]
+
+    @property
+    def is_dirty(self) -> bool:
+        with self._lock:
+            return len(self._player_round_changes) > 0 or len(self._player_changes) > 0
+
+    def set_player_round_attr(self, game_id: int, game_round_id: int, player_id: int,
+                              attr: InstrumentedAttribute, value: Optional[Union[int, bool, str]]):
+        """Registers a change to a player_round column. Later changes to the same column win."""
+        with self._lock:
+            self._player_round_changes.setdefault((game_id, game_round_id, player_id), {})[attr.key] = value
+
+    def set_player_attr(self, player_hash: str, attr: InstrumentedAttribute, value: Optional[Union[int, bool, str]]):
+        """Registers a change to a player column. Later changes to the same column win."""
+        with self._lock:
+            self._player_changes.setdefault(player_hash, {})[attr.key] = value
+
+    def get_pending(self) -> Tuple[Dict[PlayerRoundKeyType, ChangesType], Dict[str, ChangesType]]:
+        """Returns copies of the changes that have yet to be flushed"""
+        with self._lock:
+            return (
+                {k: v.copy() for k, v in self._player_round_changes.items()},
+                {k: v.copy() for k, v in self._player_changes.items()}
+            )
+
+    def flush(self, checkpoint: str = None):
+        """Writes all dirty fields to the database"""
+        with self._lock:
+            player_round_changes, self._player_round_changes = self._player_round_changes, {}
+            player_changes, self._player_changes = self._player_changes, {}
+        if len(player_round_changes) == 0 and len(player_changes) == 0:
+            return
+        self.log.debug(f'Flushing {len(player_round_changes)} player round and {len(player_changes)} player '
+                       f'changes (checkpoint: {checkpoint})')
+        try:
+            self.pq.bulk_set_player_attrs(player_round_changes=player_round_changes, player_changes=player_changes)
+        except Exception:
+            self._restore(player_round_changes, player_changes)
+            raise
+        # Inside a unit of work, the changes aren't committed until the unit ends
+        self.eng.on_unit_rollback(lambda: self._restore(player_round_changes, player_changes))
+
+    def _restore(self, player_round_changes: Dict[PlayerRoundKeyType, ChangesType],
+                 player_changes: Dict[str, ChangesType]):
+        """Puts back changes that failed to be written so they're retried at the next checkpoint,
+        keeping anything that was set while the flush was underway"""
+        self.log.warning(f'Putting back {len(player_round_changes)} player round and {len(player_changes)} '
+                         f'player changes that failed to be written')
+        with self._lock:
+            for key, changes in player_round_changes.items():
+                for col, val in changes.items():
+                    self._player_round_changes.setdefault(key, {}).setdefault(col, val)
+            for key, changes in player_changes.items():
+                for col, val in changes.items():
+                    self._player_changes.setdefault(key, {}).setdefault(col, val)
@@ -0,0 +1,206 @@
+"""In-process scheduling of the tasks in the task table, so they don't depend on crontab hitting the cron routes"""
+from datetime import (
+    datetime,
+    timedelta,
+)
+import inspect
+import threading
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+
+from loguru import logger
+from sqlalchemy.sql import or_
+
+from cah.core.jobs import (
+    DelayedJobQueue,
+    ScheduledJob,
+)
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    TableTask,
+    TableTaskParameter,
+)
+
+TaskParamType = Union[int, str, None]
+
+
+class ScheduledTask:
+    """A task from the task table, detached from the db"""
+
+    def __init__(self, task_id: int, endpoint: str, from_timestamp: datetime, until_timestamp: Optional[datetime],
+                 last_triggered: Optional[datetime], trigger_every_n_minutes: int,
+                 params: Dict[str, TaskParamType] = None):
+        self.task_id = task_id
+        self.endpoint = endpoint
+        self.from_timestamp = from_timestamp
+        self.until_timestamp = until_timestamp
+        self.last_triggered = last_triggered
+        self.trigger_every_n_minutes = trigger_every_n_minutes
+        self.params = {} if params is None else params
+        # When the task last ran & failed. Only successful runs are recorded, but a failed one still waits its turn.
+        self.last_failed = None  # type: Optional[datetime]
+
+    @classmethod
+    def from_table(cls, task: TableTask, params: List[TableTaskParameter] = None) -> 'ScheduledTask':
+        return cls(task_id=task.task_id, endpoint=task.endpoint, from_timestamp=task.from_timestamp,
+                   until_timestamp=task.until_timestamp, last_triggered=task.last_triggered,
+                   trigger_every_n_minutes=task.trigger_every_n_minutes,
+                   params={x.parameter_name: x.value_str if x.value_int is None else x.value_int
+                           for x in params or []})
+
+    @property
+    def handler_name(self) -> str:
+        """The endpoint's last path part (e.g., 'handle-randpick' for '/api/crons/handle-randpick')"""
+        return self.endpoint.strip().rstrip('/').rsplit('/', 1)[-1]
+
+    def get_next_run(self, now: datetime) -> Optional[datetime]:
+        """Determines when the task is next due. Runs are every n minutes counting from `from_timestamp`;
+        if a run was missed (e.g., while the bot was down), it's made up once right away.
+
+        Returns:
+            None if the task won't run again (past `until_timestamp`)
+        """
+        every = timedelta(minutes=max(self.trigger_every_n_minutes, 1))
+        last_runs = [x for x in [self.last_triggered, self.last_failed] if x is not None]
+        last_run = max(last_runs) if len(last_runs) > 0 else None
+        if last_run is None or last_run < self.from_timestamp:
+            next_run = self.from_timestamp
+        else:
+            n_periods = (last_run - self.from_timestamp) // every + 1
+            next_run = self.from_timestamp + n_periods * every
+        next_run = max(next_run, now)
+        if self.until_timestamp is not None and next_run > self.until_timestamp:
+            return None
+        return next_run
+
+    def __repr__(self) -> str:
+        return f'<ScheduledTask(endpoint={self.endpoint}, every_n_mins={self.trigger_every_n_minutes}, ' \
+               f'last_triggered={self.last_triggered})>'
+
+
+class TaskScheduler:
+    """Triggers the tasks in the task table as they come due.
+
+    Tasks are read from the db once (and again only when reloaded); each one's next run is put on the job queue,
+    which sleeps until the earliest is due. Once a task has run, its last_triggered is recorded
+    and its next run is scheduled.
+    """
+
+    def __init__(self, eng: WizzyPSQLClient, handlers: Dict[str, Callable], log: logger,
+                 job_queue: DelayedJobQueue, now_func: Callable[[], datetime] = datetime.now):
+        """
+        Args:
+            eng: db engine
+            handlers: the callables to run, by the task's endpoint name (e.g., 'handle-randpick').
+                The task's parameters are passed to them as keyword arguments.
+            log: log object
+            job_queue: where the tasks' next runs are scheduled
+            now_func: provides the current time (task times are stored as local time)
+        """
+        self.eng = eng
+        self.handlers = handlers
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.job_queue = job_queue
+        self.now_func = now_func
+        self._lock = threading.Lock()
+        self.tasks = {}  # type: Dict[int, ScheduledTask]
+        self._jobs = {}  # type: Dict[int, ScheduledJob]
+
+    def load_tasks(self) -> int:
+        """Reads the tasks from the db & schedules them, replacing any already scheduled
+
+        Returns:
+            the number of tasks scheduled
+        """
+        now = self.now_func()
+        with self.eng.session_mgr() as session:
+            task_rows = session.query(TableTask).filter(or_(
+                TableTask.until_timestamp.is_(None),
+                TableTask.until_timestamp >= now
+            )).all()
+            param_rows = session.query(TableTaskParameter).filter(TableTaskParameter.task_key.isnot(None)).all()
+            params = {}  # type: Dict[int, List[TableTaskParameter]]
+            for param in param_rows:
+                params.setdefault(param.task_key, []).append(param)
+            tasks = [ScheduledTask.from_table(x, params.get(x.task_id)) for x in task_rows]
+
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+            self._jobs.clear()
+            self.tasks.clear()
+        for task in tasks:
+            if task.handler_name not in self.handlers.keys():
+                self.log.warning(f'No handler for task endpoint {task.endpoint}. Skipping.')
+                continue
+            with self._lock:
+                self.tasks[task.task_id] = task
+            self._schedule(task, now=now)
+        self.log.debug(f'Scheduled {len(self._jobs)} of {len(tasks)} tasks')
+        return len(self._jobs)
+
+    def _schedule(self, task: ScheduledTask, now: datetime):
+        next_run = task.get_next_run(now=now)
+        with self._lock:
+            prev_job = self._jobs.pop(task.task_id, None)
+            if prev_job is not None:
+                # E.g., the task was run ahead of schedule
+                prev_job.cancel()
+            if next_run is None:
+                self.log.debug(f'Task {task.endpoint} has run its course')
+                self.tasks.pop(task.task_id, None)
+                return
+            self._jobs[task.task_id] = self.job_queue.schedule((next_run - now).total_seconds(), self.run_task,
+                                                               task.task_id, name=f'task-{task.handler_name}')
+
+    def run_task(self, task_id: int):
+        """Runs the task's handler, then records the run & schedules the next one"""
+        with self._lock:
+            task = self.tasks.get(task_id)
+        if task is None:
+            # Dropped in a reload
+            return
+        now = self.now_func()
+        self.log.debug(f'Triggering task {task.endpoint}')
+        handler = self.handlers[task.handler_name]
+        try:
+            handler(**self._get_handler_kwargs(task, handler))
+        except Exception as e:
+            self.log.exception(f'Task {task.endpoint} failed: {e}')
+            task.last_failed = now
+        else:
+            task.last_triggered = now
+            with self.eng.session_mgr() as session:
+                session.query(TableTask).filter(TableTask.task_id == task_id).update({
+                    TableTask.last_triggered: now
+                })
+        with self._lock:
+            if self.tasks.get(task_id) is not task:
+                # Reloaded while running; the reload scheduled the next run
+                return
+        self._schedule(task, now=self.now_func())
+
+    def _get_handler_kwargs(self, task: ScheduledTask, handler: Callable) -> Dict[str, TaskParamType]:
+        """Collects the task's parameters that its handler takes, skipping (with a warning) those it doesn't"""
+        handler_params = inspect.signature(handler).parameters
+        if any(x.kind == inspect.Parameter.VAR_KEYWORD for x in handler_params.values()):
+            return dict(task.params)
+        kwargs = {}
+        for name, value in task.params.items():
+            if name in handler_params.keys():
+                kwargs[name] = value
+            else:
+                self.log.warning(f'Task {task.endpoint} has a parameter its handler doesn\'t take: {name}. Skipping.')
+        return kwargs
+
+    def shutdown(self):
+        """Cancels all scheduled runs"""
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+            self._jobs.clear()
@@ -1,10 +1,10 @@
+from random import sample
 import re
 from typing import (
     List,
     Optional,
 )
 
-import numpy as np
 from pukr import get_logger
 
 LOG = get_logger()
@@ -121,7 +121,7 @@ class Pick(Selection):
                 if len(self.random_subset) >= self.n_required:
                     # Pick from subset
                     LOG.debug(f'Randomly selecting {self.n_required} pick(s) from subset ({self.random_subset})')
-                    self.positions = np.random.choice(self.random_subset, self.n_required, replace=False).tolist()
+                    self.positions = sample(self.random_subset, self.n_required)
                 else:
                     raise ValueError(f'The required number of responses: {self.n_required} is greater than '
                                      f'the subset made: {self.random_subset}')
@@ -129,7 +129,7 @@ class Pick(Selection):
                 # Picking from all available options
                 LOG.debug(f'Randomly selecting {self.n_required} pick(s) from all cards')
                 # Roll some dice, see if
-                self.positions = np.random.choice(self.total_cards, self.n_required, replace=False).tolist()
+                self.positions = sample(range(self.total_cards), self.n_required)
 
     def __repr__(self) -> str:
         return f'<Pick(p_hash={self.player_hash}, positions={self.positions}, is_random={self.is_random},' \
@@ -161,13 +161,13 @@ class Choice(Selection):
             if self.random_subset is not None:
                 if len(self.random_subset) >= 1:
                     LOG.debug(f'Randomly selecting choice from subset ({self.random_subset})')
-                    self.positions = np.random.choice(self.random_subset, 1, replace=False).tolist()
+                    self.positions = sample(self.random_subset, 1)
                 else:
                     raise ValueError('The parsed subset list was empty. Selection avoided.')
             else:
                 # Picking from all available options
                 LOG.debug(f'Randomly selecting choice from all submissions ({self.max_position})')
-                self.positions = np.random.choice(self.max_position + 1, 1, replace=False).tolist()
+                self.positions = sample(range(self.max_position + 1), 1)
 
     def __repr__(self) -> str:
         return f'<Choice(p_hash={self.player_hash}, choice={self.choice}, is_random={self.is_random},' \
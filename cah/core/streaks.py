@@ -0,0 +1,89 @@
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# (player_id, n_streak)
+StreakType = Tuple[Optional[int], int]
+
+
+class StreakTracker:
+    """Tracks the win streak in a game, updated as each round is wrapped up.
+
+    A streak counts the consecutive rounds won by the latest winner after their first win
+    (so winning twice in a row is a streak of 1). Rounds in which the streak holder was the judge
+    don't break their streak, while a round with a caught decknuke or without a winner ends it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.player_id = None  # type: Optional[int]
+        self.n_streak = 0
+        # Streak of a holder who was judging while someone else won, kept in case they win next
+        self._judging_streak = None  # type: Optional[StreakType]
+
+    @property
+    def current(self) -> StreakType:
+        """The current streak holder's player id & streak length"""
+        with self._lock:
+            return self.player_id, self.n_streak
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.player_id = None
+        self.n_streak = 0
+        self._judging_streak = None
+
+    def record_round(self, winner_id: Optional[int], judge_id: Optional[int], is_nuke_caught: bool = False):
+        """Updates the streak with the outcome of a round"""
+        with self._lock:
+            if winner_id is None or is_nuke_caught:
+                self._reset()
+                return
+            prev_streak = (self.player_id, self.n_streak)
+            if winner_id == self.player_id:
+                self.n_streak += 1
+            elif self._judging_streak is not None and winner_id == self._judging_streak[0]:
+                self.player_id, self.n_streak = winner_id, self._judging_streak[1] + 1
+            else:
+                self.player_id, self.n_streak = winner_id, 0
+
+            # Only a streak whose holder judged this round can carry on without them having won it
+            if prev_streak[0] not in [None, winner_id] and prev_streak[0] == judge_id:
+                self._judging_streak = prev_streak
+            elif self._judging_streak is None or self._judging_streak[0] != judge_id:
+                self._judging_streak = None
+
+    def load_rounds(self, rounds_df: 'pd.DataFrame', before_round_id: int = None):
+        """Replays a game's history (e.g., when reinstating a game) in one pass over its player rounds
+
+        Args:
+            rounds_df: the game's player rounds, with player_id, game_round_key, is_judge,
+                is_nuked_hand_caught and score
+            before_round_id: if provided, rounds from this one on are left out (e.g., the round in progress)
+        """
+        import pandas as pd
+
+        self.reset()
+        if rounds_df.shape[0] == 0:
+            return
+        if before_round_id is not None:
+            rounds_df = rounds_df.loc[rounds_df.game_round_key < before_round_id]
+        by_round = rounds_df.groupby('game_round_key')
+        summary_df = pd.DataFrame({
+            'is_nuke_caught': by_round['is_nuked_hand_caught'].any(),
+            'judge_id': rounds_df.loc[rounds_df.is_judge].groupby('game_round_key')['player_id'].first(),
+            'winner_id': rounds_df.loc[rounds_df.score > 0].groupby('game_round_key')['player_id'].first(),
+        }).sort_index()
+        for row in summary_df.itertuples():
+            self.record_round(winner_id=None if pd.isna(row.winner_id) else int(row.winner_id),
+                              judge_id=None if pd.isna(row.judge_id) else int(row.judge_id),
+                              is_nuke_caught=bool(row.is_nuke_caught))
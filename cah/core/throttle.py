@@ -0,0 +1,290 @@
+"""Rate limiting helpers for outgoing Slack API calls"""
+import threading
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from loguru import logger
+import requests
+from slack_sdk.errors import SlackApiError
+
+from cah.metrics import (
+    record_slack_call,
+    record_slack_wait,
+)
+
+# Slack Web API methods and their (sustained calls per second, burst size).
+#   chat.postMessage is a 'special' tier (roughly 1/sec per channel, with bursts tolerated),
+#   chat.postEphemeral is tier 4 (100+/min), while conversations.open, chat.update & chat.delete are tier 3 (50+/min)
+SLACK_METHOD_LIMITS = {
+    'chat.postMessage': (1.0, 20),
+    'chat.postEphemeral': (100 / 60, 20),
+    'conversations.open': (50 / 60, 10),
+    'chat.update': (50 / 60, 10),
+    'chat.delete': (50 / 60, 10),
+}  # type: Dict[str, Tuple[float, int]]
+# Slack Web API methods whose limits apply to each channel separately instead of the whole workspace
+SLACK_PER_CHANNEL_METHODS = ['chat.postMessage']
+
+# SlackBotBase methods that get throttled and the Slack Web API methods they call
+SLACK_BOT_METHOD_CALLS = {
+    'send_message': ['chat.postMessage'],
+    'message_main_channel': ['chat.postMessage'],
+    'private_message': ['conversations.open', 'chat.postMessage'],
+    'private_channel_message': ['chat.postEphemeral'],
+    'update_message': ['chat.update'],
+    'delete_message': ['chat.delete'],
+}  # type: Dict[str, List[str]]
+# Where the SlackBotBase methods that post to a channel take it: (position in args, keyword).
+#   DMs are keyed on the user, since their channel isn't known until it's opened.
+#   Methods that aren't listed post to the main channel.
+SLACK_BOT_METHOD_CHANNEL_ARGS = {
+    'send_message': (0, 'channel'),
+    'private_message': (0, 'user_id'),
+}  # type: Dict[str, Tuple[int, str]]
+
+
+class TokenBucket:
+    """Thread-safe token bucket. Tokens refill continuously at `rate` per second, up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Takes tokens if they're available without waiting"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: int = 1, timeout: float = None) -> bool:
+        """Blocks until the tokens are available (or timeout seconds pass). Returns whether they were taken."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_s = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_s = min(wait_s, remaining)
+            time.sleep(wait_s)
+
+    @property
+    def is_full(self) -> bool:
+        with self._lock:
+            self._refill()
+            return self._tokens >= self.capacity
+
+
+class ChannelTokenBuckets:
+    """A token bucket per channel, made as each channel is first used"""
+
+    def __init__(self, rate: float, capacity: int, max_channels: int = 500):
+        """
+        Args:
+            rate: tokens per second each channel's bucket refills at
+            capacity: the most tokens each channel's bucket holds
+            max_channels: past this many buckets, those that have refilled are dropped
+                (a new one starts out full anyway)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.max_channels = max_channels
+        self._lock = threading.Lock()
+        self._buckets = {}  # type: Dict[Optional[str], TokenBucket]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def get(self, channel: Optional[str]) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(channel)
+            if bucket is None:
+                if len(self._buckets) >= self.max_channels:
+                    self._buckets = {k: v for k, v in self._buckets.items() if not v.is_full}
+                bucket = self._buckets[channel] = TokenBucket(rate=self.rate, capacity=self.capacity)
+            return bucket
+
+
+def build_slack_buckets() -> Dict[str, TokenBucket]:
+    """Makes a fresh set of buckets, one per Slack method that's rate-limited across the workspace"""
+    return {method: TokenBucket(rate=rate, capacity=burst) for method, (rate, burst) in SLACK_METHOD_LIMITS.items()
+            if method not in SLACK_PER_CHANNEL_METHODS}
+
+
+def build_slack_channel_buckets() -> Dict[str, ChannelTokenBuckets]:
+    """Makes a fresh set of buckets per channel, one set per Slack method that's rate-limited per channel"""
+    return {method: ChannelTokenBuckets(rate=rate, capacity=burst) for method, (rate, burst)
+            in SLACK_METHOD_LIMITS.items() if method in SLACK_PER_CHANNEL_METHODS}
+
+
+class CallStats:
+    """Running call count, error count & latency for one kind of outgoing call"""
+
+    def __init__(self):
+        self.n_calls = 0
+        self.n_errors = 0
+        self.n_rate_limited = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def record(self, elapsed_s: float, is_error: bool = False, is_rate_limited: bool = False):
+        self.n_calls += 1
+        self.n_errors += is_error
+        self.n_rate_limited += is_rate_limited
+        self.total_s += elapsed_s
+        self.max_s = max(self.max_s, elapsed_s)
+
+    def asdict(self) -> Dict:
+        return {
+            'n_calls': self.n_calls,
+            'n_errors': self.n_errors,
+            'n_rate_limited': self.n_rate_limited,
+            'avg_ms': round(1000 * self.total_s / self.n_calls, 1) if self.n_calls > 0 else None,
+            'max_ms': round(1000 * self.max_s, 1),
+        }
+
+
+class ThrottledSlackClient:
+    """Wraps the SlackBotBase so all outgoing Slack calls share one set of per-method (and, for posting messages,
+    per-channel) rate limits.
+
+    Calls wait on the token buckets of the Web API methods they use, are retried after the wait Slack asks for
+    when they're rate limited, and are timed per method. Anything else is passed through to the SlackBotBase.
+    """
+
+    def __init__(self, st: Any, log: logger, max_retries: int = 2, max_retry_wait_s: float = 30,
+                 session: requests.Session = None):
+        """
+        Args:
+            st: the SlackBotBase being wrapped
+            log: log object
+            max_retries: times a rate limited call is retried before its error is raised
+            max_retry_wait_s: longest Retry-After that'll be waited out; past this the error's raised right away
+            session: for posting to response urls. Keeps connections to Slack alive between posts.
+        """
+        self.st = st
+        self.log = log.bind(child_name=self.__class__.__name__)
+        self.max_retries = max_retries
+        self.max_retry_wait_s = max_retry_wait_s
+        self.session = session if session is not None else requests.Session()
+        self.buckets = build_slack_buckets()
+        self.channel_buckets = build_slack_channel_buckets()
+        self._stats_lock = threading.Lock()
+        self._stats = {}  # type: Dict[str, CallStats]
+        for method in SLACK_BOT_METHOD_CALLS.keys():
+            setattr(self, method, self._wrap(method))
+
+    def __getattr__(self, item):
+        if item == 'st':
+            raise AttributeError(item)
+        return getattr(self.st, item)
+
+    def _wrap(self, method: str) -> Callable:
+        func = getattr(self.st, method)
+
+        def _throttled(*args, **kwargs):
+            return self._call(method, SLACK_BOT_METHOD_CALLS[method], func, *args, **kwargs)
+
+        _throttled.__name__ = method
+        return _throttled
+
+    def _record(self, name: str, elapsed_s: float, is_error: bool = False, is_rate_limited: bool = False):
+        with self._stats_lock:
+            self._stats.setdefault(name, CallStats()).record(elapsed_s, is_error=is_error,
+                                                             is_rate_limited=is_rate_limited)
+        record_slack_call(name, elapsed_s, is_error=is_error)
+
+    @staticmethod
+    def _get_retry_after(err: SlackApiError) -> Optional[float]:
+        """Seconds Slack asked us to wait, if the call was rate limited"""
+        response = err.response
+        if response is None or getattr(response, 'status_code', None) != 429:
+            return None
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = headers.get('Retry-After', headers.get('retry-after', 1))
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            return 1.0
+
+    def _get_channel(self, name: str, args: Tuple, kwargs: Dict) -> Optional[str]:
+        """The channel (or user, for DMs) the SlackBotBase method call posts to"""
+        if name not in SLACK_BOT_METHOD_CHANNEL_ARGS.keys():
+            return getattr(self.st, 'main_channel', None)
+        position, keyword = SLACK_BOT_METHOD_CHANNEL_ARGS[name]
+        if len(args) > position:
+            return args[position]
+        return kwargs.get(keyword)
+
+    def _call(self, name: str, api_methods: List[str], func: Callable, *args, **kwargs):
+        wait_start = time.perf_counter()
+        for api_method in api_methods:
+            if api_method in self.channel_buckets.keys():
+                self.channel_buckets[api_method].get(self._get_channel(name, args, kwargs)).acquire()
+            else:
+                self.buckets[api_method].acquire()
+        record_slack_wait(time.perf_counter() - wait_start)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except SlackApiError as e:
+                retry_after = self._get_retry_after(e)
+                self._record(name, time.perf_counter() - start, is_error=True,
+                             is_rate_limited=retry_after is not None)
+                if retry_after is None or attempt >= self.max_retries or retry_after > self.max_retry_wait_s:
+                    raise
+                attempt += 1
+                self.log.warning(f'{name} was rate limited. Retrying in {retry_after}s '
+                                 f'(attempt {attempt}/{self.max_retries})')
+                time.sleep(retry_after)
+                continue
+            except Exception:
+                self._record(name, time.perf_counter() - start, is_error=True)
+                raise
+            self._record(name, time.perf_counter() - start)
+            return result
+
+    def post_response_url(self, url: str, payload: Dict, timeout: float = 10) -> Optional[requests.Response]:
+        """Posts to an interaction's response_url (e.g., to replace or delete the original message)"""
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(url, json=payload, headers={'Content-Type': 'application/json'},
+                                     timeout=timeout)
+        except requests.RequestException as e:
+            self._record('response_url', time.perf_counter() - start, is_error=True)
+            self.log.error(f'Failed to post to response url: {e}')
+            return None
+        self._record('response_url', time.perf_counter() - start, is_error=resp.status_code >= 400,
+                     is_rate_limited=resp.status_code == 429)
+        return resp
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Call counts, errors & latency (ms) per wrapped method"""
+        with self._stats_lock:
+            return {k: v.asdict() for k, v in sorted(self._stats.items())}
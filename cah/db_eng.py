@@ -1,15 +1,33 @@
+from contextlib import contextmanager
+from contextvars import (
+    ContextVar,
+    Token,
+)
+from random import random
+import threading
+import time
 import traceback
 from typing import (
     Any,
+    Callable,
     Dict,
+    Iterator,
     List,
     Optional,
+    Tuple,
+    TypeVar,
     Union,
 )
 
 from loguru import logger
 from slacktools.db_engine import PSQLClient
-from sqlalchemy.orm import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import (
+    Session,
+    sessionmaker,
+)
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 from cah.model import (
@@ -20,50 +38,300 @@ from cah.model import (
     TableSetting,
 )
 
+SettingValType = Optional[Union[int, bool, str]]
+# The raw (setting_int, setting_str) pair as stored in the db
+RawSettingType = Tuple[Optional[int], Optional[str]]
+T = TypeVar('T')
+
+# Postgres error codes for transactions that can simply be run again: serialization_failure, deadlock_detected
+RETRYABLE_PGCODES = ('40001', '40P01')
+# Where a unit of work's session keeps the callbacks to run if it's rolled back
+UNIT_ROLLBACK_CALLBACKS_KEY = 'cah_on_rollback'
+# Seconds to wait before the first retry of a failed transaction. This doubles (plus jitter) with each retry.
+RETRY_BACKOFF_S = 0.05
+
 
 class WizzyPSQLClient(PSQLClient):
     """Creates Postgres connection engine"""
 
-    def __init__(self, props: Dict, **kwargs):
+    def __init__(self, props: Dict, settings_ttl_s: float = 60, engine_kwargs: Dict = None,
+                 is_read_committed_reads: bool = False, serialization_retries: int = 0, engine: Engine = None,
+                 **kwargs):
+        """
+        Args:
+            props: db connection properties
+            settings_ttl_s: seconds before the cached settings are reloaded from the db, so changes
+                made by another worker are eventually picked up. If <= 0, settings are reloaded on every call
+            engine_kwargs: if provided, the engine is rebuilt with these `create_engine` arguments
+                (e.g., pool size & recycling, isolation level, statement timeout)
+            is_read_committed_reads: if True, sessions from `read_session_mgr` use READ COMMITTED
+            serialization_retries: times `run_in_transaction` reruns a transaction that hit a
+                serialization failure or deadlock
+            engine: if provided, used in place of the engine built from props (e.g., a local stand-in db)
+        """
         _ = kwargs
         super().__init__(props=props)
+        if engine is not None:
+            self.engine.dispose()
+            self.engine = engine
+        elif engine_kwargs is not None:
+            # Swap the default engine for one that's pooled as configured
+            url = self.engine.url
+            self.engine.dispose()
+            self.engine = create_engine(url, **engine_kwargs)
+        self.is_read_committed_reads = is_read_committed_reads
+        self.serialization_retries = serialization_retries
+        # Built on first use
+        self._session_factory = None  # type: Optional[sessionmaker]
+        self._read_session_factory = None  # type: Optional[sessionmaker]
+        # The session shared by everything in the current unit of work (e.g., a Slack request), if one is underway
+        self._uow_session = ContextVar(f'uow_session_{id(self)}', default=None)  # type: ContextVar[Optional[Session]]
+        self._settings_lock = threading.RLock()
+        self.settings_ttl_s = settings_ttl_s
+        self._settings_cache = None  # type: Optional[Dict[SettingType, RawSettingType]]
+        self._settings_loaded_at = 0.0
+
+    @staticmethod
+    @contextmanager
+    def _session_scope(factory: sessionmaker) -> Iterator[Session]:
+        session = factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    @classmethod
+    @contextmanager
+    def _joined_scope(cls, session: Session) -> Iterator[Session]:
+        try:
+            yield session
+            # Send this block's changes so the rest of the unit of work sees them
+            session.flush()
+        except Exception:
+            # Undo the whole unit of work so a half-finished interaction isn't committed
+            cls._rollback_unit(session)
+            raise
+
+    @staticmethod
+    def _rollback_unit(session: Session):
+        """Rolls back the unit of work's session, then lets whatever handed changes to it take them back"""
+        session.rollback()
+        for callback in session.info.pop(UNIT_ROLLBACK_CALLBACKS_KEY, []):
+            try:
+                callback()
+            except Exception as e:
+                logger.exception(f'Rollback callback failed: {e}')
+
+    def _get_session_factory(self) -> sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = sessionmaker(bind=self.engine)
+        return self._session_factory
+
+    @property
+    def is_in_unit_of_work(self) -> bool:
+        return self._uow_session.get() is not None
+
+    def session_mgr(self) -> Iterator[Session]:
+        """Provides a session from the pool, committed on exit and rolled back on error.
+        Inside a unit of work, the unit's session is provided instead and only flushed on exit."""
+        uow_session = self._uow_session.get()
+        if uow_session is not None:
+            return self._joined_scope(uow_session)
+        return self._session_scope(self._get_session_factory())
+
+    def read_session_mgr(self) -> Iterator[Session]:
+        """Provides a session for read-only queries (e.g., stats & scores).
 
-    def get_setting(self, setting: SettingType) -> Optional[Union[int, bool, str]]:
+        With READ COMMITTED enabled, these reads see the latest committed data instead of
+        taking part in the serializable checks the game's writes go through.
+        """
+        if not self.is_read_committed_reads or self.is_in_unit_of_work:
+            return self.session_mgr()
+        if self._read_session_factory is None:
+            self._read_session_factory = sessionmaker(
+                bind=self.engine.execution_options(isolation_level='READ COMMITTED'))
+        return self._session_scope(self._read_session_factory)
+
+    @staticmethod
+    def _is_retryable(e: DBAPIError) -> bool:
+        return getattr(e.orig, 'pgcode', None) in RETRYABLE_PGCODES
+
+    def run_in_transaction(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Runs func(session, *args, **kwargs) in one transaction, running it again if Postgres aborts it
+        due to a serialization failure or deadlock. As func may be called more than once,
+        it shouldn't have side effects outside of the session.
+
+        Inside a unit of work, func runs once in the unit's session; a failure there aborts the whole unit.
+        """
+        def _run() -> T:
+            with self.session_mgr() as session:
+                return func(session, *args, **kwargs)
+
+        if self.is_in_unit_of_work:
+            return _run()
+        return self._run_with_retries(_run)
+
+    def _run_with_retries(self, func: Callable[[], T]) -> T:
+        """Runs func, running it again if Postgres aborts its transaction due to a serialization failure or deadlock"""
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except DBAPIError as e:
+                if not self._is_retryable(e) or attempt >= self.serialization_retries:
+                    raise
+                attempt += 1
+                wait_s = RETRY_BACKOFF_S * 2 ** (attempt - 1) * (1 + random())
+                logger.warning(f'Transaction failed with {e.orig.pgcode}. Retry {attempt} of '
+                               f'{self.serialization_retries} in {wait_s:.2f}s')
+                time.sleep(wait_s)
+
+    def begin_unit_of_work(self) -> Token:
+        """Starts a unit of work in the current context. Until it's ended, every `session_mgr` block
+        in this context shares one session, and nothing is committed until `end_unit_of_work`.
+
+        Threads started from here don't inherit the unit, so they keep using their own sessions.
+
+        Returns:
+            the token to pass to `end_unit_of_work`
+        """
+        if self.is_in_unit_of_work:
+            raise RuntimeError('A unit of work is already underway in this context')
+        return self._uow_session.set(self._get_session_factory()())
+
+    def end_unit_of_work(self, token: Token, error: BaseException = None):
+        """Ends the unit of work, committing its changes or, if it ended with an error, rolling them back"""
+        session = self._uow_session.get()
+        self._uow_session.reset(token)
+        try:
+            if error is None:
+                session.commit()
+                session.info.pop(UNIT_ROLLBACK_CALLBACKS_KEY, None)
+            else:
+                self._rollback_unit(session)
+        except Exception:
+            # E.g., a serialization failure on commit
+            self._rollback_unit(session)
+            raise
+        finally:
+            session.close()
+
+    def on_unit_rollback(self, callback: Callable[[], None]) -> bool:
+        """Has the callback run if the current unit of work is rolled back, incl. when its commit fails
+        (e.g., to put back pending changes that were handed to the unit & cleared)
+
+        Returns:
+            False if there's no unit of work underway (the callback isn't kept)
+        """
+        session = self._uow_session.get()
+        if session is None:
+            return False
+        session.info.setdefault(UNIT_ROLLBACK_CALLBACKS_KEY, []).append(callback)
+        return True
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[None]:
+        """Runs the block as one unit of work. If one is already underway, the block joins it."""
+        if self.is_in_unit_of_work:
+            yield
+            return
+        token = self.begin_unit_of_work()
+        try:
+            yield
+        except BaseException as e:
+            self.end_unit_of_work(token, error=e)
+            raise
+        self.end_unit_of_work(token)
+
+    def run_in_unit_of_work(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Runs func(*args, **kwargs) as one unit of work. If Postgres aborts the unit due to a serialization failure
+        or deadlock (incl. on its commit), the whole unit is run again, so func is repeated along with
+        any side effects it has outside of the db (e.g., Slack messages).
+
+        If a unit of work is already underway, func joins it & isn't retried on its own.
+        """
+        def _run() -> T:
+            with self.unit_of_work():
+                return func(*args, **kwargs)
+
+        if self.is_in_unit_of_work:
+            return _run()
+        return self._run_with_retries(_run)
+
+    @staticmethod
+    def _convert_setting(setting: SettingType, setting_int: Optional[int], setting_str: Optional[str]) -> \
+            SettingValType:
+        """Converts the stored setting to its intended type"""
+        if setting.name.startswith('IS_'):
+            # Boolean
+            return setting_int == 1
+        if setting_int is None:
+            # Return the string if the integer is None
+            return setting_str
+        return setting_int
+
+    def load_settings(self) -> Dict[SettingType, RawSettingType]:
+        """Reads all settings from the db into the cache"""
+        logger.debug('Loading all settings into cache')
+        with self.session_mgr() as session:
+            results = session.query(TableSetting).all()
+            settings = {x.setting_type: (x.setting_int, x.setting_str) for x in results}
+        with self._settings_lock:
+            self._settings_cache = settings
+            self._settings_loaded_at = time.monotonic()
+        return settings
+
+    def invalidate_settings(self):
+        """Drops the cached settings, forcing a reload on the next lookup"""
+        logger.debug('Invalidating settings cache')
+        with self._settings_lock:
+            self._settings_cache = None
+
+    def get_setting(self, setting: SettingType) -> SettingValType:
         """Attempts to return a given setting"""
         logger.debug(f'Received request for setting: {setting.name}')
-        with self.session_mgr() as session:
-            result: TableSetting
-            result = session.query(TableSetting).filter(TableSetting.setting_type == setting).one_or_none()
-            if result is None:
-                logger.debug('Setting was None.')
-                return result
-
-            if setting.name.startswith('IS_'):
-                # Boolean
-                logger.debug(f'Returning: {result.setting_int == 1}')
-                return result.setting_int == 1
-            if result.setting_int is None:
-                # Return the string if the integer is None
-                logger.debug(f'Returning str: {result.setting_str}')
-                return result.setting_str
-            logger.debug(f'Returning int: {result.setting_int}')
-            return result.setting_int
+        with self._settings_lock:
+            settings = self._settings_cache
+            if settings is None or time.monotonic() - self._settings_loaded_at > self.settings_ttl_s:
+                settings = self.load_settings()
+        if setting not in settings.keys():
+            logger.debug('Setting was None.')
+            return None
+        return self._convert_setting(setting, *settings[setting])
 
     def set_setting(self, setting: SettingType, setting_val: Union[int, bool, str]):
         """Attempts to set a given setting"""
         logger.debug(f'Received request to set setting: {setting.name} to {setting_val}')
-        with self.session_mgr() as session:
-            # Settings are more likely to be integer
-            setting_attr = TableSetting.setting_int
-            if isinstance(setting_val, bool):
-                setting_val = int(setting_val)
-            elif isinstance(setting_val, str):
-                # Set the attribute to change to a string instead of an integer
-                setting_attr = TableSetting.setting_str
+        # Settings are more likely to be integer
+        setting_attr = TableSetting.setting_int
+        if isinstance(setting_val, bool):
+            setting_val = int(setting_val)
+        elif isinstance(setting_val, str):
+            # Set the attribute to change to a string instead of an integer
+            setting_attr = TableSetting.setting_str
+
+        def _set_setting(session: Session):
             session.query(TableSetting).filter(TableSetting.setting_type == setting).update(
                 {setting_attr: setting_val}
             )
 
+        self.run_in_transaction(_set_setting)
+        with self._settings_lock:
+            if self._settings_cache is None or setting not in self._settings_cache.keys():
+                # Nothing cached, or no row exists for this setting (so nothing was updated)
+                return
+            # Write through to the cache
+            setting_int, setting_str = self._settings_cache[setting]
+            if setting_attr is TableSetting.setting_str:
+                setting_str = setting_val
+            else:
+                setting_int = setting_val
+            self._settings_cache[setting] = (setting_int, setting_str)
+
     def get_player_from_hash(self, user_hash: str) -> Optional[TablePlayer]:
         """Takes in a slack user hash, outputs the expunged object, if any"""
         return self._get_player_from(TablePlayer.slack_user_hash, user_hash)
@@ -95,13 +363,16 @@ class WizzyPSQLClient(PSQLClient):
     def set_active_players(self, player_hashes: List[str]):
         """Retrieves a list of active players, sets them as active and anyone not in that list as inactive"""
         logger.debug(f'Received request to set {len(player_hashes)} players as active.')
-        with self.session_mgr() as session:
+
+        def _set_active_players(session: Session):
             players = session.query(TablePlayer).all()
             player: TablePlayer
             for player in players:
                 player.is_active = player.slack_user_hash in player_hashes
             session.add_all(players)
 
+        self.run_in_transaction(_set_active_players)
+
     def refresh_table_object(self, tbl_obj, session: Session = None):
         """Refreshes a table object by adding it to the session, committing and refreshing it before
         removing it from the session"""
@@ -109,8 +380,11 @@ class WizzyPSQLClient(PSQLClient):
         def _refresh(sess: Session, tbl) -> Any:
             # Bind to session
             sess.add(tbl)
-            # Prime, pull down changes
-            sess.commit()
+            # Prime, pull down changes. A unit of work only commits when it ends.
+            if sess is self._uow_session.get():
+                sess.flush()
+            else:
+                sess.commit()
             # Populate changes to obj
             sess.refresh(tbl)
             # Remove obj from session
@@ -13,6 +13,10 @@ from sqlalchemy.sql import not_
 
 from cah.core.common_methods import refresh_players_in_channel
 from cah.db_eng import WizzyPSQLClient
+from cah.etl.migrations import (
+    apply_migrations,
+    find_missing_indexes,
+)
 from cah.model import (
     Base,
     RipType,
@@ -25,15 +29,21 @@ from cah.model import (
     TableGameRound,
     TableHonorific,
     TablePlayer,
+    TablePlayerGameScore,
     TablePlayerHand,
+    TablePlayerJudgeScore,
     TablePlayerPick,
     TablePlayerRound,
+    TablePlayerStats,
     TableQuestionCard,
     TableRip,
+    TableSchemaMigration,
     TableSetting,
     TableTask,
     TableTaskParameter,
 )
+from cah.queries.bot_queries import BotQueries
+from cah.queries.game_queries import GameQueries
 from cah.settings import (
     Development,
     Production,
@@ -52,11 +62,15 @@ class ETL:
         TableGameRound,
         TableHonorific,
         TablePlayer,
+        TablePlayerGameScore,
         TablePlayerHand,
+        TablePlayerJudgeScore,
         TablePlayerPick,
         TablePlayerRound,
+        TablePlayerStats,
         TableQuestionCard,
         TableRip,
+        TableSchemaMigration,
         TableSetting,
         TableTask,
         TableTaskParameter
@@ -79,14 +93,16 @@ class ETL:
         self.log.debug(f'Working on tables: {tables} from db...')
         tbl_objs = []
         for table in tables:
-            tbl_objs.append(
-                Base.metadata.tables.get(f'{table.__table_args__.get("schema")}.{table.__tablename__}'))
+            tbl_objs.append(table.__table__)
         if drop_all:
             # We're likely doing a refresh - drop/create operations will be for all object
             self.log.debug(f'Dropping {len(tbl_objs)} listed tables...')
             Base.metadata.drop_all(self.psql_client.engine, tables=tbl_objs)
         self.log.debug(f'Creating {len(tbl_objs)} listed tables...')
         Base.metadata.create_all(self.psql_client.engine, tables=tbl_objs)
+        # Bring any tables that were kept up to date with the models
+        apply_migrations(self.psql_client.engine, log=self.log)
+        find_missing_indexes(self.psql_client.engine, log=self.log)
 
         self.log.debug('Authenticating credentials for services...')
 
@@ -393,6 +409,14 @@ class ETL:
                 TablePlayer.is_active: False
             })
 
+    def etl_player_game_scores(self):
+        """Rebuilds the running game scores from the player_round history"""
+        BotQueries(eng=self.psql_client, log=self.log).rebuild_player_game_scores()
+
+    def etl_player_stats(self):
+        """Rebuilds the players' stats rollups from the finished rounds"""
+        GameQueries(eng=self.psql_client, log=self.log).rebuild_player_stats()
+
     def etl_honorific(self):
 
         honorifics = {
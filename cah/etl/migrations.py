@@ -0,0 +1,223 @@
+"""
+Versioned schema migrations, for bringing an existing db in line with the models. `create_all` only creates
+what's missing entirely, so e.g. indexes added to a table that's already there need a migration.
+
+Migrations are applied in order by the ETL (after its tables are created) and by `create_app` at boot,
+each in its own transaction, and recorded in `schema_migration` so they only run once.
+"""
+from typing import (
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from loguru import logger
+from sqlalchemy import (
+    Index,
+    Table,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import (
+    Connection,
+    Engine,
+)
+from sqlalchemy.exc import (
+    IntegrityError,
+    NoSuchTableError,
+)
+from sqlalchemy.orm import Session
+
+from cah.model import (
+    Base,
+    TableSchemaMigration,
+)
+from cah.queries.bot_queries import BotQueries
+from cah.queries.game_queries import GameQueries
+
+SCHEMA = 'cah'
+
+
+def get_model_table(name: str) -> Table:
+    """Finds a table declared on the models by its name"""
+    return Base.metadata.tables[f'{SCHEMA}.{name}']
+
+
+def get_model_index(name: str) -> Index:
+    """Finds an index declared on the models by its name"""
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            if index.name == name:
+                return index
+    raise KeyError(f'No index named {name} is declared on the models')
+
+
+def add_model_column(conn: Connection, table_name: str, column_name: str):
+    """Adds a column declared on the models to its table, if it's not there already"""
+    table = get_model_table(table_name)
+    column = table.c[column_name]
+    if column_name in [x['name'] for x in inspect(conn).get_columns(table_name, schema=SCHEMA)]:
+        return
+    preparer = conn.dialect.identifier_preparer
+    conn.execute(text(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(column.name)} '
+                      f'{column.type.compile(dialect=conn.dialect)}'))
+
+
+class Migration:
+    """A versioned change to the schema
+
+    Args:
+        version: the order in which migrations are applied. Never reuse or renumber one that's been released.
+        name: a short description of the change
+        new_tables: tables declared on the models to create (if they don't exist already)
+        new_columns: (table, column) pairs of nullable columns declared on the models to add to existing tables
+        index_names: indexes declared on the models to create (if they don't exist already)
+        fill_func: optional callable that takes a session & fills in the new tables or columns (e.g., from history)
+    """
+
+    def __init__(self, version: int, name: str, new_tables: Sequence[str] = (),
+                 new_columns: Sequence[Tuple[str, str]] = (), index_names: Sequence[str] = (),
+                 fill_func: Optional[Callable[[Session], object]] = None):
+        self.version = version
+        self.name = name
+        self.new_tables = list(new_tables)
+        self.new_columns = list(new_columns)
+        self.index_names = list(index_names)
+        self.fill_func = fill_func
+
+    def apply(self, conn: Connection):
+        for table_name in self.new_tables:
+            get_model_table(table_name).create(conn, checkfirst=True)
+        for table_name, column_name in self.new_columns:
+            add_model_column(conn, table_name=table_name, column_name=column_name)
+        for index_name in self.index_names:
+            get_model_index(index_name).create(conn, checkfirst=True)
+        if self.fill_func is not None:
+            # Joins the migration's transaction, so the fill is applied (or not) along with the rest of it
+            with Session(bind=conn) as session:
+                self.fill_func(session)
+                session.flush()
+
+    def __repr__(self) -> str:
+        return f'<Migration(version={self.version}, name={self.name})>'
+
+
+MIGRATIONS = [
+    Migration(2, 'Running per-player game scores', new_tables=['player_game_score'],
+              fill_func=BotQueries.build_player_game_scores),
+    Migration(3, 'Player stats rollups', new_tables=['player_stats', 'player_judge_score'],
+              fill_func=GameQueries.build_player_stats),
+    Migration(4, 'Indexes for hot lookup columns', index_names=[
+        'ix_game_round_game',
+        'ix_player_choice_order',
+        'ix_player_game_score_game',
+        'ix_player_hand_player',
+        'ix_player_pick_game_round_player',
+        'ix_player_round_game_round_player',
+        'ix_player_round_player',
+    ]),
+    Migration(5, 'Channel & judge order of each game', new_columns=[
+        ('game', 'channel_id'),
+        ('game', 'judge_order'),
+    ]),
+]  # type: List[Migration]
+
+
+class HotQuery:
+    """Columns that a frequently run query filters a table on (by equality)"""
+
+    def __init__(self, table: str, columns: Sequence[str], desc: str):
+        self.table = table
+        self.columns = tuple(columns)
+        self.desc = desc
+
+    def is_covered_by(self, index_columns: Sequence[str]) -> bool:
+        """An index serves the query if its leading columns are the ones filtered on (in any order)"""
+        n_cols = len(self.columns)
+        return len(index_columns) >= n_cols and set(index_columns[:n_cols]) == set(self.columns)
+
+    def __repr__(self) -> str:
+        return f'<HotQuery({self.table}({", ".join(self.columns)}): {self.desc})>'
+
+
+HOT_QUERIES = [
+    HotQuery('game_round', ['game_key'], 'rounds of a game (deck refreshes, round numbers)'),
+    HotQuery('player', ['slack_user_hash'], 'player lookups by Slack user'),
+    HotQuery('player', ['choice_order'], 'the judge\'s choice'),
+    HotQuery('player_game_score', ['game_key'], 'scoreboards'),
+    HotQuery('player_hand', ['player_key'], 'a player\'s hand'),
+    HotQuery('player_pick', ['game_round_key'], 'the round\'s picks'),
+    HotQuery('player_pick', ['game_round_key', 'player_key'], 'a player\'s picks'),
+    HotQuery('player_round', ['game_key', 'game_round_key', 'player_key'], 'a player\'s round'),
+    HotQuery('player_round', ['player_key'], 'a player\'s history (stats rollups)'),
+]  # type: List[HotQuery]
+
+
+def get_applied_versions(conn: Connection) -> Set[int]:
+    return set(conn.execute(select(TableSchemaMigration.version)).scalars().all())
+
+
+def apply_migrations(engine: Engine, migrations: Iterable[Migration] = None, log=None) -> List[int]:
+    """Applies the migrations that haven't been yet, in order
+
+    Returns:
+        the versions applied
+    """
+    log = logger if log is None else log
+    migrations = MIGRATIONS if migrations is None else migrations
+    TableSchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = get_applied_versions(conn)
+    newly_applied = []
+    for migration in sorted(migrations, key=lambda x: x.version):
+        if migration.version in applied:
+            continue
+        log.info(f'Applying schema migration {migration.version}: {migration.name}')
+        try:
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(TableSchemaMigration.__table__.insert().values(version=migration.version,
+                                                                            name=migration.name))
+        except IntegrityError:
+            # Another worker booting alongside this one got there first
+            log.info(f'Schema migration {migration.version} was already applied elsewhere')
+            continue
+        newly_applied.append(migration.version)
+    return newly_applied
+
+
+def get_index_columns(engine: Engine, table: str) -> List[List[str]]:
+    """Collects the columns of each index on the table, incl. the ones behind the primary key & unique constraints"""
+    insp = inspect(engine)
+    try:
+        indexes = [x['column_names'] for x in insp.get_indexes(table, schema=SCHEMA)]
+        indexes += [x['column_names'] for x in insp.get_unique_constraints(table, schema=SCHEMA)]
+        pk_cols = insp.get_pk_constraint(table, schema=SCHEMA).get('constrained_columns')
+    except NoSuchTableError:
+        return []
+    if pk_cols:
+        indexes.append(pk_cols)
+    return indexes
+
+
+def find_missing_indexes(engine: Engine, hot_queries: Iterable[HotQuery] = None,
+                         log=None) -> List[HotQuery]:
+    """Checks the db for an index serving each of the hot queries, logging & returning the ones without one"""
+    hot_queries = HOT_QUERIES if hot_queries is None else hot_queries
+    index_columns = {}
+    missing = []
+    for hot_query in hot_queries:
+        if hot_query.table not in index_columns:
+            index_columns[hot_query.table] = get_index_columns(engine, table=hot_query.table)
+        if not any(hot_query.is_covered_by(cols) for cols in index_columns[hot_query.table]):
+            missing.append(hot_query)
+    if log is not None:
+        for hot_query in missing:
+            log.warning(f'No index on {SCHEMA}.{hot_query.table}({", ".join(hot_query.columns)}) '
+                        f'for {hot_query.desc}')
+    return missing
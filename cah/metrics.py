@@ -0,0 +1,256 @@
+"""
+Request metrics, served in Prometheus' text format at /metrics.
+
+Each interaction (an HTTP request, or the processing of a queued Slack event or action) is timed along with
+the SQL statements & Slack calls made while it ran, so it's clear which ones are DB-bound and which are Slack-bound.
+Statements & calls are attributed to the interaction running in the current context.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import (
+    ContextVar,
+    Token,
+)
+import threading
+import time
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Statements or calls per interaction
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _format_value(value: float) -> str:
+    return '+Inf' if value == float('inf') else f'{value}'
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = None) -> str:
+    escaped = [str(x).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for x in label_values]
+    pairs = [f'{k}="{v}"' for k, v in zip(label_names, escaped)]
+    if extra is not None:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if len(pairs) > 0 else ''
+
+
+class Counter:
+    """A running total per set of label values"""
+    type_name = 'counter'
+
+    def __init__(self, name: str, doc: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}  # type: Dict[Tuple[str, ...], float]
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(x, '')) for x in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        key = tuple(str(labels.get(x, '')) for x in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}' for k, v in values]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per set of label values"""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, doc: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'), )
+        self._lock = threading.Lock()
+        # label values -> (count per bucket, sum, count)
+        self._values = {}  # type: Dict[Tuple[str, ...], List]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(x, '')) for x in self.label_names)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, n = self._values.get(key, ([0] * len(self.buckets), 0, 0))
+            counts[idx] += 1
+            self._values[key] = [counts, total + value, n + 1]
+
+    def get_count(self, **labels) -> int:
+        key = tuple(str(labels.get(x, '')) for x in self.label_names)
+        with self._lock:
+            return self._values.get(key, [None, 0, 0])[2]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, n) in values:
+            cumulative = 0
+            for upper, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, extra=f'le="{_format_value(upper)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.label_names, key)} {n}')
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the metrics to be rendered together"""
+
+    def __init__(self):
+        self.metrics = []  # type: List
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += [f'# HELP {metric.name} {metric.doc}', f'# TYPE {metric.name} {metric.type_name}']
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+INTERACTION_LABELS = ('route', 'action_id')
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'cah_request_duration_seconds', 'Time taken by each interaction', INTERACTION_LABELS))
+REQUEST_DB_STATEMENTS = REGISTRY.register(Histogram(
+    'cah_request_db_statements', 'SQL statements run per interaction', INTERACTION_LABELS, buckets=COUNT_BUCKETS))
+REQUEST_DB_SECONDS = REGISTRY.register(Histogram(
+    'cah_request_db_seconds', 'Time spent running SQL statements per interaction', INTERACTION_LABELS))
+REQUEST_SLACK_CALLS = REGISTRY.register(Histogram(
+    'cah_request_slack_calls', 'Slack calls made per interaction', INTERACTION_LABELS, buckets=COUNT_BUCKETS))
+REQUEST_SLACK_SECONDS = REGISTRY.register(Histogram(
+    'cah_request_slack_seconds', 'Time spent on Slack calls per interaction (excl. rate limit waits)',
+    INTERACTION_LABELS))
+REQUEST_SLACK_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'cah_request_slack_wait_seconds', 'Time spent waiting on Slack rate limits per interaction',
+    INTERACTION_LABELS))
+DB_STATEMENTS = REGISTRY.register(Counter('cah_db_statements_total', 'SQL statements run'))
+SLACK_CALLS = REGISTRY.register(Counter('cah_slack_calls_total', 'Slack calls made', ('method', 'is_error')))
+
+
+class InteractionMetrics:
+    """Counts for the interaction in progress"""
+
+    def __init__(self, route: str, action_id: str = ''):
+        self.route = route
+        self.action_id = action_id
+        self.start = time.perf_counter()
+        self.n_db_statements = 0
+        self.db_s = 0.0
+        self.n_slack_calls = 0
+        self.slack_s = 0.0
+        self.slack_wait_s = 0.0
+
+
+_current = ContextVar('cah_interaction', default=None)  # type: ContextVar[Optional[InteractionMetrics]]
+
+
+def current_interaction() -> Optional[InteractionMetrics]:
+    return _current.get()
+
+
+def begin_interaction(route: str, action_id: str = '') -> Token:
+    return _current.set(InteractionMetrics(route=route, action_id=action_id))
+
+
+def end_interaction(token: Token, route: str = None, action_id: str = None) -> Optional[InteractionMetrics]:
+    """Observes the interaction's metrics
+
+    Args:
+        route, action_id: if provided, replace the labels it was begun with (e.g., once they're known)
+    """
+    interaction = _current.get()
+    _current.reset(token)
+    if interaction is None:
+        return None
+    if route is not None:
+        interaction.route = route
+    if action_id is not None:
+        interaction.action_id = action_id
+    labels = {'route': interaction.route, 'action_id': interaction.action_id or ''}
+    REQUEST_SECONDS.observe(time.perf_counter() - interaction.start, **labels)
+    REQUEST_DB_STATEMENTS.observe(interaction.n_db_statements, **labels)
+    REQUEST_DB_SECONDS.observe(interaction.db_s, **labels)
+    REQUEST_SLACK_CALLS.observe(interaction.n_slack_calls, **labels)
+    REQUEST_SLACK_SECONDS.observe(interaction.slack_s, **labels)
+    REQUEST_SLACK_WAIT_SECONDS.observe(interaction.slack_wait_s, **labels)
+    return interaction
+
+
+@contextmanager
+def track_interaction(route: str, action_id: str = '') -> Iterator[InteractionMetrics]:
+    token = begin_interaction(route=route, action_id=action_id)
+    try:
+        yield _current.get()
+    finally:
+        end_interaction(token)
+
+
+def record_db_statement(elapsed_s: float):
+    DB_STATEMENTS.inc()
+    interaction = _current.get()
+    if interaction is not None:
+        interaction.n_db_statements += 1
+        interaction.db_s += elapsed_s
+
+
+def record_slack_call(method: str, elapsed_s: float, is_error: bool = False):
+    SLACK_CALLS.inc(method=method, is_error=str(is_error).lower())
+    interaction = _current.get()
+    if interaction is not None:
+        interaction.n_slack_calls += 1
+        interaction.slack_s += elapsed_s
+
+
+def record_slack_wait(wait_s: float):
+    interaction = _current.get()
+    if interaction is not None:
+        interaction.slack_wait_s += wait_s
+
+
+def _before_cursor_execute(conn, *args):
+    conn.info.setdefault('cah_statement_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, *args):
+    starts = conn.info.get('cah_statement_start')
+    if not starts:
+        return
+    record_db_statement(time.perf_counter() - starts.pop())
+
+
+def _on_statement_error(context):
+    # Statements that fail don't get to after_cursor_execute
+    if context.connection is not None:
+        _after_cursor_execute(context.connection)
+
+
+def instrument_engine(engine: Engine):
+    """Has the engine's statements counted & timed"""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _on_statement_error)
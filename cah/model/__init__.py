@@ -17,11 +17,15 @@ from .game import (
     GameStatus,
     TableGame,
     TableGameRound,
+    TablePlayerGameScore,
     TablePlayerRound,
 )
+from .migration import TableSchemaMigration
 from .player import (
     TableHonorific,
     TablePlayer,
+    TablePlayerJudgeScore,
+    TablePlayerStats,
 )
 from .rips import (
     RipType,
@@ -3,6 +3,7 @@ from sqlalchemy import (
     Boolean,
     Column,
     ForeignKey,
+    Index,
     Integer,
     Text,
 )
@@ -53,6 +54,10 @@ class TableQuestionCard(Base):
 
 class TablePlayerHand(Base):
     """player's hand table - This represents the player's current hand"""
+    __table_args__ = (
+        Index('ix_player_hand_player', 'player_key'),
+        {'schema': 'cah'}
+    )
 
     hand_id = Column(Integer, primary_key=True, autoincrement=True)
     card_pos = Column(Integer, nullable=False)
@@ -76,6 +81,10 @@ class TablePlayerPick(Base):
     Attributes:
         card_order: the order in which the card goes (when picking multiple)
     """
+    __table_args__ = (
+        Index('ix_player_pick_game_round_player', 'game_round_key', 'player_key'),
+        {'schema': 'cah'}
+    )
 
     pick_id = Column(Integer, primary_key=True, autoincrement=True)
     game_round_key = Column(Integer, ForeignKey('cah.game_round.game_round_id'), nullable=False)
@@ -9,7 +9,9 @@ from sqlalchemy import (
     Column,
     Enum,
     ForeignKey,
+    Index,
     Integer,
+    UniqueConstraint,
 )
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
@@ -35,6 +37,8 @@ class TableGame(Base):
     game_id = Column(Integer, primary_key=True, autoincrement=True)
     deck_combo = Column(VARCHAR(500), nullable=False)
     status = Column(Enum(GameStatus), nullable=False)
+    channel_id = Column(VARCHAR(50), nullable=True)
+    judge_order = Column(VARCHAR(1000), nullable=True)
     rounds = relationship('TableGameRound', back_populates='game')
     start_time = Column(TIMESTAMP, server_default=func.now(), nullable=False)
     last_update = Column(TIMESTAMP, onupdate=func.now(), server_default=func.now())
@@ -44,9 +48,11 @@ class TableGame(Base):
     def duration(self):
         return self.end_time - self.start_time if self.end_time is not None else self.last_update - self.start_time
 
-    def __init__(self, deck_combo: List[str], status: GameStatus, game_id: int = None, end_time: datetime = None):
+    def __init__(self, deck_combo: List[str], status: GameStatus, game_id: int = None, end_time: datetime = None,
+                 channel_id: str = None):
         self.deck_combo = ','.join(deck_combo)
         self.status = status
+        self.channel_id = channel_id
         if game_id is not None:
             self.game_id = game_id
         if end_time is not None:
@@ -58,6 +64,10 @@ class TableGame(Base):
 
 class TableGameRound(Base):
     """game_round table - stores past game round info"""
+    __table_args__ = (
+        Index('ix_game_round_game', 'game_key'),
+        {'schema': 'cah'}
+    )
 
     game_round_id = Column(Integer, primary_key=True, autoincrement=True)
     game_key = Column(Integer, ForeignKey('cah.game.game_id'), nullable=False)
@@ -84,6 +94,11 @@ class TableGameRound(Base):
 
 class TablePlayerRound(Base):
     """player-level game info"""
+    __table_args__ = (
+        Index('ix_player_round_game_round_player', 'game_key', 'game_round_key', 'player_key'),
+        Index('ix_player_round_player', 'player_key'),
+        {'schema': 'cah'}
+    )
 
     player_round_id = Column(Integer, primary_key=True, autoincrement=True)
     player_key = Column(Integer, ForeignKey('cah.player.player_id'), nullable=False)
@@ -108,3 +123,40 @@ class TablePlayerRound(Base):
     def __repr__(self) -> str:
         return f'<TablePlayerRound(id={self.player_round_id}, game_key={self.game_key}, ' \
                f'score={self.score})>'
+
+
+class TablePlayerGameScore(Base):
+    """Running score for a player in a game, kept up to date as points are awarded
+    so scoreboards don't need to sum the whole player_round table"""
+    __table_args__ = (
+        UniqueConstraint('player_key', 'game_key'),
+        Index('ix_player_game_score_game', 'game_key'),
+        {'schema': 'cah'}
+    )
+
+    player_game_score_id = Column(Integer, primary_key=True, autoincrement=True)
+    player_key = Column(Integer, ForeignKey('cah.player.player_id'), nullable=False, index=True)
+    game_key = Column(Integer, ForeignKey('cah.game.game_id'), nullable=False)
+    score = Column(Integer, default=0, nullable=False)
+    # Score before the points from the last round the player scored in
+    prev_score = Column(Integer, default=0, nullable=False)
+    last_scored_round_key = Column(Integer, ForeignKey('cah.game_round.game_round_id'), nullable=True)
+
+    def __init__(self, player_key: int, game_key: int, score: int = 0, prev_score: int = 0,
+                 last_scored_round_key: int = None):
+        self.player_key = player_key
+        self.game_key = game_key
+        self.score = score
+        self.prev_score = prev_score
+        self.last_scored_round_key = last_scored_round_key
+
+    def add_points(self, points: int, game_round_key: int):
+        """Adds points scored in the round, remembering the score before the round if it's a new one"""
+        if self.last_scored_round_key != game_round_key:
+            self.prev_score = self.score
+            self.last_scored_round_key = game_round_key
+        self.score += points
+
+    def __repr__(self) -> str:
+        return f'<TablePlayerGameScore(player_key={self.player_key}, game_key={self.game_key}, ' \
+               f'score={self.score})>'
@@ -0,0 +1,25 @@
+from sqlalchemy import (
+    TIMESTAMP,
+    VARCHAR,
+    Column,
+    Integer,
+)
+from sqlalchemy.sql import func
+
+# local imports
+from cah.model.base import Base
+
+
+class TableSchemaMigration(Base):
+    """schema_migration table - the schema migrations that have been applied to the db"""
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(VARCHAR(150), nullable=False)
+    applied_date = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    def __init__(self, version: int, name: str):
+        self.version = version
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f'<TableSchemaMigration(version={self.version}, name={self.name})>'
@@ -1,9 +1,17 @@
-from typing import Tuple
+from datetime import timedelta
+from typing import (
+    List,
+    Optional,
+    Tuple,
+)
 
 from sqlalchemy import (
     VARCHAR,
     Boolean,
     Column,
+    Float,
+    ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.ext.hybrid import hybrid_property
@@ -15,6 +23,10 @@ from cah.model.base import Base
 
 class TablePlayer(Base):
     """player table"""
+    __table_args__ = (
+        Index('ix_player_choice_order', 'choice_order'),
+        {'schema': 'cah'}
+    )
 
     player_id = Column(Integer, primary_key=True, autoincrement=True)
     slack_user_hash = Column(VARCHAR(50), nullable=False, unique=True)
@@ -64,3 +76,87 @@ class TableHonorific(Base):
     def __repr__(self) -> str:
         return f'<TableHonorific(id={self.honorific_id}, ' \
                f'score_range=({self.score_lower_lim},{self.score_upper_lim}), text={self.text})>'
+
+
+class TablePlayerStats(Base):
+    """Running per-player counters behind the player stats command, added to as each round ends"""
+
+    player_stats_id = Column(Integer, primary_key=True, autoincrement=True)
+    player_key = Column(Integer, ForeignKey('cah.player.player_id'), nullable=False, unique=True)
+    total_score = Column(Integer, default=0, nullable=False)
+    n_games_played = Column(Integer, default=0, nullable=False)
+    n_rounds_played = Column(Integer, default=0, nullable=False)
+    n_rounds_won = Column(Integer, default=0, nullable=False)
+    n_decknukes_issued = Column(Integer, default=0, nullable=False)
+    n_decknukes_caught = Column(Integer, default=0, nullable=False)
+    n_picks = Column(Integer, default=0, nullable=False)
+    pick_time_sum_s = Column(Float, default=0, nullable=False)
+    pick_time_min_s = Column(Float, nullable=True)
+    pick_time_max_s = Column(Float, nullable=True)
+    last_scored_round_key = Column(Integer, ForeignKey('cah.game_round.game_round_id'), nullable=True)
+    # The last game & round added, so nothing gets counted twice
+    last_game_key = Column(Integer, ForeignKey('cah.game.game_id'), nullable=True)
+    last_round_key = Column(Integer, ForeignKey('cah.game_round.game_round_id'), nullable=True)
+
+    def __init__(self, player_key: int):
+        self.player_key = player_key
+        self.total_score = 0
+        self.n_games_played = 0
+        self.n_rounds_played = 0
+        self.n_rounds_won = 0
+        self.n_decknukes_issued = 0
+        self.n_decknukes_caught = 0
+        self.n_picks = 0
+        self.pick_time_sum_s = 0
+
+    def has_round(self, game_round_key: int) -> bool:
+        return self.last_round_key is not None and self.last_round_key >= game_round_key
+
+    def add_round(self, game_key: int, game_round_key: int, score: int, is_nuked_hand: bool,
+                  is_nuked_hand_caught: bool, pick_times_s: List[float]):
+        """Adds a finished round to the counters"""
+        if self.last_game_key != game_key:
+            self.n_games_played += 1
+            self.last_game_key = game_key
+        self.last_round_key = game_round_key
+        self.n_rounds_played += 1
+        self.total_score += score
+        if score > 0:
+            self.n_rounds_won += 1
+            self.last_scored_round_key = game_round_key
+        self.n_decknukes_issued += int(is_nuked_hand)
+        self.n_decknukes_caught += int(is_nuked_hand_caught)
+        if len(pick_times_s) > 0:
+            self.n_picks += len(pick_times_s)
+            self.pick_time_sum_s += sum(pick_times_s)
+            fastest, slowest = min(pick_times_s), max(pick_times_s)
+            self.pick_time_min_s = fastest if self.pick_time_min_s is None else min(self.pick_time_min_s, fastest)
+            self.pick_time_max_s = slowest if self.pick_time_max_s is None else max(self.pick_time_max_s, slowest)
+
+    @property
+    def avg_pick_time(self) -> Optional[timedelta]:
+        return timedelta(seconds=self.pick_time_sum_s / self.n_picks) if self.n_picks > 0 else None
+
+    def __repr__(self) -> str:
+        return f'<TablePlayerStats(player_key={self.player_key}, rounds={self.n_rounds_played}, ' \
+               f'won={self.n_rounds_won})>'
+
+
+class TablePlayerJudgeScore(Base):
+    """Points a player has received from each judge, added to as each round ends"""
+
+    player_judge_score_id = Column(Integer, primary_key=True, autoincrement=True)
+    player_key = Column(Integer, ForeignKey('cah.player.player_id'), nullable=False, index=True)
+    judge_key = Column(Integer, ForeignKey('cah.player.player_id'), nullable=False)
+    points_received = Column(Integer, default=0, nullable=False)
+    n_rounds = Column(Integer, default=0, nullable=False)
+
+    def __init__(self, player_key: int, judge_key: int):
+        self.player_key = player_key
+        self.judge_key = judge_key
+        self.points_received = 0
+        self.n_rounds = 0
+
+    def __repr__(self) -> str:
+        return f'<TablePlayerJudgeScore(player_key={self.player_key}, judge_key={self.judge_key}, ' \
+               f'points={self.points_received})>'
@@ -1,16 +1,26 @@
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Tuple,
+)
+
 from loguru import logger
-import pandas as pd
+from sqlalchemy.orm import Session
 from sqlalchemy.sql import (
-    and_,
+    case,
     func,
 )
 
 from cah.db_eng import WizzyPSQLClient
 from cah.model import (
     TablePlayer,
+    TablePlayerGameScore,
     TablePlayerRound,
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class BotQueries:
     """Storing the query methodology here for easier mocking"""
@@ -19,77 +29,88 @@ class BotQueries:
         self.eng = eng
         self.log = log.bind(child_name=self.__class__.__name__)
 
-    def get_overall_score(self, col_name: str = 'overall') -> pd.DataFrame:
-        with self.eng.session_mgr() as session:
+    def get_overall_score(self, col_name: str = 'overall') -> 'pd.DataFrame':
+        import pandas as pd
+
+        with self.eng.read_session_mgr() as session:
             overall = session.query(
                 TablePlayer.player_id,
                 TablePlayer.display_name,
-                func.sum(TablePlayerRound.score).label(col_name)
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(
+                func.sum(TablePlayerGameScore.score).label(col_name)
+            ).join(TablePlayerGameScore, TablePlayerGameScore.player_key == TablePlayer.player_id).filter(
                 TablePlayer.is_active
             ).group_by(TablePlayer.player_id).all()
             return pd.DataFrame(overall)
 
-    def get_score_data_for_display_points(self, game_id: int, game_round_id: int) -> pd.DataFrame:
-        """Gets the details for display_points when a current game is in progress"""
-        with self.eng.session_mgr() as session:
-            prev_round_game_score_subq = (session.query(
-                TablePlayer.player_id,
-                func.sum(TablePlayerRound.score).label('prev')
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(
-                TablePlayerRound.game_key == game_id,
-                TablePlayerRound.game_round_key < game_round_id - 1
-            ).group_by(TablePlayer.player_id).subquery())
+    def get_score_data_for_display_points(self, game_id: int, game_round_id: int) -> 'pd.DataFrame':
+        """Gets the details for display_points when a current game is in progress
 
-            current_round_game_score_subq = (session.query(
-                TablePlayer.player_id,
-                func.sum(TablePlayerRound.score).label('current')
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(
-                TablePlayerRound.game_key == game_id
-            ).group_by(TablePlayer.player_id).subquery())
+        Reads from the running game scores, so this only touches a row per player per game played.
+        'prev' scores are as of before the previous round, so they exclude the points from the round that just ended.
+        """
+        import pandas as pd
 
-            overall_prev_score_subq = (session.query(
-                TablePlayer.player_id,
-                func.sum(TablePlayerRound.score).label('overall_prev')
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(and_(
-                TablePlayer.is_active,
-                TablePlayerRound.game_round_key < game_round_id - 1
-            )).group_by(TablePlayer.player_id).subquery())
+        with self.eng.read_session_mgr() as session:
+            overall_score_subq = (session.query(
+                TablePlayerGameScore.player_key,
+                func.sum(TablePlayerGameScore.score).label('overall')
+            ).group_by(TablePlayerGameScore.player_key).subquery())
 
-            overall_current_score_subq = (session.query(
-                TablePlayer.player_id,
-                func.sum(TablePlayerRound.score).label('overall_current')
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(and_(
-                TablePlayer.is_active
-            )).group_by(TablePlayer.player_id).subquery())
+            game_score_subq = (session.query(TablePlayerGameScore).filter(
+                TablePlayerGameScore.game_key == game_id
+            ).subquery())
+
+            current = func.coalesce(game_score_subq.c.score, 0)
+            prev = func.coalesce(case(
+                (game_score_subq.c.last_scored_round_key >= game_round_id - 1, game_score_subq.c.prev_score),
+                else_=game_score_subq.c.score
+            ), 0)
+            overall = func.coalesce(overall_score_subq.c.overall, 0)
 
             main_query = session.query(
                 TablePlayer.player_id,
                 TablePlayer.display_name,
-                func.coalesce(func.sum(overall_current_score_subq.c.overall_current), 0).label('overall_current'),
-                func.coalesce(func.sum(overall_prev_score_subq.c.overall_prev), 0).label('overall_prev'),
-                func.coalesce(func.sum(current_round_game_score_subq.c.current), 0).label('current'),
-                func.coalesce(func.sum(prev_round_game_score_subq.c.prev), 0).label('prev'),
-            ).outerjoin(
-                overall_current_score_subq, TablePlayer.player_id == overall_current_score_subq.c.player_id
-            ).outerjoin(
-                overall_prev_score_subq, TablePlayer.player_id == overall_prev_score_subq.c.player_id
+                overall.label('overall_current'),
+                (overall - current + prev).label('overall_prev'),
+                current.label('current'),
+                prev.label('prev'),
             ).outerjoin(
-                current_round_game_score_subq, TablePlayer.player_id == current_round_game_score_subq.c.player_id
+                overall_score_subq, TablePlayer.player_id == overall_score_subq.c.player_key
             ).outerjoin(
-                prev_round_game_score_subq, TablePlayer.player_id == prev_round_game_score_subq.c.player_id
-            ).group_by(TablePlayer.player_id, TablePlayer.display_name)
+                game_score_subq, TablePlayer.player_id == game_score_subq.c.player_key
+            ).filter(TablePlayer.is_active)
             return pd.read_sql(main_query.statement, session.bind)
 
-    def get_player_rounds_in_game(self, game_id: int) -> pd.DataFrame:
+    @staticmethod
+    def build_player_game_scores(session: Session) -> int:
+        """Replaces the running game scores with ones built from the full player_round history
+
+        Returns:
+            the number of game scores built
+        """
+        round_scores = session.query(
+            TablePlayerRound.player_key,
+            TablePlayerRound.game_key,
+            TablePlayerRound.game_round_key,
+            func.sum(TablePlayerRound.score).label('score')
+        ).group_by(
+            TablePlayerRound.player_key, TablePlayerRound.game_key, TablePlayerRound.game_round_key
+        ).order_by(TablePlayerRound.game_round_key).all()
+
+        game_scores = {}  # type: Dict[Tuple[int, int], TablePlayerGameScore]
+        for row in round_scores:
+            key = (row.player_key, row.game_key)
+            if key not in game_scores:
+                game_scores[key] = TablePlayerGameScore(player_key=row.player_key, game_key=row.game_key)
+            if row.score != 0:
+                game_scores[key].add_points(row.score, game_round_key=row.game_round_key)
+        session.query(TablePlayerGameScore).delete()
+        session.add_all(game_scores.values())
+        return len(game_scores)
+
+    def rebuild_player_game_scores(self):
+        """Rebuilds the running game scores from the full player_round history
+        (e.g., if they're suspected to have drifted)"""
         with self.eng.session_mgr() as session:
-            all_rounds = session.query(
-                TablePlayer.player_id,
-                TablePlayerRound.game_round_key,
-                TablePlayerRound.is_judge,
-                TablePlayerRound.is_nuked_hand_caught,
-                TablePlayerRound.score
-            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(
-                TablePlayerRound.game_key == game_id
-            ).all()
-            return pd.DataFrame(all_rounds)
+            n_game_scores = self.build_player_game_scores(session)
+        self.log.debug(f'Rebuilt {n_game_scores} game scores')
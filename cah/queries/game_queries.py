@@ -1,16 +1,17 @@
+import threading
+import time
 from typing import (
+    TYPE_CHECKING,
     Dict,
     List,
     Optional,
+    Tuple,
     TypedDict,
 )
 
 from loguru import logger
-import pandas as pd
-from sqlalchemy.sql import (
-    and_,
-    func,
-)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
 
 from cah.db_eng import WizzyPSQLClient
 from cah.model import (
@@ -18,12 +19,20 @@ from cah.model import (
     TableAnswerCard,
     TableGameRound,
     TablePlayer,
+    TablePlayerJudgeScore,
     TablePlayerPick,
     TablePlayerRound,
+    TablePlayerStats,
     TableQuestionCard,
     TableRip,
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Seconds before the cached game stats are recalculated, so rounds ended by other workers are eventually counted
+GAME_STATS_TTL_S = 300
+
 
 class PickItemType(TypedDict):
     card_key: int
@@ -33,6 +42,10 @@ class PickItemType(TypedDict):
 
 class GameQueries:
     """Storing the query methodology here for easier mocking"""
+    # Global game stats are shared by all games in the process
+    _game_stats_lock = threading.Lock()
+    _game_stats = None  # type: Optional[Dict]
+    _game_stats_loaded_at = 0.0
 
     def __init__(self, eng: WizzyPSQLClient, log: logger):
         self.eng = eng
@@ -58,7 +71,7 @@ class GameQueries:
                 ...
             }
         """
-        with self.eng.session_mgr() as session:
+        with self.eng.read_session_mgr() as session:
             picks = session.query(
                 TablePlayerPick.pick_id,
                 TablePlayerPick.answer_card_key,
@@ -90,7 +103,7 @@ class GameQueries:
     def get_current_question(self, game_round_id: int) -> Optional[TableQuestionCard]:
         if game_round_id is None:
             return None
-        with self.eng.session_mgr() as session:
+        with self.eng.read_session_mgr() as session:
             question = session.query(TableQuestionCard).\
                 join(TableGameRound, TableGameRound.question_card_key == TableQuestionCard.question_card_id).\
                 filter(TableGameRound.game_round_id == game_round_id).one_or_none()
@@ -98,79 +111,213 @@ class GameQueries:
             return question
 
     def get_rip(self, rip_type: RipType) -> str:
-        with self.eng.session_mgr() as session:
+        with self.eng.read_session_mgr() as session:
             rip = session.query(TableRip).filter(TableRip.rip_type == rip_type).\
                 order_by(func.random()).limit(1).one_or_none()
             if rip is None:
                 return 'I....got nothing. Consider yourself spared from rippin this time.'
             return rip.text
 
-    def get_game_stats(self) -> Dict:
+    def get_player_rounds_in_game(self, game_id: int) -> 'pd.DataFrame':
+        """Collects the game's player rounds (e.g., for replaying its streaks)"""
+        import pandas as pd
+
+        with self.eng.read_session_mgr() as session:
+            all_rounds = session.query(
+                TablePlayer.player_id,
+                TablePlayerRound.game_round_key,
+                TablePlayerRound.is_judge,
+                TablePlayerRound.is_nuked_hand_caught,
+                TablePlayerRound.score
+            ).join(TablePlayerRound, TablePlayerRound.player_key == TablePlayer.player_id).filter(
+                TablePlayerRound.game_key == game_id
+            ).all()
+            return pd.DataFrame(all_rounds)
+
+    @staticmethod
+    def _add_rounds_to_player_stats(session: Session, player_rounds: List,
+                                    pick_times: Dict[Tuple[int, int], List[float]]):
+        """Adds finished player rounds to the players' stats rollups, skipping any already added
+
+        Args:
+            player_rounds: rows with player_key, game_key, game_round_key, score, is_judge, is_nuked_hand
+                and is_nuked_hand_caught, in round order
+            pick_times: seconds from the start of the round to each pick, by (player_key, game_round_key)
+        """
+        player_ids = list({x.player_key for x in player_rounds})
+        stats_by_player = {x.player_key: x for x in session.query(TablePlayerStats).filter(
+            TablePlayerStats.player_key.in_(player_ids)
+        ).with_for_update().all()}  # type: Dict[int, TablePlayerStats]
+        judge_scores = {(x.player_key, x.judge_key): x for x in session.query(TablePlayerJudgeScore).filter(
+            TablePlayerJudgeScore.player_key.in_(player_ids)
+        ).with_for_update().all()}  # type: Dict[Tuple[int, int], TablePlayerJudgeScore]
+        judge_by_round = {x.game_round_key: x.player_key for x in player_rounds if x.is_judge}
+
+        for pround in player_rounds:
+            stats = stats_by_player.get(pround.player_key)
+            if stats is None:
+                stats = stats_by_player[pround.player_key] = TablePlayerStats(player_key=pround.player_key)
+                session.add(stats)
+            if stats.has_round(pround.game_round_key):
+                continue
+            stats.add_round(game_key=pround.game_key, game_round_key=pround.game_round_key, score=pround.score,
+                            is_nuked_hand=pround.is_nuked_hand, is_nuked_hand_caught=pround.is_nuked_hand_caught,
+                            pick_times_s=pick_times.get((pround.player_key, pround.game_round_key), []))
+            judge_id = judge_by_round.get(pround.game_round_key)
+            if judge_id is None or pround.is_judge:
+                continue
+            judge_score = judge_scores.get((pround.player_key, judge_id))
+            if judge_score is None:
+                judge_score = judge_scores[(pround.player_key, judge_id)] = \
+                    TablePlayerJudgeScore(player_key=pround.player_key, judge_key=judge_id)
+                session.add(judge_score)
+            judge_score.points_received += pround.score
+            judge_score.n_rounds += 1
+
+    @staticmethod
+    def _query_rounds_for_player_stats(session: Session, round_filter) -> \
+            Tuple[List, Dict[Tuple[int, int], List[float]]]:
+        """Collects the player rounds & pick times to add to the players' stats rollups"""
+        player_rounds = session.query(
+            TablePlayerRound.player_key,
+            TablePlayerRound.game_key,
+            TablePlayerRound.game_round_key,
+            TablePlayerRound.score,
+            TablePlayerRound.is_judge,
+            TablePlayerRound.is_nuked_hand,
+            TablePlayerRound.is_nuked_hand_caught
+        ).join(TableGameRound, TablePlayerRound.game_round_key == TableGameRound.game_round_id).filter(
+            round_filter
+        ).order_by(TablePlayerRound.game_round_key).all()
+        picks = session.query(
+            TablePlayerPick.player_key,
+            TablePlayerPick.game_round_key,
+            TablePlayerPick.created_date,
+            TableGameRound.start_time
+        ).join(TableGameRound, TablePlayerPick.game_round_key == TableGameRound.game_round_id).filter(
+            round_filter
+        ).all()
+        pick_times = {}  # type: Dict[Tuple[int, int], List[float]]
+        for pick in picks:
+            pick_times.setdefault((pick.player_key, pick.game_round_key), []).append(
+                (pick.created_date - pick.start_time).total_seconds())
+        return player_rounds, pick_times
+
+    def rollup_player_stats(self, game_round_id: int):
+        """Adds the finished round to its players' stats rollups"""
+
+        def _rollup(session: Session):
+            player_rounds, pick_times = self._query_rounds_for_player_stats(
+                session, round_filter=TableGameRound.game_round_id == game_round_id)
+            if len(player_rounds) > 0:
+                self._add_rounds_to_player_stats(session, player_rounds=player_rounds, pick_times=pick_times)
+
+        self.eng.run_in_transaction(_rollup)
+
+    @classmethod
+    def build_player_stats(cls, session: Session) -> int:
+        """Replaces the players' stats rollups with ones built from all finished rounds
+
+        Returns:
+            the number of player rounds they were built from
+        """
+        session.query(TablePlayerJudgeScore).delete()
+        session.query(TablePlayerStats).delete()
+        player_rounds, pick_times = cls._query_rounds_for_player_stats(
+            session, round_filter=TableGameRound.end_time.isnot(None))
+        if len(player_rounds) > 0:
+            cls._add_rounds_to_player_stats(session, player_rounds=player_rounds, pick_times=pick_times)
+        return len(player_rounds)
+
+    def rebuild_player_stats(self):
+        """Rebuilds the players' stats rollups from all finished rounds"""
         with self.eng.session_mgr() as session:
-            # round duration
-            round_stats = session.query(
-                func.avg(TableGameRound.end_time - TableGameRound.start_time).label('avg_round'),
-                func.min(TableGameRound.end_time - TableGameRound.start_time).label('min_round'),
-                func.max(TableGameRound.end_time - TableGameRound.start_time).label('max_round')
-            ).filter(and_(
-                TableGameRound.end_time.isnot(None)
-            )).all()
-            avg_round, min_round, max_round = round_stats[0]
-
-            # pick/choose stats
-            pick_stats_q = session.query(
-                TableGameRound.game_round_id,
-                TableGameRound.start_time.label('round_start'),
+            n_player_rounds = self.build_player_stats(session)
+        self.log.debug(f'Rebuilt player stats from {n_player_rounds} player rounds')
+
+    @classmethod
+    def invalidate_game_stats(cls):
+        """Drops the cached game stats so they're recalculated on the next request (e.g., after a round ends)"""
+        with cls._game_stats_lock:
+            cls._game_stats = None
+
+    def get_game_stats(self) -> Dict:
+        """Retrieves the global game stats, calculating them if they're not cached"""
+        with self._game_stats_lock:
+            if self._game_stats is not None and \
+                    time.monotonic() - self._game_stats_loaded_at < GAME_STATS_TTL_S:
+                return self._game_stats.copy()
+        game_stats = self._calculate_game_stats()
+        with self._game_stats_lock:
+            GameQueries._game_stats = game_stats
+            GameQueries._game_stats_loaded_at = time.monotonic()
+        return game_stats.copy()
+
+    def _calculate_game_stats(self) -> Dict:
+        """Aggregates the stats in the db in one query, so only a single row is returned"""
+        with self.eng.read_session_mgr() as session:
+            is_round_ended = TableGameRound.end_time.isnot(None)
+            round_duration = TableGameRound.end_time - TableGameRound.start_time
+
+            # Time from the start of the round to each pick
+            picks_cte = session.query(
                 TablePlayer.display_name,
-                TablePlayerPick.created_date.label('pick_timestamp'),
-                (TablePlayerPick.created_date - TableGameRound.start_time).label('duration_before_pick'),
-                TableGameRound.end_time.label('round_end'),
-            ).join(TablePlayerPick, TablePlayerPick.game_round_key == TableGameRound.game_round_id).\
-                join(TablePlayer, TablePlayerPick.slack_user_hash == TablePlayer.slack_user_hash). \
-                filter(and_(
-                    TableGameRound.end_time.isnot(None)
-                ))
-
-            pick_stats_df = pd.read_sql(pick_stats_q.statement, session.bind)
-            slowest_pick_idx = pick_stats_df['duration_before_pick'].idxmax()
-            slowest_pick = pick_stats_df.loc[slowest_pick_idx, 'duration_before_pick']
-            slowest_pick_player = pick_stats_df.loc[slowest_pick_idx, 'display_name']
-
-            fastest_pick_idx = pick_stats_df['duration_before_pick'].idxmin()
-            fastest_pick = pick_stats_df.loc[fastest_pick_idx, 'duration_before_pick']
-            fastest_pick_player = pick_stats_df.loc[fastest_pick_idx, 'display_name']
-
-            avg_pick_time = pick_stats_df['duration_before_pick'].mean()
-
-            p50 = pick_stats_df.loc[pick_stats_df['duration_before_pick'] ==
-                                    pick_stats_df['duration_before_pick'].quantile(.5, interpolation='lower')]
-            p50_display_name = p50.iloc[0]['display_name']
-            p50_dur = p50.iloc[0]['duration_before_pick']
-
-            total_decknukes = session.query(func.count(TablePlayerRound.is_nuked_hand)).filter(
-                TablePlayerRound.is_nuked_hand
-            ).scalar()
-            total_caught_decknukes = session.query(func.count(TablePlayerRound.is_nuked_hand)).filter(
-                TablePlayerRound.is_nuked_hand_caught
-            ).scalar()
-            dn_capture_rate = total_caught_decknukes / total_decknukes
-            dn_capture_text = f'{dn_capture_rate:.1%} ({total_caught_decknukes} caught / {total_decknukes} nuked)'
-
-            # TODO: More stats
-            #   % of time that a winner is the judge next
-
-            return {
-                'Fastest Round': min_round,
-                'Average Round': avg_round,
-                'Slowest Round': max_round,
-                'Slowest Pick': slowest_pick,
-                'Slowest Pickler': slowest_pick_player,
-                'Fastest Pick': fastest_pick,
-                'fastest pickler': fastest_pick_player,
-                'Average pickling time': avg_pick_time,
-                'p50 p-pickler': p50_display_name,
-                'median pickle time': p50_dur,
-                'total global decknukes': total_decknukes,
-                'global decknuke capture rate': dn_capture_text,
-                '% Likelihood the winner is judge in next round': 'TBD'
-            }
+                (TablePlayerPick.created_date - TableGameRound.start_time).label('duration')
+            ).select_from(TableGameRound).\
+                join(TablePlayerPick, TablePlayerPick.game_round_key == TableGameRound.game_round_id).\
+                join(TablePlayer, TablePlayerPick.player_key == TablePlayer.player_id).\
+                filter(is_round_ended).cte('picks')
+            p50_pick = session.query(
+                func.percentile_disc(0.5).within_group(picks_cte.c.duration)
+            ).scalar_subquery()
+
+            def _pickler(order_by, where=None):
+                pickler_q = session.query(picks_cte.c.display_name)
+                if where is not None:
+                    pickler_q = pickler_q.filter(where)
+                return pickler_q.order_by(order_by).limit(1).scalar_subquery()
+
+            stats = session.query(
+                session.query(func.min(round_duration)).filter(is_round_ended).scalar_subquery().label('min_round'),
+                session.query(func.avg(round_duration)).filter(is_round_ended).scalar_subquery().label('avg_round'),
+                session.query(func.max(round_duration)).filter(is_round_ended).scalar_subquery().label('max_round'),
+                func.min(picks_cte.c.duration).label('fastest_pick'),
+                func.max(picks_cte.c.duration).label('slowest_pick'),
+                func.avg(picks_cte.c.duration).label('avg_pick'),
+                p50_pick.label('p50_pick'),
+                _pickler(picks_cte.c.duration.asc()).label('fastest_pickler'),
+                _pickler(picks_cte.c.duration.desc()).label('slowest_pickler'),
+                _pickler(picks_cte.c.display_name, where=picks_cte.c.duration == p50_pick).label('p50_pickler'),
+                session.query(func.count()).filter(
+                    TablePlayerRound.is_nuked_hand
+                ).scalar_subquery().label('total_decknukes'),
+                session.query(func.count()).filter(
+                    TablePlayerRound.is_nuked_hand_caught
+                ).scalar_subquery().label('total_caught_decknukes'),
+            ).select_from(picks_cte).one()
+
+        if stats.total_decknukes > 0:
+            dn_capture_rate = stats.total_caught_decknukes / stats.total_decknukes
+            dn_capture_text = f'{dn_capture_rate:.1%} ({stats.total_caught_decknukes} caught / ' \
+                              f'{stats.total_decknukes} nuked)'
+        else:
+            dn_capture_text = '#Nevernuked'
+
+        # TODO: More stats
+        #   % of time that a winner is the judge next
+
+        return {
+            'Fastest Round': stats.min_round,
+            'Average Round': stats.avg_round,
+            'Slowest Round': stats.max_round,
+            'Slowest Pick': stats.slowest_pick,
+            'Slowest Pickler': stats.slowest_pickler,
+            'Fastest Pick': stats.fastest_pick,
+            'fastest pickler': stats.fastest_pickler,
+            'Average pickling time': stats.avg_pick,
+            'p50 p-pickler': stats.p50_pickler,
+            'median pickle time': stats.p50_pick,
+            'total global decknukes': stats.total_decknukes,
+            'global decknuke capture rate': dn_capture_text,
+            '% Likelihood the winner is judge in next round': 'TBD'
+        }
@@ -1,29 +1,37 @@
+from datetime import timedelta
 from typing import (
+    Any,
     Dict,
     List,
     Optional,
+    Tuple,
     Union,
 )
 
 from loguru import logger
-import pandas as pd
+from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.sql import (
     and_,
+    bindparam,
     func,
+    insert,
     not_,
     or_,
+    update,
 )
 
 from cah.db_eng import WizzyPSQLClient
 from cah.model import (
     TableAnswerCard,
-    TableGameRound,
     TableHonorific,
     TablePlayer,
+    TablePlayerGameScore,
     TablePlayerHand,
+    TablePlayerJudgeScore,
     TablePlayerPick,
     TablePlayerRound,
+    TablePlayerStats,
 )
 
 
@@ -35,6 +43,8 @@ class PlayerHandCardType:
 
 
 PlayerHandType = List[PlayerHandCardType]
+# (hand_id, card_pos)
+HandSlotType = Tuple[Optional[int], int]
 
 
 class PlayerQueries:
@@ -80,6 +90,47 @@ class PlayerQueries:
                 attr: value
             })
 
+    def bulk_set_player_attrs(self, player_round_changes: Dict[Tuple[int, int, int], Dict[str, Any]],
+                              player_changes: Dict[str, Dict[str, Any]]):
+        """Applies many player_round and player column changes in one transaction.
+
+        Args:
+            player_round_changes: {(game_id, game_round_id, player_id): {column_name: value}}
+            player_changes: {slack_user_hash: {column_name: value}}
+
+        Notes:
+            Rows sharing the same set of changed columns are sent as a single executemany UPDATE.
+            Bound parameter names are prefixed, as SQLAlchemy reserves the column names for the SET clause.
+        """
+        pr_tbl = TablePlayerRound.__table__
+        p_tbl = TablePlayer.__table__
+        pr_groups = {}  # type: Dict[Tuple[str, ...], List[Dict]]
+        for (game_id, game_round_id, player_id), changes in player_round_changes.items():
+            params = {f'b_{k}': v for k, v in changes.items()}
+            params.update({'b_game_key': game_id, 'b_game_round_key': game_round_id, 'b_player_key': player_id})
+            pr_groups.setdefault(tuple(sorted(changes.keys())), []).append(params)
+        p_groups = {}  # type: Dict[Tuple[str, ...], List[Dict]]
+        for player_hash, changes in player_changes.items():
+            params = {f'b_{k}': v for k, v in changes.items()}
+            params['b_slack_user_hash'] = player_hash
+            p_groups.setdefault(tuple(sorted(changes.keys())), []).append(params)
+
+        def _set_attrs(session: Session):
+            for cols, params_list in pr_groups.items():
+                self.log.debug(f'Updating {cols} for {len(params_list)} player rounds')
+                session.execute(update(pr_tbl).where(and_(
+                    pr_tbl.c.game_key == bindparam('b_game_key'),
+                    pr_tbl.c.game_round_key == bindparam('b_game_round_key'),
+                    pr_tbl.c.player_key == bindparam('b_player_key')
+                )).values({c: bindparam(f'b_{c}') for c in cols}), params_list)
+            for cols, params_list in p_groups.items():
+                self.log.debug(f'Updating {cols} for {len(params_list)} players')
+                session.execute(update(p_tbl).where(
+                    p_tbl.c.slack_user_hash == bindparam('b_slack_user_hash')
+                ).values({c: bindparam(f'b_{c}') for c in cols}), params_list)
+
+        self.eng.run_in_transaction(_set_attrs)
+
     def get_total_games_played(self, player_id: int) -> int:
         with self.eng.session_mgr() as session:
             return session.query(func.count(func.distinct(TablePlayerRound.game_key))).filter(
@@ -97,23 +148,44 @@ class PlayerQueries:
                 return honorific.text
             return 'The Unknown'
 
+    def add_points(self, player_id: int, game_round_id: int, game_id: int, points: int):
+        """Adds points to the player's round and to their running score for the game"""
+
+        def _add_points(session: Session):
+            session.query(TablePlayerRound).filter(and_(
+                TablePlayerRound.game_key == game_id,
+                TablePlayerRound.game_round_key == game_round_id,
+                TablePlayerRound.player_key == player_id
+            )).update({
+                TablePlayerRound.score: TablePlayerRound.score + points
+            })
+            game_score = session.query(TablePlayerGameScore).filter(and_(
+                TablePlayerGameScore.player_key == player_id,
+                TablePlayerGameScore.game_key == game_id
+            )).with_for_update().one_or_none()
+            if game_score is None:
+                game_score = TablePlayerGameScore(player_key=player_id, game_key=game_id)
+                session.add(game_score)
+            game_score.add_points(points, game_round_key=game_round_id)
+
+        self.eng.run_in_transaction(_add_points)
+
     def get_current_score(self, game_id: int, player_id: int) -> int:
         """Retrieves player's current score"""
         with self.eng.session_mgr() as session:
-            return session.query(
-                    func.sum(TablePlayerRound.score)
-                ).filter(and_(
-                    TablePlayerRound.player_key == player_id,
-                    TablePlayerRound.game_key == game_id
-                )).scalar()
+            score = session.query(TablePlayerGameScore.score).filter(and_(
+                TablePlayerGameScore.player_key == player_id,
+                TablePlayerGameScore.game_key == game_id
+            )).scalar()
+            return score if score is not None else 0
 
     def get_overall_score(self, player_id: int) -> int:
         with self.eng.session_mgr() as session:
             return session.query(
-                func.sum(TablePlayerRound.score)
-            ).filter(and_(
-                TablePlayerRound.player_key == player_id
-            )).scalar()
+                func.coalesce(func.sum(TablePlayerGameScore.score), 0)
+            ).filter(
+                TablePlayerGameScore.player_key == player_id
+            ).scalar()
 
     def get_total_decknukes_issued(self, player_id: int) -> int:
         with self.eng.session_mgr() as session:
@@ -177,8 +249,8 @@ class PlayerQueries:
                 TableAnswerCard.times_burned: TableAnswerCard.times_burned + 1
             })
 
-    def set_cards_in_hand(self, player_id: int, cards: List[TableAnswerCard]):
-        """Takes a card into the player's hand"""
+    def set_cards_in_hand(self, player_id: int, card_ids: List[int]):
+        """Takes cards (by answer card id) into the player's hand"""
         with self.eng.session_mgr() as session:
             # Determine if space for a new card (any picked / nuked cards?)
             all_cards = session.query(TablePlayerHand).filter(and_(
@@ -193,35 +265,104 @@ class PlayerQueries:
                 )
             )).all()
             self.log.debug(f'{len(available_slots)} open slots found for user out of {total_card_cnt}. '
-                           f'{len(cards)} to try to add.')
-            if len(available_slots) >= len(cards):
+                           f'{len(card_ids)} to try to add.')
+            if len(available_slots) >= len(card_ids):
                 # Replace the first slot with a card
                 self.log.debug('Existing slot(s) were equal to or greater than dealt cards.')
-                for i, card in enumerate(cards):
+                for i, card_id in enumerate(card_ids):
                     slot: TablePlayerHand
                     slot = available_slots[i]
                     self.log.debug(f'Replacing card at slot {slot.card_pos}.')
                     slot.is_nuked = slot.is_picked = False
-                    slot.answer_card_key = card.answer_card_id
+                    slot.answer_card_key = card_id
                     session.add(slot)
-            elif len(available_slots) == 0 and total_card_cnt + len(cards) <= 5:
+            elif len(available_slots) == 0 and total_card_cnt + len(card_ids) <= 5:
                 self.log.debug('No slots available, but total cards plus cards to add were at or less than '
                                'the limit. Creating new cards.')
                 taken_positions = [x.card_pos for x in all_cards]
                 available_positions = [i for i in range(5) if i not in taken_positions]
                 # Possibly dealing with totally new game
-                for i, card in enumerate(cards):
+                for i, card_id in enumerate(card_ids):
                     self.log.debug(f'Adding card to new slot {available_positions[i]}...')
                     session.add(TablePlayerHand(
                         card_pos=available_positions[i],
                         player_key=player_id,
-                        answer_card_key=card.answer_card_id
+                        answer_card_key=card_id
                     ))
 
+    def get_open_hand_slots(self, player_ids: List[int], hand_size: int = 5) -> Dict[int, List[HandSlotType]]:
+        """Finds every slot that can take a new card across all the players' hands in one query.
+
+        A slot is open if its card was picked or nuked, or if the player has no card in that position yet.
+
+        Returns:
+            {player_id: [(hand_id, card_pos), ...]} where hand_id is None for positions without a row
+        """
+        with self.eng.session_mgr() as session:
+            rows = session.query(
+                TablePlayerHand.player_key,
+                TablePlayerHand.hand_id,
+                TablePlayerHand.card_pos,
+                TablePlayerHand.is_picked,
+                TablePlayerHand.is_nuked,
+            ).filter(
+                TablePlayerHand.player_key.in_(player_ids)
+            ).order_by(TablePlayerHand.hand_id).all()
+        open_slots = {x: [] for x in player_ids}  # type: Dict[int, List[HandSlotType]]
+        taken_positions = {x: set() for x in player_ids}
+        for row in rows:
+            taken_positions[row.player_key].add(row.card_pos)
+            if row.is_picked or row.is_nuked:
+                open_slots[row.player_key].append((row.hand_id, row.card_pos))
+        for player_id, positions in taken_positions.items():
+            open_slots[player_id] += [(None, i) for i in range(hand_size) if i not in positions]
+        return open_slots
+
+    def fill_hand_slots(self, slot_fills: List[Tuple[int, Optional[int], int, int]]):
+        """Writes dealt cards into players' hands in one transaction.
+
+        Args:
+            slot_fills: [(player_id, hand_id, card_pos, answer_card_id), ...]
+                where hand_id is None for slots that don't yet have a row
+
+        Notes:
+            Replaced slots go out as one executemany UPDATE and new slots as one multi-row INSERT.
+        """
+        hand_tbl = TablePlayerHand.__table__
+        replacements = []
+        additions = []
+        for player_id, hand_id, card_pos, card_id in slot_fills:
+            if hand_id is None:
+                additions.append({
+                    'player_key': player_id,
+                    'card_pos': card_pos,
+                    'answer_card_key': card_id,
+                    'is_picked': False,
+                    'is_nuked': False,
+                })
+            else:
+                replacements.append({'b_hand_id': hand_id, 'b_answer_card_key': card_id})
+        self.log.debug(f'Filling {len(replacements)} existing and {len(additions)} new hand slots')
+
+        def _fill_slots(session: Session):
+            if len(replacements) > 0:
+                session.execute(update(hand_tbl).where(
+                    hand_tbl.c.hand_id == bindparam('b_hand_id')
+                ).values({
+                    'answer_card_key': bindparam('b_answer_card_key'),
+                    'is_picked': False,
+                    'is_nuked': False,
+                }), replacements)
+            if len(additions) > 0:
+                session.execute(insert(hand_tbl), additions)
+
+        self.eng.run_in_transaction(_fill_slots)
+
     def mark_chosen_pick(self, player_id: int, game_round_id: int):
         """When a pick is chosen by a judge, this method handles marking those cards as chosen in the db
         for better tracking"""
-        with self.eng.session_mgr() as session:
+
+        def _mark_chosen(session: Session):
             # Get card id of this round's picks by this user, mark them as chosen
             answer_cards = session.query(TableAnswerCard).join(
                 TablePlayerPick, TableAnswerCard.answer_card_id == TablePlayerPick.answer_card_key).filter(and_(
@@ -233,10 +374,13 @@ class PlayerQueries:
                 acard.times_chosen += 1
                 session.add(acard)
 
+        self.eng.run_in_transaction(_mark_chosen)
+
     def set_picked_card(self, player_id: int, game_round_id: int, slack_user_hash: str, position: int,
                         card: PlayerHandCardType):
         """Handles the process of setting a picked card in various tables"""
-        with self.eng.session_mgr() as session:
+
+        def _set_picked(session: Session):
             # Move card to player_pick
             session.add(TablePlayerPick(
                 player_key=player_id,
@@ -259,6 +403,8 @@ class PlayerQueries:
                 TableAnswerCard.times_picked: TableAnswerCard.times_picked + 1
             })
 
+        self.eng.run_in_transaction(_set_picked)
+
     def get_picks_as_str(self, player_id: int, game_round_id: int) -> List[str]:
         """Grabs the player's picks and renders them in a pipe-delimited string in the order that
         they were selected"""
@@ -290,111 +436,75 @@ class PlayerQueries:
         with self.eng.session_mgr() as session:
             session.add(TablePlayerRound(player_key=player_id, game_key=game_id, game_round_key=game_round_id,
                                          is_arp=is_arp, is_arc=is_arc))
+            # Players show on the scoreboard from their first round, even before they've scored
+            has_game_score = session.query(TablePlayerGameScore.player_game_score_id).filter(and_(
+                TablePlayerGameScore.player_key == player_id,
+                TablePlayerGameScore.game_key == game_id
+            )).first() is not None
+            if not has_game_score:
+                session.add(TablePlayerGameScore(player_key=player_id, game_key=game_id))
 
     def get_player_stats(self, player_id: int, game_round_id: int) -> Dict:
-        with self.eng.session_mgr() as session:
-            # pick/choose stats
-            pick_stats_q = session.query(
-                TableGameRound.game_round_id,
-                TableGameRound.start_time.label('round_start'),
+        """Reads the player's stats from their rollups, which are added to as each round ends"""
+        with self.eng.read_session_mgr() as session:
+            stats = session.query(TablePlayerStats).filter(
+                TablePlayerStats.player_key == player_id
+            ).one_or_none()  # type: Optional[TablePlayerStats]
+            judge_scores = session.query(
                 TablePlayer.display_name,
-                TablePlayerPick.created_date.label('pick_timestamp'),
-                (TablePlayerPick.created_date - TableGameRound.start_time).label('duration_before_pick'),
-                TableGameRound.end_time.label('round_end')
-            ).join(TablePlayerPick, TablePlayerPick.game_round_key == TableGameRound.game_round_id).\
-                join(TablePlayer, TablePlayerPick.slack_user_hash == TablePlayer.slack_user_hash).\
-                filter(and_(
-                    TableGameRound.end_time.isnot(None),
-                    TablePlayer.player_id == player_id
-                ))
-
-            pick_stats_df = pd.read_sql(pick_stats_q.statement, session.bind)
-            slowest_pick_idx = pick_stats_df['duration_before_pick'].idxmax()
-            slowest_pick = pick_stats_df.loc[slowest_pick_idx, 'duration_before_pick']
-
-            fastest_pick_idx = pick_stats_df['duration_before_pick'].idxmin()
-            fastest_pick = pick_stats_df.loc[fastest_pick_idx, 'duration_before_pick']
-
-            avg_pick_time = pick_stats_df['duration_before_pick'].mean()
-
-            player_rounds_q = session.query(TablePlayerRound).filter(TablePlayerRound.player_key == player_id)
-            prounds_df = pd.read_sql(player_rounds_q.statement, session.bind)
-
-            total_score = prounds_df['score'].sum()
-            total_games_played = prounds_df['game_key'].nunique()
-            total_rounds_played = prounds_df['game_round_key'].nunique()
-            total_rounds_won = prounds_df[prounds_df['score'] > 0].shape[0]
-            total_decknukes_issued = prounds_df[prounds_df['is_nuked_hand']].shape[0]
-            total_decknukes_caught = prounds_df[prounds_df['is_nuked_hand_caught']].shape[0]
-            game_round_of_last_score = prounds_df.loc[prounds_df['score'] > 0, 'game_round_key'].max()
-            if pd.isna(game_round_of_last_score):
-                rounds_since_last_score = 'You never scored??'
-            else:
-                rounds_since_last_score = game_round_id - game_round_of_last_score
-
-            if total_decknukes_issued > 0:
-                noncaught_nukes = total_decknukes_issued - total_decknukes_caught
-                decknuke_success = noncaught_nukes / total_decknukes_issued
-                decknuke_text = f'{decknuke_success:.1%} ({noncaught_nukes} uncaught / {total_decknukes_issued} nuked)'
-            else:
-                decknuke_text = '#Nevernuked'
-
-            round_success_rate = total_rounds_won / total_rounds_played
-            round_success_text = f'{round_success_rate:.1%} ({total_rounds_won} won / {total_rounds_played} played)'
-
-            # Judge stats
-            judge_stats_q = session.query(TablePlayerRound, TablePlayer.display_name).\
-                join(TablePlayer, TablePlayer.player_id == TablePlayerRound.player_key).\
-                filter(or_(
-                    TablePlayerRound.player_key == player_id,
-                    TablePlayerRound.is_judge
-                )).\
-                order_by(TablePlayerRound.game_round_key)
-            judge_stats_df = pd.read_sql(judge_stats_q.statement, session.bind)
-            # Filter
-            judge_stats_df = judge_stats_df[['player_key', 'display_name', 'game_round_key', 'score', 'is_judge']]
-            judge_stats_df['judged_round'] = (judge_stats_df['player_key'] == player_id) & judge_stats_df['is_judge']
-            # Remove times when player for whom we're getting the stats was judge
-            judge_stats_df = judge_stats_df[~judge_stats_df['judged_round']]
-
-            # Group by game round, apply names to judges
-            judge_round_summary = judge_stats_df[['game_round_key', 'score']].\
-                groupby('game_round_key', as_index=False).sum()
-            judge_round_summary = judge_round_summary.merge(
-                judge_stats_df.loc[judge_stats_df['is_judge'], ['game_round_key', 'display_name']]
-            )
-            judge_round_summary = judge_round_summary.groupby('display_name', as_index=False).sum()
-
-            try:
-                best_judge_id = judge_round_summary['score'].idxmax()
-                best_judge_points_given = judge_round_summary.loc[best_judge_id, 'score']
-                similar_best_judges = judge_round_summary.loc[
-                    judge_round_summary['score'] == best_judge_points_given, 'display_name'].tolist()
-                similar_best_judges = ', '.join(similar_best_judges)
-            except Exception as e:
-                similar_best_judges = f'I have failed you: {e}'
-
-            try:
-                worst_judge_id = judge_round_summary['score'].idxmin()
-                worst_judge_points_given = judge_round_summary.loc[worst_judge_id, 'score']
-                similar_worst_judges = judge_round_summary.loc[
-                    judge_round_summary['score'] == worst_judge_points_given, 'display_name'].tolist()
-                similar_worst_judges = ', '.join(similar_worst_judges)
-            except Exception as e:
-                similar_worst_judges = f'I have failed you: {e}'
-
-            return {
-                'Slowest Pick': slowest_pick,
-                'Fastest Pick': fastest_pick,
-                'Average pickling time': avg_pick_time,
-                'overall score': total_score,
-                'games played': total_games_played,
-                'rounds endured': total_rounds_played,
-                'round success rate': round_success_text,
-                'decknuke success rate': decknuke_text,
-                'rounds since last score': rounds_since_last_score,
-                'most agreeable judges': similar_best_judges,
-                'most points awarded by judge': best_judge_points_given,
-                'least agreeable judges': similar_worst_judges,
-                'least points awarded by judge': worst_judge_points_given,
-            }
+                TablePlayerJudgeScore.points_received
+            ).join(TablePlayer, TablePlayer.player_id == TablePlayerJudgeScore.judge_key).filter(
+                TablePlayerJudgeScore.player_key == player_id
+            ).all()
+            session.expunge_all()
+        if stats is None:
+            stats = TablePlayerStats(player_key=player_id)
+
+        if stats.last_scored_round_key is None:
+            rounds_since_last_score = 'You never scored??'
+        else:
+            rounds_since_last_score = game_round_id - stats.last_scored_round_key
+
+        if stats.n_decknukes_issued > 0:
+            noncaught_nukes = stats.n_decknukes_issued - stats.n_decknukes_caught
+            decknuke_success = noncaught_nukes / stats.n_decknukes_issued
+            decknuke_text = f'{decknuke_success:.1%} ({noncaught_nukes} uncaught / {stats.n_decknukes_issued} nuked)'
+        else:
+            decknuke_text = '#Nevernuked'
+
+        if stats.n_rounds_played > 0:
+            round_success_rate = stats.n_rounds_won / stats.n_rounds_played
+        else:
+            round_success_rate = 0
+        round_success_text = f'{round_success_rate:.1%} ({stats.n_rounds_won} won / ' \
+                             f'{stats.n_rounds_played} played)'
+
+        # Judge stats
+        best_judge_points_given = worst_judge_points_given = None
+        similar_best_judges = similar_worst_judges = 'No judges yet'
+        if len(judge_scores) > 0:
+            best_judge_points_given = max(x.points_received for x in judge_scores)
+            similar_best_judges = ', '.join(x.display_name for x in judge_scores
+                                            if x.points_received == best_judge_points_given)
+            worst_judge_points_given = min(x.points_received for x in judge_scores)
+            similar_worst_judges = ', '.join(x.display_name for x in judge_scores
+                                             if x.points_received == worst_judge_points_given)
+
+        def _to_timedelta(seconds: Optional[float]) -> Optional[timedelta]:
+            return None if seconds is None else timedelta(seconds=seconds)
+
+        return {
+            'Slowest Pick': _to_timedelta(stats.pick_time_max_s),
+            'Fastest Pick': _to_timedelta(stats.pick_time_min_s),
+            'Average pickling time': stats.avg_pick_time,
+            'overall score': stats.total_score,
+            'games played': stats.n_games_played,
+            'rounds endured': stats.n_rounds_played,
+            'round success rate': round_success_text,
+            'decknuke success rate': decknuke_text,
+            'rounds since last score': rounds_since_last_score,
+            'most agreeable judges': similar_best_judges,
+            'most points awarded by judge': best_judge_points_given,
+            'least agreeable judges': similar_worst_judges,
+            'least points awarded by judge': worst_judge_points_given,
+        }
@@ -1,46 +1,37 @@
 import json
-import os
 import re
+from typing import TYPE_CHECKING
 
 from flask import (
     Blueprint,
     current_app,
+    g,
     make_response,
     request,
 )
-import requests
-from slack_bolt import App
-from slack_bolt.adapter.flask import SlackRequestHandler
 
-from cah.routes.helpers import get_app_bot
-from cah.settings import (
-    Development,
-    Production,
+from cah.routes.helpers import (
+    get_app_bot,
+    get_bolt_handler,
 )
 
-bp_actions = Blueprint('actions', __name__)
-
-ENV = os.getenv('CAH_ENV')
-if ENV is None:
-    raise ValueError('No set env. Cannot proceed')
-if ENV == 'DEV':
-    env_class = Development
-else:
-    env_class = Production
+if TYPE_CHECKING:
+    from slack_bolt import App
 
-env_class.load_secrets()
-props = env_class.SECRETS
-bolt_app = App(token=props['xoxb-token'], signing_secret=props['signing-secret'], process_before_response=True)
-handler = SlackRequestHandler(app=bolt_app)
+bp_actions = Blueprint('actions', __name__)
 
 
 @bp_actions.route('/api/actions', methods=['GET', 'POST'])
 def handle_event():
     """Handles a slack event"""
-    return handler.handle(req=request)
+    return get_bolt_handler().handle(req=request)
+
+
+def register_listeners(bolt_app: 'App'):
+    """Hooks this module's listeners up to the shared Bolt app"""
+    bolt_app.action(re.compile('.*'))(handle_action)
 
 
-@bolt_app.action(re.compile('.*'))
 def handle_action(ack):
     """Handle a response when a user clicks a button from Wizzy in Slack"""
     ack()
@@ -61,21 +52,31 @@ def handle_action(ack):
         actions = event_data['actions']
         # Not sure if we'll ever receive more than one action?
         action = actions[0]
-    # Send that info onwards to determine how to deal with it
-    get_app_bot().process_incoming_action(user, channel, action_dict=action, event_dict=event_data)
-
-    # Respond to the initial message and update it
+    # Labels the request's metrics
+    g.action_id = action.get('action_id')
+    # Respond to the initial message and update it once the action's been handled
     update_dict = {
         'delete_original': True
     }
     if event_data.get('container', {'is_ephemeral': False}).get('is_ephemeral', False):
         update_dict['response_type'] = 'ephemeral'
     response_url = event_data.get('response_url')
-    if response_url is not None:
-        # Update original message
-        if 'shortcut' not in action.get('type'):
-            _ = requests.post(event_data['response_url'], json=update_dict,
-                              headers={'Content-Type': 'application/json'})
+
+    bot = get_app_bot()
+
+    def _update_original():
+        if response_url is not None and 'shortcut' not in action.get('type'):
+            bot.st.post_response_url(response_url, update_dict)
+
+    # Send that info onwards to be processed after any other work queued for the channel
+    is_queued = bot.queue_incoming_action(user, channel, action_dict=action, event_dict=event_data,
+                                          callback=_update_original)
+    if not is_queued and response_url is not None:
+        bot.st.post_response_url(response_url, {
+            'response_type': 'ephemeral',
+            'replace_original': False,
+            'text': 'I\'m swamped right now :sweat_smile: Try that again in a bit.'
+        })
 
     # Send HTTP 200 response with an empty body so Slack knows we're done
     return make_response('', 200)
@@ -0,0 +1,29 @@
+"""The Bolt app that Slack's requests are routed through, shared by all the blueprints"""
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from slack_bolt.adapter.flask import SlackRequestHandler
+    from slack_sdk import WebClient
+
+
+def create_bolt_handler(signing_secret: str, client: 'WebClient') -> 'SlackRequestHandler':
+    """Builds the Bolt app with all the routes' listeners registered, along with the handler requests go through
+
+    Args:
+        signing_secret: used to verify that requests come from Slack
+        client: the bot's already-authenticated Slack client, reused for Bolt's calls so we don't
+            make another connection or auth call for it
+    """
+    from slack_bolt import App
+    from slack_bolt.adapter.flask import SlackRequestHandler
+
+    from cah.routes import (
+        actions,
+        events,
+    )
+
+    bolt_app = App(client=client, signing_secret=signing_secret, process_before_response=True,
+                   token_verification_enabled=False)
+    for module in [actions, events]:
+        module.register_listeners(bolt_app)
+    return SlackRequestHandler(app=bolt_app)
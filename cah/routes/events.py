@@ -1,57 +1,44 @@
-import os
 from typing import TYPE_CHECKING
 
 from flask import (
     Blueprint,
     request,
 )
-from slack_bolt import App
-from slack_bolt.adapter.flask import SlackRequestHandler
 
 from cah.routes.helpers import (
     get_app_bot,
     get_app_logger,
+    get_bolt_handler,
     get_wizzy_eng,
 )
-from cah.settings import (
-    Development,
-    Production,
-)
 
 if TYPE_CHECKING:
+    from slack_bolt import App
+
     from cah.model import TablePlayer
 
 bp_events = Blueprint('events', __name__)
 
 
-ENV = os.getenv('CAH_ENV')
-if ENV is None:
-    raise ValueError('No set env. Cannot proceed')
-if ENV == 'DEV':
-    env_class = Development
-else:
-    env_class = Production
-
-env_class.load_secrets()
-props = env_class.SECRETS
-bolt_app = App(token=props['xoxb-token'], signing_secret=props['signing-secret'], process_before_response=True)
-handler = SlackRequestHandler(app=bolt_app)
-
-
 @bp_events.route('/api/events', methods=['GET', 'POST'])
 def handle_event():
     """Handles a slack event"""
-    return handler.handle(req=request)
+    return get_bolt_handler().handle(req=request)
+
+
+def register_listeners(bolt_app: 'App'):
+    """Hooks this module's listeners up to the shared Bolt app"""
+    bolt_app.event('message')(scan_message)
+    bolt_app.event('user_change')(notify_new_statuses)
 
 
-@bolt_app.event('message')
 def scan_message(ack):
     ack()
+    # Request data isn't available to the workers, so grab it now
     event_data = request.json
-    get_app_bot().process_event(event_data)
+    get_app_bot().queue_event(event_data)
 
 
-@bolt_app.event('user_change')
 def notify_new_statuses(event_data):
     """Triggered when a user updates their profile info. Gets saved to global dict
     where we then report it in #general"""
@@ -7,6 +7,12 @@ from flask import (
 )
 from pukr import PukrLog
 
+from cah.metrics import (
+    begin_interaction,
+    current_interaction,
+    end_interaction,
+)
+
 
 def get_db_conn():
     return current_app.config['db']
@@ -17,7 +23,7 @@ def get_session():
 
 
 def get_wizzy_eng():
-    return current_app.config['eng']
+    return current_app.extensions['eng']
 
 
 def get_app_logger() -> PukrLog:
@@ -28,6 +34,10 @@ def get_app_bot():
     return current_app.extensions['bot']
 
 
+def get_bolt_handler():
+    return current_app.extensions['bolt_handler']
+
+
 def log_before():
     g.start_time = time.perf_counter()
 
@@ -35,5 +45,53 @@ def log_before():
 def log_after(response):
     total_time = time.perf_counter() - g.start_time
     time_ms = int(total_time * 1000)
-    get_app_logger().info(f'Timing: {time_ms}ms [{request.method}] -> {request.path}')
+    interaction = current_interaction()
+    counts_txt = ''
+    if interaction is not None:
+        counts_txt = f' ({interaction.n_db_statements} queries, {interaction.n_slack_calls} Slack calls)'
+    get_app_logger().info(f'Timing: {time_ms}ms{counts_txt} [{request.method}] -> {request.path}')
     return response
+
+
+def begin_request_metrics():
+    """Starts counting the request's db statements & Slack calls"""
+    g.metrics_token = begin_interaction(route='')
+
+
+def end_request_metrics(error: BaseException = None):
+    _ = error
+    token = g.pop('metrics_token', None)
+    if token is None:
+        return
+    # Labelled by the route's rule rather than the path, so unknown paths don't each get their own series
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    end_interaction(token, route=route, action_id=g.get('action_id', ''))
+
+
+def begin_unit_of_work():
+    """Has the request's db work share one session, committed when the request ends"""
+    g.uow_token = get_wizzy_eng().begin_unit_of_work()
+
+
+def commit_unit_of_work(response):
+    """Commits the request's db work before the response goes out, so a failed commit
+    (e.g., a serialization failure) is answered with an error instead of being lost"""
+    if response.status_code >= 500:
+        # Left for teardown, which rolls it back if the request raised
+        return response
+    token = g.pop('uow_token', None)
+    if token is not None:
+        get_wizzy_eng().end_unit_of_work(token)
+    return response
+
+
+def end_unit_of_work(error: BaseException = None):
+    """Ends the request's db work if it wasn't committed with the response (e.g., the request failed)"""
+    token = g.pop('uow_token', None)
+    if token is None:
+        return
+    try:
+        get_wizzy_eng().end_unit_of_work(token, error=error)
+    except Exception as e:
+        get_app_logger().error(f'Failed to commit the unit of work for [{request.method}] -> '
+                               f'{request.path}: {e}')
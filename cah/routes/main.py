@@ -1,9 +1,13 @@
 from flask import (
     Blueprint,
+    Response,
     current_app,
     jsonify,
 )
 
+from cah.metrics import REGISTRY
+from cah.routes.helpers import get_app_bot
+
 bp_main = Blueprint('main', __name__)
 
 
@@ -13,3 +17,21 @@ def get_app_info():
         'app_name': current_app.name,
         'version': current_app.config.get('VERSION')
     }), 200
+
+
+@bp_main.route('/stats/work-queue', methods=['GET'])
+def get_work_queue_stats():
+    """Depth & latency of the queue that incoming Slack events & actions are processed from"""
+    return jsonify(get_app_bot().work_queue.get_stats()), 200
+
+
+@bp_main.route('/stats/slack', methods=['GET'])
+def get_slack_stats():
+    """Call counts, errors & latency of outgoing Slack calls, per method"""
+    return jsonify(get_app_bot().st.get_stats()), 200
+
+
+@bp_main.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency, db statements & Slack calls per route & action, in Prometheus' text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
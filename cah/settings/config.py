@@ -42,6 +42,36 @@ class Common(object):
 
     LOG_LEVEL = 'DEBUG'
     PORT = 5004
+    # Seconds a cold import of cah.app may take (checked by the tests) so restarts stay quick
+    STARTUP_IMPORT_BUDGET_S = 3.0
+    # Slack events & actions are acknowledged right away, then processed on a pool of workers,
+    #   in order per channel. Past WORK_QUEUE_MAX_PENDING items, new ones are turned away.
+    WORK_QUEUE_WORKERS = 4
+    WORK_QUEUE_MAX_PENDING = 200
+    # Seconds the bot settings are cached before rereading them from the db
+    SETTINGS_CACHE_TTL_S = 60
+    # Tasks in the task table are triggered by the bot itself (instead of crontab hitting the cron routes)
+    IS_TASK_SCHEDULER_ENABLED = True
+
+    # DB connection pooling
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_PRE_PING = True
+    # Seconds before a pooled connection is replaced
+    DB_POOL_RECYCLE_S = 1800
+    # Milliseconds before Postgres cancels a statement (0 to disable)
+    DB_STATEMENT_TIMEOUT_MS = 15000
+    # Read-only queries (stats, scores) run with READ COMMITTED instead of SERIALIZABLE
+    DB_READ_COMMITTED_READS = True
+    # Times a write that hits a serialization failure or deadlock is retried
+    DB_SERIALIZATION_RETRIES = 3
+    # Each request's db work (and each queued event, action or job's) shares one session and is committed once,
+    #   when it ends. Fewer commits, but the session's transaction is held open across any Slack calls made,
+    #   and writes can't be retried one at a time: a unit aborted by a serialization failure is run again whole,
+    #   Slack calls included. When off, each transaction is committed (and retried) on its own.
+    DB_UNIT_OF_WORK_PER_REQUEST = True
+    # Schema migrations (e.g., new indexes) are applied when the app starts, and missing indexes reported
+    DB_MIGRATE_ON_BOOT = True
 
     SECRETS = None
     SQLALCHEMY_DATABASE_URI = 'postgresql+psycopg2://{usr}:{pwd}@{host}:{port}/{database}'
@@ -56,13 +86,27 @@ class Common(object):
             secrets_path = KEY_DIR.joinpath('cah-secretprops.properties')
         cls.SECRETS = read_secrets(secrets_path)
 
+    @classmethod
+    def get_engine_kwargs(cls) -> Dict:
+        """Collects the create_engine arguments for the pool settings above"""
+        engine_kwargs = {
+            'isolation_level': 'SERIALIZABLE',
+            'pool_size': cls.DB_POOL_SIZE,
+            'max_overflow': cls.DB_MAX_OVERFLOW,
+            'pool_pre_ping': cls.DB_POOL_PRE_PING,
+            'pool_recycle': cls.DB_POOL_RECYCLE_S,
+        }
+        if cls.DB_STATEMENT_TIMEOUT_MS > 0:
+            engine_kwargs['connect_args'] = {'options': f'-c statement_timeout={cls.DB_STATEMENT_TIMEOUT_MS}'}
+        return engine_kwargs
+
     @classmethod
     def build_db_engine(cls):
         """Builds database engine, sets SESSION"""
         if cls.SECRETS is None:
             cls.load_secrets()
         cls.SQLALCHEMY_DATABASE_URI = cls.SQLALCHEMY_DATABASE_URI.format(**cls.SECRETS)
-        engine = create_engine(cls.SQLALCHEMY_DATABASE_URI, isolation_level='SERIALIZABLE')
+        engine = create_engine(cls.SQLALCHEMY_DATABASE_URI, **cls.get_engine_kwargs())
         Base.metadata.bind = engine
         cls.SESSION = sessionmaker(bind=engine)
 
@@ -0,0 +1,214 @@
+"""
+Drives full games through CAHBot against local stand-ins for Slack & Postgres and reports, per operation,
+latency percentiles along with the db queries & Slack calls made.
+
+    python -m tests.benchmarks.bench_games --players 8 --rounds 20 --arp 2 --arc 1 --nukes 1
+    python -m tests.benchmarks.bench_games --db-url postgresql+psycopg2://cah@localhost/cah_bench
+    python -m tests.benchmarks.bench_games --save-baseline
+
+Results are compared to the stored baseline (tests/benchmarks/baseline.json). More db queries or Slack calls
+per operation than the baseline count as a regression (exit code 1). Latency is machine-dependent,
+so slower operations are only reported unless --strict-latency is set.
+"""
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import pathlib
+import random
+import sys
+import time
+from typing import (
+    Dict,
+    Iterator,
+    List,
+)
+
+from loguru import logger
+
+from cah.bot_base import CAHBot
+from cah.core.games import GameStatus
+from cah.db_eng import WizzyPSQLClient
+from cah.settings import Development
+
+from ..mocks.standins import (
+    STANDIN_DB_PROPS,
+    FakeSlackBotBase,
+    QueryCounter,
+    build_standin_bot,
+    make_standin_engine,
+    seed_standin_db,
+)
+
+BASELINE_PATH = pathlib.Path(__file__).parent.joinpath('baseline.json')
+# Allowed growth over the baseline before it counts as a regression
+COUNT_TOLERANCE = 0.1
+LATENCY_TOLERANCE = 0.5
+DECK_NAME = 'bench'
+
+
+class OpRecorder:
+    """Times operations, along with the db queries & Slack calls each one made"""
+
+    def __init__(self, query_counter: QueryCounter, fake_st: FakeSlackBotBase):
+        self.query_counter = query_counter
+        self.fake_st = fake_st
+        # op -> [(seconds, n_queries, n_slack_calls), ...]
+        self.samples = defaultdict(list)  # type: Dict[str, List]
+
+    @contextmanager
+    def measure(self, op: str) -> Iterator[None]:
+        n_queries = self.query_counter.n_queries
+        n_slack_calls = self.fake_st.n_calls
+        start = time.perf_counter()
+        yield
+        self.samples[op].append((time.perf_counter() - start, self.query_counter.n_queries - n_queries,
+                                 self.fake_st.n_calls - n_slack_calls))
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(pct * (len(values) - 1))))]
+
+    def summarize(self) -> Dict[str, Dict]:
+        summary = {}
+        for op, samples in sorted(self.samples.items()):
+            secs, queries, calls = zip(*samples)
+            summary[op] = {
+                'n': len(samples),
+                'p50_ms': round(1000 * self._percentile(secs, 0.5), 2),
+                'p95_ms': round(1000 * self._percentile(secs, 0.95), 2),
+                'max_ms': round(1000 * max(secs), 2),
+                'queries_per_op': round(sum(queries) / len(samples), 2),
+                'slack_calls_per_op': round(sum(calls) / len(samples), 2),
+            }
+        return summary
+
+
+def play_game(bot: CAHBot, recorder: OpRecorder, player_hashes: List[str], n_rounds: int, n_nukes: int) -> int:
+    """Plays a game of up to n_rounds rounds, returning the number of rounds played"""
+    channel = bot.channel_id
+    with recorder.measure('new_game'):
+        bot.new_game(deck_names=[DECK_NAME], player_hashes=player_hashes, channel=channel)
+    game = bot.get_game(channel)
+    n_played = 0
+    while n_played < n_rounds and game.status == GameStatus.PLAYER_DECISION:
+        pending = game.players_left_to_pick(as_name=False)
+        for p_hash in random.sample(pending, min(n_nukes, len(pending))):
+            with recorder.measure('decknuke'):
+                bot.decknuke(user=p_hash, channel=channel)
+        for p_hash in game.players_left_to_pick(as_name=False):
+            with recorder.measure('pick'):
+                bot.process_picks(user_hash=p_hash, message='randpick', channel=channel)
+        if game.status == GameStatus.JUDGE_DECISION:
+            # Judging wraps up the round & starts the next one
+            with recorder.measure('choose'):
+                bot.choose_card(user_hash=game.judge.player_hash, message='randchoose', channel=channel)
+        n_played += 1
+        with recorder.measure('display_points'):
+            bot.display_points(channel=channel)
+    if bot.eng.engine.dialect.name == 'postgresql':
+        # Game stats lean on Postgres-only aggregates (percentile_disc)
+        with recorder.measure('game_stats'):
+            bot.game_stats(channel=channel)
+    with recorder.measure('player_stats'):
+        bot.player_stats(user_id=player_hashes[0], message='', channel=channel)
+    with recorder.measure('end_game'):
+        bot.end_game(channel=channel)
+    return n_played
+
+
+def run_benchmark(n_players: int = 6, n_rounds: int = 10, n_arp: int = 1, n_arc: int = 0, n_nukes: int = 0,
+                  db_url: str = None, seed: int = 0) -> Dict:
+    """Sets up the stand-ins, plays a game and collects the results"""
+    random.seed(seed)
+    engine = make_standin_engine(db_url=db_url)
+    eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+    player_hashes = seed_standin_db(eng, n_players=n_players, n_arp=n_arp, n_arc=n_arc, deck_name=DECK_NAME)
+    query_counter = QueryCounter(engine)
+    fake_st = FakeSlackBotBase(main_channel=Development.MAIN_CHANNEL, channel_members=player_hashes)
+    recorder = OpRecorder(query_counter=query_counter, fake_st=fake_st)
+
+    start = time.perf_counter()
+    with recorder.measure('startup'):
+        # Round transitions run inline, landing in the timed operation that triggered them
+        bot = build_standin_bot(eng, fake_st=fake_st)
+    n_played = play_game(bot, recorder, player_hashes=player_hashes, n_rounds=n_rounds, n_nukes=n_nukes)
+    bot.work_queue.shutdown()
+    return {
+        'params': {
+            'players': n_players, 'rounds': n_rounds, 'arp': n_arp, 'arc': n_arc, 'nukes': n_nukes, 'seed': seed,
+            'db': 'sqlite' if db_url is None else engine.url.get_backend_name(),
+        },
+        'rounds_played': n_played,
+        'total_s': round(time.perf_counter() - start, 3),
+        'n_queries': query_counter.n_queries,
+        'slack_calls': dict(sorted(fake_st.calls.items())),
+        'ops': recorder.summarize(),
+    }
+
+
+def compare_to_baseline(results: Dict, baseline: Dict, strict_latency: bool = False) -> List[str]:
+    """Lists the ways the results fall behind the baseline; only count regressions fail unless strict_latency"""
+    regressions = []
+    for op, base in baseline['ops'].items():
+        res = results['ops'].get(op)
+        if res is None:
+            continue
+        for stat in ['queries_per_op', 'slack_calls_per_op']:
+            if res[stat] > base[stat] * (1 + COUNT_TOLERANCE) + 0.5:
+                regressions.append(f'{op}: {stat} went from {base[stat]} to {res[stat]}')
+        if res['p50_ms'] > base['p50_ms'] * (1 + LATENCY_TOLERANCE):
+            msg = f'{op}: p50 went from {base["p50_ms"]}ms to {res["p50_ms"]}ms'
+            if strict_latency:
+                regressions.append(msg)
+            else:
+                logger.warning(msg)
+    return regressions
+
+
+def print_results(results: Dict):
+    print(f'{results["rounds_played"]} rounds with {results["params"]} in {results["total_s"]}s: '
+          f'{results["n_queries"]} db queries, Slack calls: {results["slack_calls"]}')
+    cols = ['n', 'p50_ms', 'p95_ms', 'max_ms', 'queries_per_op', 'slack_calls_per_op']
+    print(f'{"op":<16}' + ''.join(f'{x:>20}' for x in cols))
+    for op, stats in results['ops'].items():
+        print(f'{op:<16}' + ''.join(f'{stats[x]:>20}' for x in cols))
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks full games against local stand-ins')
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--arp', type=int, default=1, help='players that auto-randpick')
+    parser.add_argument('--arc', type=int, default=0, help='players that auto-randchoose when judging')
+    parser.add_argument('--nukes', type=int, default=0, help='decknukes per round')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-url', help='a local (throwaway!) db to use instead of in-memory SQLite')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--strict-latency', action='store_true', help='fail on slower p50s too')
+    parsed = parser.parse_args(args)
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    results = run_benchmark(n_players=parsed.players, n_rounds=parsed.rounds, n_arp=parsed.arp, n_arc=parsed.arc,
+                            n_nukes=parsed.nukes, db_url=parsed.db_url, seed=parsed.seed)
+    print_results(results)
+    if parsed.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2) + '\n')
+        print(f'Saved baseline to {BASELINE_PATH}')
+        return 0
+    if not BASELINE_PATH.exists():
+        return 0
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if baseline['params'] != results['params']:
+        print(f'Baseline was run with {baseline["params"]}; skipping the comparison')
+        return 0
+    regressions = compare_to_baseline(results, baseline, strict_latency=parsed.strict_latency)
+    for regression in regressions:
+        print(f'REGRESSION - {regression}')
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,473 @@
+"""
+Replays Slack traffic (events, actions, slash commands & crons) against the app from `create_app`,
+served locally, at one or more request rates. Slack itself is stood in for by a fake Web API server &
+client, and the db by in-memory SQLite (or a local, throwaway Postgres with --db-url).
+
+    python -m tests.benchmarks.load_replay --players 40 --rate 20 50 100 200 --duration 10
+    python -m tests.benchmarks.load_replay --replay recorded.jsonl --speed 2
+    python -m tests.benchmarks.load_replay --slack-latency-ms 150 --workers 8 --max-pending 500
+
+By default, traffic is synthesized to look like a big channel spamming `pick` at the start of a round.
+Recorded traffic is a JSONL file with one request per line: `{"path": "/api/events", "json": {...}}` or
+`{"path": "/api/actions", "form": {"payload": "..."}}`, optionally with `"at_s"`, the seconds since the
+start of the recording it was sent at. Requests are signed with the stand-in signing secret.
+
+Each rate is run as its own stage, reporting throughput, latency percentiles & error rates per kind of
+request, along with the work queue's stats & how long it took to drain.
+"""
+import argparse
+from collections import (
+    Counter,
+    defaultdict,
+)
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+import itertools
+import json
+import logging
+import pathlib
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from loguru import logger
+import requests
+from slack_sdk import WebClient
+from slack_sdk.signature import SignatureVerifier
+from werkzeug.serving import make_server
+
+from cah.app import create_app
+from cah.core.throttle import (
+    ChannelTokenBuckets,
+    TokenBucket,
+)
+from cah.db_eng import WizzyPSQLClient
+from cah.settings import Development
+
+from ..mocks.standins import (
+    STANDIN_DB_PROPS,
+    FakeSlackBotBase,
+    FakeSlackWebAPI,
+    make_standin_engine,
+    seed_standin_db,
+)
+
+SIGNING_SECRET = 'standin-signing-secret'
+TEAM_ID = 'TSTANDIN'
+DECK_NAME = 'bench'
+CMD_YAML_PATH = pathlib.Path(__file__).parent.parent.parent.joinpath('cah', 'commands.yaml')
+# Share of each kind of request in synthesized traffic
+DEFAULT_MIX = {
+    'pick_event': 0.5,
+    'pick_action': 0.3,
+    'choose_event': 0.05,
+    'slash_status': 0.1,
+    'cron': 0.05,
+}
+DRAIN_TIMEOUT_S = 60
+
+
+class LoadItem:
+    """A request to send; its body is built when it's sent, so it can follow the game (e.g., who's judging)"""
+
+    def __init__(self, kind: str, path: str, build: Callable[[], Tuple[Optional[Dict], Optional[Dict]]],
+                 at_s: float = None):
+        """
+        Args:
+            build: returns the json body or the form data (the other being None)
+            at_s: seconds after the start of the stage to send it at; if not provided, sent at the stage's rate
+        """
+        self.kind = kind
+        self.path = path
+        self.build = build
+        self.at_s = at_s
+
+
+class LoadStandIns:
+    """The app served locally, along with the stand-ins it runs against"""
+
+    def __init__(self, n_players: int = 30, n_arp: int = 0, n_arc: int = 0, workers: int = None,
+                 max_pending: int = None, slack_latency_s: float = 0, is_throttled: bool = True, db_url: str = None):
+        """
+        Args:
+            slack_latency_s: seconds each Slack call takes
+            is_throttled: if False, Slack's rate limits are lifted to see what the app itself can handle
+        """
+        self.engine = make_standin_engine(db_url=db_url)
+        eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=self.engine)
+        self.player_hashes = seed_standin_db(eng, n_players=n_players, n_arp=n_arp, n_arc=n_arc,
+                                             deck_name=DECK_NAME)
+        self.config = build_config(workers=workers, max_pending=max_pending,
+                                   is_sqlite=self.engine.dialect.name == 'sqlite')
+        self.fake_api = FakeSlackWebAPI(latency_s=slack_latency_s).start()
+        self.fake_st = FakeSlackBotBase(main_channel=self.config.MAIN_CHANNEL, channel_members=self.player_hashes,
+                                        latency_s=slack_latency_s)
+        # Bolt's client, which only gets used for its auth check
+        self.fake_st.bot = WebClient(token='xoxb-standin', base_url=self.fake_api.api_url)
+
+        # The bot replaces the signal handlers with its cleanup; keep ours
+        handlers = {x: signal.getsignal(x) for x in [signal.SIGINT, signal.SIGTERM]}
+        with patch('cah.bot_base.SlackBotBase', new=lambda *args, **kwargs: self.fake_st), \
+                patch('cah.app.WizzyPSQLClient', new=partial(WizzyPSQLClient, engine=self.engine)):
+            self.app = create_app(config_class=self.config, props={'signing-secret': SIGNING_SECRET})
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+        self.bot = self.app.extensions['bot']
+        if not is_throttled:
+            self.bot.st.buckets = {k: TokenBucket(rate=1e9, capacity=10 ** 9) for k in self.bot.st.buckets.keys()}
+            self.bot.st.channel_buckets = {k: ChannelTokenBuckets(rate=1e9, capacity=10 ** 9)
+                                           for k in self.bot.st.channel_buckets.keys()}
+        self.fake_st.set_command_handler(self.bot, cmd_yaml_path=CMD_YAML_PATH, triggers=self.config.TRIGGERS)
+
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self._thread = threading.Thread(target=self.server.serve_forever, name='cah-app', daemon=True)
+        self._thread.start()
+
+    def start_game(self):
+        self.bot.new_game(deck_names=[DECK_NAME], player_hashes=self.player_hashes, channel=self.bot.channel_id)
+
+    def wait_for_drain(self, timeout_s: float = DRAIN_TIMEOUT_S) -> Optional[float]:
+        """Waits for the work queue to empty, returning the seconds it took (None if it didn't)"""
+        start = time.perf_counter()
+        while self.bot.work_queue.n_pending > 0:
+            if time.perf_counter() - start > timeout_s:
+                return None
+            time.sleep(0.01)
+        return time.perf_counter() - start
+
+    def shutdown(self):
+        self.server.shutdown()
+        with suppress(SystemExit):
+            self.bot.cleanup()
+        # Let what's running finish its response url posts
+        self.bot.work_queue.shutdown(wait=True)
+        self.fake_api.stop()
+
+
+def build_config(workers: int = None, max_pending: int = None, is_sqlite: bool = True):
+    """Development config, pointed at the stand-ins"""
+    attrs = {
+        'LOG_DIR': pathlib.Path(tempfile.gettempdir()).joinpath('cah-load-logs'),
+        'LOG_LEVEL': 'WARNING',
+        # Flask-SQLAlchemy isn't used for queries, but wants a url it can build an engine for
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    }
+    if is_sqlite:
+        # SQLite only has SERIALIZABLE
+        attrs['DB_READ_COMMITTED_READS'] = False
+    if workers is not None:
+        attrs['WORK_QUEUE_WORKERS'] = workers
+    if max_pending is not None:
+        attrs['WORK_QUEUE_MAX_PENDING'] = max_pending
+    return type('LoadTestConfig', (Development,), attrs)
+
+
+class TrafficSynthesizer:
+    """Builds Slack payloads for players of the game in the stand-ins' main channel"""
+
+    def __init__(self, stand_ins: LoadStandIns):
+        self.stand_ins = stand_ins
+        self.channel = stand_ins.bot.channel_id
+        self.trigger = stand_ins.config.TRIGGERS[0]
+        self._ids = itertools.count(1)
+
+    def _judge_hash(self) -> str:
+        game = self.stand_ins.bot.games.get(self.channel)
+        if game is None or game.judge is None:
+            return random.choice(self.stand_ins.player_hashes)
+        return game.judge.player_hash
+
+    def message_event(self, user: str, text: str) -> Dict:
+        n = next(self._ids)
+        return {
+            'token': 'standin',
+            'team_id': TEAM_ID,
+            'api_app_id': 'ASTANDIN',
+            'type': 'event_callback',
+            'event_id': f'Ev{n:08d}',
+            'event_time': int(time.time()),
+            'event': {
+                'type': 'message',
+                'channel_type': 'channel',
+                'user': user,
+                'text': text,
+                'channel': self.channel,
+                'ts': f'{time.time():.6f}',
+            },
+        }
+
+    def button_action(self, user: str, action_id: str, value: str) -> Dict:
+        n = next(self._ids)
+        return {
+            'type': 'block_actions',
+            'team': {'id': TEAM_ID},
+            'user': {'id': user},
+            'api_app_id': 'ASTANDIN',
+            'channel': {'id': self.channel},
+            'container': {'type': 'message', 'is_ephemeral': True},
+            'trigger_id': f'{n}.standin',
+            'response_url': self.stand_ins.fake_api.response_url(f'{n}'),
+            'actions': [{'action_id': action_id, 'block_id': f'b{n}', 'type': 'button', 'value': value,
+                         'action_ts': f'{time.time():.6f}'}],
+        }
+
+    def build_item(self, kind: str) -> LoadItem:
+        players = self.stand_ins.player_hashes
+        if kind == 'pick_event':
+            return LoadItem(kind, '/api/events', lambda: (self.message_event(
+                random.choice(players), f'{self.trigger} pick {random.randint(1, 5)}'), None))
+        if kind == 'pick_action':
+            def _build():
+                num = random.randint(1, 5)
+                payload = self.button_action(random.choice(players), f'game-pick-{num}', f'pick-{num}')
+                return None, {'payload': json.dumps(payload)}
+            return LoadItem(kind, '/api/actions', _build)
+        if kind == 'choose_event':
+            return LoadItem(kind, '/api/events', lambda: (self.message_event(
+                self._judge_hash(), f'{self.trigger} randchoose'), None))
+        if kind == 'slash_status':
+            return LoadItem(kind, '/api/slash', lambda: (None, {
+                'command': f'/{self.trigger}', 'text': 'status', 'team_id': TEAM_ID,
+                'user_id': random.choice(players), 'channel_id': self.channel}))
+        if kind == 'cron':
+            path = random.choice(['/api/crons/handle-randpick', '/api/crons/handle-randchoose'])
+            return LoadItem(kind, path, lambda: (None, None))
+        raise ValueError(f'Unknown kind of request: {kind}')
+
+    def synthesize(self, n_items: int, mix: Dict[str, float] = None) -> List[LoadItem]:
+        mix = DEFAULT_MIX if mix is None else mix
+        kinds = random.choices(list(mix.keys()), weights=list(mix.values()), k=n_items)
+        return [self.build_item(kind) for kind in kinds]
+
+
+def load_recording(path: pathlib.Path, speed: float = 1) -> List[LoadItem]:
+    """Reads recorded requests; their timing is kept (sped up by `speed`) when every one has it"""
+    lines = [json.loads(x) for x in path.read_text().splitlines() if x.strip() != '']
+    is_timed = all('at_s' in x for x in lines)
+    items = []
+    for line in lines:
+        kind = line.get('kind', line['path'].rsplit('/', 1)[-1])
+        body = (line.get('json'), line.get('form'))
+        items.append(LoadItem(kind, line['path'], lambda body=body: body,
+                              at_s=line['at_s'] / speed if is_timed else None))
+    return items
+
+
+def sign_request(body: str) -> Dict[str, str]:
+    timestamp = str(int(time.time()))
+    return {
+        'X-Slack-Request-Timestamp': timestamp,
+        'X-Slack-Signature': SignatureVerifier(SIGNING_SECRET).generate_signature(timestamp=timestamp, body=body),
+    }
+
+
+class StageResult:
+    """Outcome of each request sent in a stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # kind -> [(latency_s, is_error), ...]
+        self.samples = defaultdict(list)  # type: Dict[str, List[Tuple[float, bool]]]
+        self.statuses = Counter()  # type: Counter
+
+    def add(self, kind: str, latency_s: float, status: str):
+        with self._lock:
+            self.samples[kind].append((latency_s, not status.startswith('2')))
+            self.statuses[status] += 1
+
+    @staticmethod
+    def _percentile(values: List[float], pct: float) -> float:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(round(pct * (len(values) - 1))))]
+
+    def summarize(self) -> Dict[str, Dict]:
+        summary = {}
+        all_samples = [x for samples in self.samples.values() for x in samples]
+        for kind, samples in sorted(self.samples.items()) + [('all', all_samples)]:
+            if len(samples) == 0:
+                continue
+            latencies = [x[0] for x in samples]
+            summary[kind] = {
+                'n': len(samples),
+                'error_rate': round(sum(x[1] for x in samples) / len(samples), 4),
+                'p50_ms': round(1000 * self._percentile(latencies, 0.5), 1),
+                'p95_ms': round(1000 * self._percentile(latencies, 0.95), 1),
+                'p99_ms': round(1000 * self._percentile(latencies, 0.99), 1),
+                'max_ms': round(1000 * max(latencies), 1),
+            }
+        return summary
+
+
+def send_items(base_url: str, items: List[LoadItem], rate: float, concurrency: int = 64) -> Tuple[StageResult, float]:
+    """Sends the items open-loop (on schedule, regardless of how long earlier ones take)
+
+    Latency is counted from when a request was due, so time spent waiting on a free sender counts too.
+
+    Returns:
+        the results & the seconds it took to get all the responses
+    """
+    result = StageResult()
+    local = threading.local()
+
+    def _send(item: LoadItem, due: float):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        json_body, form = item.build()
+        if json_body is not None:
+            body, content_type = json.dumps(json_body), 'application/json'
+        else:
+            body, content_type = urlencode(form or {}), 'application/x-www-form-urlencoded'
+        headers = {'Content-Type': content_type, **sign_request(body)}
+        try:
+            resp = session.post(f'{base_url}{item.path}', data=body.encode(), headers=headers, timeout=30)
+            status = str(resp.status_code)
+        except requests.RequestException as e:
+            status = e.__class__.__name__
+        result.add(item.kind, time.perf_counter() - due, status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as executor:
+        for i, item in enumerate(items):
+            due = start + (item.at_s if item.at_s is not None else i / rate)
+            wait_s = due - time.perf_counter()
+            if wait_s > 0:
+                time.sleep(wait_s)
+            executor.submit(_send, item, due)
+    return result, time.perf_counter() - start
+
+
+def run_stage(stand_ins: LoadStandIns, items: List[LoadItem], rate: float, concurrency: int = 64,
+              drain_timeout_s: float = DRAIN_TIMEOUT_S) -> Dict:
+    """Sends a stage's requests, then waits for the bot to work through them"""
+    slack_calls = stand_ins.fake_st.n_calls
+    queue_stats = stand_ins.bot.work_queue.get_stats()
+    result, send_s = send_items(stand_ins.url, items, rate=rate, concurrency=concurrency)
+    drain_s = stand_ins.wait_for_drain(timeout_s=drain_timeout_s)
+    work_queue = requests.get(f'{stand_ins.url}/stats/work-queue', timeout=10).json()
+    slack = requests.get(f'{stand_ins.url}/stats/slack', timeout=10).json()
+    summary = result.summarize()
+    return {
+        'rate': rate,
+        'n_sent': len(items),
+        'throughput_rps': round(len(items) / send_s, 1),
+        'drain_s': None if drain_s is None else round(drain_s, 2),
+        'statuses': dict(result.statuses),
+        'requests': summary,
+        'work_queue': {
+            'n_processed': work_queue['n_processed'] - queue_stats['n_processed'],
+            'n_failed': work_queue['n_failed'] - queue_stats['n_failed'],
+            'n_refused': work_queue['n_refused'] - queue_stats['n_refused'],
+            'wait_ms': work_queue['wait_ms'],
+            'run_ms': work_queue['run_ms'],
+        },
+        'slack_calls': stand_ins.fake_st.n_calls - slack_calls,
+        # Since startup, incl. time spent waiting on the rate limits
+        'slack': {k: {x: v[x] for x in ['n_calls', 'avg_ms', 'max_ms']} for k, v in slack.items()},
+    }
+
+
+def run_load(rates: List[float], duration_s: float = 10, n_players: int = 30, n_arp: int = 0, n_arc: int = 0,
+             workers: int = None, max_pending: int = None, slack_latency_s: float = 0, is_throttled: bool = True,
+             concurrency: int = 64, drain_timeout_s: float = DRAIN_TIMEOUT_S, replay_path: pathlib.Path = None,
+             speed: float = 1, mix: Dict[str, float] = None, db_url: str = None, seed: int = 0) -> List[Dict]:
+    """Starts the app & a game, then runs a stage per rate"""
+    random.seed(seed)
+    stand_ins = LoadStandIns(n_players=n_players, n_arp=n_arp, n_arc=n_arc, workers=workers,
+                             max_pending=max_pending, slack_latency_s=slack_latency_s, is_throttled=is_throttled,
+                             db_url=db_url)
+    try:
+        stand_ins.start_game()
+        synthesizer = TrafficSynthesizer(stand_ins)
+        stages = []
+        for rate in rates:
+            if replay_path is not None:
+                items = load_recording(replay_path, speed=speed)
+            else:
+                items = synthesizer.synthesize(n_items=max(1, int(rate * duration_s)), mix=mix)
+            stages.append(run_stage(stand_ins, items, rate=rate, concurrency=concurrency,
+                                    drain_timeout_s=drain_timeout_s))
+        return stages
+    finally:
+        stand_ins.shutdown()
+
+
+def print_stage(stage: Dict):
+    wq = stage['work_queue']
+    print(f'\n@ {stage["rate"]} req/s: sent {stage["n_sent"]} at {stage["throughput_rps"]} req/s, '
+          f'drained in {stage["drain_s"]}s, statuses: {stage["statuses"]}, Slack calls: {stage["slack_calls"]}')
+    print(f'   work queue: {wq["n_processed"]} processed, {wq["n_failed"]} failed, {wq["n_refused"]} refused, '
+          f'wait p95 {wq["wait_ms"]["p95"]}ms, run p95 {wq["run_ms"]["p95"]}ms')
+    print('   Slack: ' + ', '.join(f'{k} {v["n_calls"]}x avg {v["avg_ms"]}ms' for k, v in stage['slack'].items()))
+    cols = ['n', 'error_rate', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+    print(f'   {"kind":<20}' + ''.join(f'{x:>12}' for x in cols))
+    for kind, stats in stage['requests'].items():
+        print(f'   {kind:<20}' + ''.join(f'{stats[x]:>12}' for x in cols))
+
+
+def parse_mix(mix_str: str) -> Dict[str, float]:
+    """Parses e.g., 'pick_event=0.7,cron=0.3'"""
+    mix = {}
+    for part in mix_str.split(','):
+        kind, share = part.split('=')
+        if kind.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Unknown kind of request: {kind} (one of {list(DEFAULT_MIX)})')
+        mix[kind.strip()] = float(share)
+    return mix
+
+
+def main(args: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replays Slack traffic against the app & local stand-ins')
+    parser.add_argument('--rate', type=float, nargs='+', default=[10, 50, 100], help='requests/s, a stage each')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of synthesized traffic per stage')
+    parser.add_argument('--players', type=int, default=30)
+    parser.add_argument('--arp', type=int, default=0, help='players that auto-randpick')
+    parser.add_argument('--arc', type=int, default=0, help='players that auto-randchoose when judging')
+    parser.add_argument('--mix', type=parse_mix, help=f'share of each kind of request (of {list(DEFAULT_MIX)})')
+    parser.add_argument('--replay', type=pathlib.Path, help='JSONL of recorded requests to send instead')
+    parser.add_argument('--speed', type=float, default=1, help='speeds up timed recordings')
+    parser.add_argument('--workers', type=int, help='work queue workers (default from config)')
+    parser.add_argument('--max-pending', type=int, help='work queue capacity (default from config)')
+    parser.add_argument('--slack-latency-ms', type=float, default=0, help='time each Slack call takes')
+    parser.add_argument('--no-throttle', action='store_true', help='lift Slack\'s rate limits')
+    parser.add_argument('--concurrency', type=int, default=64, help='requests in flight at most')
+    parser.add_argument('--drain-timeout', type=float, default=DRAIN_TIMEOUT_S,
+                        help='seconds to wait for the work queue to empty after each stage')
+    parser.add_argument('--db-url', help='a local (throwaway!) db to use instead of in-memory SQLite')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', type=pathlib.Path, help='also write the results here')
+    parsed = parser.parse_args(args)
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    # Leave out werkzeug's line per request
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    stages = run_load(rates=parsed.rate, duration_s=parsed.duration, n_players=parsed.players, n_arp=parsed.arp,
+                      n_arc=parsed.arc, workers=parsed.workers, max_pending=parsed.max_pending,
+                      slack_latency_s=parsed.slack_latency_ms / 1000, is_throttled=not parsed.no_throttle,
+                      concurrency=parsed.concurrency, drain_timeout_s=parsed.drain_timeout,
+                      replay_path=parsed.replay, speed=parsed.speed, mix=parsed.mix, db_url=parsed.db_url,
+                      seed=parsed.seed)
+    for stage in stages:
+        print_stage(stage)
+    if parsed.json is not None:
+        parsed.json.write_text(json.dumps(stages, indent=2) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
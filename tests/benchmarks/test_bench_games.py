@@ -0,0 +1,43 @@
+from copy import deepcopy
+from unittest import (
+    TestCase,
+    main,
+)
+
+from .bench_games import (
+    compare_to_baseline,
+    run_benchmark,
+)
+
+
+class TestBenchGames(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.results = run_benchmark(n_players=4, n_rounds=3, n_arp=1, n_arc=1, n_nukes=1)
+
+    def test_full_game(self):
+        self.assertEqual(3, self.results['rounds_played'])
+        for op in ['startup', 'new_game', 'decknuke', 'pick', 'display_points', 'player_stats', 'end_game']:
+            self.assertIn(op, self.results['ops'])
+        self.assertEqual(3, self.results['ops']['display_points']['n'])
+        self.assertGreater(self.results['n_queries'], 0)
+        self.assertGreater(self.results['slack_calls']['chat.postMessage'], 0)
+
+    def test_compare_to_baseline(self):
+        self.assertEqual([], compare_to_baseline(self.results, baseline=self.results, strict_latency=True))
+        # More queries per pick than the baseline
+        results = deepcopy(self.results)
+        results['ops']['pick']['queries_per_op'] *= 2
+        regressions = compare_to_baseline(results, baseline=self.results)
+        self.assertEqual(1, len(regressions))
+        self.assertTrue(regressions[0].startswith('pick: queries_per_op'))
+        # Slower ops only count when asked to
+        results = deepcopy(self.results)
+        results['ops']['pick']['p50_ms'] = self.results['ops']['pick']['p50_ms'] * 10 + 1
+        self.assertEqual([], compare_to_baseline(results, baseline=self.results))
+        self.assertEqual(1, len(compare_to_baseline(results, baseline=self.results, strict_latency=True)))
+
+
+if __name__ == '__main__':
+    main()
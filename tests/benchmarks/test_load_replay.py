@@ -0,0 +1,52 @@
+import json
+import pathlib
+import tempfile
+from unittest import (
+    TestCase,
+    main,
+)
+
+from .load_replay import (
+    DEFAULT_MIX,
+    run_load,
+)
+
+
+class TestLoadReplay(TestCase):
+
+    def test_synthesized(self):
+        stages = run_load(rates=[40], duration_s=1, n_players=6, is_throttled=False, drain_timeout_s=10)
+        self.assertEqual(1, len(stages))
+        stage = stages[0]
+        self.assertEqual(40, stage['n_sent'])
+        self.assertEqual({'200': 40}, stage['statuses'])
+        self.assertIsNotNone(stage['drain_s'])
+        self.assertEqual(0, stage['requests']['all']['error_rate'])
+        self.assertTrue(set(stage['requests'].keys()).issubset(set(DEFAULT_MIX.keys()) | {'all'}))
+        # Every event & action made it through the Bolt app & the work queue, as did the crons' work for the game
+        n_queued = sum(stage['requests'][x]['n'] for x in ['pick_event', 'pick_action', 'choose_event', 'cron']
+                       if x in stage['requests'])
+        self.assertEqual(n_queued, stage['work_queue']['n_processed'])
+        self.assertEqual(0, stage['work_queue']['n_refused'])
+
+    def test_replay(self):
+        lines = [
+            {'path': '/api/crons/handle-randpick', 'at_s': 0},
+            {'path': '/api/slash', 'form': {'command': '/wah', 'text': 'status', 'user_id': 'UREPLAY',
+                                            'channel_id': 'CREPLAY'}, 'at_s': 0.1},
+            {'path': '/api/not-a-route', 'json': {}, 'at_s': 0.2},
+        ]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = pathlib.Path(tmp_dir).joinpath('recorded.jsonl')
+            path.write_text('\n'.join(json.dumps(x) for x in lines))
+            stages = run_load(rates=[1], n_players=4, replay_path=path, speed=2, is_throttled=False,
+                              drain_timeout_s=10)
+        stage = stages[0]
+        self.assertEqual(3, stage['n_sent'])
+        self.assertEqual(2, stage['statuses']['200'])
+        self.assertEqual(1, stage['requests']['not-a-route']['error_rate'])
+        self.assertEqual(0, stage['requests']['slash']['error_rate'])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,3 @@
-from typing import Union
 from unittest import (
     TestCase,
     main,
@@ -35,41 +34,96 @@ class TestDeck(TestCase):
         self.mock_session.expunge_all.assert_called()
 
     def _query_handler(self, *args, **kwargs):
-        select_tbl = self.mock_session.query.call_args.args
-        if TableDeck in select_tbl:
+        # Queries may select either whole tables or single columns
+        select_tbls = [getattr(x, 'class_', x) for x in self.mock_session.query.call_args.args]
+        if TableDeck in select_tbls:
             return [TableDeck(name=x) for x in self.mock_deck_combo]
-        elif TableAnswerCard in select_tbl:
-            return [TableAnswerCard(card_text=f'Test answer {i}.', deck_key=2) for i in range(self.n_answer_cards)]
-        elif TableQuestionCard in select_tbl:
-            return [TableQuestionCard(card_text=f'Test question {i}.', deck_key=2, responses_required=1)
-                    for i in range(self.n_question_cards)]
+        elif TableAnswerCard in select_tbls:
+            acards = []
+            for i in range(self.n_answer_cards):
+                acard = TableAnswerCard(card_text=f'Test answer {i}.', deck_key=2)
+                acard.answer_card_id = i
+                acards.append(acard)
+            return acards
+        elif TableQuestionCard in select_tbls:
+            qcards = []
+            for i in range(self.n_question_cards):
+                qcard = TableQuestionCard(card_text=f'Test question {i}.', deck_key=2, responses_required=1)
+                qcard.question_card_id = i
+                qcards.append(qcard)
+            return qcards
 
     def test_num_answer_cards(self):
-        self.assertEqual(self.n_answer_cards, len(self.deck.answers_card_list))
+        self.assertEqual(self.n_answer_cards, len(self.deck.answer_card_ids))
         self.assertEqual(self.n_answer_cards, self.deck.num_answer_cards)
 
     def test_num_question_cards(self):
-        self.assertEqual(self.n_question_cards, len(self.deck.questions_card_list))
+        self.assertEqual(self.n_question_cards, len(self.deck.question_card_ids))
         self.assertEqual(self.n_question_cards, self.deck.num_question_cards)
 
     def test_shuffle(self):
-        alist = self.deck.answers_card_list.copy()
-        qlist = self.deck.questions_card_list.copy()
+        alist = self.deck.answer_card_ids.copy()
+        qlist = self.deck.question_card_ids.copy()
         self.deck.shuffle_deck()
-        self.assertNotEqual(alist, self.deck.answers_card_list)
-        self.assertNotEqual(qlist, self.deck.questions_card_list)
+        self.assertNotEqual(alist, self.deck.answer_card_ids)
+        self.assertNotEqual(qlist, self.deck.question_card_ids)
+        self.assertCountEqual(alist, self.deck.answer_card_ids)
 
     def test_deal(self):
-        instances = {
-            'answer': TableAnswerCard,
-            'question': TableQuestionCard,
-        }
-        for instance, tbl in instances.items():
-            before = getattr(self.deck, f'{instance}s_card_list').copy()
-            method = getattr(self.deck, f'deal_{instance}_card')
-            card = method()  # type: Union[TableAnswerCard, TableQuestionCard]
-            self.assertLess(len(getattr(self.deck, f'{instance}s_card_list')), len(before))
-            self.assertNotIn(card, getattr(self.deck, f'{instance}s_card_list'))
+        self.mock_session.query.reset_mock()
+        card_ids = self.deck.deal_answer_cards(n_cards=5)
+        self.assertEqual(5, len(set(card_ids)))
+        card_id = self.deck.deal_answer_card()
+        self.assertNotIn(card_id, card_ids)
+        self.assertEqual(self.n_answer_cards - 6, self.deck.num_answer_cards)
+        # Dealing answers doesn't touch the db
+        self.mock_session.query.assert_not_called()
+
+        qcard = self.deck.deal_question_card()  # type: TableQuestionCard
+        self.assertIsInstance(qcard, TableQuestionCard)
+        self.assertEqual(self.n_question_cards - 1, self.deck.num_question_cards)
+        # The rest of the questions are loaded along with the first
+        self.deck.deal_question_card()
+        self.assertEqual(1, self.mock_session.query.call_count)
+
+        # Asking for more than what's left only deals what's left
+        card_ids = self.deck.deal_answer_cards(n_cards=self.n_answer_cards)
+        self.assertEqual(self.n_answer_cards - 6, len(card_ids))
+        self.assertEqual(0, self.deck.num_answer_cards)
+        with self.assertRaises(IndexError):
+            self.deck.deal_answer_card()
+
+    def test_flush_draw_counts(self):
+        for _ in range(3):
+            self.deck.deal_answer_cards(n_cards=5)
+        self.deck.deal_question_card()
+        self.mock_session.query.reset_mock()
+        self.mock_eng.session_mgr.reset_mock()
+
+        self.deck.flush_draw_counts()
+        # One transaction, one UPDATE per card type
+        self.mock_eng.session_mgr.assert_called_once()
+        self.assertEqual(2, self.mock_session.query.return_value.filter.return_value.update.call_count)
+        # Nothing left to flush
+        self.mock_eng.session_mgr.reset_mock()
+        self.deck.flush_draw_counts()
+        self.mock_eng.session_mgr.assert_not_called()
+
+    def test_flush_draw_counts_failed(self):
+        """Increments that fail to be written are kept for the next flush"""
+        self.deck.deal_answer_cards(n_cards=5)
+        update = self.mock_session.query.return_value.filter.return_value.update
+        update.side_effect = RuntimeError('db went away')
+        with self.assertRaises(RuntimeError):
+            self.deck.flush_draw_counts()
+        update.side_effect = None
+        update.reset_mock()
+        self.deck.deal_answer_cards(n_cards=5)
+        self.deck.flush_draw_counts()
+        # The cards from both deals were dealt once each
+        update.assert_called_once()
+        card_ids = self.mock_session.query.return_value.filter.call_args.args[0].right.value
+        self.assertEqual(10, len(card_ids))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,46 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from cah.core.game_registry import GameRegistry
+
+
+class TestGameRegistry(TestCase):
+
+    def setUp(self) -> None:
+        self.registry = GameRegistry()
+        self.game_a = MagicMock(name='game_a', game_id=1, channel_id='CA')
+        self.game_a.players.player_dict = {'UA': MagicMock(), 'UB': MagicMock()}
+        self.game_b = MagicMock(name='game_b', game_id=2, channel_id='CB')
+        self.game_b.players.player_dict = {'UC': MagicMock()}
+        self.registry.set('CA', self.game_a)
+        self.registry.set('CB', self.game_b)
+
+    def test_lookups(self):
+        self.assertEqual(2, len(self.registry))
+        self.assertIs(self.game_a, self.registry.get('CA'))
+        self.assertIsNone(self.registry.get('CX'))
+        self.assertIs(self.game_b, self.registry.get_by_id(2))
+        self.assertIsNone(self.registry.get_by_id(3))
+
+    def test_players(self):
+        self.assertListEqual([self.game_b], self.registry.find_player_games('UC'))
+        self.assertListEqual([], self.registry.find_player_games('UX'))
+        self.assertListEqual(['UA', 'UB', 'UC'], self.registry.get_player_hashes())
+
+    def test_remove(self):
+        self.assertIs(self.game_a, self.registry.remove('CA'))
+        self.assertIsNone(self.registry.remove('CA'))
+        self.registry.set('CB', None)
+        self.assertEqual(0, len(self.registry))
+        self.assertListEqual([], self.registry.games)
+
+    def test_channel_lock(self):
+        self.assertIs(self.registry.channel_lock('CA'), self.registry.channel_lock('CA'))
+        self.assertIsNot(self.registry.channel_lock('CA'), self.registry.channel_lock('CB'))
+
+
+if __name__ == '__main__':
+    main()
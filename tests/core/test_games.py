@@ -85,6 +85,15 @@ class TestGames(TestCase):
         pass
         # Ensure judge is the same
 
+    def test_end_round(self):
+        self.game.game_round_id = 12
+        self.game.end_round()
+        self.assertEqual(GameStatus.END_ROUND, self.game.status)
+        # The round is added to the players' stats
+        self.mock_gq().rollup_player_stats.assert_called_once_with(game_round_id=12)
+        # ...and the cached game stats are dropped
+        self.mock_gq().invalidate_game_stats.assert_called_once()
+
     def test_process_picks(self):
         """Tests the process_picks method"""
         # Preload some mocks
@@ -173,6 +182,53 @@ class TestGames(TestCase):
                 self.game.assign_player_pick.assert_called()
             self.game.assign_player_pick.reset_mock()
 
+    def test_process_last_picks(self):
+        """When the last picks come in at once, only the first moves the round on to judging"""
+        self.game.assign_player_pick = MagicMock(name='assign_player_pick', return_value='pick registered')
+        self.game.players_left_to_pick = MagicMock(name='players_left_to_pick', return_value=[])
+        self.game._display_picks = MagicMock(name='_display_picks')
+        self.game.message_updates = MagicMock(name='message_updates')
+        self.game.game_round_tbl = TableGameRound(game_key=1, question_card_key=3)
+        self.game.current_question_card = TableQuestionCard(card_text='test', deck_key=3, responses_required=1)
+        self.game.status = GameStatus.PLAYER_DECISION
+        self.game.judge.is_arc = False
+        judge_hash = self.game.judge.player_hash
+        p_hash, other_p_hash = random.sample([x for x in self.player_hashes if x != judge_hash], 2)
+        for player_hash in [p_hash, other_p_hash]:
+            self.game.players.player_dict[player_hash].get_all_cards = MagicMock(return_value=5)
+            self.game.players.player_dict[player_hash].is_dm_cards = False
+            self.game.process_picks(player_hash=player_hash, message='pick 1')
+        self.assertEqual(GameStatus.JUDGE_DECISION, self.game.status)
+        self.game._display_picks.assert_called_once()
+
+    def test_deal_cards(self):
+        """Tests that dealing reads and writes all players' hands in bulk"""
+        mock_pq = MagicMock(name='PlayerQueries')
+        self.game.players.pq = mock_pq
+        for i, p_obj in enumerate(self.game.players.player_dict.values()):
+            p_obj.player_table_id = i
+        # New player, a player with one picked card, a player with a full hand, ...
+        open_slots = {
+            0: [(None, i) for i in range(5)],
+            1: [(11, 2)],
+            2: [],
+        }
+        mock_pq.get_open_hand_slots.side_effect = lambda player_ids, hand_size: {
+            x: open_slots.get(x, [(20 + x, 0)]) for x in player_ids
+        }
+        self.mock_deck.num_answer_cards = 100
+        self.mock_deck.deal_answer_cards.side_effect = lambda n_cards: [100 + x for x in range(n_cards)]
+
+        self.game.deal_cards()
+        mock_pq.get_open_hand_slots.assert_called_once()
+        mock_pq.fill_hand_slots.assert_called_once()
+        slot_fills = mock_pq.fill_hand_slots.call_args.kwargs['slot_fills']
+        self.assertEqual(5 + 1 + 3, len(slot_fills))
+        self.assertIn((0, None, 4, 104), slot_fills)
+        self.assertIn((1, 11, 2, 100), slot_fills)
+        self.assertNotIn(2, [x[0] for x in slot_fills])
+        mock_pq.set_cards_in_hand.assert_not_called()
+
 
 if __name__ == '__main__':
     main()
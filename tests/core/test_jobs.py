@@ -0,0 +1,200 @@
+import threading
+import time
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from pukr import get_logger
+
+from cah.core.jobs import (
+    CoalescedMessageUpdates,
+    DelayedJobQueue,
+    OrderedWorkQueue,
+    run_later,
+)
+
+
+class TestDelayedJobQueue(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_jobs')
+
+    def setUp(self) -> None:
+        self.queue = DelayedJobQueue(log=self.log, max_workers=2)
+        self.addCleanup(self.queue.shutdown)
+
+    def test_runs_in_delay_order(self):
+        order = []
+        done = threading.Event()
+
+        def _record(val: str):
+            order.append(val)
+            if len(order) == 3:
+                done.set()
+
+        self.queue.schedule(0.3, _record, 'c')
+        self.queue.schedule(0.1, _record, 'a')
+        self.queue.schedule(0.2, _record, 'b')
+        self.assertTrue(done.wait(timeout=5))
+        self.assertListEqual(['a', 'b', 'c'], order)
+
+    def test_does_not_block_caller(self):
+        start = time.perf_counter()
+        self.queue.schedule(5, MagicMock(name='slow_job'))
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(1, self.queue.n_pending)
+
+    def test_cancel(self):
+        mock_job = MagicMock(name='job')
+        job = self.queue.schedule(0.1, mock_job)
+        job.cancel()
+        time.sleep(0.3)
+        mock_job.assert_not_called()
+
+    def test_wrapper_and_errors(self):
+        done = threading.Event()
+        wrapped = []
+
+        def _wrapper(func):
+            wrapped.append(True)
+            func()
+
+        queue = DelayedJobQueue(log=self.log, job_wrapper=_wrapper)
+        self.addCleanup(queue.shutdown)
+        # A failing job shouldn't take down the queue
+        queue.schedule(0, MagicMock(name='bad_job', side_effect=ValueError('boom')))
+        queue.schedule(0.1, done.set)
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(2, len(wrapped))
+
+    def test_run_later_without_queue(self):
+        mock_job = MagicMock(name='job')
+        self.assertIsNone(run_later(None, 5, mock_job, 1, name='job', x=2))
+        mock_job.assert_called_once_with(1, x=2)
+
+
+class TestOrderedWorkQueue(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_jobs')
+
+    def setUp(self) -> None:
+        self.queue = OrderedWorkQueue(log=self.log, max_workers=4, max_pending=10)
+        self.addCleanup(self.queue.shutdown)
+
+    def test_ordered_per_key(self):
+        order = {'a': [], 'b': []}
+        done = threading.Semaphore(0)
+
+        def _record(key: str, val: int):
+            # Later items finish faster, so they'd get ahead if a key's items overlapped
+            time.sleep(0.05 - val * 0.01)
+            order[key].append(val)
+            done.release()
+
+        for i in range(4):
+            self.assertTrue(self.queue.submit('a', _record, 'a', i))
+            self.assertTrue(self.queue.submit('b', _record, 'b', i))
+        for _ in range(8):
+            self.assertTrue(done.acquire(timeout=5))
+        self.assertListEqual([0, 1, 2, 3], order['a'])
+        self.assertListEqual([0, 1, 2, 3], order['b'])
+        self.queue.shutdown(wait=True)
+        stats = self.queue.get_stats()
+        self.assertEqual(0, stats['n_pending'])
+        self.assertEqual(8, stats['n_processed'])
+        self.assertIsNotNone(stats['run_ms']['avg'])
+
+    def test_shutdown_drains(self):
+        release = threading.Event()
+        mock_work = MagicMock(name='work')
+        self.queue.submit('a', release.wait, 5)
+        for _ in range(3):
+            self.queue.submit('a', mock_work)
+        threading.Timer(0.1, release.set).start()
+        # Everything already accepted is run before shutting down
+        self.queue.shutdown(wait=True)
+        self.assertEqual(3, mock_work.call_count)
+        self.assertFalse(self.queue.submit('a', mock_work))
+
+    def test_keys_run_in_parallel(self):
+        release = threading.Event()
+        done = threading.Event()
+        self.queue.submit('a', release.wait, 5)
+        self.queue.submit('b', done.set)
+        # 'b' isn't held up by the blocked 'a'
+        self.assertTrue(done.wait(timeout=5))
+        release.set()
+
+    def test_refuses_when_full(self):
+        release = threading.Event()
+        for _ in range(10):
+            self.assertTrue(self.queue.submit('a', release.wait, 5))
+        self.assertFalse(self.queue.submit('b', MagicMock(name='work')))
+        stats = self.queue.get_stats()
+        self.assertEqual(10, stats['n_pending'])
+        self.assertEqual(1, stats['n_refused'])
+        release.set()
+
+    def test_wrapper_and_errors(self):
+        done = threading.Event()
+        wrapped = []
+
+        def _wrapper(func):
+            wrapped.append(True)
+            func()
+
+        queue = OrderedWorkQueue(log=self.log, job_wrapper=_wrapper)
+        self.addCleanup(queue.shutdown)
+        # A failing item shouldn't hold up the rest of its key
+        queue.submit('a', MagicMock(name='bad_work', side_effect=ValueError('boom')))
+        queue.submit('a', done.set)
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(2, len(wrapped))
+        self.assertEqual(1, queue.get_stats()['n_failed'])
+
+
+class TestCoalescedMessageUpdates(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_jobs')
+
+    def setUp(self) -> None:
+        self.queue = DelayedJobQueue(log=self.log)
+        self.addCleanup(self.queue.shutdown)
+        self.mock_update = MagicMock(name='update_message')
+        self.updates = CoalescedMessageUpdates(log=self.log, update_func=self.mock_update, job_queue=self.queue,
+                                               delay_s=0.2)
+
+    def test_burst_is_sent_once(self):
+        for i in range(10):
+            self.updates.update('C1', '111.1', blocks=[i])
+        self.updates.update('C1', '222.2', blocks=['other'])
+        self.mock_update.assert_not_called()
+        time.sleep(0.5)
+        self.assertEqual(2, self.mock_update.call_count)
+        self.mock_update.assert_any_call('C1', '111.1', blocks=[9])
+        self.mock_update.assert_any_call('C1', '222.2', blocks=['other'])
+        self.assertEqual(0, self.updates.n_pending)
+
+    def test_update_now_replaces_pending(self):
+        self.updates.update('C1', '111.1', blocks=['remaining'])
+        self.updates.update_now('C1', '111.1', message='done')
+        self.mock_update.assert_called_once_with('C1', '111.1', message='done')
+        # The held back update doesn't follow it
+        time.sleep(0.4)
+        self.assertEqual(1, self.mock_update.call_count)
+
+    def test_without_queue(self):
+        updates = CoalescedMessageUpdates(log=self.log, update_func=self.mock_update, job_queue=None)
+        updates.update('C1', '111.1', blocks=['a'])
+        self.mock_update.assert_called_once_with('C1', '111.1', blocks=['a'])
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,11 @@ from unittest.mock import (
 
 from pukr import get_logger
 
-from cah.core.players import Player
+from cah.core.players import (
+    Player,
+    Players,
+)
+from cah.core.render_cache import RenderCache
 from cah.model import (
     TableAnswerCard,
     TablePlayer,
@@ -72,6 +76,23 @@ class TestPlayer(TestCase):
         self.assertIsNone(self.player._choice_order)
         self.mock_pq.handle_player_new_round.assert_called()
 
+    def test_render_hand_cached(self):
+        self.player.render_cache = RenderCache()
+        self.player.game_round_id = 10
+        self.mock_pq.get_player_hand.return_value = [
+            TableAnswerCard(card_text=f'card {i}', deck_key=1) for i in range(5)
+        ]
+        first = self.player.render_hand(max_selected=1)
+        self.assertEqual(first, self.player.render_hand(max_selected=1))
+        self.mock_pq.get_player_hand.assert_called_once()
+        # A different number of required picks renders differently
+        self.player.render_hand(max_selected=2)
+        self.assertEqual(2, self.mock_pq.get_player_hand.call_count)
+        # New cards mean a new render
+        self.player.take_cards([1, 2])
+        self.player.render_hand(max_selected=1)
+        self.assertEqual(3, self.mock_pq.get_player_hand.call_count)
+
     def test_pick_card(self):
         a_1 = TableAnswerCard(card_text='one', deck_key=random.randint(3, 500))
         a_2 = TableAnswerCard(card_text='two', deck_key=random.randint(3, 500))
@@ -150,6 +171,46 @@ class TestPlayers(TestCase):
     def setUpClass(cls) -> None:
         cls.log = get_logger('cah_test')
 
+    def setUp(self) -> None:
+        self.mock_eng = MagicMock(name='PSQLClient')
+        self.mock_st = MagicMock(name='SlackTools')
+        self.mock_config = MagicMock(name='config', MAIN_CHANNEL='CXXX')
+        self.mock_pq = make_patcher(self, 'cah.core.players.PlayerQueries').return_value
+        self.mock_pq.get_player_table.side_effect = lambda player_hash: TablePlayer(
+            slack_user_hash=player_hash, display_name=player_hash.lower(), avi_url='test.com'
+        )
+        self.mock_render_hand = make_patcher(self, 'cah.core.players.Player.render_hand')
+        self.mock_render_hand.return_value = [{'type': 'section'}]
+        self.player_hashes = [f'U{i}' for i in range(6)]
+        self.players = Players(player_hash_list=self.player_hashes.copy(), slack_api=self.mock_st,
+                               eng=self.mock_eng, parent_log=self.log, config=self.mock_config)
+
+    def test_render_hands(self):
+        judge_hash = 'U0'
+        for p_hash, p_obj in self.players.player_dict.items():
+            p_obj._is_arp = p_hash == 'U1'
+            p_obj._is_dm_cards = p_hash == 'U2'
+        self.mock_st.private_message.return_value = ('DXXX', '111.222')
+
+        def _private_channel_message(user_id, channel, **kwargs):
+            if user_id == 'U3':
+                raise ValueError('channel_not_found')
+            return f'{user_id}.ts'
+        self.mock_st.private_channel_message.side_effect = _private_channel_message
+
+        failures = self.players.render_hands(judge_hash=judge_hash, question_block=[{'type': 'q'}], req_ans=1)
+
+        # Judge & ARP players get nothing; one failure doesn't stop the rest
+        self.assertListEqual(['U3'], list(failures.keys()))
+        self.assertEqual(4, self.mock_render_hand.call_count)
+        self.mock_st.private_message.assert_called_once()
+        self.assertEqual(4, self.mock_st.private_channel_message.call_count)
+        self.assertDictEqual({'DXXX': '111.222', 'CXXX': 'U2.ts'}, self.players.player_dict['U2'].pick_blocks)
+        for p_hash in ['U4', 'U5']:
+            self.assertDictEqual({'CXXX': f'{p_hash}.ts'}, self.players.player_dict[p_hash].pick_blocks)
+        for p_hash in ['U0', 'U1', 'U3']:
+            self.assertDictEqual({}, self.players.player_dict[p_hash].pick_blocks)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,53 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from cah.core.render_cache import (
+    RenderCache,
+    RenderKind,
+)
+
+
+class TestRenderCache(TestCase):
+
+    def setUp(self) -> None:
+        self.cache = RenderCache()
+        self.mock_render = MagicMock(name='render', side_effect=lambda: [{'type': 'section'}])
+
+    def test_memoized_per_round(self):
+        blocks = self.cache.get_or_render(1, RenderKind.QUESTION, self.mock_render)
+        # Callers adding onto the blocks don't change what's cached
+        blocks += [{'type': 'divider'}]
+        self.assertListEqual([{'type': 'section'}], self.cache.get_or_render(1, RenderKind.QUESTION, self.mock_render))
+        self.assertEqual(1, self.mock_render.call_count)
+        self.assertEqual(1, self.cache.n_hits)
+
+        # A new round starts over
+        self.cache.get_or_render(2, RenderKind.QUESTION, self.mock_render)
+        self.assertEqual(2, self.mock_render.call_count)
+        # Without a round, nothing's cached
+        self.cache.get_or_render(None, RenderKind.QUESTION, self.mock_render)
+        self.cache.get_or_render(None, RenderKind.QUESTION, self.mock_render)
+        self.assertEqual(4, self.mock_render.call_count)
+
+    def test_invalidate(self):
+        for p_hash in ['U1', 'U2']:
+            self.cache.get_or_render(1, RenderKind.HAND, self.mock_render, player_hash=p_hash, variant=1)
+        self.cache.get_or_render(1, RenderKind.QUESTION, self.mock_render)
+        self.assertEqual(3, self.mock_render.call_count)
+
+        self.cache.invalidate(kind=RenderKind.HAND, player_hash='U1')
+        self.cache.get_or_render(1, RenderKind.HAND, self.mock_render, player_hash='U1', variant=1)
+        self.cache.get_or_render(1, RenderKind.HAND, self.mock_render, player_hash='U2', variant=1)
+        self.cache.get_or_render(1, RenderKind.QUESTION, self.mock_render)
+        self.assertEqual(4, self.mock_render.call_count)
+
+        self.cache.invalidate(kind=RenderKind.QUESTION)
+        self.cache.get_or_render(1, RenderKind.QUESTION, self.mock_render)
+        self.assertEqual(5, self.mock_render.call_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from pukr import get_logger
+
+from cah.core.players import Player
+from cah.core.round_state import RoundStateStore
+from cah.model import (
+    TablePlayer,
+    TablePlayerRound,
+)
+from tests.common import (
+    make_patcher,
+    random_string,
+)
+
+
+class TestRoundStateStore(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_round_state')
+
+    def setUp(self) -> None:
+        self.mock_eng = MagicMock(name='PSQLClient')
+        self.mock_pq = make_patcher(self, 'cah.core.round_state.PlayerQueries').return_value
+        self.store = RoundStateStore(eng=self.mock_eng, log=self.log)
+
+    def test_flush_batches_changes(self):
+        self.store.set_player_round_attr(1, 2, 3, TablePlayerRound.is_picked, False)
+        self.store.set_player_round_attr(1, 2, 3, TablePlayerRound.is_picked, True)
+        self.store.set_player_round_attr(1, 2, 4, TablePlayerRound.is_judge, True)
+        self.store.set_player_attr('UXXX', TablePlayer.choice_order, 2)
+        self.assertTrue(self.store.is_dirty)
+        self.mock_pq.bulk_set_player_attrs.assert_not_called()
+
+        self.store.flush()
+        self.mock_pq.bulk_set_player_attrs.assert_called_once_with(
+            player_round_changes={
+                (1, 2, 3): {'is_picked': True},
+                (1, 2, 4): {'is_judge': True},
+            },
+            player_changes={'UXXX': {'choice_order': 2}}
+        )
+        self.assertFalse(self.store.is_dirty)
+
+        # Nothing left to write
+        self.mock_pq.bulk_set_player_attrs.reset_mock()
+        self.store.flush()
+        self.mock_pq.bulk_set_player_attrs.assert_not_called()
+
+    def test_failed_flush_keeps_changes(self):
+        self.store.set_player_attr('UXXX', TablePlayer.is_dm_cards, False)
+        self.mock_pq.bulk_set_player_attrs.side_effect = ValueError('db went away')
+        with self.assertRaises(ValueError):
+            self.store.flush()
+        _, player_changes = self.store.get_pending()
+        self.assertDictEqual({'UXXX': {'is_dm_cards': False}}, player_changes)
+
+    def test_unit_rollback_restores_changes(self):
+        self.store.set_player_attr('UXXX', TablePlayer.is_dm_cards, False)
+        self.store.flush()
+        self.assertFalse(self.store.is_dirty)
+        # The unit of work the flush joined failed to commit
+        (restore, ), _ = self.mock_eng.on_unit_rollback.call_args
+        self.store.set_player_attr('UXXX', TablePlayer.is_dm_cards, True)
+        restore()
+        # Changes made since the flush are kept over the restored ones
+        _, player_changes = self.store.get_pending()
+        self.assertDictEqual({'UXXX': {'is_dm_cards': True}}, player_changes)
+
+    def test_player_setters_write_behind(self):
+        mock_player_tbl = TablePlayer(slack_user_hash=random_string(), display_name='test_user', avi_url='test.com')
+        mock_player_tbl.player_id = 8
+        mock_player_pq = make_patcher(self, 'cah.core.players.PlayerQueries').return_value
+        mock_player_pq.get_player_table.return_value = mock_player_tbl
+        player = Player(player_hash=mock_player_tbl.slack_user_hash, eng=self.mock_eng, log=self.log,
+                        round_state=self.store)
+        player.game_id = 5
+        player.game_round_id = 6
+
+        player.is_picked = True
+        player.is_nuked_hand = True
+        player.choice_order = 3
+        self.assertTrue(player.is_picked)
+        self.assertEqual(3, player.choice_order)
+        # Nothing was queried or written on the way through
+        mock_player_pq.get_player_round_table.assert_not_called()
+        mock_player_pq.set_player_round_table.assert_not_called()
+        mock_player_pq.set_player_table_attr.assert_not_called()
+
+        player_round_changes, player_changes = self.store.get_pending()
+        self.assertDictEqual({(5, 6, 8): {'is_picked': True, 'is_nuked_hand': True}}, player_round_changes)
+        self.assertDictEqual({mock_player_tbl.slack_user_hash: {'choice_order': 3}}, player_changes)
+
+
+if __name__ == '__main__':
+    main()
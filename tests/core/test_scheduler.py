@@ -0,0 +1,160 @@
+from datetime import (
+    datetime,
+    timedelta,
+)
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import MagicMock
+
+from pukr import get_logger
+
+from cah.core.scheduler import (
+    ScheduledTask,
+    TaskScheduler,
+)
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    TableTask,
+    TableTaskParameter,
+)
+from tests.mocks.standins import (
+    STANDIN_DB_PROPS,
+    HeldJobQueue,
+    make_standin_engine,
+)
+
+START = datetime(2023, 1, 2, 12, 0)
+
+
+class TestScheduledTask(TestCase):
+
+    def _make_task(self, last_triggered: datetime = None, until: datetime = None) -> ScheduledTask:
+        return ScheduledTask(task_id=1, endpoint='/api/crons/handle-randpick', from_timestamp=START,
+                             until_timestamp=until, last_triggered=last_triggered, trigger_every_n_minutes=30)
+
+    def test_handler_name(self):
+        self.assertEqual('handle-randpick', self._make_task().handler_name)
+
+    def test_get_next_run(self):
+        # Not started yet
+        self.assertEqual(START, self._make_task().get_next_run(now=START - timedelta(hours=1)))
+        # Never triggered, but past its start
+        now = START + timedelta(minutes=5)
+        self.assertEqual(now, self._make_task().get_next_run(now=now))
+        # Stays on the from_timestamp grid
+        task = self._make_task(last_triggered=START + timedelta(minutes=31))
+        self.assertEqual(START + timedelta(minutes=60), task.get_next_run(now=START + timedelta(minutes=32)))
+        # Missed runs are made up once, right away
+        now = START + timedelta(hours=5, minutes=1)
+        self.assertEqual(now, task.get_next_run(now=now))
+
+    def test_until(self):
+        task = self._make_task(last_triggered=START, until=START + timedelta(minutes=45))
+        self.assertEqual(START + timedelta(minutes=30), task.get_next_run(now=START + timedelta(minutes=1)))
+        task.last_triggered = START + timedelta(minutes=30)
+        self.assertIsNone(task.get_next_run(now=START + timedelta(minutes=31)))
+
+
+class TestTaskScheduler(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_scheduler')
+
+    def setUp(self) -> None:
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        self.eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        with self.eng.session_mgr() as session:
+            randpick = TableTask(endpoint='/api/crons/handle-randpick', from_timestamp=START,
+                                 trigger_every_n_minutes=10)
+            session.add_all([
+                randpick,
+                TableTask(endpoint='handle-randchoose', from_timestamp=START + timedelta(minutes=5),
+                          trigger_every_n_minutes=60),
+                TableTask(endpoint='expired', from_timestamp=START - timedelta(days=2),
+                          until=START - timedelta(days=1)),
+                TableTask(endpoint='no-handler', from_timestamp=START),
+            ])
+            session.flush()
+            session.add(TableTaskParameter(parameter_name='channel', task_key=randpick.task_id,
+                                           value_str='CCHANNEL'))
+        self.now = START
+        self.handlers = {
+            'handle-randpick': MagicMock(name='handle_randpick'),
+            'handle-randchoose': MagicMock(name='handle_randchoose', side_effect=ValueError('broken')),
+            'expired': MagicMock(name='expired'),
+        }
+        self.job_queue = HeldJobQueue()
+        self.scheduler = TaskScheduler(eng=self.eng, handlers=self.handlers, log=self.log,
+                                       job_queue=self.job_queue, now_func=lambda: self.now)
+
+    def _get_last_triggered(self, endpoint: str):
+        with self.eng.session_mgr() as session:
+            return session.query(TableTask.last_triggered).filter(TableTask.endpoint == endpoint).scalar()
+
+    def test_load_tasks(self):
+        self.assertEqual(2, self.scheduler.load_tasks())
+        self.assertListEqual(['task-handle-randpick', 'task-handle-randchoose'],
+                             [x.name for x in self.job_queue.jobs])
+        randpick_job, randchoose_job = self.job_queue.jobs
+        self.assertAlmostEqual(5 * 60, randchoose_job.run_at - randpick_job.run_at, delta=1)
+        # Reloading replaces what was scheduled
+        self.assertEqual(2, self.scheduler.load_tasks())
+        self.assertEqual(2, len([x for x in self.job_queue.jobs if not x.is_cancelled]))
+
+    def test_run_task(self):
+        self.scheduler.load_tasks()
+        randpick_id, randchoose_id = self.scheduler.tasks.keys()
+        self.now = START + timedelta(minutes=2)
+        self.scheduler.run_task(randpick_id)
+        self.handlers['handle-randpick'].assert_called_once_with(channel='CCHANNEL')
+        self.assertEqual(self.now, self._get_last_triggered('/api/crons/handle-randpick'))
+        self.assertEqual(START + timedelta(minutes=10), self.scheduler.tasks[randpick_id].get_next_run(now=self.now))
+        # A failing handler isn't recorded, but it's still rescheduled for its next turn
+        self.now = START + timedelta(minutes=5)
+        self.scheduler.run_task(randchoose_id)
+        self.assertIsNone(self._get_last_triggered('handle-randchoose'))
+        self.assertEqual(START + timedelta(minutes=65),
+                         self.scheduler.tasks[randchoose_id].get_next_run(now=self.now))
+        # Each task's next run replaces the one it was run ahead of
+        self.assertEqual(2, len([x for x in self.job_queue.jobs if not x.is_cancelled]))
+
+    def test_handler_params(self):
+        """Only the parameters a handler takes are passed to it"""
+        def handle_randpick():
+            calls.append(True)
+
+        calls = []
+        self.handlers['handle-randpick'] = handle_randpick
+        self.scheduler.load_tasks()
+        randpick_id = list(self.scheduler.tasks.keys())[0]
+        self.scheduler.run_task(randpick_id)
+        self.assertEqual(1, len(calls))
+        self.assertEqual(START, self._get_last_triggered('/api/crons/handle-randpick'))
+
+    def test_run_course(self):
+        """Tasks stop being scheduled once past their until_timestamp"""
+        with self.eng.session_mgr() as session:
+            session.query(TableTask).filter(TableTask.endpoint == '/api/crons/handle-randpick').update({
+                TableTask.until_timestamp: START + timedelta(minutes=15)
+            })
+        self.scheduler.load_tasks()
+        randpick_id = list(self.scheduler.tasks.keys())[0]
+        for minute in [0, 10]:
+            self.now = START + timedelta(minutes=minute)
+            self.scheduler.run_task(randpick_id)
+        self.assertEqual(2, self.handlers['handle-randpick'].call_count)
+        self.assertNotIn(randpick_id, self.scheduler.tasks.keys())
+
+    def test_shutdown(self):
+        self.scheduler.load_tasks()
+        self.scheduler.shutdown()
+        self.job_queue.run_all()
+        self.handlers['handle-randpick'].assert_not_called()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+import pandas as pd
+
+from cah.core.streaks import StreakTracker
+
+
+class TestStreakTracker(TestCase):
+
+    def setUp(self) -> None:
+        self.tracker = StreakTracker()
+
+    def test_consecutive_wins(self):
+        self.assertEqual((None, 0), self.tracker.current)
+        self.tracker.record_round(winner_id=1, judge_id=3)
+        self.assertEqual((1, 0), self.tracker.current)
+        self.tracker.record_round(winner_id=1, judge_id=2)
+        self.tracker.record_round(winner_id=1, judge_id=3)
+        self.assertEqual((1, 2), self.tracker.current)
+        # Someone else wins while the holder was playing
+        self.tracker.record_round(winner_id=2, judge_id=3)
+        self.assertEqual((2, 0), self.tracker.current)
+
+    def test_judging_keeps_streak(self):
+        self.tracker.record_round(winner_id=1, judge_id=3)
+        self.tracker.record_round(winner_id=1, judge_id=2)
+        # Holder judges twice while others win
+        self.tracker.record_round(winner_id=2, judge_id=1)
+        self.assertEqual((2, 0), self.tracker.current)
+        self.tracker.record_round(winner_id=3, judge_id=1)
+        self.tracker.record_round(winner_id=1, judge_id=2)
+        self.assertEqual((1, 2), self.tracker.current)
+
+        # The kept streak is dropped once the holder plays a round without winning
+        self.tracker.record_round(winner_id=2, judge_id=1)
+        self.tracker.record_round(winner_id=3, judge_id=2)
+        self.tracker.record_round(winner_id=1, judge_id=3)
+        self.assertEqual((1, 0), self.tracker.current)
+
+    def test_caught_nuke_ends_streak(self):
+        self.tracker.record_round(winner_id=1, judge_id=3)
+        self.tracker.record_round(winner_id=1, judge_id=2)
+        self.tracker.record_round(winner_id=1, judge_id=2, is_nuke_caught=True)
+        self.assertEqual((None, 0), self.tracker.current)
+        self.tracker.record_round(winner_id=1, judge_id=2)
+        self.assertEqual((1, 0), self.tracker.current)
+
+    def test_load_rounds(self):
+        # (round, winner, judge, is_nuke_caught)
+        outcomes = [(10, 2, 1, False), (11, 1, 2, False), (12, 1, 3, False), (13, 2, 1, False),
+                    (14, 1, 3, False), (15, None, 2, False)]
+        rows = []
+        for round_id, winner_id, judge_id, is_nuke_caught in outcomes:
+            for player_id in [1, 2, 3]:
+                rows.append({
+                    'player_id': player_id,
+                    'game_round_key': round_id,
+                    'is_judge': player_id == judge_id,
+                    'is_nuked_hand_caught': is_nuke_caught and player_id == winner_id,
+                    'score': 1 if player_id == winner_id else 0,
+                })
+        rounds_df = pd.DataFrame(rows)
+
+        # The round in progress is left out
+        self.tracker.load_rounds(rounds_df, before_round_id=15)
+        self.assertEqual((1, 2), self.tracker.current)
+
+        # A finished round without a winner ends the streak
+        self.tracker.load_rounds(rounds_df)
+        self.assertEqual((None, 0), self.tracker.current)
+
+        self.tracker.load_rounds(pd.DataFrame())
+        self.assertEqual((None, 0), self.tracker.current)
+
+
+if __name__ == '__main__':
+    main()
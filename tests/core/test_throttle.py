@@ -0,0 +1,98 @@
+from unittest import (
+    TestCase,
+    main,
+)
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
+
+from pukr import get_logger
+from slack_sdk.errors import SlackApiError
+
+from cah.core.throttle import (
+    ChannelTokenBuckets,
+    ThrottledSlackClient,
+)
+
+
+class TestThrottledSlackClient(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_throttle')
+
+    def setUp(self) -> None:
+        self.mock_st = MagicMock(name='SlackBotBase')
+        self.mock_session = MagicMock(name='Session')
+        self.client = ThrottledSlackClient(st=self.mock_st, log=self.log, max_retries=2, session=self.mock_session)
+
+    @staticmethod
+    def _rate_limited_err(retry_after: str = '0') -> SlackApiError:
+        return SlackApiError('ratelimited', response=MagicMock(status_code=429, headers={'Retry-After': retry_after}))
+
+    def test_passes_through(self):
+        self.mock_st.send_message.return_value = '111.222'
+        self.assertEqual('111.222', self.client.send_message('C1', 'hi', ret_ts=True))
+        self.mock_st.send_message.assert_called_once_with('C1', 'hi', ret_ts=True)
+        # Methods that aren't throttled go straight to the SlackBotBase
+        self.assertIs(self.mock_st.bot_id, self.client.bot_id)
+        stats = self.client.get_stats()
+        self.assertEqual(1, stats['send_message']['n_calls'])
+        self.assertEqual(0, stats['send_message']['n_errors'])
+
+    @patch('cah.core.throttle.time.sleep')
+    def test_retries_after_rate_limit(self, mock_sleep: MagicMock):
+        self.mock_st.update_message.side_effect = [self._rate_limited_err('3'), None]
+        self.client.update_message('C1', '111.222', message='hi')
+        self.assertEqual(2, self.mock_st.update_message.call_count)
+        mock_sleep.assert_any_call(3.0)
+        stats = self.client.get_stats()['update_message']
+        self.assertEqual(2, stats['n_calls'])
+        self.assertEqual(1, stats['n_rate_limited'])
+
+        # The retry budget runs out
+        self.mock_st.delete_message.side_effect = self._rate_limited_err()
+        with self.assertRaises(SlackApiError):
+            self.client.delete_message(channel='C1', ts='111.222')
+        self.assertEqual(3, self.mock_st.delete_message.call_count)
+
+    def test_other_errors_not_retried(self):
+        self.mock_st.private_message.side_effect = SlackApiError('channel_not_found',
+                                                                 response=MagicMock(status_code=200))
+        with self.assertRaises(SlackApiError):
+            self.client.private_message('U1', 'hi')
+        self.assertEqual(1, self.mock_st.private_message.call_count)
+        self.assertEqual(1, self.client.get_stats()['private_message']['n_errors'])
+
+    def test_post_message_limits_per_channel(self):
+        # One message's worth in each channel
+        self.client.channel_buckets['chat.postMessage'] = ChannelTokenBuckets(rate=1e-6, capacity=1)
+        self.client.send_message('C1', 'hi')
+        self.client.send_message(channel='C2', message='hi')
+        self.client.private_message('U1', 'hi')
+        self.client.message_main_channel(message='hi')
+        buckets = self.client.channel_buckets['chat.postMessage']
+        self.assertEqual(4, len(buckets))
+        # A busy channel doesn't hold up the others
+        self.assertFalse(buckets.get('C1').try_acquire())
+        self.assertTrue(buckets.get('C3').try_acquire())
+
+    def test_channel_buckets_dropped_once_refilled(self):
+        buckets = ChannelTokenBuckets(rate=1e-6, capacity=1, max_channels=2)
+        buckets.get('C1').acquire()
+        buckets.get('C2')
+        buckets.get('C3')
+        # C2's was still full, so it was dropped to make room
+        self.assertEqual(2, len(buckets))
+        self.assertFalse(buckets.get('C1').try_acquire())
+
+    def test_post_response_url(self):
+        self.mock_session.post.return_value = MagicMock(status_code=200)
+        self.client.post_response_url('https://hooks.slack.com/x', {'delete_original': True})
+        self.mock_session.post.assert_called_once()
+        self.assertEqual(1, self.client.get_stats()['response_url']['n_calls'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+from datetime import datetime
+from unittest import (
+    TestCase,
+    main,
+)
+
+from sqlalchemy import (
+    select,
+    text,
+)
+from sqlalchemy.orm import Session
+
+from cah.etl.migrations import (
+    HOT_QUERIES,
+    MIGRATIONS,
+    HotQuery,
+    Migration,
+    apply_migrations,
+    find_missing_indexes,
+    get_applied_versions,
+    get_model_index,
+)
+from cah.model import (
+    GameStatus,
+    TableDeck,
+    TableGame,
+    TableGameRound,
+    TablePlayer,
+    TablePlayerGameScore,
+    TablePlayerJudgeScore,
+    TablePlayerRound,
+    TablePlayerStats,
+    TableQuestionCard,
+    TableSchemaMigration,
+)
+from tests.mocks.standins import make_standin_engine
+
+
+class TestMigrations(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = make_standin_engine()
+        self.addCleanup(self.engine.dispose)
+
+    def _drop_indexes(self, index_names):
+        """Takes the db back to before the indexes were added to the models"""
+        with self.engine.begin() as conn:
+            for index_name in index_names:
+                conn.execute(text(f'DROP INDEX cah.{index_name}'))
+
+    def test_models_cover_hot_queries(self):
+        """A db created from the models has an index for every hot query"""
+        self.assertListEqual([], find_missing_indexes(self.engine))
+
+    def test_migrations_refer_to_model_indexes(self):
+        versions = [x.version for x in MIGRATIONS]
+        self.assertEqual(len(versions), len(set(versions)))
+        for migration in MIGRATIONS:
+            for index_name in migration.index_names:
+                get_model_index(index_name)
+        with self.assertRaises(KeyError):
+            get_model_index('ix_not_declared')
+
+    def test_apply_to_existing_db(self):
+        self._drop_indexes([x for migration in MIGRATIONS for x in migration.index_names])
+        missing = find_missing_indexes(self.engine)
+        self.assertIn(('player_round', ('game_key', 'game_round_key', 'player_key')),
+                      [(x.table, x.columns) for x in missing])
+        # Covered by its unique constraint
+        self.assertNotIn('slack_user_hash', [col for x in missing for col in x.columns])
+
+        self.assertListEqual([x.version for x in MIGRATIONS], apply_migrations(self.engine))
+        self.assertListEqual([], find_missing_indexes(self.engine))
+        with self.engine.connect() as conn:
+            self.assertSetEqual({x.version for x in MIGRATIONS}, get_applied_versions(conn))
+            self.assertEqual(MIGRATIONS[0].name, conn.execute(
+                select(TableSchemaMigration.name).where(TableSchemaMigration.version == MIGRATIONS[0].version)).scalar())
+        # Each migration only runs once
+        self._drop_indexes(['ix_player_hand_player'])
+        self.assertListEqual([], apply_migrations(self.engine))
+        self.assertEqual(1, len(find_missing_indexes(self.engine)))
+
+    def test_add_columns(self):
+        """Columns added to the models since the tables were created are added to them"""
+        with self.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE cah.game DROP COLUMN judge_order'))
+            conn.execute(text('ALTER TABLE cah.game DROP COLUMN channel_id'))
+        apply_migrations(self.engine)
+        with self.engine.connect() as conn:
+            self.assertEqual(0, conn.execute(text('SELECT COUNT(channel_id) + COUNT(judge_order) FROM cah.game'))
+                             .scalar())
+        # Applying it again to a db that already has them is harmless
+        with self.engine.begin() as conn:
+            [x for x in MIGRATIONS if len(x.new_columns) > 0][0].apply(conn)
+
+    def test_create_tables(self):
+        """Tables added to the models since the db was created are made & filled in from the rounds played"""
+        with Session(self.engine) as session:
+            player = TablePlayer(slack_user_hash='UPLAYER', display_name='player', avi_url='')
+            judge = TablePlayer(slack_user_hash='UJUDGE', display_name='judge', avi_url='')
+            deck = TableDeck(name='test')
+            session.add_all([player, judge, deck])
+            session.flush()
+            question = TableQuestionCard(card_text='_____', deck_key=deck.deck_id, responses_required=1)
+            game = TableGame(deck_combo=['test'], status=GameStatus.ENDED)
+            session.add_all([question, game])
+            session.flush()
+            game_round = TableGameRound(game_key=game.game_id, question_card_key=question.question_card_id)
+            game_round.end_time = datetime.now()
+            session.add(game_round)
+            session.flush()
+            for player_id, is_judge, score in [(player.player_id, False, 1), (judge.player_id, True, 0)]:
+                player_round = TablePlayerRound(player_key=player_id, game_key=game.game_id,
+                                                game_round_key=game_round.game_round_id, is_arp=False, is_arc=False)
+                player_round.is_judge = is_judge
+                player_round.score = score
+                session.add(player_round)
+            session.commit()
+            player_id, judge_id = player.player_id, judge.player_id
+        with self.engine.begin() as conn:
+            for table in ['player_judge_score', 'player_stats', 'player_game_score']:
+                conn.execute(text(f'DROP TABLE cah.{table}'))
+
+        self.assertListEqual([x.version for x in MIGRATIONS], apply_migrations(self.engine))
+        self.assertListEqual([], find_missing_indexes(self.engine))
+        with Session(self.engine) as session:
+            self.assertEqual(1, session.query(TablePlayerGameScore.score).filter(
+                TablePlayerGameScore.player_key == player_id).scalar())
+            self.assertEqual((1, 1), session.query(TablePlayerStats.n_rounds_played, TablePlayerStats.total_score)
+                             .filter(TablePlayerStats.player_key == player_id).one())
+            self.assertEqual(1, session.query(TablePlayerJudgeScore.points_received).filter(
+                TablePlayerJudgeScore.player_key == player_id, TablePlayerJudgeScore.judge_key == judge_id).scalar())
+
+    def test_new_migration(self):
+        apply_migrations(self.engine)
+        self._drop_indexes(['ix_player_hand_player'])
+        migrations = MIGRATIONS + [Migration(MIGRATIONS[-1].version + 1, 'Re-add hand index',
+                                             index_names=['ix_player_hand_player'])]
+        self.assertListEqual([migrations[-1].version], apply_migrations(self.engine, migrations=migrations))
+        self.assertListEqual([], find_missing_indexes(self.engine))
+
+    def test_hot_query_coverage(self):
+        hot_query = HotQuery('player_round', ['game_round_key', 'game_key'], 'test')
+        self.assertTrue(hot_query.is_covered_by(['game_key', 'game_round_key', 'player_key']))
+        self.assertFalse(hot_query.is_covered_by(['game_key', 'player_key', 'game_round_key']))
+        self.assertFalse(hot_query.is_covered_by(['game_key']))
+        self.assertTrue(all(len(x.columns) > 0 for x in HOT_QUERIES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,387 @@
+"""Local stand-ins for Slack & Postgres, so full games can be driven without either (e.g., for benchmarks)"""
+from collections import Counter
+from contextlib import contextmanager
+from datetime import (
+    datetime,
+    timedelta,
+)
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+import itertools
+import json
+import pathlib
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from unittest.mock import patch
+
+from loguru import logger
+from sqlalchemy import (
+    create_engine,
+    event,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+from cah.bot_base import CAHBot
+from cah.core.jobs import ScheduledJob
+from cah.core.throttle import (
+    ChannelTokenBuckets,
+    TokenBucket,
+)
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    SettingType,
+    TableAnswerCard,
+    TableDeck,
+    TablePlayer,
+    TableQuestionCard,
+    TableSetting,
+)
+from cah.model.base import Base
+from cah.settings import Development
+
+from .users import (
+    random_display_name,
+    random_user,
+)
+
+# Stand-in props; only used when a real PSQLClient builds its (unused) default engine
+STANDIN_DB_PROPS = {'usr': 'cah', 'pwd': '', 'host': 'localhost', 'port': 5432, 'database': 'cah'}
+
+
+class FakeSlackBotBase:
+    """Takes the place of slacktools' SlackBotBase, counting calls instead of sending them to Slack"""
+
+    def __init__(self, *args, main_channel: str = 'CMAIN', channel_members: List[str] = None,
+                 latency_s: float = 0, **kwargs):
+        """
+        Args:
+            latency_s: seconds each call takes, to stand in for the round trip to Slack
+        """
+        _ = args, kwargs
+        self.main_channel = main_channel
+        self.bot_id = 'BFAKE'
+        self.user_id = 'UFAKEBOT'
+        self.bot = None
+        self.commands = None
+        self.channel_members = channel_members if channel_members is not None else []
+        self.latency_s = latency_s
+        self.calls = Counter()  # type: Counter
+        self._lock = threading.Lock()
+        self._ts = itertools.count(1)
+        # Where message events & slash commands get dispatched to (see set_command_handler)
+        self.handler = None  # type: Any
+        self.triggers = []  # type: List[str]
+        self.command_map = []  # type: List[Tuple[re.Pattern, Dict]]
+
+    def _record(self, method: str) -> str:
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        with self._lock:
+            self.calls[method] += 1
+            return f'{1700000000 + next(self._ts)}.000100'
+
+    def set_command_handler(self, handler: Any, cmd_yaml_path: pathlib.Path, triggers: List[str]):
+        """Has message events & slash commands call the handler's commands from the yaml, as slacktools would"""
+        import yaml
+
+        with cmd_yaml_path.open('r') as f:
+            groups = yaml.safe_load(f)['commands']
+        self.handler = handler
+        self.triggers = triggers
+        self.command_map = [(re.compile(regex), cmd['response_cmd']) for group in groups.values()
+                            for regex, cmd in group.items() if 'response_cmd' in cmd]
+
+    def _run_command(self, user: str, channel: str, message: str):
+        values = {'user': user, 'channel': channel, 'message': message, 'cleaned_message': message}
+        cmd = next((cmd for regex, cmd in self.command_map if regex.match(message.lower()) is not None), None)
+        if cmd is None:
+            self.send_message(channel, message='I didn\'t understand this')
+            return
+        # Args that aren't event values get passed as they are (e.g., 'randpick')
+        resp = getattr(self.handler, cmd['callable_name'])(*[values.get(x, x) for x in cmd.get('args', [])])
+        if isinstance(resp, str):
+            self.send_message(channel, message=resp)
+        elif isinstance(resp, list):
+            self.send_message(channel, message='', blocks=resp)
+
+    def parse_message_event(self, event_dict: Dict):
+        event = event_dict.get('event', {})
+        text = event.get('text', '')
+        trigger = next((x for x in self.triggers if text.lower().startswith(x)), None)
+        if trigger is None or event.get('user') is None:
+            return
+        self._run_command(user=event['user'], channel=event.get('channel'), message=text[len(trigger):].strip())
+
+    def parse_slash_command(self, event_dict: Dict):
+        self._run_command(user=event_dict['user_id'], channel=event_dict['channel_id'],
+                          message=event_dict.get('text', '').strip())
+
+    @property
+    def n_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def update_commands(self, commands: Dict):
+        self.commands = commands
+
+    def build_help_block(self, *args, **kwargs) -> List[Dict]:
+        _ = args, kwargs
+        return []
+
+    @staticmethod
+    def timedelta_to_human(td: timedelta) -> str:
+        return str(td)
+
+    @staticmethod
+    def get_time_elapsed(start: datetime) -> str:
+        return str(datetime.now() - start)
+
+    def send_message(self, channel: str, message: str = None, ret_ts: bool = False, **kwargs) -> Optional[str]:
+        _ = channel, message, kwargs
+        ts = self._record('chat.postMessage')
+        return ts if ret_ts else None
+
+    def message_main_channel(self, message: str = None, **kwargs) -> Optional[str]:
+        return self.send_message(self.main_channel, message=message, **kwargs)
+
+    def private_message(self, user_id: str, message: str = None, ret_ts: bool = False,
+                        **kwargs) -> Optional[Tuple[str, str]]:
+        _ = message, kwargs
+        self._record('conversations.open')
+        ts = self._record('chat.postMessage')
+        return (f'D{user_id}', ts) if ret_ts else None
+
+    def private_channel_message(self, user_id: str, channel: str, message: str = None, ret_ts: bool = False,
+                                **kwargs) -> Optional[str]:
+        _ = user_id, channel, message, kwargs
+        ts = self._record('chat.postEphemeral')
+        return ts if ret_ts else None
+
+    def update_message(self, channel: str, ts: str, message: str = None, **kwargs):
+        _ = channel, ts, message, kwargs
+        self._record('chat.update')
+
+    def delete_message(self, channel: str, ts: str, **kwargs):
+        _ = channel, ts, kwargs
+        self._record('chat.delete')
+
+    def get_channel_members(self, channel: str, humans_only: bool = False) -> List[SimpleNamespace]:
+        _ = channel, humans_only
+        self._record('conversations.members')
+        return [
+            SimpleNamespace(id=uid, real_name=uid.lower(),
+                            profile=SimpleNamespace(display_name=uid.lower(), image_32=''))
+            for uid in self.channel_members
+        ]
+
+
+class FakeSlackWebAPI:
+    """A local HTTP server answering Slack Web API calls (`/api/<method>`) and response url posts
+    (`/response/<id>`) with success, counting each one"""
+    # Extra fields for the calls whose responses get read
+    RESPONSES = {
+        'auth.test': {'team_id': 'TSTANDIN', 'team': 'standin', 'user_id': 'UFAKEBOT', 'user': 'fakebot',
+                      'bot_id': 'BFAKE', 'url': 'https://standin.slack.com/'},
+    }
+
+    def __init__(self, latency_s: float = 0):
+        """
+        Args:
+            latency_s: seconds each call takes, to stand in for the round trip to Slack
+        """
+        self.latency_s = latency_s
+        self.calls = Counter()  # type: Counter
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._build_handler())
+        self.server.daemon_threads = True
+        self._thread = None  # type: Optional[threading.Thread]
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self) -> str:
+        return f'{self.url}/api/'
+
+    def response_url(self, response_id: str) -> str:
+        return f'{self.url}/response/{response_id}'
+
+    def _build_handler(self):
+        api = self
+
+        class _Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if api.latency_s > 0:
+                    time.sleep(api.latency_s)
+                path = self.path.strip('/').split('/')
+                method = path[1] if path[0] == 'api' else 'response_url'
+                with api._lock:
+                    api.calls[method] += 1
+                body = json.dumps({'ok': True, **api.RESPONSES.get(method, {})}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+    def start(self) -> 'FakeSlackWebAPI':
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-slack-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class QueryCounter:
+    """Counts the statements run on an engine"""
+
+    def __init__(self, engine: Engine):
+        self._lock = threading.Lock()
+        self.n_queries = 0
+        # Lists collecting the statements while they're being captured
+        self._captures = []  # type: List[List[str]]
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement: str, *args):
+        _ = conn, cursor, args
+        with self._lock:
+            self.n_queries += 1
+            for captured in self._captures:
+                captured.append(statement)
+
+    @contextmanager
+    def capture(self) -> Iterator[List[str]]:
+        """Collects the statements run within the block"""
+        statements = []  # type: List[str]
+        with self._lock:
+            self._captures.append(statements)
+        try:
+            yield statements
+        finally:
+            with self._lock:
+                self._captures.remove(statements)
+
+
+class HeldJobQueue:
+    """Stands in for the DelayedJobQueue, holding jobs until they're run with `run_all`,
+    so that scheduled work (e.g., round transitions) isn't counted toward what scheduled it"""
+
+    def __init__(self):
+        self.jobs = []  # type: List[ScheduledJob]
+
+    def schedule(self, delay_s: float, func: Callable, *args, name: str = None, **kwargs) -> ScheduledJob:
+        job = ScheduledJob(name=name or func.__name__, run_at=time.monotonic() + delay_s, func=func, args=args,
+                           kwargs=kwargs)
+        self.jobs.append(job)
+        return job
+
+    def run_all(self):
+        while len(self.jobs) > 0:
+            job = self.jobs.pop(0)
+            if not job.is_cancelled:
+                job.func(*job.args, **job.kwargs)
+
+    def shutdown(self, wait: bool = False):
+        _ = wait
+        self.jobs.clear()
+
+
+def build_standin_bot(eng: WizzyPSQLClient, fake_st: FakeSlackBotBase, config=Development,
+                      job_queue: HeldJobQueue = None) -> CAHBot:
+    """Starts up the bot with the Slack stand-in and without throttling (nothing's actually sent)
+
+    Args:
+        job_queue: where games' delayed jobs go. If None, they're run right away.
+    """
+    with patch('cah.bot_base.SlackBotBase', new=lambda *args, **kwargs: fake_st):
+        bot = CAHBot(eng=eng, props={}, parent_log=logger, config=config)
+    bot.jobs.shutdown()
+    bot.jobs = job_queue
+    bot.st.buckets = {k: TokenBucket(rate=1e9, capacity=10 ** 9) for k in bot.st.buckets.keys()}
+    bot.st.channel_buckets = {k: ChannelTokenBuckets(rate=1e9, capacity=10 ** 9)
+                              for k in bot.st.channel_buckets.keys()}
+    return bot
+
+
+def make_standin_engine(db_url: str = None) -> Engine:
+    """Builds an engine for a local db. Without a url, an in-memory SQLite db stands in for Postgres."""
+    if db_url is not None:
+        engine = create_engine(db_url)
+    else:
+        # One connection for everything, so all threads see the same in-memory db
+        engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+
+        @event.listens_for(engine, 'connect')
+        def _attach_schema(dbapi_conn, _):
+            dbapi_conn.execute("ATTACH DATABASE ':memory:' AS cah")
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def seed_standin_db(eng: WizzyPSQLClient, n_players: int, n_arp: int = 0, n_arc: int = 0, deck_name: str = 'bench',
+                    n_questions: int = 100, n_answers: int = 500, n_two_answer_questions: int = 10) -> List[str]:
+    """Loads the bot settings, a deck of cards and players into an empty db
+
+    Args:
+        n_arp: the number of players (from the end of the list) that auto-randpick
+        n_arc: the number of players (from the start of the list) that auto-randchoose when judging
+
+    Returns:
+        the players' slack hashes
+    """
+    settings = []
+    for setting in SettingType:
+        if setting.name.startswith('IS_'):
+            # Nothing to announce, but look for games so reinstating is part of startup
+            settings.append(TableSetting(setting, setting_int=int(setting == SettingType.IS_LOOK_FOR_ONGOING_GAMES)))
+        elif setting == SettingType.DECKNUKE_PENALTY:
+            settings.append(TableSetting(setting, setting_int=-3))
+        elif setting == SettingType.JUDGE_ORDER_DIVIDER:
+            settings.append(TableSetting(setting, setting_str=':shiny_arrow:'))
+        else:
+            settings.append(TableSetting(setting, setting_str=''))
+    player_hashes = [random_user() for _ in range(n_players)]
+    with eng.session_mgr() as session:
+        session.add_all(settings)
+        deck = TableDeck(name=deck_name)
+        session.add(deck)
+        session.flush()
+        session.add_all([
+            TableQuestionCard(card_text=f'Question {i}: _____' + (' and _____' if i < n_two_answer_questions else ''),
+                              deck_key=deck.deck_id, responses_required=2 if i < n_two_answer_questions else 1)
+            for i in range(n_questions)
+        ])
+        session.add_all([TableAnswerCard(card_text=f'Answer {i}', deck_key=deck.deck_id) for i in range(n_answers)])
+        session.add_all([
+            TablePlayer(slack_user_hash=p_hash, display_name=random_display_name(), avi_url='',
+                        is_auto_randpick=i >= n_players - n_arp, is_auto_randchoose=i < n_arc)
+            for i, p_hash in enumerate(player_hashes)
+        ])
+    return player_hashes
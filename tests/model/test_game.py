@@ -0,0 +1,24 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from cah.model import TablePlayerGameScore
+
+
+class TestTablePlayerGameScore(TestCase):
+
+    def test_add_points(self):
+        game_score = TablePlayerGameScore(player_key=1, game_key=2)
+        game_score.add_points(1, game_round_key=10)
+        self.assertEqual((1, 0, 10), (game_score.score, game_score.prev_score, game_score.last_scored_round_key))
+        # More points in the same round (e.g., a penalty) don't move the previous score along
+        game_score.add_points(-3, game_round_key=10)
+        self.assertEqual((-2, 0, 10), (game_score.score, game_score.prev_score, game_score.last_scored_round_key))
+        # A later round's points are counted from the score the earlier rounds left
+        game_score.add_points(2, game_round_key=13)
+        self.assertEqual((0, -2, 13), (game_score.score, game_score.prev_score, game_score.last_scored_round_key))
+
+
+if __name__ == '__main__':
+    main()
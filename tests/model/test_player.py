@@ -0,0 +1,45 @@
+from datetime import timedelta
+from unittest import (
+    TestCase,
+    main,
+)
+
+from cah.model import TablePlayerStats
+
+
+class TestTablePlayerStats(TestCase):
+
+    def test_add_round(self):
+        stats = TablePlayerStats(player_key=1)
+        self.assertFalse(stats.has_round(10))
+        self.assertIsNone(stats.avg_pick_time)
+
+        stats.add_round(game_key=2, game_round_key=10, score=1, is_nuked_hand=False, is_nuked_hand_caught=False,
+                        pick_times_s=[4.0, 8.0])
+        # A round judged (no picks, no points) still counts as played
+        stats.add_round(game_key=2, game_round_key=11, score=0, is_nuked_hand=True, is_nuked_hand_caught=True,
+                        pick_times_s=[])
+        stats.add_round(game_key=3, game_round_key=20, score=2, is_nuked_hand=False, is_nuked_hand_caught=False,
+                        pick_times_s=[3.0])
+        self.assertEqual(2, stats.n_games_played)
+        self.assertEqual(3, stats.n_rounds_played)
+        self.assertEqual(2, stats.n_rounds_won)
+        self.assertEqual(3, stats.total_score)
+        self.assertEqual(20, stats.last_scored_round_key)
+        self.assertEqual((1, 1), (stats.n_decknukes_issued, stats.n_decknukes_caught))
+        self.assertEqual(3, stats.n_picks)
+        self.assertEqual((3.0, 8.0), (stats.pick_time_min_s, stats.pick_time_max_s))
+        self.assertEqual(timedelta(seconds=5), stats.avg_pick_time)
+
+    def test_has_round(self):
+        stats = TablePlayerStats(player_key=1)
+        stats.add_round(game_key=2, game_round_key=10, score=0, is_nuked_hand=False, is_nuked_hand_caught=False,
+                        pick_times_s=[])
+        # Anything up to the last round added has been counted
+        self.assertTrue(stats.has_round(9))
+        self.assertTrue(stats.has_round(10))
+        self.assertFalse(stats.has_round(11))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+from typing import (
+    Dict,
+    Tuple,
+)
+from unittest import (
+    TestCase,
+    main,
+)
+
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    TablePlayer,
+    TablePlayerJudgeScore,
+    TablePlayerStats,
+)
+from cah.queries.game_queries import GameQueries
+from tests.mocks.standins import (
+    STANDIN_DB_PROPS,
+    make_standin_engine,
+    seed_standin_db,
+)
+
+
+def _player_round(player_key: int, game_round_key: int, score: int = 0, is_judge: bool = False,
+                  is_nuked_hand: bool = False, is_nuked_hand_caught: bool = False) -> SimpleNamespace:
+    return SimpleNamespace(player_key=player_key, game_key=1, game_round_key=game_round_key, score=score,
+                           is_judge=is_judge, is_nuked_hand=is_nuked_hand, is_nuked_hand_caught=is_nuked_hand_caught)
+
+
+class TestGameQueries(TestCase):
+
+    def setUp(self) -> None:
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        self.eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        seed_standin_db(self.eng, n_players=3, n_questions=1, n_answers=1)
+        with self.eng.session_mgr() as session:
+            self.player_ids = [x.player_id for x in session.query(TablePlayer.player_id).order_by(
+                TablePlayer.player_id)]
+
+    def _add_rounds(self, player_rounds, pick_times: Dict[Tuple[int, int], list] = None):
+        with self.eng.session_mgr() as session:
+            GameQueries._add_rounds_to_player_stats(session, player_rounds=player_rounds,
+                                                    pick_times={} if pick_times is None else pick_times)
+
+    def _get_stats(self) -> Dict[int, Tuple[int, int, int, int]]:
+        with self.eng.session_mgr() as session:
+            return {x.player_key: (x.n_rounds_played, x.n_rounds_won, x.total_score, x.n_picks)
+                    for x in session.query(TablePlayerStats).all()}
+
+    def _get_judge_scores(self) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        with self.eng.session_mgr() as session:
+            return {(x.player_key, x.judge_key): (x.points_received, x.n_rounds)
+                    for x in session.query(TablePlayerJudgeScore).all()}
+
+    def test_add_rounds_to_player_stats(self):
+        p1, p2, p3 = self.player_ids
+        self._add_rounds([
+            _player_round(p1, 10, is_judge=True),
+            _player_round(p2, 10, score=1),
+            _player_round(p3, 10, is_nuked_hand=True),
+        ], pick_times={(p2, 10): [2.0], (p3, 10): [5.0]})
+        self.assertDictEqual({p1: (1, 0, 0, 0), p2: (1, 1, 1, 1), p3: (1, 0, 0, 1)}, self._get_stats())
+        # Judges don't score against themselves
+        self.assertDictEqual({(p2, p1): (1, 1), (p3, p1): (0, 1)}, self._get_judge_scores())
+
+        # Rounds already added (e.g., a retried rollup) aren't counted twice
+        self._add_rounds([
+            _player_round(p1, 10, is_judge=True),
+            _player_round(p2, 10, score=1),
+            _player_round(p3, 10, is_nuked_hand=True),
+            _player_round(p1, 11, score=1),
+            _player_round(p2, 11, is_judge=True),
+            _player_round(p3, 11),
+        ], pick_times={(p2, 10): [2.0], (p3, 10): [5.0], (p1, 11): [3.0], (p3, 11): [4.0]})
+        self.assertDictEqual({p1: (2, 1, 1, 1), p2: (2, 1, 1, 1), p3: (2, 0, 0, 2)}, self._get_stats())
+        self.assertDictEqual({
+            (p2, p1): (1, 1),
+            (p3, p1): (0, 1),
+            (p1, p2): (1, 1),
+            (p3, p2): (0, 1),
+        }, self._get_judge_scores())
+        with self.eng.session_mgr() as session:
+            p3_stats = session.query(TablePlayerStats).filter(TablePlayerStats.player_key == p3).one()
+            self.assertEqual((1, 0, 1), (p3_stats.n_games_played, p3_stats.n_decknukes_caught,
+                                         p3_stats.n_decknukes_issued))
+
+
+if __name__ == '__main__':
+    main()
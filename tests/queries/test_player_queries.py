@@ -0,0 +1,90 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from pukr import get_logger
+
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    GameStatus,
+    TableGame,
+    TableGameRound,
+    TablePlayer,
+    TablePlayerGameScore,
+    TablePlayerRound,
+    TableQuestionCard,
+)
+from cah.queries.player_queries import PlayerQueries
+from tests.mocks.standins import (
+    STANDIN_DB_PROPS,
+    make_standin_engine,
+    seed_standin_db,
+)
+
+
+class TestPlayerQueries(TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.log = get_logger('test_player_queries')
+
+    def setUp(self) -> None:
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        self.eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        player_hashes = seed_standin_db(self.eng, n_players=2, n_questions=1, n_answers=1)
+        with self.eng.session_mgr() as session:
+            self.player_ids = [
+                x.player_id for x in session.query(TablePlayer).filter(TablePlayer.slack_user_hash.in_(player_hashes))
+            ]
+            game = TableGame(deck_combo=['bench'], status=GameStatus.PLAYER_DECISION)
+            session.add(game)
+            session.flush()
+            self.game_id = game.game_id
+            question_card_id = session.query(TableQuestionCard.question_card_id).scalar()
+            game_rounds = [TableGameRound(game_key=game.game_id, question_card_key=question_card_id)
+                           for _ in range(3)]
+            session.add_all(game_rounds)
+            session.flush()
+            self.game_round_ids = [x.game_round_id for x in game_rounds]
+            session.add_all([
+                TablePlayerRound(player_key=player_id, game_key=game.game_id, game_round_key=game_round_id,
+                                 is_arp=False, is_arc=False)
+                for player_id in self.player_ids for game_round_id in self.game_round_ids
+            ])
+        self.pq = PlayerQueries(eng=self.eng, log=self.log)
+
+    def _get_game_score(self, player_id: int):
+        with self.eng.session_mgr() as session:
+            game_score = session.query(TablePlayerGameScore).filter(
+                TablePlayerGameScore.player_key == player_id,
+                TablePlayerGameScore.game_key == self.game_id
+            ).one()
+            return game_score.score, game_score.prev_score, game_score.last_scored_round_key
+
+    def test_add_points(self):
+        player_id, other_player_id = self.player_ids
+        round1_id, round2_id, round3_id = self.game_round_ids
+        self.pq.add_points(player_id, game_round_id=round1_id, game_id=self.game_id, points=1)
+        self.assertEqual((1, 0, round1_id), self._get_game_score(player_id))
+        # A second award in the same round adds to it without moving the previous score along
+        self.pq.add_points(player_id, game_round_id=round1_id, game_id=self.game_id, points=1)
+        self.assertEqual((2, 0, round1_id), self._get_game_score(player_id))
+        # Skipping a round keeps the previous score as of the last round scored in
+        self.pq.add_points(player_id, game_round_id=round3_id, game_id=self.game_id, points=1)
+        self.assertEqual((3, 2, round3_id), self._get_game_score(player_id))
+        self.pq.add_points(other_player_id, game_round_id=round2_id, game_id=self.game_id, points=1)
+        self.assertEqual((1, 0, round2_id), self._get_game_score(other_player_id))
+
+        # The points went to the rounds as well
+        with self.eng.session_mgr() as session:
+            round_scores = session.query(TablePlayerRound.player_key, TablePlayerRound.game_round_key,
+                                         TablePlayerRound.score).filter(TablePlayerRound.score > 0).all()
+        self.assertCountEqual([(player_id, round1_id, 2), (player_id, round3_id, 1),
+                               (other_player_id, round2_id, 1)], round_scores)
+        self.assertEqual(3, self.pq.get_current_score(game_id=self.game_id, player_id=player_id))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,7 @@
+import json
+import subprocess
+import sys
+from typing import Dict
 from unittest import (
     TestCase,
     main,
@@ -9,8 +13,38 @@ from unittest.mock import (
 
 from pukr import get_logger
 
+from cah.settings import Production
 from tests.common import random_string
 
+# Run in a fresh interpreter so nothing's been imported yet
+COLD_IMPORT_SCRIPT = """
+import importlib
+import json
+import sys
+import time
+from types import ModuleType
+
+start = time.perf_counter()
+try:
+    importlib.import_module(sys.argv[1])
+except Exception as e:
+    print(json.dumps({'error': repr(e)}))
+    sys.exit(0)
+import_time_s = time.perf_counter() - start
+
+heavy_globals = [
+    f'{name}.{attr}' for name, module in list(sys.modules.items()) if name.startswith('cah')
+    for attr, val in vars(module).items() if isinstance(val, ModuleType) and val.__name__ in ['numpy', 'pandas']
+]
+print(json.dumps({'import_time_s': import_time_s, 'heavy_globals': heavy_globals}))
+"""
+
+
+def cold_import(module_name: str) -> Dict:
+    result = subprocess.run([sys.executable, '-c', COLD_IMPORT_SCRIPT, module_name], capture_output=True,
+                            text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
 
 class TestApp(TestCase):
 
@@ -18,6 +52,38 @@ class TestApp(TestCase):
     def setUpClass(cls) -> None:
         cls.log = get_logger('cah_test')
 
+    def _check_import_budget(self, resp: Dict):
+        self.log.debug(f'Cold import took {resp["import_time_s"]:.2f}s')
+        # pandas & numpy are loaded on first use, not at import
+        self.assertListEqual([], resp['heavy_globals'])
+        self.assertLess(resp['import_time_s'], Production.STARTUP_IMPORT_BUDGET_S)
+
+    def test_cold_import_bot(self):
+        """Starting up after a deploy shouldn't be held up by imports"""
+        resp = cold_import('cah.bot_base')
+        self.assertNotIn('error', resp)
+        self._check_import_budget(resp)
+
+    def test_cold_import_app(self):
+        resp = cold_import('cah.app')
+        if 'error' in resp:
+            self.skipTest(f'cah.app needs a configured environment to be imported: {resp["error"]}')
+        self._check_import_budget(resp)
+
+    def test_bolt_handler(self):
+        """The Bolt app reuses the bot's client and doesn't call Slack while it's set up"""
+        from slack_sdk import WebClient
+
+        from cah.routes.bolt import create_bolt_handler
+
+        client = WebClient(token=f'xoxb-{random_string()}')
+        with patch.object(client, 'api_call') as mock_api_call:
+            handler = create_bolt_handler(signing_secret=random_string(), client=client)
+        mock_api_call.assert_not_called()
+        self.assertIs(client, handler.app.client)
+        listener_names = [x.ack_function.__name__ for x in handler.app._listeners]
+        self.assertCountEqual(['handle_action', 'scan_message', 'notify_new_statuses'], listener_names)
+
 
 if __name__ == '__main__':
     main()
@@ -4,13 +4,27 @@ from unittest import (
     TestCase,
     main,
 )
-from unittest.mock import MagicMock
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
 
 import pandas as pd
 from pukr import get_logger
 
 from cah.bot_base import CAHBot
-from cah.model import GameStatus
+from cah.core.render_cache import RenderKind
+from cah.db_eng import WizzyPSQLClient
+from cah.model import (
+    GameStatus,
+    TableAnswerCard,
+    TableGame,
+    TableGameRound,
+    TablePlayer,
+    TablePlayerRound,
+    TableQuestionCard,
+)
+from cah.settings import Development
 from tests.common import (
     make_patcher,
     random_string,
@@ -20,6 +34,13 @@ from tests.mocks.db_objects import (
     mock_get_rounds_df,
     mock_get_score,
 )
+from tests.mocks.standins import (
+    STANDIN_DB_PROPS,
+    FakeSlackBotBase,
+    build_standin_bot,
+    make_standin_engine,
+    seed_standin_db,
+)
 
 
 class TestCAHBot(TestCase):
@@ -39,6 +60,8 @@ class TestCAHBot(TestCase):
             self._side_effect_query_stmt_decider
         self.mock_config = MagicMock(name='config')
         self.mock_config.UPDATE_DATE = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
+        self.mock_config.WORK_QUEUE_WORKERS = 2
+        self.mock_config.WORK_QUEUE_MAX_PENDING = 10
 
         self.mock_creds = {
             'team': 't;a',
@@ -105,6 +128,8 @@ class TestCAHBot(TestCase):
         # Load mocks
         self.mock_bot_queries().get_overall_score.return_value = overall_df
         self.mock_bot_queries().get_score_data_for_display_points.return_value = combi_df
+        # Player 1 is on a 2-round streak
+        self.mock_game.streak.current = (1, 2)
 
         self.cahbot.current_game = self.mock_game
         resp = self.cahbot.display_points()
@@ -126,12 +151,33 @@ class TestCAHBot(TestCase):
         # Load mocks
         self.mock_bot_queries().get_overall_score.return_value = overall_df
         self.mock_bot_queries().get_score_data_for_display_points.return_value = combi_df
+        self.mock_game.streak.current = (None, 0)
         self.cahbot.current_game = self.mock_game
         resp = self.cahbot.display_points()
         self.assertIsInstance(resp, list)
         self.assertEqual(3, len(resp))
         self.mock_eng.session_mgr.assert_called()
 
+    def test_get_score_ranks(self):
+        """Ranks go by game score, then overall score, with ties kept in order"""
+        self.mock_bot_queries().get_overall_score.return_value = pd.DataFrame({
+            'player_id': [1, 2, 3, 4],
+            'display_name': ['a', 'b', 'c', 'd'],
+            'overall': [5, 9, 5, 7],
+        })
+        self.mock_bot_queries().get_score_data_for_display_points.return_value = pd.DataFrame({
+            'player_id': [1, 2, 3, 4],
+            'display_name': ['a', 'b', 'c', 'd'],
+            'overall_current': [5, 9, 5, 7],
+            'overall_prev': [4, 9, 5, 7],
+            'current': [2, 1, 2, 0],
+            'prev': [1, 1, 2, 0],
+        })
+        score_df = self.cahbot.get_score(in_game=True, game=self.mock_game)
+        self.assertListEqual([1, 3, 2, 4], score_df['current_rank'].tolist())
+        self.assertListEqual([3, 2, 1, 4], score_df['prev_rank'].tolist())
+        self.assertListEqual([2, -1, -1, 0], score_df['rank_chg'].tolist())
+
     def test_ping(self):
         # In-game ping
         self.mock_game.judge.player_hash = 'XXXX'
@@ -155,5 +201,164 @@ class TestCAHBot(TestCase):
         self.assertEqual('I can\'t really do this outside of a game WHAT DO YOU WANT FROM ME?!?!?!?!??!', resp)
 
 
+class TestCheckForOngoingGame(TestCase):
+
+    def test_latest_game_per_channel(self):
+        """Only the latest game in each channel is reinstated, and only if it wasn't ended"""
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        player_hashes = seed_standin_db(eng, n_players=3)
+        games = [
+            # Games from before channels were recorded count as the main channel's
+            (None, GameStatus.ENDED),
+            (None, GameStatus.PLAYER_DECISION),
+            ('COTHER', GameStatus.PLAYER_DECISION),
+            ('COTHER', GameStatus.ENDED),
+            ('CTHIRD', GameStatus.JUDGE_DECISION),
+        ]
+        with eng.session_mgr() as session:
+            game_tbls = [TableGame(deck_combo=['bench'], status=status, channel_id=channel) for channel, status in games]
+            session.add_all(game_tbls)
+            session.flush()
+            game_ids = [x.game_id for x in game_tbls]
+        with patch('cah.bot_base.CAHBot.reinstate_game') as mock_reinstate:
+            bot = build_standin_bot(eng, fake_st=FakeSlackBotBase(channel_members=player_hashes))
+            self.addCleanup(bot.work_queue.shutdown)
+        reinstated = sorted((x.kwargs['game_id'], x.kwargs['channel']) for x in mock_reinstate.call_args_list)
+        self.assertListEqual([(game_ids[1], Development.MAIN_CHANNEL), (game_ids[4], 'CTHIRD')], reinstated)
+
+
+class TestCAHBotWithGame(TestCase):
+
+    def setUp(self) -> None:
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        self.player_hashes = seed_standin_db(eng, n_players=3)
+        self.bot = build_standin_bot(eng, fake_st=FakeSlackBotBase(channel_members=self.player_hashes))
+        self.addCleanup(self.bot.work_queue.shutdown)
+        self.bot.work_queue = MagicMock(name='work_queue')
+        mock_game = MagicMock(name='game', channel_id='CGAME')
+        mock_game.players.player_dict = {x: None for x in self.player_hashes[:2]}
+        self.bot.games.set('CGAME', mock_game)
+
+    def test_unit_of_work_per_job(self):
+        self.assertEqual(self.bot.eng.run_in_unit_of_work, self.bot.task_jobs.job_wrapper)
+
+        class NoUnitOfWork(Development):
+            DB_UNIT_OF_WORK_PER_REQUEST = False
+
+        # Without units of work, each of the queued work's transactions is committed (& retried) on its own
+        bot = build_standin_bot(self.bot.eng, fake_st=FakeSlackBotBase(channel_members=self.player_hashes),
+                                config=NoUnitOfWork)
+        self.addCleanup(bot.work_queue.shutdown)
+        self.assertIsNone(bot.work_queue.job_wrapper)
+        self.assertIsNone(bot.task_jobs.job_wrapper)
+
+    def test_actions_keyed_on_game_channel(self):
+        # A click from a DM is ordered with the rest of the player's game
+        self.bot.queue_incoming_action(self.player_hashes[0], 'DPLAYER', action_dict={}, event_dict={})
+        self.assertEqual('CGAME', self.bot.work_queue.submit.call_args.args[0])
+        # Without a game, the channel it came from is used
+        self.bot.queue_incoming_action(self.player_hashes[2], 'DOTHER', action_dict={}, event_dict={})
+        self.assertEqual('DOTHER', self.bot.work_queue.submit.call_args.args[0])
+
+    def test_events_keyed_on_game_channel(self):
+        self.bot.queue_event({'event': {'channel': 'DPLAYER', 'user': self.player_hashes[1], 'text': 'c! pick 1'}})
+        self.assertEqual('CGAME', self.bot.work_queue.submit.call_args.args[0])
+        self.bot.queue_event({'event': {'channel': 'CGAME', 'user': self.player_hashes[2], 'text': 'hi'}})
+        self.assertEqual('CGAME', self.bot.work_queue.submit.call_args.args[0])
+
+    def test_modify_answer_text(self):
+        with self.bot.eng.session_mgr() as session:
+            answer_card_id = session.query(TableAnswerCard.answer_card_id).limit(1).scalar()
+        mock_game = self.bot.games.get('CGAME')
+        self.bot.modify_answer_text(answer_card_id=answer_card_id, new_text='Edited answer')
+        with self.bot.eng.session_mgr() as session:
+            self.assertEqual('Edited answer', session.query(TableAnswerCard.card_text).filter(
+                TableAnswerCard.answer_card_id == answer_card_id).scalar())
+        # Hands are rendered again with the new text
+        mock_game.render_cache.invalidate.assert_called_once_with(kind=RenderKind.HAND)
+
+    def test_scheduled_tasks_queued_per_game(self):
+        mock_game = self.bot.games.get('CGAME')
+        self.bot.handle_randpick()
+        self.bot.work_queue.submit.assert_called_once_with('CGAME', mock_game.handle_autorandpicks, name='randpick')
+        mock_game.handle_autorandpicks.assert_not_called()
+        # Tasks with a channel only run for that channel's game
+        self.bot.work_queue.submit.reset_mock()
+        self.bot.handle_randpick(channel='COTHER')
+        self.bot.force_choose(channel='COTHER')
+        self.bot.work_queue.submit.assert_not_called()
+
+        # The judge's status is checked once it's the choice's turn in the queue
+        self.bot.force_choose()
+        key, func, *args = self.bot.work_queue.submit.call_args.args
+        kwargs = {k: v for k, v in self.bot.work_queue.submit.call_args.kwargs.items() if k != 'name'}
+        self.assertEqual('CGAME', key)
+        mock_game.status = GameStatus.JUDGE_DECISION
+        mock_game.judge.selected_choice_idx = None
+        with patch.object(self.bot, 'choose_card') as mock_choose_card:
+            func(*args, **kwargs)
+            # A judge who's still deciding gets a random choice
+            mock_choose_card.assert_called_once_with(mock_game.judge.player_hash, 'randchoose', channel='CGAME')
+            # One who's already chosen is left alone
+            mock_choose_card.reset_mock()
+            mock_game.judge.selected_choice_idx = 1
+            func(*args, **kwargs)
+            mock_choose_card.assert_not_called()
+
+    def test_randchoose_for_arc_judge(self):
+        mock_game = self.bot.games.get('CGAME')
+        mock_game.status = GameStatus.JUDGE_DECISION
+        mock_game.judge.selected_choice_idx = None
+        self.bot.work_queue.submit.side_effect = lambda key, func, *args, name=None, **kwargs: func(*args, **kwargs)
+        with patch.object(self.bot, 'choose_card') as mock_choose_card:
+            mock_game.judge.is_arc = False
+            self.bot.handle_randchoose()
+            mock_choose_card.assert_not_called()
+            mock_game.judge.is_arc = True
+            self.bot.handle_randchoose()
+        mock_choose_card.assert_called_once_with(mock_game.judge.player_hash, 'randchoose', channel='CGAME')
+
+    def test_add_busy_player(self):
+        other_game = MagicMock(name='other_game', channel_id='COTHER')
+        other_game.players.player_dict = {self.player_hashes[2]: None}
+        self.bot.games.set('COTHER', other_game)
+        action_dict = {'action_id': 'add-player-done', 'selected_user': self.player_hashes[0]}
+        # Someone already playing in another channel's game can't be added to this one
+        with patch.object(self.bot.st, 'send_message') as mock_send_message:
+            self.bot.process_incoming_action(self.player_hashes[2], 'COTHER', action_dict=action_dict, event_dict={})
+        other_game.players.add_player_to_game.assert_not_called()
+        channel, message = mock_send_message.call_args.args
+        self.assertEqual('COTHER', channel)
+        self.assertIn(f'<@{self.player_hashes[0]}> already in a game elsewhere', message)
+        # Someone who isn't can
+        action_dict['selected_user'] = 'UNEW'
+        self.bot.process_incoming_action(self.player_hashes[2], 'COTHER', action_dict=action_dict, event_dict={})
+        other_game.players.add_player_to_game.assert_called_once_with(
+            'UNEW', game_id=other_game.game_id, game_round_id=other_game.game_round_id)
+
+    def test_reinstate_leaves_out_busy_players(self):
+        with self.bot.eng.session_mgr() as session:
+            game_tbl = TableGame(deck_combo=['bench'], status=GameStatus.PLAYER_DECISION, channel_id='COTHER')
+            session.add(game_tbl)
+            session.flush()
+            question_card_id = session.query(TableQuestionCard.question_card_id).limit(1).scalar()
+            game_round_tbl = TableGameRound(game_key=game_tbl.game_id, question_card_key=question_card_id)
+            session.add(game_round_tbl)
+            session.flush()
+            for player in session.query(TablePlayer).all():
+                session.add(TablePlayerRound(player_key=player.player_id, game_key=game_tbl.game_id,
+                                             game_round_key=game_round_tbl.game_round_id, is_arp=False, is_arc=False))
+            game_id = game_tbl.game_id
+        with patch('cah.bot_base.Game') as mock_game_cls, patch('cah.bot_base.Deck'):
+            self.bot.reinstate_game(game_id=game_id, channel='COTHER')
+        # The players already in CGAME's game stay there
+        self.assertListEqual([self.player_hashes[2]], mock_game_cls.call_args.kwargs['player_hashes'])
+        mock_game_cls.return_value.reinstate_round.assert_called_once()
+
+
 if __name__ == '__main__':
     main()
@@ -5,9 +5,13 @@ from unittest import (
 from unittest.mock import MagicMock
 
 from pukr import get_logger
+from sqlalchemy.exc import DBAPIError
 
 from cah.db_eng import WizzyPSQLClient
-from cah.model import SettingType
+from cah.model import (
+    SettingType,
+    TableSetting,
+)
 from tests.common import (
     make_patcher,
     random_string,
@@ -40,6 +44,165 @@ class TestPSQLClient(TestCase):
         self.mock_session().__enter__().query.assert_called()
         self.assertIsNone(resp)
 
+    def test_settings_cache(self):
+        mock_query = self.mock_session().__enter__().query
+        mock_query.return_value.all.return_value = [
+            TableSetting(SettingType.IS_PING_WINNER, setting_int=1),
+            TableSetting(SettingType.JUDGE_ORDER, setting_str='UA,UB'),
+            TableSetting(SettingType.DECKNUKE_PENALTY, setting_int=-1),
+        ]
+        mock_query.reset_mock()
+        self.assertTrue(self.eng.get_setting(SettingType.IS_PING_WINNER))
+        self.assertEqual('UA,UB', self.eng.get_setting(SettingType.JUDGE_ORDER))
+        self.assertEqual(-1, self.eng.get_setting(SettingType.DECKNUKE_PENALTY))
+        self.assertIsNone(self.eng.get_setting(SettingType.IS_PING_JUDGE))
+        # All settings were loaded in one go
+        mock_query.assert_called_once_with(TableSetting)
+
+        # Writes go to the db and the cache
+        self.eng.set_setting(SettingType.IS_PING_WINNER, False)
+        self.eng.set_setting(SettingType.JUDGE_ORDER, 'UB,UA')
+        mock_query.return_value.filter.return_value.update.assert_called_with({TableSetting.setting_str: 'UB,UA'})
+        self.assertFalse(self.eng.get_setting(SettingType.IS_PING_WINNER))
+        self.assertEqual('UB,UA', self.eng.get_setting(SettingType.JUDGE_ORDER))
+        self.assertEqual(1, mock_query.return_value.all.call_count)
+
+        # Invalidating forces a reload
+        self.eng.invalidate_settings()
+        self.eng.get_setting(SettingType.IS_PING_WINNER)
+        self.assertEqual(2, mock_query.return_value.all.call_count)
+
+    def test_settings_cache_ttl(self):
+        mock_query = self.mock_session().__enter__().query
+        mock_query.return_value.all.return_value = [TableSetting(SettingType.DECKNUKE_PENALTY, setting_int=-1)]
+        self.eng.settings_ttl_s = 0
+        self.eng.get_setting(SettingType.DECKNUKE_PENALTY)
+        self.eng.get_setting(SettingType.DECKNUKE_PENALTY)
+        self.assertEqual(2, mock_query.return_value.all.call_count)
+
+    @staticmethod
+    def _make_db_error(pgcode: str) -> DBAPIError:
+        orig = Exception('could not serialize access')
+        orig.pgcode = pgcode
+        return DBAPIError(statement='UPDATE ...', params={}, orig=orig)
+
+    def test_run_in_transaction(self):
+        self.eng.serialization_retries = 2
+        mock_func = MagicMock(name='func', side_effect=[self._make_db_error('40001'), 'done'])
+        self.assertEqual('done', self.eng.run_in_transaction(mock_func, 1, x=2))
+        self.assertEqual(2, mock_func.call_count)
+        mock_func.assert_called_with(self.mock_session().__enter__(), 1, x=2)
+
+        # Retries run out
+        mock_func = MagicMock(name='func', side_effect=self._make_db_error('40P01'))
+        with self.assertRaises(DBAPIError):
+            self.eng.run_in_transaction(mock_func)
+        self.assertEqual(3, mock_func.call_count)
+
+        # Other errors aren't retried
+        mock_func = MagicMock(name='func', side_effect=self._make_db_error('23505'))
+        with self.assertRaises(DBAPIError):
+            self.eng.run_in_transaction(mock_func)
+        mock_func.assert_called_once()
+
+    def test_unit_of_work_retries(self):
+        del self.eng.session_mgr
+        mock_factory = MagicMock(name='session_factory')
+        mock_factory.return_value.info = {}
+        self.eng._session_factory = mock_factory
+        self.eng.serialization_retries = 2
+        mock_func = MagicMock(name='func', return_value='done')
+
+        # The whole unit is run again when its commit is aborted
+        mock_factory().commit.side_effect = [self._make_db_error('40001'), None]
+        self.assertEqual('done', self.eng.run_in_unit_of_work(mock_func, 1, x=2))
+        self.assertEqual(2, mock_func.call_count)
+        mock_func.assert_called_with(1, x=2)
+
+        # Other errors aren't retried
+        mock_func.reset_mock()
+        mock_factory().commit.side_effect = self._make_db_error('23505')
+        with self.assertRaises(DBAPIError):
+            self.eng.run_in_unit_of_work(mock_func)
+        mock_func.assert_called_once()
+        self.assertFalse(self.eng.is_in_unit_of_work)
+
+    def test_read_session_mgr(self):
+        # Without READ COMMITTED, reads go through the normal sessions
+        self.eng.is_read_committed_reads = False
+        self.assertIs(self.mock_session(), self.eng.read_session_mgr())
+
+    def test_unit_of_work(self):
+        # Use the real session handling with a fake session factory
+        del self.eng.session_mgr
+        mock_factory = MagicMock(name='session_factory')
+        self.eng._session_factory = mock_factory
+        mock_func = MagicMock(name='func', return_value='done')
+
+        with self.eng.unit_of_work():
+            self.assertTrue(self.eng.is_in_unit_of_work)
+            with self.eng.session_mgr() as session1:
+                pass
+            with self.eng.read_session_mgr() as session2:
+                pass
+            self.assertEqual('done', self.eng.run_in_transaction(mock_func))
+            # Nested units join the outer one
+            with self.eng.unit_of_work():
+                with self.eng.session_mgr() as session3:
+                    pass
+        self.assertFalse(self.eng.is_in_unit_of_work)
+        # Everything shared one session, which was committed once
+        mock_factory.assert_called_once()
+        self.assertIs(session1, session2)
+        self.assertIs(session1, session3)
+        mock_func.assert_called_once_with(session1)
+        session1.commit.assert_called_once()
+        session1.close.assert_called_once()
+
+        # An error in any block rolls back the unit
+        mock_factory.reset_mock()
+        with self.assertRaises(ValueError):
+            with self.eng.unit_of_work():
+                with self.eng.session_mgr():
+                    raise ValueError('oops')
+        mock_factory().commit.assert_not_called()
+        mock_factory().rollback.assert_called()
+        mock_factory().close.assert_called_once()
+        self.assertFalse(self.eng.is_in_unit_of_work)
+
+    def test_unit_rollback_callbacks(self):
+        del self.eng.session_mgr
+        mock_factory = MagicMock(name='session_factory')
+        mock_factory.return_value.info = {}
+        self.eng._session_factory = mock_factory
+        mock_callback = MagicMock(name='callback')
+
+        # Nothing to roll back outside a unit
+        self.assertFalse(self.eng.on_unit_rollback(mock_callback))
+
+        # Dropped once the unit is committed
+        with self.eng.unit_of_work():
+            self.assertTrue(self.eng.on_unit_rollback(mock_callback))
+        mock_callback.assert_not_called()
+        self.assertDictEqual({}, mock_factory().info)
+
+        # Run when the unit's commit fails, which is then raised
+        mock_factory().commit.side_effect = DBAPIError('COMMIT', {}, Exception('could not serialize access'))
+        token = self.eng.begin_unit_of_work()
+        self.eng.on_unit_rollback(mock_callback)
+        with self.assertRaises(DBAPIError):
+            self.eng.end_unit_of_work(token)
+        mock_callback.assert_called_once()
+        mock_factory().rollback.assert_called()
+        self.assertFalse(self.eng.is_in_unit_of_work)
+
+        # Run when the unit ends in an error
+        mock_callback.reset_mock()
+        token = self.eng.begin_unit_of_work()
+        self.eng.on_unit_rollback(mock_callback)
+        self.eng.end_unit_of_work(token, error=ValueError('oops'))
+        mock_callback.assert_called_once()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,118 @@
+from unittest import (
+    TestCase,
+    main,
+)
+
+from flask import (
+    Flask,
+    g,
+)
+from sqlalchemy import (
+    create_engine,
+    text,
+)
+
+from cah.metrics import (
+    REQUEST_DB_STATEMENTS,
+    REQUEST_SECONDS,
+    SLACK_CALLS,
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    current_interaction,
+    instrument_engine,
+    record_slack_call,
+    record_slack_wait,
+    track_interaction,
+)
+from cah.routes.helpers import (
+    begin_request_metrics,
+    end_request_metrics,
+)
+from cah.routes.main import bp_main
+from tests.common import random_string
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self) -> None:
+        self.engine = create_engine('sqlite://')
+        instrument_engine(self.engine)
+
+    def test_histogram(self):
+        hist = Histogram('test_seconds', 'Test', ('route', ), buckets=(0.1, 1))
+        for val in [0.05, 0.1, 0.5, 5]:
+            hist.observe(val, route='/a')
+        self.assertEqual(4, hist.get_count(route='/a'))
+        self.assertEqual(0, hist.get_count(route='/b'))
+        self.assertListEqual([
+            'test_seconds_bucket{route="/a",le="0.1"} 2',
+            'test_seconds_bucket{route="/a",le="1"} 3',
+            'test_seconds_bucket{route="/a",le="+Inf"} 4',
+            'test_seconds_sum{route="/a"} 5.65',
+            'test_seconds_count{route="/a"} 4',
+        ], hist.render())
+
+    def test_registry_render(self):
+        registry = MetricsRegistry()
+        counter = registry.register(Counter('test_total', 'Things counted', ('name', )))
+        counter.inc(name='say "hi"')
+        counter.inc(2, name='say "hi"')
+        self.assertEqual('# HELP test_total Things counted\n'
+                         '# TYPE test_total counter\n'
+                         'test_total{name="say \\"hi\\""} 3\n', registry.render())
+
+    def test_track_interaction(self):
+        route = f'/{random_string()}'
+        self.assertIsNone(current_interaction())
+        with track_interaction(route=route, action_id='game-pick-1') as interaction:
+            with self.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                conn.execute(text('SELECT 2'))
+            record_slack_call('send_message', 0.2)
+            record_slack_wait(0.5)
+        self.assertIsNone(current_interaction())
+        self.assertEqual(2, interaction.n_db_statements)
+        self.assertEqual(1, interaction.n_slack_calls)
+        self.assertAlmostEqual(0.2, interaction.slack_s)
+        self.assertAlmostEqual(0.5, interaction.slack_wait_s)
+        self.assertEqual(1, REQUEST_SECONDS.get_count(route=route, action_id='game-pick-1'))
+        self.assertEqual(1, REQUEST_DB_STATEMENTS.get_count(route=route, action_id='game-pick-1'))
+
+    def test_outside_interaction(self):
+        """Calls made outside of an interaction only count toward the totals"""
+        n_calls = SLACK_CALLS.get(method='update_message', is_error='true')
+        record_slack_call('update_message', 0.1, is_error=True)
+        with self.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        self.assertEqual(n_calls + 1, SLACK_CALLS.get(method='update_message', is_error='true'))
+
+    def test_request_metrics(self):
+        app = Flask(__name__)
+        app.before_request(begin_request_metrics)
+        app.teardown_request(end_request_metrics)
+        app.register_blueprint(bp_main)
+        engine = self.engine
+
+        @app.route('/api/things/<int:thing_id>', methods=['POST'])
+        def _handle(thing_id: int):
+            g.action_id = 'do-thing'
+            with engine.connect() as conn:
+                conn.execute(text('SELECT :x'), {'x': thing_id})
+            return ''
+
+        client = app.test_client()
+        for i in range(3):
+            self.assertEqual(200, client.post(f'/api/things/{i}').status_code)
+        self.assertEqual(3, REQUEST_SECONDS.get_count(route='/api/things/<int:thing_id>', action_id='do-thing'))
+        resp = client.get('/metrics')
+        self.assertEqual(200, resp.status_code)
+        self.assertTrue(resp.mimetype.startswith('text/plain'))
+        body = resp.get_data(as_text=True)
+        self.assertIn('# TYPE cah_request_duration_seconds histogram', body)
+        self.assertIn('cah_request_db_statements_bucket{route="/api/things/<int:thing_id>",action_id="do-thing",'
+                      'le="1"} 3', body)
+
+
+if __name__ == '__main__':
+    main()
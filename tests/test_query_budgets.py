@@ -0,0 +1,134 @@
+"""
+Per-operation budgets on the number of SQL statements that hot paths may run, so N+1 query patterns
+don't creep back in unnoticed. Games are played against the in-memory stand-in db with a few table sizes;
+each call to a budgeted operation is captured separately & checked against its budget.
+"""
+from collections import (
+    Counter,
+    defaultdict,
+)
+import random
+from typing import (
+    Dict,
+    List,
+)
+from unittest import (
+    TestCase,
+    main,
+)
+
+from cah.db_eng import WizzyPSQLClient
+from tests.mocks.standins import (
+    STANDIN_DB_PROPS,
+    FakeSlackBotBase,
+    HeldJobQueue,
+    QueryCounter,
+    build_standin_bot,
+    make_standin_engine,
+    seed_standin_db,
+)
+
+
+class QueryBudget:
+    """The number of statements an operation may run, plus an allowance per player in the game"""
+
+    def __init__(self, n_statements: int, per_player: int = 0):
+        self.n_statements = n_statements
+        self.per_player = per_player
+
+    def allowed(self, n_players: int) -> int:
+        return self.n_statements + self.per_player * n_players
+
+
+QUERY_BUDGETS = {
+    'Game.process_picks': QueryBudget(17),
+    # Incl. ending the previous round, where each player's round, score & rollup rows are still written
+    #   one at a time
+    'Game.new_round': QueryBudget(20, per_player=4),
+    'Game.deal_cards': QueryBudget(2),
+    'Game.choose_card': QueryBudget(1),
+    'CAHBot.display_points': QueryBudget(2),
+}  # type: Dict[str, QueryBudget]
+
+
+def describe_statements(statements: List[str], n_max: int = 15) -> str:
+    """Lists the statements, most repeated first (where N+1 patterns show up)"""
+    counts = Counter(' '.join(x.split())[:200] for x in statements)
+    lines = [f'  {n}x {stmt}' for stmt, n in counts.most_common(n_max)]
+    if len(counts) > n_max:
+        lines.append(f'  ...and {len(counts) - n_max} other statements')
+    return '\n'.join(lines)
+
+
+class TestQueryBudgets(TestCase):
+
+    def _spy(self, obj, method: str, op: str, query_counter: QueryCounter, samples: Dict[str, List[List[str]]]):
+        """Has each call to the method record the statements it ran"""
+        func = getattr(obj, method)
+
+        def _captured(*args, **kwargs):
+            with query_counter.capture() as statements:
+                result = func(*args, **kwargs)
+            samples[op].append(statements)
+            return result
+
+        setattr(obj, method, _captured)
+
+    def _play(self, n_players: int, n_rounds: int = 3) -> Dict[str, List[List[str]]]:
+        """Plays a few rounds, returning the statements run by each call to a budgeted operation"""
+        random.seed(n_players)
+        engine = make_standin_engine()
+        self.addCleanup(engine.dispose)
+        eng = WizzyPSQLClient(props=STANDIN_DB_PROPS, engine=engine)
+        player_hashes = seed_standin_db(eng, n_players=n_players)
+        query_counter = QueryCounter(engine)
+        fake_st = FakeSlackBotBase(channel_members=player_hashes)
+        # Holding back scheduled jobs keeps round transitions out of what scheduled them
+        job_queue = HeldJobQueue()
+        bot = build_standin_bot(eng, fake_st=fake_st, job_queue=job_queue)
+        self.addCleanup(bot.work_queue.shutdown)
+        channel = bot.channel_id
+        bot.new_game(deck_names=['bench'], player_hashes=player_hashes, channel=channel)
+        game = bot.get_game(channel)
+
+        samples = defaultdict(list)  # type: Dict[str, List[List[str]]]
+        for op in QUERY_BUDGETS.keys():
+            cls_name, method = op.split('.')
+            self._spy(game if cls_name == 'Game' else bot, method, op=op, query_counter=query_counter,
+                      samples=samples)
+        for _ in range(n_rounds):
+            job_queue.run_all()
+            for p_hash in game.players_left_to_pick(as_name=False):
+                bot.process_picks(user_hash=p_hash, message='randpick', channel=channel)
+            bot.choose_card(user_hash=game.judge.player_hash, message='randchoose', channel=channel)
+            bot.display_points(channel=channel)
+            job_queue.run_all()
+        return samples
+
+    def _check_budgets(self, samples: Dict[str, List[List[str]]], n_players: int):
+        over_budget = []
+        for op, budget in QUERY_BUDGETS.items():
+            self.assertIn(op, samples, f'{op} was never called')
+            worst = max(samples[op], key=len)
+            if len(worst) > budget.allowed(n_players):
+                over_budget.append(f'{op} ran {len(worst)} statements with {n_players} players '
+                                   f'(budget: {budget.allowed(n_players)}):\n{describe_statements(worst)}')
+        if len(over_budget) > 0:
+            self.fail('\n'.join(over_budget))
+
+    def test_small_game(self):
+        self._check_budgets(self._play(n_players=4), n_players=4)
+
+    def test_big_game(self):
+        """Budgets that don't allow for more players hold no matter how many are playing"""
+        self._check_budgets(self._play(n_players=12), n_players=12)
+
+    def test_report(self):
+        statements = ['SELECT * FROM cah.player_hand WHERE player_key = ?'] * 3 + ['UPDATE cah.game SET status=?']
+        report = describe_statements(statements)
+        self.assertEqual('  3x SELECT * FROM cah.player_hand WHERE player_key = ?\n'
+                         '  1x UPDATE cah.game SET status=?', report)
+
+
+if __name__ == '__main__':
+    main()